@@ -0,0 +1,9 @@
+"""
+Suíte de benchmarks offline do PromoHunter.
+
+Os benchmarks reproduzem payloads gravados das lojas a partir de um servidor HTTP
+local (ver `mock_store`), sem depender de rede nem do Telegram.
+
+Uso (a partir do diretório `system/`):
+    python -m benchmarks.run --output bench_results.json
+"""
@@ -0,0 +1,483 @@
+"""
+Servidor local que imita a Telegram Bot API para os testes de carga.
+
+Implementa o subconjunto de métodos usado pelo `TelegramBot` (getMe, getUpdates,
+setWebhook/deleteWebhook, sendMessage, editMessageText, sendChatAction, sendPhoto,
+sendMediaGroup, sendDocument) e registra cada envio para medir latência e conferir os limites
+de flood do Telegram (~1 mensagem/s por chat e ~30 mensagens/s no total).
+
+Fotos enviadas por URL contam como download (`downloads`); as enviadas por um
+`file_id` emitido antes contam em `file_id_sends`. URLs em `dead_urls` e `file_id`
+desconhecidos recebem 400, como na Bot API. Arquivos enviados com `sendDocument`
+(upload multipart) ficam em `documents`.
+
+Basta passar `base_url` para o `TelegramBot`:
+    with FakeTelegramServer() as api:
+        bot = TelegramBot(FAKE_TOKEN, base_url=api.api_base_url)
+"""
+
+import json
+import threading
+import time
+from collections import defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple
+from email.parser import BytesParser
+from email.policy import HTTP
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+
+FAKE_TOKEN = '123456:FAKE-TOKEN-PARA-TESTES-DE-CARGA'
+BOT_USER = {
+    'id': 123456,
+    'is_bot': True,
+    'first_name': 'PromoHunter',
+    'username': 'promohunter_loadtest_bot',
+    'can_join_groups': True,
+    'can_read_all_group_messages': False,
+    'supports_inline_queries': False,
+}
+
+# Campos textuais enviados sem codificação JSON pelo python-telegram-bot
+_RAW_FIELDS = {'text', 'caption', 'action', 'parse_mode', 'url', 'photo', 'allowed_updates'}
+
+# Métodos que contam para os limites de flood (chat actions não contam)
+_FLOOD_METHODS = {'sendMessage', 'editMessageText', 'sendPhoto', 'sendMediaGroup', 'sendDocument'}
+
+
+class FloodLimits:
+    """Limites de envio da Bot API e, opcionalmente, sua aplicação com respostas 429."""
+
+    def __init__(self, per_chat_per_sec: int = 1, per_chat_burst: int = 3, global_per_sec: int = 30,
+                 enforce: bool = False, retry_after: int = 1):
+        """
+        Args:
+            per_chat_per_sec: Mensagens por segundo toleradas em um mesmo chat
+            per_chat_burst: Rajada tolerada por chat dentro de uma janela de 1s
+            global_per_sec: Mensagens por segundo toleradas somando todos os chats
+            enforce: Se True, envios acima do limite recebem HTTP 429 como no Telegram real
+            retry_after: Valor de `retry_after` devolvido nas respostas 429
+        """
+        self.per_chat_per_sec = per_chat_per_sec
+        self.per_chat_burst = max(per_chat_burst, per_chat_per_sec)
+        self.global_per_sec = global_per_sec
+        self.enforce = enforce
+        self.retry_after = retry_after
+
+
+class SentMessage:
+    """Registro de um envio feito pelo bot."""
+
+    __slots__ = ('chat_id', 'method', 'text', 'timestamp', 'message_id', 'flood_violation')
+
+    def __init__(self, chat_id: int, method: str, text: str, timestamp: float, message_id: int,
+                 flood_violation: Optional[str]):
+        self.chat_id = chat_id
+        self.method = method
+        self.text = text
+        self.timestamp = timestamp
+        self.message_id = message_id
+        self.flood_violation = flood_violation
+
+
+class _FakeTelegramHandler(BaseHTTPRequestHandler):
+    """Handler HTTP das rotas `/bot<token>/<metodo>`."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        self._dispatch()
+
+    def do_GET(self):
+        self._dispatch()
+
+    def _dispatch(self):
+        server: 'FakeTelegramServer' = self.server.owner
+        partes = urlsplit(self.path)
+        segmentos = partes.path.strip('/').split('/')
+        if len(segmentos) != 2 or not segmentos[0].startswith('bot'):
+            self._send(404, {'ok': False, 'error_code': 404, 'description': 'Not Found'})
+            return
+
+        params = self._read_params(partes.query)
+        status, corpo = server.handle(segmentos[1], params)
+        self._send(status, corpo)
+
+    def _read_params(self, query: str) -> Dict[str, Any]:
+        tamanho = int(self.headers.get('Content-Length') or 0)
+        bruto = self.rfile.read(tamanho) if tamanho else b''
+        tipo = self.headers.get('Content-Type', '')
+
+        if 'application/json' in tipo and bruto:
+            return json.loads(bruto)
+
+        campos = parse_qs(query)
+        arquivos: Dict[str, Any] = {}
+        if bruto and 'multipart' in tipo:
+            # Uploads (sendDocument): campos de texto viram parâmetros, arquivos viram (nome, bytes)
+            mensagem = BytesParser(policy=HTTP).parsebytes(b'Content-Type: ' + tipo.encode() + b'\r\n\r\n' + bruto)
+            for parte in mensagem.iter_parts():
+                nome = parte.get_param('name', header='content-disposition')
+                if parte.get_filename():
+                    arquivos[nome] = (parte.get_filename(), parte.get_payload(decode=True))
+                else:
+                    campos[nome] = [parte.get_payload(decode=True).decode('utf-8')]
+        elif bruto:
+            campos.update(parse_qs(bruto.decode('utf-8')))
+
+        params: Dict[str, Any] = {}
+        for nome, valores in campos.items():
+            valor = valores[-1]
+            if nome not in _RAW_FIELDS:
+                try:
+                    valor = json.loads(valor)
+                except ValueError:
+                    pass
+            params[nome] = valor
+        params.update(arquivos)
+        return params
+
+    def _send(self, status: int, corpo: Dict[str, Any]):
+        dados = json.dumps(corpo).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(dados)))
+        self.end_headers()
+        try:
+            self.wfile.write(dados)
+        except (BrokenPipeError, ConnectionResetError):
+            # O bot encerrou o long polling (ex: stop_polling) antes da resposta
+            pass
+
+    def log_message(self, format, *args):
+        """Silencia o log padrão por requisição do `http.server`."""
+        pass
+
+
+class FakeTelegramServer:
+    """Bot API simulada, rodando em uma thread própria.
+
+    As mensagens dos "usuários" são injetadas com `inject_message` e entregues ao bot
+    via getUpdates (long polling) ou, se um webhook for registrado, via POST na URL dele.
+    """
+
+    def __init__(self, flood_limits: Optional[FloodLimits] = None, host: str = '127.0.0.1', port: int = 0,
+                 send_latency_ms: float = 0.0, download_latency_ms: float = 0.0):
+        """
+        Args:
+            flood_limits: Limites de flood verificados em cada envio (padrão: limites do Telegram, sem 429)
+            host: Endereço de escuta
+            port: Porta de escuta (0 escolhe uma porta livre)
+            send_latency_ms: Latência simulada de cada chamada de envio
+            download_latency_ms: Latência simulada do download de cada foto enviada por URL
+        """
+        self.flood_limits = flood_limits or FloodLimits()
+        self.send_latency_ms = send_latency_ms
+        self.download_latency_ms = download_latency_ms
+
+        self._updates: List[Dict[str, Any]] = []
+        self._updates_cond = threading.Condition()
+        self._next_update_id = 1
+        self._next_message_id = 1
+        self._webhook_url: Optional[str] = None
+
+        self._lock = threading.Lock()
+        self.sent: List[SentMessage] = []
+        self.method_calls: Dict[str, int] = defaultdict(int)
+        self.throttled = 0
+        self._chat_window: Dict[int, Deque[float]] = defaultdict(deque)
+        self._global_window: Deque[float] = deque()
+        self._listeners: List[Callable[[SentMessage], None]] = []
+
+        # Fotos: URLs que "não baixam", file_ids emitidos e contagem de downloads
+        self.dead_urls: Set[str] = set()
+        self._file_ids: Set[str] = set()
+        self.downloads = 0
+        self.file_id_sends = 0
+        # Documentos recebidos: (chat_id, nome do arquivo, conteúdo)
+        self.documents: List[Tuple[Any, str, bytes]] = []
+
+        self._httpd = ThreadingHTTPServer((host, port), _FakeTelegramHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.owner = self
+        self._threads: List[threading.Thread] = []
+        self._running = False
+
+    @property
+    def api_base_url(self) -> str:
+        """Valor para o parâmetro `base_url` do `TelegramBot` (o token é anexado pelo PTB)."""
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/bot"
+
+    def add_listener(self, callback: Callable[[SentMessage], None]):
+        """Registra uma função chamada (na thread do servidor) a cada envio do bot."""
+        self._listeners.append(callback)
+
+    def inject_message(self, chat_id: int, text: str, first_name: str = 'Usuário') -> int:
+        """Enfileira uma mensagem de texto de um usuário, como se tivesse sido enviada no Telegram.
+
+        Returns:
+            int: update_id atribuído
+        """
+        entidades = []
+        if text.startswith('/'):
+            comando = text.split()[0]
+            entidades.append({'type': 'bot_command', 'offset': 0, 'length': len(comando)})
+
+        with self._updates_cond:
+            update_id = self._next_update_id
+            self._next_update_id += 1
+            usuario = {'id': chat_id, 'is_bot': False, 'first_name': first_name, 'username': f'user{chat_id}'}
+            self._updates.append({
+                'update_id': update_id,
+                'message': {
+                    'message_id': update_id,
+                    'date': int(time.time()),
+                    'chat': {'id': chat_id, 'type': 'private', 'first_name': first_name},
+                    'from': usuario,
+                    'text': text,
+                    'entities': entidades,
+                },
+            })
+            self._updates_cond.notify_all()
+        return update_id
+
+    def handle(self, metodo: str, params: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        """Atende uma chamada da Bot API e devolve (status HTTP, corpo JSON)."""
+        with self._lock:
+            self.method_calls[metodo] += 1
+
+        if metodo == 'getMe':
+            return 200, {'ok': True, 'result': BOT_USER}
+        if metodo == 'getUpdates':
+            return 200, {'ok': True, 'result': self._get_updates(params)}
+        if metodo == 'setWebhook':
+            self._webhook_url = params.get('url') or None
+            return 200, {'ok': True, 'result': True}
+        if metodo == 'deleteWebhook':
+            self._webhook_url = None
+            return 200, {'ok': True, 'result': True}
+        if metodo == 'getWebhookInfo':
+            return 200, {'ok': True, 'result': {'url': self._webhook_url or '', 'has_custom_certificate': False,
+                                                'pending_update_count': len(self._updates)}}
+        if metodo == 'sendChatAction':
+            self._record(metodo, params)
+            return 200, {'ok': True, 'result': True}
+        if metodo in _FLOOD_METHODS:
+            return self._handle_send(metodo, params)
+        if metodo in ('setMyCommands', 'close', 'logOut', 'answerCallbackQuery'):
+            return 200, {'ok': True, 'result': True}
+
+        return 404, {'ok': False, 'error_code': 404, 'description': f'Not Found: method {metodo}'}
+
+    def _get_updates(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        offset = int(params.get('offset') or 0)
+        limite = int(params.get('limit') or 100)
+        espera = float(params.get('timeout') or 0)
+        prazo = time.monotonic() + espera
+
+        with self._updates_cond:
+            # Como no Telegram, um offset confirma (e descarta) os updates anteriores
+            if offset:
+                self._updates = [u for u in self._updates if u['update_id'] >= offset]
+            while not self._updates and self._running:
+                restante = prazo - time.monotonic()
+                if restante <= 0:
+                    break
+                self._updates_cond.wait(restante)
+            return self._updates[:limite]
+
+    def _check_media(self, metodo: str, params: Dict[str, Any]) -> Optional[str]:
+        """Valida as fotos do envio e contabiliza downloads/file_ids (descrição do erro, se houver)."""
+        if metodo == 'sendPhoto':
+            referencias = [params.get('photo') or '']
+        elif metodo == 'sendMediaGroup':
+            referencias = [midia.get('media') or '' for midia in params.get('media') or []]
+        else:
+            return None
+
+        downloads = reaproveitadas = 0
+        with self._lock:
+            for referencia in referencias:
+                if referencia.startswith(('http://', 'https://')):
+                    if referencia in self.dead_urls:
+                        return 'Bad Request: failed to get HTTP URL content'
+                    downloads += 1
+                elif referencia in self._file_ids:
+                    reaproveitadas += 1
+                else:
+                    return 'Bad Request: wrong file identifier/HTTP URL specified'
+            self.downloads += downloads
+            self.file_id_sends += reaproveitadas
+        if downloads and self.download_latency_ms:
+            time.sleep(downloads * self.download_latency_ms / 1000)
+        return None
+
+    def _handle_send(self, metodo: str, params: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        if self.send_latency_ms:
+            time.sleep(self.send_latency_ms / 1000)
+
+        erro = self._check_media(metodo, params)
+        if erro:
+            return 400, {'ok': False, 'error_code': 400, 'description': erro}
+
+        enviado = self._record(metodo, params)
+        if enviado.flood_violation and self.flood_limits.enforce:
+            with self._lock:
+                self.throttled += 1
+            retry_after = self.flood_limits.retry_after
+            return 429, {
+                'ok': False,
+                'error_code': 429,
+                'description': f'Too Many Requests: retry after {retry_after}',
+                'parameters': {'retry_after': retry_after},
+            }
+
+        chat_id = params.get('chat_id')
+        mensagem = {
+            'message_id': enviado.message_id,
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private'},
+            'from': BOT_USER,
+        }
+        if metodo == 'sendDocument':
+            nome, conteudo = params.get('document') if isinstance(params.get('document'), tuple) else ('', b'')
+            with self._lock:
+                self.documents.append((chat_id, nome, conteudo))
+            mensagem['document'] = {'file_id': f'document-{enviado.message_id}', 'file_unique_id':
+                                    f'd{enviado.message_id}', 'file_name': nome, 'file_size': len(conteudo)}
+            if params.get('caption'):
+                mensagem['caption'] = params['caption']
+        elif metodo == 'sendPhoto':
+            mensagem['photo'] = [self._photo(params.get('photo') or '', f'{enviado.message_id}')]
+            if params.get('caption'):
+                mensagem['caption'] = params['caption']
+        elif metodo == 'sendMediaGroup':
+            midias = params.get('media') or []
+            resultado = []
+            for indice, midia in enumerate(midias):
+                item = dict(mensagem, message_id=enviado.message_id + indice)
+                item['photo'] = [self._photo(midia.get('media') or '', f'{enviado.message_id}-{indice}')]
+                resultado.append(item)
+            return 200, {'ok': True, 'result': resultado}
+        else:
+            mensagem['text'] = params.get('text', '')
+        return 200, {'ok': True, 'result': mensagem}
+
+    def _photo(self, referencia: str, sufixo: str) -> Dict[str, Any]:
+        """PhotoSize devolvido no envio: o mesmo file_id se a foto foi enviada por file_id."""
+        with self._lock:
+            file_id = referencia if referencia in self._file_ids else f'photo-{sufixo}'
+            self._file_ids.add(file_id)
+        return {'file_id': file_id, 'file_unique_id': f'u{sufixo}', 'width': 800, 'height': 800}
+
+    def _record(self, metodo: str, params: Dict[str, Any]) -> SentMessage:
+        agora = time.monotonic()
+        chat_id = params.get('chat_id')
+        violacao = None
+
+        with self._lock:
+            if metodo == 'sendMediaGroup':
+                message_id = self._next_message_id
+                self._next_message_id += max(1, len(params.get('media') or []))
+            elif metodo == 'editMessageText':
+                message_id = params.get('message_id') or 0
+            else:
+                message_id = self._next_message_id
+                self._next_message_id += 1
+
+            if metodo in _FLOOD_METHODS:
+                violacao = self._check_flood(chat_id, agora)
+
+            enviado = SentMessage(chat_id, metodo, params.get('text') or params.get('caption') or '',
+                                  agora, message_id, violacao)
+            self.sent.append(enviado)
+
+        for callback in self._listeners:
+            callback(enviado)
+        return enviado
+
+    def _check_flood(self, chat_id: Any, agora: float) -> Optional[str]:
+        """Atualiza as janelas deslizantes de 1s e indica qual limite foi excedido (chamado com o lock)."""
+        janela_chat = self._chat_window[chat_id]
+        while janela_chat and agora - janela_chat[0] > 1.0:
+            janela_chat.popleft()
+        while self._global_window and agora - self._global_window[0] > 1.0:
+            self._global_window.popleft()
+
+        janela_chat.append(agora)
+        self._global_window.append(agora)
+
+        if len(self._global_window) > self.flood_limits.global_per_sec:
+            return 'global'
+        if len(janela_chat) > self.flood_limits.per_chat_burst:
+            return 'per_chat'
+        return None
+
+    def flood_report(self) -> Dict[str, Any]:
+        """Resumo da conformidade com os limites de flood durante a execução."""
+        with self._lock:
+            envios = [s for s in self.sent if s.method in _FLOOD_METHODS]
+            por_segundo: Dict[int, int] = defaultdict(int)
+            for enviado in envios:
+                por_segundo[int(enviado.timestamp)] += 1
+            violacoes_chat = sum(1 for s in envios if s.flood_violation == 'per_chat')
+            violacoes_global = sum(1 for s in envios if s.flood_violation == 'global')
+            chats_violadores = len({s.chat_id for s in envios if s.flood_violation == 'per_chat'})
+            return {
+                'messages_sent': len(envios),
+                'peak_global_per_sec': max(por_segundo.values()) if por_segundo else 0,
+                'per_chat_violations': violacoes_chat,
+                'chats_with_violations': chats_violadores,
+                'global_violations': violacoes_global,
+                'throttled_429': self.throttled,
+                'compliant': violacoes_chat == 0 and violacoes_global == 0,
+                'limits': {
+                    'per_chat_burst': self.flood_limits.per_chat_burst,
+                    'global_per_sec': self.flood_limits.global_per_sec,
+                    'enforced': self.flood_limits.enforce,
+                },
+            }
+
+    def _webhook_loop(self):
+        """Entrega os updates pendentes via POST enquanto houver um webhook registrado."""
+        sessao = requests.Session()
+        while self._running:
+            with self._updates_cond:
+                while self._running and (not self._webhook_url or not self._updates):
+                    self._updates_cond.wait(0.5)
+                if not self._running:
+                    return
+                url = self._webhook_url
+                pendentes, self._updates = self._updates, []
+            for update in pendentes:
+                try:
+                    sessao.post(url, json=update, timeout=10)
+                except requests.exceptions.RequestException:
+                    pass
+
+    def start(self) -> 'FakeTelegramServer':
+        """Inicia o servidor HTTP e o entregador de webhooks em threads daemon."""
+        self._running = True
+        for alvo, nome in ((self._httpd.serve_forever, 'fake-telegram'), (self._webhook_loop, 'fake-telegram-webhook')):
+            thread = threading.Thread(target=alvo, name=nome, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self):
+        """Para o servidor, liberando eventuais long polls pendentes."""
+        self._running = False
+        with self._updates_cond:
+            self._updates_cond.notify_all()
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        for thread in self._threads:
+            thread.join(timeout=5)
+
+    def __enter__(self) -> 'FakeTelegramServer':
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,33 @@
+"""
+Carregamento dos payloads gravados das lojas usados pelos benchmarks.
+"""
+
+import json
+import os
+from typing import Any, Dict
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+MAGALU_FIXTURE = 'magalu_busca.json'
+KABUM_FIXTURE = 'kabum_sponsored_products.json'
+KABUM_CATALOG_FIXTURE = 'kabum_catalog_products.json'
+MAGALU_STOREFRONT_FIXTURE = 'magalu_storefront.html'
+
+# Marcador do build id do Next.js no HTML gravado da vitrine
+BUILD_ID_PLACEHOLDER = '__BUILD_ID__'
+
+
+def fixture_path(nome: str) -> str:
+    """Retorna o caminho absoluto de um arquivo de fixture."""
+    return os.path.join(FIXTURES_DIR, nome)
+
+
+def load_fixture_bytes(nome: str) -> bytes:
+    """Lê o payload gravado exatamente como foi recebido da loja."""
+    with open(fixture_path(nome), 'rb') as arquivo:
+        return arquivo.read()
+
+
+def load_fixture(nome: str) -> Dict[str, Any]:
+    """Lê e decodifica um payload gravado."""
+    return json.loads(load_fixture_bytes(nome))
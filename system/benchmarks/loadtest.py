@@ -0,0 +1,222 @@
+"""
+Teste de carga do `TelegramBot` contra a Bot API simulada e as lojas simuladas.
+
+Simula uma população de usuários em ciclo fechado (envia, espera a resposta final,
+"pensa" e envia de novo), mede a latência ponta a ponta de cada update e verifica
+os limites de flood do Telegram. Tudo roda offline, em um único processo.
+
+Uso (a partir do diretório `system/`):
+    python -m benchmarks.loadtest --users 200 --duration 60
+    python -m benchmarks.loadtest --users 1000 --mix buscar=0.6,texto=0.3,help=0.1 --output carga.json
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_telegram import FAKE_TOKEN, FakeTelegramServer, FloodLimits, SentMessage
+from benchmarks.mock_store import MockStoreConfig, MockStoreServer
+from benchmarks.stats import summarize
+from config.settings import get_config
+from services.indice import IndiceProdutos
+from services.lojas import Kabuum, Magalu
+from services.product_search import ProductSearchService
+from services.telegram import TelegramBot
+
+TERMOS = ['notebook', 'smartphone', 'mouse gamer', 'monitor', 'ssd', 'headset', 'placa de video', 'teclado']
+
+# Tipo de mensagem -> (gerador do texto, trechos que identificam a última resposta do bot)
+QUERY_KINDS = {
+    'buscar': (lambda rnd: f"/buscar {rnd.choice(TERMOS)}",
+               ('Busca concluída', 'Nenhum produto encontrado', 'Ocorreu um erro')),
+    'texto': (lambda rnd: f"procuro {rnd.choice(TERMOS)} barato",
+              ('Busca concluída', 'Nenhum produto encontrado', 'Ocorreu um erro')),
+    'start': (lambda rnd: '/start', ('Bem-vindo',)),
+    'help': (lambda rnd: '/help', ('Comandos Disponíveis',)),
+}
+
+
+def parse_mix(texto: str) -> List[Tuple[str, float]]:
+    """Converte `buscar=0.7,help=0.3` em uma lista de (tipo, peso)."""
+    mix = []
+    for parte in texto.split(','):
+        nome, _, peso = parte.partition('=')
+        nome = nome.strip()
+        if nome not in QUERY_KINDS:
+            raise argparse.ArgumentTypeError(f"Tipo de mensagem desconhecido: {nome}")
+        mix.append((nome, float(peso or 1)))
+    return mix
+
+
+class LoadGenerator:
+    """População de usuários simulados conversando com o bot pela Bot API simulada."""
+
+    def __init__(self, api: FakeTelegramServer, args: argparse.Namespace):
+        self.api = api
+        self.args = args
+        self.random = random.Random(args.seed)
+        self.mix = args.mix
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending: Dict[int, Tuple[str, asyncio.Future, List[float]]] = {}
+
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.first_reply: Dict[str, List[float]] = defaultdict(list)
+        self.timeouts: Dict[str, int] = defaultdict(int)
+        self.completed = 0
+
+        api.add_listener(self._on_sent)
+
+    def _on_sent(self, enviado: SentMessage):
+        """Chamado na thread do servidor a cada envio do bot."""
+        if self.loop is not None and enviado.method != 'sendChatAction':
+            self.loop.call_soon_threadsafe(self._resolve, enviado)
+
+    def _resolve(self, enviado: SentMessage):
+        pendente = self._pending.get(enviado.chat_id)
+        if not pendente:
+            return
+        tipo, futuro, primeiros = pendente
+        if not primeiros:
+            primeiros.append(enviado.timestamp)
+        marcadores = QUERY_KINDS[tipo][1]
+        if not futuro.done() and any(m in enviado.text for m in marcadores):
+            futuro.set_result(enviado.timestamp)
+
+    async def _user(self, chat_id: int, prazo: float):
+        await asyncio.sleep(self.random.uniform(0, self.args.ramp_up))
+        nomes, pesos = zip(*self.mix)
+
+        while time.monotonic() < prazo:
+            tipo = self.random.choices(nomes, weights=pesos)[0]
+            texto = QUERY_KINDS[tipo][0](self.random)
+            futuro = self.loop.create_future()
+            primeiros: List[float] = []
+            self._pending[chat_id] = (tipo, futuro, primeiros)
+
+            inicio = time.monotonic()
+            self.api.inject_message(chat_id, texto)
+            try:
+                fim = await asyncio.wait_for(futuro, timeout=self.args.update_timeout)
+                self.latencies[tipo].append(fim - inicio)
+                self.completed += 1
+            except asyncio.TimeoutError:
+                self.timeouts[tipo] += 1
+            if primeiros:
+                self.first_reply[tipo].append(primeiros[0] - inicio)
+            self._pending.pop(chat_id, None)
+
+            await asyncio.sleep(self.random.expovariate(1000 / self.args.think_time_ms) if self.args.think_time_ms else 0)
+
+    async def run(self) -> float:
+        """Executa a população até o fim da duração configurada e retorna o tempo decorrido."""
+        self.loop = asyncio.get_running_loop()
+        inicio = time.monotonic()
+        prazo = inicio + self.args.duration
+        await asyncio.gather(*(self._user(10_000 + i, prazo) for i in range(self.args.users)))
+        return time.monotonic() - inicio
+
+    def report(self, duracao: float) -> Dict[str, Any]:
+        todos = [lat for lats in self.latencies.values() for lat in lats]
+        return {
+            'users': self.args.users,
+            'duration_s': round(duracao, 2),
+            'updates_completed': self.completed,
+            'updates_timed_out': sum(self.timeouts.values()),
+            'end_to_end': summarize(todos, duracao),
+            'by_kind': {
+                tipo: {
+                    'end_to_end': summarize(self.latencies[tipo], duracao),
+                    'first_reply': summarize(self.first_reply[tipo], duracao),
+                    'timed_out': self.timeouts[tipo],
+                }
+                for tipo, _ in self.mix
+            },
+        }
+
+
+async def run_load_test(args: argparse.Namespace) -> Dict[str, Any]:
+    """Sobe as lojas e a Bot API simuladas, inicia o bot sem modificações e aplica a carga."""
+    config_lojas = MockStoreConfig(args.store_latency_ms, args.store_jitter_ms, args.store_error_rate, seed=args.seed)
+    limites = FloodLimits(enforce=args.enforce_flood_limits)
+
+    with MockStoreServer(config_lojas) as lojas, FakeTelegramServer(limites, send_latency_ms=args.send_latency_ms) as api:
+        bot = TelegramBot(
+            FAKE_TOKEN,
+            base_url=api.api_base_url,
+            product_search=ProductSearchService(
+                magalu=Magalu(base_url=lojas.base_url),
+                kabuum=Kabuum(base_url=lojas.base_url),
+                # Catálogo em memória: cada execução começa vazia, sem depender de execuções anteriores
+                indice=IndiceProdutos(),
+            ),
+        )
+        gerador = LoadGenerator(api, args)
+
+        await bot.start_polling()
+        try:
+            duracao = await gerador.run()
+        finally:
+            await bot.stop_polling()
+
+        relatorio = gerador.report(duracao)
+        relatorio['flood'] = api.flood_report()
+        relatorio['bot_api_calls'] = dict(api.method_calls)
+        relatorio['store_requests'] = dict(lojas.requests)
+        return relatorio
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Teste de carga do PromoHunter contra a Bot API simulada')
+    parser.add_argument('--users', type=int, default=50, help='Número de chats simultâneos')
+    parser.add_argument('--duration', type=float, default=30.0, help='Duração da carga em segundos')
+    parser.add_argument('--ramp-up', type=float, default=5.0, help='Janela (s) em que os usuários começam')
+    parser.add_argument('--think-time-ms', type=float, default=2000.0, help='Pausa média entre mensagens de um usuário')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix('buscar=0.6,texto=0.3,start=0.05,help=0.05'),
+                        help='Mistura de mensagens, ex: buscar=0.7,help=0.3')
+    parser.add_argument('--update-timeout', type=float, default=120.0, help='Tempo máximo de espera por update')
+    parser.add_argument('--store-latency-ms', type=float, default=150.0)
+    parser.add_argument('--store-jitter-ms', type=float, default=100.0)
+    parser.add_argument('--store-error-rate', type=float, default=0.0)
+    parser.add_argument('--send-latency-ms', type=float, default=20.0, help='Latência simulada da Bot API por envio')
+    parser.add_argument('--enforce-flood-limits', action='store_true', help='Responder 429 acima dos limites de flood')
+    parser.add_argument('--seed', type=int, default=27)
+    parser.add_argument('--output', help='Arquivo JSON de saída (padrão: stdout)')
+    parser.add_argument('--verbose', action='store_true', help='Mantém os logs do bot na saída')
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+
+    if not args.verbose:
+        logging.disable(logging.INFO)
+    # Os produtos das lojas simuladas não podem ir para a exportação real (EXPORT_DIR)
+    get_config().EXPORT_DIR = ''
+
+    saida_bot = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    with saida_bot:
+        relatorio = asyncio.run(run_load_test(args))
+
+    saida = json.dumps(relatorio, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as arquivo:
+            arquivo.write(saida + '\n')
+        print(f"Resultados gravados em {args.output}", file=sys.stderr)
+    else:
+        print(saida)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,242 @@
+"""
+Servidor local que fala o protocolo do Redis (RESP), para testar o estado compartilhado.
+
+Implementa apenas os comandos usados por `services.estado.EstadoRedis`:
+PING, AUTH, SELECT, GET, SET (EX/PX, NX/XX), DEL, INCR, PEXPIRE, RPUSH, BLPOP,
+LLEN, DBSIZE, FLUSHALL e EVAL (apenas o script `SCRIPT_LIBERAR`). Os dados ficam em memória, num único banco; uma latência
+por comando pode ser injetada para simular um servidor em outra máquina.
+"""
+
+import socketserver
+import threading
+import time
+from collections import Counter, deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from services.estado import SCRIPT_LIBERAR
+
+
+class _Erro(Exception):
+    """Erro devolvido ao cliente como resposta `-ERR ...`."""
+
+
+def _codificar(valor: Any) -> bytes:
+    if valor is None:
+        return b'$-1\r\n'
+    if isinstance(valor, _Erro):
+        return b'-ERR %s\r\n' % str(valor).encode()
+    if isinstance(valor, bool):
+        return b':%d\r\n' % int(valor)
+    if isinstance(valor, int):
+        return b':%d\r\n' % valor
+    if isinstance(valor, str):
+        return b'+%s\r\n' % valor.encode()
+    if isinstance(valor, list):
+        return b'*%d\r\n' % len(valor) + b''.join(_codificar(item) for item in valor)
+    return b'$%d\r\n%s\r\n' % (len(valor), valor)
+
+
+class _MockRedisHandler(socketserver.StreamRequestHandler):
+    def _ler_comando(self) -> Optional[List[bytes]]:
+        linha = self.rfile.readline()
+        if not linha:
+            return None
+        if not linha.startswith(b'*'):
+            # Comando inline (ex: `PING` digitado no telnet)
+            return linha.split()
+        partes = []
+        for _ in range(int(linha[1:-2])):
+            tamanho = int(self.rfile.readline()[1:-2])
+            partes.append(self.rfile.read(tamanho + 2)[:-2])
+        return partes
+
+    def handle(self):
+        servidor: 'MockRedisServer' = self.server.owner
+        while True:
+            try:
+                comando = self._ler_comando()
+            except (OSError, ValueError):
+                return
+            if not comando:
+                return
+            if servidor.latency_ms:
+                time.sleep(servidor.latency_ms / 1000)
+            try:
+                resposta = servidor.executar(comando)
+            except _Erro as e:
+                resposta = e
+            try:
+                self.wfile.write(_codificar(resposta))
+            except OSError:
+                return
+
+
+class _ServidorTcp(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class MockRedisServer:
+    """Servidor RESP em memória, rodando em uma thread própria.
+
+    Exemplo:
+        with MockRedisServer() as redis:
+            estado = EstadoRedis(redis.url)
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency_ms: float = 0.0):
+        """
+        Args:
+            host: Endereço de escuta
+            port: Porta de escuta (0 escolhe uma porta livre)
+            latency_ms: Latência adicionada a cada comando
+        """
+        self.latency_ms = latency_ms
+        self._dados: Dict[bytes, Tuple[Optional[float], bytes]] = {}
+        self._listas: Dict[bytes, Deque[bytes]] = {}
+        self._cond = threading.Condition()
+        self.commands: Counter = Counter()
+        self._server = _ServidorTcp((host, port), _MockRedisHandler)
+        self._server.owner = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """URL a ser passada para `EstadoRedis`/`SHARED_STATE_URL`."""
+        host, port = self._server.server_address[:2]
+        return f"redis://{host}:{port}/0"
+
+    def _vivo(self, chave: bytes) -> Optional[bytes]:
+        entrada = self._dados.get(chave)
+        if entrada is None:
+            return None
+        if entrada[0] is not None and entrada[0] <= time.monotonic():
+            del self._dados[chave]
+            return None
+        return entrada[1]
+
+    def executar(self, comando: List[bytes]) -> Any:
+        """Executa um comando e retorna a resposta (antes da codificação RESP)."""
+        nome = comando[0].upper().decode()
+        argumentos = comando[1:]
+        self.commands[nome] += 1
+        if nome == 'BLPOP':
+            return self._blpop(argumentos)
+        with self._cond:
+            if nome == 'PING':
+                return 'PONG'
+            if nome in ('AUTH', 'SELECT'):
+                return 'OK'
+            if nome == 'GET':
+                return self._vivo(argumentos[0])
+            if nome == 'SET':
+                return self._set(argumentos)
+            if nome == 'DEL':
+                removidas = 0
+                for chave in argumentos:
+                    existia = self._vivo(chave) is not None or chave in self._listas
+                    self._dados.pop(chave, None)
+                    self._listas.pop(chave, None)
+                    removidas += existia
+                return removidas
+            if nome == 'INCR':
+                atual = self._vivo(argumentos[0])
+                try:
+                    valor = int(atual or 0) + 1
+                except ValueError:
+                    raise _Erro('value is not an integer or out of range')
+                expira_em = self._dados[argumentos[0]][0] if atual is not None else None
+                self._dados[argumentos[0]] = (expira_em, str(valor).encode())
+                return valor
+            if nome == 'PEXPIRE':
+                atual = self._vivo(argumentos[0])
+                if atual is None:
+                    return 0
+                self._dados[argumentos[0]] = (time.monotonic() + int(argumentos[1]) / 1000, atual)
+                return 1
+            if nome == 'RPUSH':
+                lista = self._listas.setdefault(argumentos[0], deque())
+                lista.extend(argumentos[1:])
+                self._cond.notify_all()
+                return len(lista)
+            if nome == 'LLEN':
+                return len(self._listas.get(argumentos[0], ()))
+            if nome == 'EVAL':
+                # Sem interpretador Lua: só o compare-and-delete das travas é reconhecido
+                if argumentos[0].decode() != SCRIPT_LIBERAR:
+                    raise _Erro('only the lock release script is supported')
+                chave, valor = argumentos[2], argumentos[3]
+                if self._vivo(chave) != valor:
+                    return 0
+                del self._dados[chave]
+                return 1
+            if nome == 'DBSIZE':
+                return len(self._dados) + len(self._listas)
+            if nome == 'FLUSHALL':
+                self._dados.clear()
+                self._listas.clear()
+                return 'OK'
+        raise _Erro(f"unknown command '{nome}'")
+
+    def _set(self, argumentos: List[bytes]) -> Any:
+        chave, valor = argumentos[0], argumentos[1]
+        opcoes = [a.upper() for a in argumentos[2:]]
+        expira_em = None
+        for marcador, escala in ((b'PX', 1000), (b'EX', 1)):
+            if marcador in opcoes:
+                expira_em = time.monotonic() + int(opcoes[opcoes.index(marcador) + 1]) / escala
+        existe = self._vivo(chave) is not None
+        if (b'NX' in opcoes and existe) or (b'XX' in opcoes and not existe):
+            return None
+        self._dados[chave] = (expira_em, valor)
+        return 'OK'
+
+    def _blpop(self, argumentos: List[bytes]) -> Any:
+        chaves, timeout = argumentos[:-1], float(argumentos[-1])
+        prazo = time.monotonic() + timeout if timeout else None
+        with self._cond:
+            while True:
+                for chave in chaves:
+                    lista = self._listas.get(chave)
+                    if lista:
+                        return [chave, lista.popleft()]
+                restante = None if prazo is None else prazo - time.monotonic()
+                if restante is not None and restante <= 0:
+                    return None
+                self._cond.wait(restante)
+
+    def start(self) -> 'MockRedisServer':
+        """Inicia o servidor em uma thread daemon."""
+        self._thread = threading.Thread(target=self._server.serve_forever, name='mock-redis', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Para o servidor e libera a porta."""
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self) -> 'MockRedisServer':
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Servidor local compatível com o protocolo do Redis')
+    parser.add_argument('--port', type=int, default=6379)
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    args = parser.parse_args()
+
+    redis = MockRedisServer(port=args.port, latency_ms=args.latency_ms).start()
+    print(f"Servidor RESP simulado em {redis.url} (Ctrl+C para parar)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        redis.stop()
@@ -0,0 +1,298 @@
+"""
+Servidor HTTP local que imita as APIs das lojas a partir de payloads gravados.
+
+Serve as mesmas rotas consultadas pelos adaptadores em `services.lojas`:
+    - Magalu: /_next/data/<build_id>/magazinemagalushopbr/busca/<termo>.json
+    - Magalu (vitrine HTML, para descoberta do build id): /magazinemagalushopbr/
+    - Kabum:  /catalog/v2/sponsored_products?query=<termo>
+    - Kabum (catálogo completo): /catalog/v2/products?query=<termo>&page_number=<n>&page_size=<m>
+
+As rotas paginadas devolvem produtos distintos por página (a Magalu repete a
+fixture com ids sufixados; o catálogo da Kabum é fatiado conforme page_size).
+A ordenação por menor preço (`sortType=price` na Magalu, `sort=price` na Kabum)
+é respeitada.
+
+Como no Next.js real, a rota de dados responde 404 para um build id diferente do
+atual; `rotate_build_id` simula um novo deploy da Magalu.
+
+As respostas das buscas trazem `ETag` e `Last-Modified`; requisições condicionais
+com o ETag atual recebem 304 sem corpo (desative com `conditional=False`).
+
+Latência e erros podem ser injetados para simular lojas lentas ou instáveis.
+"""
+
+import hashlib
+import json
+import math
+import random
+import re
+import secrets
+import threading
+import time
+from collections import Counter
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import parse_qs, urlsplit
+
+from benchmarks.fixtures import (
+    BUILD_ID_PLACEHOLDER, KABUM_CATALOG_FIXTURE, KABUM_FIXTURE, MAGALU_FIXTURE, MAGALU_STOREFRONT_FIXTURE,
+    load_fixture_bytes
+)
+
+MAGALU_ROUTE = re.compile(r'^/_next/data/(?P<build_id>[^/]+)/magazinemagalushopbr/busca/(?P<termo>[^/]+)\.json$')
+MAGALU_STOREFRONT_ROUTE = '/magazinemagalushopbr/'
+KABUM_ROUTE = '/catalog/v2/sponsored_products'
+KABUM_CATALOG_ROUTE = '/catalog/v2/products'
+DEFAULT_BUILD_ID = '6cijUACDhFQyBEGYnV_Mr'
+
+
+class MockStoreConfig:
+    """Parâmetros de injeção de latência e erros do servidor simulado."""
+
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, error_rate: float = 0.0,
+                 error_status: int = 503, seed: Optional[int] = None, slow_rate: float = 0.0,
+                 slow_ms: float = 0.0):
+        """
+        Args:
+            latency_ms: Latência base adicionada a cada resposta
+            jitter_ms: Variação aleatória (uniforme, 0..jitter_ms) somada à latência
+            error_rate: Fração das requisições respondidas com erro (0.0 a 1.0)
+            error_status: Código HTTP devolvido nos erros injetados
+            seed: Semente do gerador aleatório, para execuções reprodutíveis
+            slow_rate: Fração das respostas com atraso extra (cauda de latência)
+            slow_ms: Atraso extra das respostas lentas
+        """
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.slow_rate = slow_rate
+        self.slow_ms = slow_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def next_delay(self) -> float:
+        """Sorteia o atraso (em segundos) da próxima resposta."""
+        with self._lock:
+            jitter = self.random.uniform(0, self.jitter_ms) if self.jitter_ms else 0.0
+            lenta = self.slow_rate and self.random.random() < self.slow_rate
+        return (self.latency_ms + jitter + (self.slow_ms if lenta else 0.0)) / 1000
+
+    def should_fail(self) -> bool:
+        """Sorteia se a próxima resposta deve ser um erro."""
+        if not self.error_rate:
+            return False
+        with self._lock:
+            return self.random.random() < self.error_rate
+
+
+class _MockStoreHandler(BaseHTTPRequestHandler):
+    """Handler das rotas simuladas das lojas."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server: 'MockStoreServer' = self.server.owner
+        partes = urlsplit(self.path)
+        path = partes.path
+        query = parse_qs(partes.query)
+
+        if path == MAGALU_STOREFRONT_ROUTE:
+            server.record('magalu_storefront')
+            self._send(200, server.storefront_html(), 'text/html; charset=utf-8')
+            return
+
+        rota_magalu = MAGALU_ROUTE.match(path)
+        if rota_magalu:
+            if rota_magalu.group('build_id') != server.build_id:
+                server.record('magalu_stale_build_id')
+                self._send(404, b'{"notFound": true}')
+                return
+            store = 'magalu'
+        elif path == KABUM_ROUTE:
+            store = 'kabum'
+        elif path == KABUM_CATALOG_ROUTE:
+            store = 'kabum_catalog'
+        else:
+            server.record('not_found')
+            self._send(404, b'{"error": "not found"}')
+            return
+
+        delay = server.config.next_delay()
+        if delay:
+            time.sleep(delay)
+
+        if server.config.should_fail():
+            server.record(f'{store}_error')
+            self._send(server.config.error_status, b'{"error": "injected"}')
+            return
+
+        body = server.body_for(store, query)
+        if not server.conditional:
+            server.record(store)
+            self._send(200, body)
+            return
+
+        etag = '"%s"' % hashlib.sha1(body).hexdigest()[:20]
+        validadores = {'ETag': etag, 'Last-Modified': server.last_modified}
+        if self.headers.get('If-None-Match') == etag:
+            server.record(f'{store}_304')
+            self._send(304, b'', headers=validadores)
+            return
+        server.record(store)
+        self._send(200, body, headers=validadores)
+
+    def _send(self, status: int, body: bytes, content_type: str = 'application/json; charset=utf-8',
+              headers: Optional[Dict[str, str]] = None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for nome, valor in (headers or {}).items():
+            self.send_header(nome, valor)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """Silencia o log padrão por requisição do `http.server`."""
+        pass
+
+
+class MockStoreServer:
+    """Servidor local que responde como Magalu e Kabum, rodando em uma thread própria.
+
+    Exemplo:
+        with MockStoreServer(MockStoreConfig(latency_ms=150)) as loja:
+            magalu = Magalu(base_url=loja.base_url)
+    """
+
+    def __init__(self, config: Optional[MockStoreConfig] = None, host: str = '127.0.0.1', port: int = 0,
+                 payloads: Optional[Dict[str, bytes]] = None, build_id: str = DEFAULT_BUILD_ID,
+                 conditional: bool = True):
+        """
+        Args:
+            config: Parâmetros de latência/erros (padrão: sem injeção)
+            host: Endereço de escuta
+            port: Porta de escuta (0 escolhe uma porta livre)
+            payloads: Corpos servidos por loja (padrão: fixtures gravadas)
+            build_id: Build id do Next.js aceito pela rota de dados da Magalu
+            conditional: Envia ETag/Last-Modified e responde 304 a requisições condicionais
+        """
+        self.config = config or MockStoreConfig()
+        self.build_id = build_id
+        self.conditional = conditional
+        self.last_modified = formatdate(time.time(), usegmt=True)
+        self._storefront_template = load_fixture_bytes(MAGALU_STOREFRONT_FIXTURE)
+        self.payloads = payloads or {
+            'magalu': load_fixture_bytes(MAGALU_FIXTURE),
+            'kabum': load_fixture_bytes(KABUM_FIXTURE),
+            'kabum_catalog': load_fixture_bytes(KABUM_CATALOG_FIXTURE),
+        }
+        self._paginas: Dict[tuple, bytes] = {}
+        self._paginas_lock = threading.Lock()
+        self.requests: Counter = Counter()
+        self._requests_lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), _MockStoreHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.owner = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        """URL base a ser passada para os adaptadores das lojas."""
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def body_for(self, store: str, query: Dict[str, list]) -> bytes:
+        """Corpo da resposta de uma loja para a página pedida na query string."""
+        if store == 'magalu':
+            pagina = int(query.get('page', ['1'])[0])
+            por_preco = query.get('sortType', [''])[0] == 'price'
+            if pagina == 1 and not por_preco:
+                return self.payloads['magalu']
+            chave = ('magalu', pagina, 0, por_preco)
+        elif store == 'kabum_catalog':
+            chave = ('kabum_catalog', int(query.get('page_number', ['1'])[0]), int(query.get('page_size', ['20'])[0]),
+                     query.get('sort', [''])[0] == 'price')
+        else:
+            return self.payloads[store]
+
+        with self._paginas_lock:
+            if chave not in self._paginas:
+                self._paginas[chave] = self._montar_pagina(*chave)
+            return self._paginas[chave]
+
+    def _montar_pagina(self, store: str, pagina: int, tamanho: int = 0, por_preco: bool = False) -> bytes:
+        dados = json.loads(self.payloads[store])
+        if store == 'magalu':
+            busca = dados['pageProps']['data']['search']
+            if por_preco:
+                busca['products'].sort(key=lambda produto: float((produto.get('price') or {}).get('bestPrice') or 0))
+            if pagina > 1:
+                for produto in busca['products']:
+                    produto['id'] = f"{produto['id']}p{pagina}"
+            busca['pagination']['page'] = pagina
+        else:
+            itens = dados['data']
+            if por_preco:
+                itens.sort(key=lambda item: item['attributes'].get('price_with_discount') or item['attributes'].get('price', 0))
+            dados['data'] = itens[(pagina - 1) * tamanho:pagina * tamanho]
+            dados['meta']['total_pages_count'] = math.ceil(len(itens) / tamanho) if tamanho else 1
+            dados['meta']['page'] = {'number': pagina, 'size': tamanho, 'is_current_page': True}
+        return json.dumps(dados, ensure_ascii=False).encode('utf-8')
+
+    def storefront_html(self) -> bytes:
+        """HTML da vitrine da Magalu com o build id atual."""
+        return self._storefront_template.replace(BUILD_ID_PLACEHOLDER.encode(), self.build_id.encode())
+
+    def rotate_build_id(self, novo: Optional[str] = None) -> str:
+        """Simula um novo deploy da Magalu: o build id anterior passa a responder 404."""
+        self.build_id = novo or secrets.token_urlsafe(16)
+        return self.build_id
+
+    def record(self, rota: str):
+        """Contabiliza uma requisição atendida."""
+        with self._requests_lock:
+            self.requests[rota] += 1
+
+    def start(self) -> 'MockStoreServer':
+        """Inicia o servidor em uma thread daemon."""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name='mock-store', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Para o servidor e libera a porta."""
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self) -> 'MockStoreServer':
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Servidor local que imita as APIs da Magalu e da Kabum')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    parser.add_argument('--jitter-ms', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--slow-rate', type=float, default=0.0)
+    parser.add_argument('--slow-ms', type=float, default=0.0)
+    args = parser.parse_args()
+
+    config = MockStoreConfig(args.latency_ms, args.jitter_ms, args.error_rate,
+                             slow_rate=args.slow_rate, slow_ms=args.slow_ms)
+    loja = MockStoreServer(config, port=args.port).start()
+    print(f"Servidor simulado das lojas em {loja.base_url} (Ctrl+C para parar)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        loja.stop()
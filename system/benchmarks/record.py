@@ -0,0 +1,55 @@
+"""
+Regrava as fixtures dos benchmarks a partir das lojas reais.
+
+Uso (a partir do diretório `system/`, com acesso à internet):
+    python -m benchmarks.record notebook
+"""
+
+import argparse
+import os
+import sys
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fixtures import KABUM_CATALOG_FIXTURE, KABUM_FIXTURE, MAGALU_FIXTURE, fixture_path
+from services.lojas import Kabuum, Magalu
+
+
+def gravar(url: str, destino: str, headers=None):
+    """Baixa `url` e grava o corpo da resposta sem nenhuma transformação."""
+    response = requests.get(url, headers=headers, timeout=30)
+    response.raise_for_status()
+    with open(fixture_path(destino), 'wb') as arquivo:
+        arquivo.write(response.content)
+    print(f"✅ {destino}: {len(response.content)} bytes")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Regrava as fixtures dos benchmarks')
+    parser.add_argument('termo', nargs='?', default='notebook')
+    parser.add_argument('--magalu-build-id', help='Build id do Next.js (padrão: descoberto na vitrine)')
+    args = parser.parse_args()
+
+    build_id = args.magalu_build_id or Magalu()._descobrir_build_id() or Magalu.DEFAULT_BUILD_ID
+
+    gravar(
+        Magalu()._url_busca(args.termo, build_id),
+        MAGALU_FIXTURE,
+    )
+    gravar(
+        f"{Kabuum.BASE_URL}/catalog/v2/sponsored_products?query={args.termo}&context=search",
+        KABUM_FIXTURE,
+        headers=Kabuum.HEADERS,
+    )
+    # Catálogo completo: uma página grande, fatiada pelo servidor simulado
+    gravar(
+        f"{Kabuum.BASE_URL}/catalog/v2/products?query={args.termo}&page_number=1&page_size=100&sort=most_searched",
+        KABUM_CATALOG_FIXTURE,
+        headers=Kabuum.HEADERS,
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,1066 @@
+"""
+Runner da suíte de benchmarks offline.
+
+Mede vazão e latência de cada estágio do pipeline de busca (parse dos adaptadores,
+`_normalize_product`, `find_best_products`, `format_product_message`) e da busca
+completa (`search_products`) sob concorrência, contra o servidor simulado das lojas.
+
+Uso (a partir do diretório `system/`):
+    python -m benchmarks.run --output bench_results.json
+    python -m benchmarks.run --only search_products --concurrency 16 --latency-ms 200
+    python -m benchmarks.run --baseline bench_anterior.json --fail-on-regression
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import itertools
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fixtures import (
+    KABUM_CATALOG_FIXTURE, KABUM_FIXTURE, MAGALU_FIXTURE, load_fixture, load_fixture_bytes
+)
+from benchmarks.mock_redis import MockRedisServer
+from benchmarks.mock_store import MockStoreConfig, MockStoreServer
+from benchmarks.stats import summarize, time_calls
+from concurrent.futures import ThreadPoolExecutor
+from config.settings import get_config
+from services import json_projetado
+from services.cache import TTLCache
+from services.cache_http import CacheHttp
+from services.estado import EstadoLocal, EstadoRedis
+from services.exportacao import ExportadorObservacoes, ler_observacoes
+from services.filtros import extrair_filtro
+from services.indice import IndiceProdutos
+from services.lojas import Kabuum, Magalu
+from services.memoria import (
+    NIVEL_BUFFERS, NIVEL_BUSCAS, NIVEL_DERIVADOS, NIVEL_RESERVA, FilaLimitada, GovernadorMemoria,
+)
+from services.ofertas import VitrineOfertas
+from services.processamento import PoolCpu, extrair_pagina, ranquear_e_renderizar
+from services.product_search import ProductSearchService
+from services.renderizacao import RenderizadorMensagens
+from services.resiliencia import Orcamento
+
+SYSTEM_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BENCHMARKS: Dict[str, Callable[[argparse.Namespace], Dict[str, Any]]] = {}
+
+# Módulos cujo custo de import é medido no estágio `startup_import`; o primeiro
+# (ponto de entrada) é o que precisa caber no orçamento --import-budget-ms
+IMPORT_TARGETS = ['main', 'services.telegram']
+
+
+def benchmark(nome: str):
+    """Registra uma função de benchmark na suíte."""
+    def registrar(funcao: Callable[[argparse.Namespace], Dict[str, Any]]):
+        BENCHMARKS[nome] = funcao
+        return funcao
+    return registrar
+
+
+def _produtos_projetados(loja: type, fixture: str) -> List[Dict[str, Any]]:
+    """Produtos projetados de uma fixture, como saem da leitura de uma página da loja."""
+    return loja._extrair_produtos(load_fixture_bytes(fixture))[0]
+
+
+def _extracao_completa(loja: type, payload: bytes) -> List[Dict[str, Any]]:
+    """Comportamento anterior à leitura projetada: `json.loads` do payload inteiro e projeção dos produtos."""
+    dados = json.loads(payload)
+    for chave in loja.CAMINHO_PRODUTOS:
+        dados = dados.get(chave, {}) if isinstance(dados, dict) else {}
+    return [loja._projetar_produto(produto_raw) for produto_raw in dados or []]
+
+
+def _produtos_normalizados(service: ProductSearchService) -> List[Dict[str, Any]]:
+    """Produtos das duas fixtures já normalizados, como em `search_products`."""
+    magalu = _produtos_projetados(Magalu, MAGALU_FIXTURE)
+    kabuum = _produtos_projetados(Kabuum, KABUM_FIXTURE)
+    return (
+        [service._normalize_product(p, 'Magalu') for p in magalu]
+        + [service._normalize_product(p, 'Kabuum') for p in kabuum]
+    )
+
+
+@benchmark('magalu_parse')
+def bench_magalu_parse(args: argparse.Namespace) -> Dict[str, Any]:
+    """Decodificação projetada (produtos + total de páginas) do payload da Magalu."""
+    payload = load_fixture_bytes(MAGALU_FIXTURE)
+    loja = Magalu()
+    resultado = time_calls(lambda: loja._extrair_produtos(payload), args.iterations)
+    resultado['payload_bytes'] = len(payload)
+    resultado['json_backend'] = json_projetado.BACKEND
+    return resultado
+
+
+@benchmark('kabum_parse')
+def bench_kabum_parse(args: argparse.Namespace) -> Dict[str, Any]:
+    """Decodificação projetada (produtos + total de páginas) do catálogo da Kabum."""
+    payload = load_fixture_bytes(KABUM_CATALOG_FIXTURE)
+    loja = Kabuum()
+    resultado = time_calls(lambda: loja._extrair_produtos(payload), args.iterations)
+    resultado['payload_bytes'] = len(payload)
+    resultado['json_backend'] = json_projetado.BACKEND
+    return resultado
+
+
+def _pico_memoria(funcao: Callable[[], Any]) -> int:
+    """Pico de memória alocada (bytes, via tracemalloc) durante uma chamada."""
+    tracemalloc.start()
+    try:
+        funcao()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+@benchmark('json_parse_backends')
+def bench_json_backends(args: argparse.Namespace) -> Dict[str, Any]:
+    """Tempo e pico de memória da decodificação dos payloads gravados, por estratégia.
+
+    `full_json_loads` é o comportamento anterior (`json.loads` do payload inteiro e
+    extração dos produtos); `projected_<backend>` é a leitura projetada usada hoje.
+    """
+    resultado: Dict[str, Any] = {'default_backend': json_projetado.BACKEND}
+
+    for nome_fixture, loja in ((MAGALU_FIXTURE, Magalu()), (KABUM_CATALOG_FIXTURE, Kabuum())):
+        payload = load_fixture_bytes(nome_fixture)
+        estrategias: Dict[str, Callable[[], Any]] = {
+            'full_json_loads': lambda: _extracao_completa(type(loja), payload),
+        }
+        for backend in json_projetado.BACKENDS:
+            estrategias[f'projected_{backend}'] = (
+                lambda backend=backend: loja._extrair_produtos(payload, backend=backend)
+            )
+
+        por_estrategia: Dict[str, Any] = {}
+        for estrategia, funcao in estrategias.items():
+            medicao = time_calls(funcao, args.iterations)
+            medicao['peak_memory_kib'] = round(_pico_memoria(funcao) / 1024, 1)
+            por_estrategia[estrategia] = medicao
+        resultado[nome_fixture] = dict(por_estrategia, payload_bytes=len(payload))
+
+    # O estágio é comparado com o baseline pelo p50 do backend padrão na Magalu
+    resultado['latency_ms'] = resultado[MAGALU_FIXTURE][f'projected_{json_projetado.BACKEND}']['latency_ms']
+    return resultado
+
+
+@benchmark('normalize_product')
+def bench_normalize(args: argparse.Namespace) -> Dict[str, Any]:
+    """`_normalize_product` sobre todos os produtos das fixtures (por lote)."""
+    service = ProductSearchService()
+    brutos = _produtos_projetados(Magalu, MAGALU_FIXTURE)
+    resultado = time_calls(lambda: [service._normalize_product(p, 'Magalu') for p in brutos], args.iterations)
+    resultado['batch_size'] = len(brutos)
+    return resultado
+
+
+@benchmark('find_best_products')
+def bench_find_best(args: argparse.Namespace) -> Dict[str, Any]:
+    """Ranking `melhor_custo_beneficio` sobre os produtos normalizados."""
+    service = ProductSearchService()
+    produtos = _produtos_normalizados(service)
+    resultado = time_calls(
+        lambda: service.find_best_products(produtos, criterio='melhor_custo_beneficio'),
+        args.iterations,
+    )
+    resultado['batch_size'] = len(produtos)
+    return resultado
+
+
+@benchmark('format_product_message')
+def bench_format(args: argparse.Namespace) -> Dict[str, Any]:
+    """Formatação das mensagens do top 5 (por lote), com os fragmentos em cache e sem cache."""
+    service = ProductSearchService()
+    melhores = service.find_best_products(_produtos_normalizados(service), criterio='melhor_custo_beneficio')
+    resultado = time_calls(
+        lambda: [service.format_product_message(p, i) for i, p in enumerate(melhores, 1)],
+        args.iterations,
+    )
+    sem_cache = RenderizadorMensagens(service.parse_mode, max_fragmentos=0)
+    resultado['uncached'] = time_calls(
+        lambda: [sem_cache.produto(p, i) for i, p in enumerate(melhores, 1)],
+        args.iterations,
+    )
+    resultado['batch_size'] = len(melhores)
+    resultado['render_cache'] = service.renderizador.stats()
+    return resultado
+
+
+@benchmark('search_products')
+def bench_search_products(args: argparse.Namespace) -> Dict[str, Any]:
+    """Busca completa contra o servidor simulado, com `concurrency` buscas simultâneas."""
+    config = MockStoreConfig(args.latency_ms, args.jitter_ms, args.error_rate, seed=args.seed,
+                             slow_rate=args.slow_rate, slow_ms=args.slow_ms)
+
+    with MockStoreServer(config) as loja:
+        # Cache desativado: cada iteração mede a ida às lojas
+        service = ProductSearchService(
+            magalu=Magalu(base_url=loja.base_url),
+            kabuum=Kabuum(base_url=loja.base_url),
+            cache=TTLCache(max_entries=0),
+        )
+        # Por padrão o limitador de saída fica desligado, para medir o pipeline e não o limite
+        for adaptador in (service.magalu, service.kabuum):
+            adaptador.limitador.taxa_por_s = args.store_rps
+            adaptador.limitador.max_em_andamento = args.store_max_in_flight
+        latencias: List[float] = []
+        encontrados: List[int] = []
+
+        async def cliente(id_cliente: int, n_buscas: int):
+            for n in range(n_buscas):
+                inicio = time.perf_counter()
+                # Termos distintos: buscas iguais simultâneas seriam atendidas por uma só
+                resultados = await service.search_products(f'notebook {id_cliente}-{n}')
+                latencias.append(time.perf_counter() - inicio)
+                encontrados.append(len(resultados['all_products']))
+
+        async def executar():
+            por_cliente = max(1, args.search_iterations // args.concurrency)
+            await asyncio.gather(*(cliente(i, por_cliente) for i in range(args.concurrency)))
+
+        inicio_total = time.perf_counter()
+        asyncio.run(executar())
+        duracao = time.perf_counter() - inicio_total
+
+        return summarize(
+            latencias,
+            duracao,
+            concurrency=args.concurrency,
+            mean_products=round(sum(encontrados) / len(encontrados), 2) if encontrados else 0,
+            upstream_requests=dict(loja.requests),
+            stores=service.stats()['stores'],
+        )
+
+
+@benchmark('search_filters')
+def bench_search_filters(args: argparse.Namespace) -> Dict[str, Any]:
+    """Busca filtrada ("notebook até 3000 só Kabum"): filtro depois da busca x filtro levado às lojas.
+
+    `post_filter` busca sem filtro e filtra no ranking (o comportamento anterior);
+    `pushdown` passa o filtro a `search_products`, que não consulta a loja excluída e
+    descarta os produtos recusados na decodificação. Reporta as requisições às lojas
+    e os produtos normalizados por busca.
+    """
+    config = MockStoreConfig(args.latency_ms, args.jitter_ms, args.error_rate, seed=args.seed)
+    termo, filtro = extrair_filtro('notebook até 3000 só Kabum')
+    resultado: Dict[str, Any] = {'filter': filtro.descricao()}
+
+    for modo in ('post_filter', 'pushdown'):
+        with MockStoreServer(config) as loja:
+            service = ProductSearchService(
+                magalu=Magalu(base_url=loja.base_url),
+                kabuum=Kabuum(base_url=loja.base_url),
+                cache=TTLCache(max_entries=0),
+            )
+            for adaptador in (service.magalu, service.kabuum):
+                adaptador.limitador.taxa_por_s = args.store_rps
+                adaptador.limitador.max_em_andamento = args.store_max_in_flight
+            latencias: List[float] = []
+            normalizados: List[int] = []
+            selecionados: List[int] = []
+
+            async def buscar(n: int, semaforo: asyncio.Semaphore):
+                async with semaforo:
+                    inicio = time.perf_counter()
+                    if modo == 'pushdown':
+                        resultados = await service.search_products(f'{termo} {n}', filtro=filtro)
+                    else:
+                        resultados = await service.search_products(f'{termo} {n}')
+                    melhores = service.find_best_products(resultados['all_products'], 'melhor_custo_beneficio', filtro)
+                    latencias.append(time.perf_counter() - inicio)
+                    normalizados.append(len(resultados['all_products']))
+                    selecionados.append(len(melhores))
+
+            async def executar():
+                semaforo = asyncio.Semaphore(args.concurrency)
+                await asyncio.gather(*(buscar(n, semaforo) for n in range(args.search_iterations)))
+
+            inicio_total = time.perf_counter()
+            asyncio.run(executar())
+            resultado[modo] = summarize(
+                latencias, time.perf_counter() - inicio_total,
+                upstream_requests=sum(loja.requests.values()),
+                normalized_per_search=round(sum(normalizados) / len(normalizados), 1),
+                top_size=min(selecionados),
+            )
+
+    # Comparado com o baseline pelo p50 com o filtro levado às lojas
+    resultado['latency_ms'] = resultado['pushdown']['latency_ms']
+    resultado['normalized_reduction'] = round(
+        1 - resultado['pushdown']['normalized_per_search'] / max(resultado['post_filter']['normalized_per_search'], 1), 3
+    )
+    return resultado
+
+
+@benchmark('offers_view')
+def bench_offers_view(args: argparse.Namespace) -> Dict[str, Any]:
+    """Pedidos de "ofertas do dia": busca ampla + ranking a cada pedido x leitura da vitrine materializada.
+
+    `on_demand` faz, por pedido, o que um usuário faria sem o `/ofertas` (busca da
+    categoria nas lojas e `montar_resposta`); `materialized` lê o ranking pronto de
+    `VitrineOfertas`. Reporta também a duração de uma reconstrução da vitrine e as
+    requisições às lojas de cada modo.
+    """
+    config = MockStoreConfig(args.latency_ms, args.jitter_ms, args.error_rate, seed=args.seed)
+    categorias = ['smartphone', 'notebook', 'smart tv', 'fone bluetooth', 'air fryer']
+    pedidos = [categorias[n % len(categorias)] for n in range(args.search_iterations)]
+    resultado: Dict[str, Any] = {'categories': len(categorias), 'requests': len(pedidos)}
+
+    with MockStoreServer(config) as loja:
+        service = ProductSearchService(
+            magalu=Magalu(base_url=loja.base_url),
+            kabuum=Kabuum(base_url=loja.base_url),
+            cache=TTLCache(max_entries=0),
+        )
+        for adaptador in (service.magalu, service.kabuum):
+            adaptador.limitador.taxa_por_s = args.store_rps
+            adaptador.limitador.max_em_andamento = args.store_max_in_flight
+        latencias: List[float] = []
+
+        async def sob_demanda(categoria: str, semaforo: asyncio.Semaphore):
+            async with semaforo:
+                inicio = time.perf_counter()
+                resultados = await service.search_products(categoria)
+                service.montar_resposta(resultados, 'melhor_custo_beneficio')
+                latencias.append(time.perf_counter() - inicio)
+
+        async def executar():
+            semaforo = asyncio.Semaphore(args.concurrency)
+            await asyncio.gather(*(sob_demanda(categoria, semaforo) for categoria in pedidos))
+
+        inicio_total = time.perf_counter()
+        asyncio.run(executar())
+        resultado['on_demand'] = summarize(latencias, time.perf_counter() - inicio_total,
+                                           upstream_requests=sum(loja.requests.values()))
+
+        loja.requests.clear()
+        vitrine = VitrineOfertas(service, categorias)
+        reconstrucao = asyncio.run(vitrine.reconstruir())
+        resultado['rebuild'] = dict(reconstrucao, upstream_requests=sum(loja.requests.values()))
+        leituras = itertools.cycle(pedidos)
+        resultado['materialized'] = time_calls(lambda: vitrine.consultar(next(leituras)), len(pedidos) * 100)
+
+    # Comparado com o baseline pelo p50 da leitura da vitrine
+    resultado['latency_ms'] = resultado['materialized']['latency_ms']
+    return resultado
+
+
+@benchmark('search_many')
+def bench_search_many(args: argparse.Namespace) -> Dict[str, Any]:
+    """Vazão de um lote de termos (com repetições): laço de `search_products` x `search_many`."""
+    config = MockStoreConfig(args.latency_ms, args.jitter_ms, args.error_rate, seed=args.seed)
+    unicos = [f'notebook lote {n}' for n in range(args.search_iterations)]
+    # Um quarto dos termos repetido com outra caixa, como em listas montadas à mão
+    termos = unicos + [termo.upper() for termo in unicos[::4]]
+    resultado: Dict[str, Any] = {'terms': len(termos), 'unique_terms': len(unicos)}
+
+    for modo in ('sequential', 'batch'):
+        with MockStoreServer(config) as loja:
+            service = ProductSearchService(
+                magalu=Magalu(base_url=loja.base_url),
+                kabuum=Kabuum(base_url=loja.base_url),
+                cache=TTLCache(max_entries=0),
+            )
+            for adaptador in (service.magalu, service.kabuum):
+                adaptador.limitador.taxa_por_s = args.store_rps
+                adaptador.limitador.max_em_andamento = args.store_max_in_flight
+            latencias: List[float] = []
+
+            async def executar() -> Dict[str, Any]:
+                if modo == 'sequential':
+                    for termo in termos:
+                        inicio = time.perf_counter()
+                        await service.search_products(termo)
+                        latencias.append(time.perf_counter() - inicio)
+                    return {}
+                lote = service.search_many(termos, concorrencia=args.concurrency)
+                inicio = time.perf_counter()
+                async for _ in lote:
+                    # Tempo até cada termo ficar pronto, a partir do início do lote
+                    latencias.append(time.perf_counter() - inicio)
+                return lote.stats()
+
+            inicio_total = time.perf_counter()
+            lote_stats = asyncio.run(executar())
+            duracao = time.perf_counter() - inicio_total
+            resultado[modo] = summarize(latencias, duracao, duration_s=round(duracao, 3),
+                                        upstream_requests=sum(loja.requests.values()))
+            if lote_stats:
+                resultado[modo]['batch'] = lote_stats
+
+    # Comparado com o baseline pelo p50 do modo em lote
+    resultado['latency_ms'] = resultado['batch']['latency_ms']
+    resultado['speedup'] = round(resultado['sequential']['duration_s'] / max(resultado['batch']['duration_s'], 1e-9), 2)
+    return resultado
+
+
+@benchmark('shared_state')
+def bench_shared_state(args: argparse.Namespace) -> Dict[str, Any]:
+    """Dois workers recebendo os mesmos termos: estado isolado x compartilhado (servidor RESP local)."""
+    config = MockStoreConfig(args.latency_ms, args.jitter_ms, args.error_rate, seed=args.seed)
+    termos = [f'notebook worker {n}' for n in range(args.search_iterations)]
+    resultado: Dict[str, Any] = {'workers': 2, 'terms': len(termos)}
+
+    for modo in ('isolated', 'shared'):
+        with MockStoreServer(config) as loja, MockRedisServer() as redis:
+            servicos = []
+            for _ in range(2):
+                estado = EstadoRedis(redis.url) if modo == 'shared' else EstadoLocal()
+                servicos.append(ProductSearchService(
+                    magalu=Magalu(base_url=loja.base_url, estado=estado),
+                    kabuum=Kabuum(base_url=loja.base_url, estado=estado),
+                    estado=estado,
+                ))
+            for service in servicos:
+                for adaptador in (service.magalu, service.kabuum):
+                    adaptador.limitador.taxa_por_s = args.store_rps
+                    adaptador.limitador.max_em_andamento = args.store_max_in_flight
+            latencias: List[float] = []
+
+            async def buscar(service: ProductSearchService, termo: str, semaforo: asyncio.Semaphore):
+                async with semaforo:
+                    inicio = time.perf_counter()
+                    await service.search_products(termo)
+                    latencias.append(time.perf_counter() - inicio)
+
+            async def executar():
+                # Cada worker atende `--concurrency` chats ao mesmo tempo, com os mesmos termos
+                semaforos = [asyncio.Semaphore(args.concurrency) for _ in servicos]
+                await asyncio.gather(*(
+                    buscar(service, termo, semaforo)
+                    for termo in termos for service, semaforo in zip(servicos, semaforos)
+                ))
+
+            inicio_total = time.perf_counter()
+            asyncio.run(executar())
+            duracao = time.perf_counter() - inicio_total
+            resultado[modo] = summarize(latencias, duracao, upstream_requests=sum(loja.requests.values()),
+                                        backend_commands=sum(redis.commands.values()))
+
+    with MockRedisServer() as redis:
+        estado = EstadoRedis(redis.url)
+        estado.set('bench', b'x' * 4096)
+        resultado['backend_get_4kb'] = time_calls(lambda: estado.get('bench'), args.iterations)
+        estado.fechar()
+
+    # Comparado com o baseline pelo p50 do modo compartilhado
+    resultado['latency_ms'] = resultado['shared']['latency_ms']
+    resultado['upstream_reduction'] = round(
+        1 - resultado['shared']['upstream_requests'] / max(resultado['isolated']['upstream_requests'], 1), 3
+    )
+    return resultado
+
+
+@benchmark('telegram_album')
+def bench_telegram_album(args: argparse.Namespace) -> Dict[str, Any]:
+    """Envio do top 5 como álbum de fotos na Bot API simulada, com reaproveitamento de `file_id`.
+
+    As buscas se repetem sobre um catálogo pequeno de imagens (uma delas morta): a
+    rodada `first` envia as fotos por URL e as seguintes (`repeat`) por `file_id`.
+    """
+    from telegram import Bot
+
+    from benchmarks.fake_telegram import FAKE_TOKEN, FakeTelegramServer
+    from services.midia import EnviadorAlbuns, MapaFileIds
+
+    service = ProductSearchService()
+    produtos = _produtos_normalizados(service)
+    imagens = [f'https://img.exemplo/produto-{n}.jpg' for n in range(20)]
+    tops = [produtos[n * 5:(n + 1) * 5] for n in range(4)]
+    resultado: Dict[str, Any] = {}
+
+    # Cada foto enviada por URL custa um download ao Telegram
+    with FakeTelegramServer(download_latency_ms=30.0) as api:
+        api.dead_urls.add(imagens[3])
+
+        async def executar():
+            bot = Bot(FAKE_TOKEN, base_url=api.api_base_url)
+            async with bot:
+                albuns = EnviadorAlbuns(bot, MapaFileIds(), parse_mode=service.parse_mode)
+                for rodada, repeticoes in (('first', 1), ('repeat', max(1, args.search_iterations // 4))):
+                    latencias: List[float] = []
+                    downloads_antes = api.downloads
+                    inicio_total = time.perf_counter()
+                    for _ in range(repeticoes):
+                        for n, top in enumerate(tops):
+                            itens = [(imagens[n * 5 + i], service.format_product_message(p, i + 1))
+                                     for i, p in enumerate(top)]
+                            inicio = time.perf_counter()
+                            await albuns.enviar(1000 + n, itens)
+                            latencias.append(time.perf_counter() - inicio)
+                    duracao = time.perf_counter() - inicio_total
+                    resultado[rodada] = summarize(latencias, duracao, downloads=api.downloads - downloads_antes)
+                resultado['media'] = albuns.stats()
+
+        asyncio.run(executar())
+        resultado['file_id_sends'] = api.file_id_sends
+
+    # Comparado com o baseline pelo p50 dos envios repetidos
+    resultado['latency_ms'] = resultado['repeat']['latency_ms']
+    return resultado
+
+
+# Vocabulário dos produtos sintéticos do estágio `catalog_index` (com acentos, como nas lojas)
+_CATEGORIAS = ['Notebook', 'Smartphone', 'Câmera', 'Monitor', 'Fogão', 'Geladeira', 'Máquina de Lavar',
+               'Headset', 'Teclado Mecânico', 'Mouse Gamer', 'Tablet', 'Smart TV', 'Micro-ondas', 'Ventilador',
+               'Placa de Vídeo', 'Processador', 'Cadeira Gamer', 'Impressora', 'Caixa de Som', 'Relógio']
+_MARCAS = ['Samsung', 'Apple', 'Lenovo', 'Dell', 'Acer', 'Asus', 'LG', 'Philips', 'Brastemp', 'Electrolux',
+           'Xiaomi', 'Motorola', 'Logitech', 'Redragon', 'HyperX', 'Canon', 'Sony', 'JBL', 'Intel', 'AMD']
+_ATRIBUTOS = ['Pro', 'Ultra', 'Slim', 'Plus', 'Max', 'Lite', 'Gamer', 'Inox', 'Bivolt', 'Sem Fio', 'Full HD',
+              '4K', '8GB', '16GB', '256GB', '512GB', '1TB', 'Preto', 'Branco', 'Prata', 'Azul', 'Portátil',
+              'Elétrico', 'Digital', 'Automático', 'Touch', 'RGB', 'USB-C', 'Wi-Fi', 'Bluetooth']
+# Consultas medidas: termo comum, sem acento, por prefixo, várias palavras e rara
+_CONSULTAS_INDICE = ['notebook', 'camera', 'gelad', 'fogao inox', 'mouse gamer rgb sem fio', 'samsung 4k',
+                     'maquina de lavar electrolux', 'xiaomi relogio azul bluetooth']
+
+
+def _produto_sintetico(n: int, rnd: random.Random) -> Dict[str, Any]:
+    categoria, marca = rnd.choice(_CATEGORIAS), rnd.choice(_MARCAS)
+    nome = f"{categoria} {marca} {' '.join(rnd.sample(_ATRIBUTOS, 3))} {rnd.randint(100, 9999)}"
+    preco = round(rnd.uniform(50, 10000), 2)
+    return {
+        'id': str(n), 'name': nome, 'price': preco, 'full_price': preco, 'discount': 0, 'brand': marca,
+        'availability': True, 'url': f'https://loja.exemplo/p/{n}', 'imageUrl': '',
+        'rating': {'average': 4.5, 'count': 10}, 'store': 'Magalu' if n % 2 else 'Kabuum',
+        'installment': '', 'offer': {}, 'payment_method': '',
+    }
+
+
+@benchmark('catalog_index')
+def bench_catalog_index(args: argparse.Namespace) -> Dict[str, Any]:
+    """Latência de consulta do catálogo local (SQLite FTS5) com `--index-docs` produtos.
+
+    Mede a carga inicial (upserts em lotes), consultas com prefixo e sem acento e a
+    atualização incremental de produtos já indexados.
+    """
+    rnd = random.Random(args.seed)
+    diretorio = tempfile.mkdtemp(prefix='promohunter-indice-')
+    try:
+        indice = IndiceProdutos(os.path.join(diretorio, 'catalogo.sqlite3'))
+        lote = 50000
+        inicio = time.perf_counter()
+        for base in range(0, args.index_docs, lote):
+            indice.upsert(_produto_sintetico(n, rnd) for n in range(base, min(base + lote, args.index_docs)))
+        indice.otimizar()
+        carga_s = time.perf_counter() - inicio
+
+        consultas = itertools.cycle(_CONSULTAS_INDICE)
+        resultado = time_calls(lambda: indice.buscar(next(consultas), limite=200), args.iterations)
+        resultado['matches'] = {
+            consulta: len(indice.buscar(consulta, limite=200)['products']) for consulta in _CONSULTAS_INDICE
+        }
+
+        # Atualização incremental: uma busca nas lojas traz ~200 produtos, parte já indexada
+        resultado['upsert_200'] = time_calls(
+            lambda: indice.upsert(_produto_sintetico(rnd.randrange(args.index_docs * 2), rnd) for _ in range(200)),
+            max(1, args.iterations // 10),
+        )
+        resultado['documents'] = len(indice)
+        resultado['load_s'] = round(carga_s, 2)
+        resultado['load_docs_per_s'] = round(args.index_docs / carga_s, 0) if carga_s else 0.0
+        resultado['db_mb'] = round(
+            sum(os.path.getsize(os.path.join(diretorio, nome)) for nome in os.listdir(diretorio)) / 1e6, 1
+        )
+        indice.fechar()
+    finally:
+        shutil.rmtree(diretorio, ignore_errors=True)
+    return resultado
+
+
+@benchmark('export_observations')
+def bench_export_observations(args: argparse.Namespace) -> Dict[str, Any]:
+    """Exportação das observações: custo de `registrar` no caminho da busca, gravação e leitura.
+
+    Registra `--iterations` buscas de 100 produtos, mede a latência de cada `registrar`
+    (a parte que a busca paga), a vazão da thread de gravação e os bytes por linha, e
+    lê o resultado com todas as colunas e só com `observed_at`, `store` e `price`.
+    """
+    rnd = random.Random(args.seed)
+    produtos = [_produto_sintetico(n, rnd) for n in range(100)]
+    diretorio = tempfile.mkdtemp(prefix='bench-export-')
+    try:
+        exportador = ExportadorObservacoes(diretorio, lote_max=5000, intervalo_gravacao_s=0.2,
+                                           fila_max=args.iterations + 10)
+        registro = time_calls(lambda: exportador.registrar(produtos, 'notebook'), args.iterations, aquecimento=0)
+        inicio = time.perf_counter()
+        exportador.fechar(timeout=None)
+        gravacao_s = time.perf_counter() - inicio
+        stats = exportador.stats()
+        tamanho = sum(os.path.getsize(os.path.join(diretorio, nome)) for nome in os.listdir(diretorio))
+
+        leituras: Dict[str, Any] = {}
+        for nome, colunas in (('all_columns', None), ('pruned', ['observed_at', 'store', 'price'])):
+            inicio = time.perf_counter()
+            linhas = sum(1 for _ in ler_observacoes(diretorio, colunas))
+            duracao = time.perf_counter() - inicio
+            leituras[nome] = {'rows': linhas, 'rows_per_s': round(linhas / duracao, 1) if duracao else 0.0}
+    finally:
+        shutil.rmtree(diretorio, ignore_errors=True)
+
+    return {
+        'format': stats['format'],
+        'register': registro,
+        'rows': stats['rows'],
+        'dropped': stats['dropped'],
+        'drain_s': round(gravacao_s, 3),
+        'bytes_per_row': round(tamanho / max(stats['rows'], 1), 1),
+        'scan': leituras,
+        # Comparado com o baseline pelo p50 de `registrar` (o que a busca paga)
+        'latency_ms': registro['latency_ms'],
+    }
+
+
+@benchmark('memory_budget')
+def bench_memory_budget(args: argparse.Namespace) -> Dict[str, Any]:
+    """Orçamento de memória: custo de uma verificação, precisão das estimativas e descarte por nível.
+
+    Enche o cache de buscas (500 termos de 100 produtos), os resultados de reserva, o
+    cache de fragmentos e o buffer de mensagens, mede a verificação sem descarte (o
+    que a thread do governador paga a cada `MEMORY_CHECK_INTERVAL_S`), compara o
+    estimado com o medido pelo tracemalloc e verifica com metade do total como
+    orçamento: os descartes devem começar pelos níveis mais baixos.
+    """
+    rnd = random.Random(args.seed)
+    buscas = TTLCache(500, 300)
+    reserva = TTLCache(1000, 3600)
+    fragmentos = TTLCache(4096, float('inf'))
+    mensagens = FilaLimitada(maxlen=1000)
+    for termo in range(500):
+        produtos = [_produto_sintetico(rnd.randrange(100000), rnd) for _ in range(100)]
+        buscas.set(f'termo {termo}', {'all_products': produtos, 'total_products': len(produtos)})
+        if termo % 2 == 0:
+            reserva.set(f'kabuum:termo {termo}', produtos[:50])
+    for n in range(4096):
+        fragmentos.set((f'Kabuum|produto {n}|https://x/{n}', n), f'*Produto {n}* ' + 'x' * rnd.randrange(100, 300))
+    for n in range(1000):
+        mensagens.append({'user_id': n, 'username': f'user{n}', 'message': f'notebook até {n}'})
+    componentes = (('search_cache', buscas, NIVEL_BUSCAS), ('store_fallback', reserva, NIVEL_RESERVA),
+                   ('render_fragments', fragmentos, NIVEL_DERIVADOS), ('received_messages', mensagens, NIVEL_BUFFERS))
+
+    governador = GovernadorMemoria(0, 0)
+    for nome, componente, nivel in componentes:
+        governador.registrar(nome, componente, nivel)
+    verificacao = time_calls(governador.verificar, args.iterations)
+    estimado = governador.stats()
+
+    ja_rastreava = tracemalloc.is_tracing()
+    depuracao = GovernadorMemoria(0, 0, depurar=True)
+    try:
+        for nome, componente, nivel in componentes:
+            depuracao.registrar(nome, componente, nivel)
+        depuracao.verificar()
+        medido = depuracao.stats()['components']
+    finally:
+        if not ja_rastreava:
+            tracemalloc.stop()
+    precisao = {
+        nome: {'estimated_bytes': item['bytes'], 'measured_bytes': item.get('measured_bytes'),
+               'ratio': round(item['bytes'] / item['measured_bytes'], 2) if item.get('measured_bytes') else None}
+        for nome, item in medido.items()
+    }
+
+    governador.orcamento_bytes = estimado['used_bytes'] // 2
+    inicio = time.perf_counter()
+    descarte = governador.verificar()
+    descarte_ms = (time.perf_counter() - inicio) * 1000
+
+    return {
+        'check': verificacao,
+        'used_bytes': estimado['used_bytes'],
+        'accuracy': precisao,
+        'eviction': {
+            'budget_bytes': governador.orcamento_bytes,
+            'after_bytes': descarte['after_bytes'],
+            'evicted': descarte['evicted'],
+            'duration_ms': round(descarte_ms, 3),
+        },
+        # Comparado com o baseline pelo p50 de uma verificação sem descarte
+        'latency_ms': verificacao['latency_ms'],
+    }
+
+
+def _pagina_kabum(produtos: int) -> bytes:
+    """Catálogo da Kabum com `produtos` itens (as fixtures repetidas), para variar o tamanho da página."""
+    catalogo = load_fixture(KABUM_CATALOG_FIXTURE)
+    itens = catalogo['data']
+    catalogo['data'] = [itens[i % len(itens)] for i in range(produtos)]
+    return json.dumps(catalogo).encode()
+
+
+def _cpu_principal(funcao: Callable[[], Any], iteracoes: int) -> float:
+    """CPU (ms por chamada) gasta pela thread que chama `funcao`, sem contar o trabalho feito em outros processos."""
+    inicio = time.thread_time()
+    for _ in range(iteracoes):
+        funcao()
+    return round((time.thread_time() - inicio) * 1000 / iteracoes, 4)
+
+
+def _vazao_concorrente(funcao: Callable[[], Any], chamadas: int, concorrencia: int) -> float:
+    """Chamadas/s de `funcao` executada por `concorrencia` threads."""
+    with ThreadPoolExecutor(max_workers=concorrencia) as executor:
+        inicio = time.perf_counter()
+        list(executor.map(lambda _: funcao(), range(chamadas)))
+        return round(chamadas / (time.perf_counter() - inicio), 2)
+
+
+@benchmark('cpu_offload')
+def bench_cpu_offload(args: argparse.Namespace) -> Dict[str, Any]:
+    """Estágios de CPU inline x no pool de processos, por tamanho da carga.
+
+    Para a decodificação de páginas (por bytes) e para ranking + renderização (por
+    produtos na resposta) mede a latência de cada chamada, a CPU gasta pela thread que
+    chama (a que disputaria o GIL com o event loop) e a vazão com `concurrency` threads.
+    `crossover` é a menor carga em que o pool tem p50 menor que o inline.
+    """
+    processos = max(2, os.cpu_count() or 1)
+    pool = PoolCpu(processos, min_bytes=0, min_produtos=0)
+    pool.aquecer()
+    iteracoes = max(10, args.iterations // 4)
+    try:
+        paginas: Dict[str, Any] = {}
+        for produtos in (5, 20, 100, 400, 1600):
+            payload = _pagina_kabum(produtos)
+            inline = lambda: Kabuum._extrair_produtos(payload)
+            no_pool = lambda: json_projetado.carregar(pool.executar('page_decode', extrair_pagina, Kabuum.NOME, payload))
+            paginas[str(len(payload))] = {
+                'products': produtos,
+                'inline': dict(time_calls(inline, iteracoes), main_cpu_ms=_cpu_principal(inline, iteracoes),
+                               concurrent_ops_per_s=_vazao_concorrente(inline, iteracoes, args.concurrency)),
+                'pool': dict(time_calls(no_pool, iteracoes), main_cpu_ms=_cpu_principal(no_pool, iteracoes),
+                             concurrent_ops_per_s=_vazao_concorrente(no_pool, iteracoes, args.concurrency)),
+            }
+
+        service = ProductSearchService(pool_cpu=pool)
+        config = get_config()
+        rnd = random.Random(args.seed)
+        ranking: Dict[str, Any] = {}
+        for produtos in (100, 500, 2000, 8000):
+            todos = [_produto_sintetico(n, rnd) for n in range(produtos)]
+            resultados = {'query': 'notebook', 'all_products': todos, 'total_found': produtos,
+                          'magalu': [p for p in todos if p['store'] == 'Magalu'],
+                          'kabuum': [p for p in todos if p['store'] == 'Kabuum']}
+            sem_listas = {k: v for k, v in resultados.items() if k not in ('magalu', 'kabuum')}
+            inline = lambda: service.montar_resposta(resultados)
+            no_pool = lambda: json_projetado.carregar(pool.executar(
+                'rank_render', ranquear_e_renderizar, json_projetado.serializar(sem_listas),
+                'melhor_custo_beneficio', service.parse_mode, config.RENDER_CACHE_SIZE,
+            ))
+            ranking[str(produtos)] = {
+                'inline': dict(time_calls(inline, iteracoes), main_cpu_ms=_cpu_principal(inline, iteracoes)),
+                'pool': dict(time_calls(no_pool, iteracoes), main_cpu_ms=_cpu_principal(no_pool, iteracoes)),
+            }
+    finally:
+        pool.fechar()
+
+    def virada(medicoes: Dict[str, Any]) -> Optional[int]:
+        for carga, medicao in medicoes.items():
+            if medicao['pool']['latency_ms']['p50'] < medicao['inline']['latency_ms']['p50']:
+                return int(carga)
+        return None
+
+    maior = paginas[max(paginas, key=int)]
+    return {
+        'cpus': os.cpu_count(),
+        'pool_processes': processos,
+        'page_decode_by_bytes': paginas,
+        'rank_render_by_products': ranking,
+        'crossover': {'page_decode_bytes': virada(paginas), 'rank_render_products': virada(ranking)},
+        'pool': pool.stats(),
+        # Comparado com o baseline pela latência da maior página no pool
+        'latency_ms': maior['pool']['latency_ms'],
+    }
+
+
+@benchmark('store_hedging')
+def bench_store_hedging(args: argparse.Namespace) -> Dict[str, Any]:
+    """Cauda de latência de uma página da Kabum com e sem cópia (hedge) da requisição.
+
+    O servidor simulado atrasa `slow_rate` das respostas em `slow_ms` (padrão: 3% em 500ms);
+    com hedge, a cópia disparada após o p95 deve cortar essa cauda do p99.
+    """
+    slow_rate = args.slow_rate or 0.03
+    slow_ms = args.slow_ms or 500.0
+    resultado: Dict[str, Any] = {}
+
+    for modo, taxa_hedge in (('without_hedge', 0.0), ('with_hedge', 0.1)):
+        config = MockStoreConfig(args.latency_ms, args.jitter_ms, seed=args.seed,
+                                 slow_rate=slow_rate, slow_ms=slow_ms)
+        with MockStoreServer(config) as loja, ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            kabuum = Kabuum(base_url=loja.base_url)
+            kabuum.http.orcamento_hedge = Orcamento(taxa_hedge, inicial=0.0)
+            # Como em search_products, o limitador fica desligado por padrão: mede o hedge, não a fila
+            kabuum.limitador.taxa_por_s = args.store_rps
+            kabuum.limitador.max_em_andamento = args.store_max_in_flight
+
+            def buscar(_):
+                inicio = time.perf_counter()
+                kabuum.buscar_pagina('notebook', 1)
+                return time.perf_counter() - inicio
+
+            inicio_total = time.perf_counter()
+            latencias = list(executor.map(buscar, range(args.search_iterations * 5)))
+            duracao = time.perf_counter() - inicio_total
+            resultado[modo] = summarize(latencias, duracao, store=kabuum.http.stats(),
+                                        upstream_requests=loja.requests['kabum_catalog'])
+
+    # O estágio é comparado com o baseline pelo p50 do modo com hedge
+    resultado['latency_ms'] = resultado['with_hedge']['latency_ms']
+    resultado['slow_rate'] = slow_rate
+    resultado['slow_ms'] = slow_ms
+    return resultado
+
+
+@benchmark('http_revalidation')
+def bench_http_revalidation(args: argparse.Namespace) -> Dict[str, Any]:
+    """Buscas repetidas com o cache HTTP condicional: a primeira rodada baixa as páginas,
+    as seguintes recebem 304 e reaproveitam os produtos já decodificados.
+    """
+    config = MockStoreConfig(args.latency_ms, args.jitter_ms, seed=args.seed)
+    diretorio = tempfile.mkdtemp(prefix='promohunter-http-')
+    termos = [f'notebook {n}' for n in range(max(1, args.search_iterations // 4))]
+    resultado: Dict[str, Any] = {}
+
+    try:
+        with MockStoreServer(config) as loja:
+            adaptadores = [Magalu(base_url=loja.base_url), Kabuum(base_url=loja.base_url)]
+            for adaptador in adaptadores:
+                adaptador.cache_http = adaptador.http.cache = CacheHttp(diretorio, adaptador.NOME)
+
+            for rodada in ('cold', 'revalidated'):
+                latencias: List[float] = []
+                inicio_total = time.perf_counter()
+                for termo in termos:
+                    for adaptador in adaptadores:
+                        inicio = time.perf_counter()
+                        adaptador.buscar_produtos(termo)
+                        latencias.append(time.perf_counter() - inicio)
+                duracao = time.perf_counter() - inicio_total
+                resultado[rodada] = summarize(latencias, duracao, upstream_requests=dict(loja.requests))
+
+            resultado['caches'] = {adaptador.NOME: adaptador.cache_http.stats() for adaptador in adaptadores}
+    finally:
+        shutil.rmtree(diretorio, ignore_errors=True)
+
+    # Comparado com o baseline pelo p50 das buscas revalidadas
+    resultado['latency_ms'] = resultado['revalidated']['latency_ms']
+    return resultado
+
+
+@benchmark('magalu_build_id_failover')
+def bench_build_id_failover(args: argparse.Namespace) -> Dict[str, Any]:
+    """Buscas simultâneas logo após um novo deploy da Magalu (build id trocado).
+
+    Mede a latência das buscas que pegam o 404 e confere que apenas uma
+    redescoberta do build id é feita, mesmo com `concurrency` buscas ao mesmo tempo.
+    """
+    config = MockStoreConfig(args.latency_ms, args.jitter_ms, seed=args.seed)
+
+    with MockStoreServer(config) as loja, ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        magalu = Magalu(base_url=loja.base_url)
+        magalu.buscar_produtos('notebook')
+
+        latencias: List[float] = []
+        vazias = 0
+        rodadas = max(1, args.search_iterations // args.concurrency)
+        inicio_total = time.perf_counter()
+        for _ in range(rodadas):
+            loja.rotate_build_id()
+
+            def buscar():
+                inicio = time.perf_counter()
+                produtos = magalu.buscar_produtos('notebook')
+                return time.perf_counter() - inicio, produtos
+
+            for latencia, produtos in executor.map(lambda _: buscar(), range(args.concurrency)):
+                latencias.append(latencia)
+                vazias += 0 if produtos else 1
+        duracao = time.perf_counter() - inicio_total
+
+        return summarize(
+            latencias,
+            duracao,
+            concurrency=args.concurrency,
+            deploys=rodadas,
+            empty_results=vazias,
+            storefront_requests=loja.requests['magalu_storefront'],
+            stale_build_id_404s=loja.requests['magalu_stale_build_id'],
+        )
+
+
+def _parse_importtime(saida: str, modulo: str) -> Dict[str, Any]:
+    """Extrai da saída de `-X importtime` o tempo total do módulo e os imports mais pesados."""
+    total_us = 0
+    proprios = []
+    for linha in saida.splitlines():
+        if not linha.startswith('import time:') or 'self [us]' in linha:
+            continue
+        proprio, cumulativo, nome = linha[len('import time:'):].split('|')
+        proprios.append((int(proprio), nome.strip()))
+        if nome.strip() == modulo and not nome[1:].startswith(' '):
+            total_us = int(cumulativo)
+    mais_pesados = sorted(proprios, reverse=True)[:10]
+    return {
+        'total_ms': total_us / 1000,
+        'modules_imported': len(proprios),
+        'heaviest_self_ms': {nome: round(us / 1000, 3) for us, nome in mais_pesados},
+    }
+
+
+@benchmark('startup_import')
+def bench_startup_import(args: argparse.Namespace) -> Dict[str, Any]:
+    """Tempo de import (via `-X importtime`) do ponto de entrada e do módulo do bot."""
+    detalhes: Dict[str, Any] = {}
+    amostras_entrada: List[float] = []
+
+    for modulo in IMPORT_TARGETS:
+        totais = []
+        perfil: Dict[str, Any] = {}
+        for _ in range(args.import_runs):
+            processo = subprocess.run(
+                [sys.executable, '-X', 'importtime', '-c', f'import {modulo}'],
+                cwd=SYSTEM_DIR, capture_output=True, text=True,
+            )
+            perfil = _parse_importtime(processo.stderr, modulo)
+            totais.append(perfil['total_ms'] / 1000)
+        detalhes[modulo] = summarize(totais, sum(totais), **{k: v for k, v in perfil.items() if k != 'total_ms'})
+        if modulo == IMPORT_TARGETS[0]:
+            amostras_entrada = totais
+
+    resultado = summarize(amostras_entrada, sum(amostras_entrada), modules=detalhes)
+    resultado['budget_ms'] = args.import_budget_ms
+    resultado['within_budget'] = resultado['latency_ms']['p50'] <= args.import_budget_ms
+    return resultado
+
+
+def _git_commit() -> Optional[str]:
+    """Commit atual do repositório, para associar os resultados ao código medido."""
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL,
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(atual: Dict[str, Any], baseline: Dict[str, Any], limite_pct: float) -> List[str]:
+    """Compara o p50 de cada estágio com uma execução anterior.
+
+    Returns:
+        Lista de descrições das regressões acima de `limite_pct`
+    """
+    regressoes = []
+    for nome, resultado in atual['results'].items():
+        anterior = baseline.get('results', {}).get(nome)
+        if not anterior or 'latency_ms' not in resultado or 'latency_ms' not in anterior:
+            continue
+        p50_antes = anterior['latency_ms']['p50']
+        p50_agora = resultado['latency_ms']['p50']
+        if p50_antes > 0:
+            variacao = (p50_agora - p50_antes) / p50_antes * 100
+            if variacao > limite_pct:
+                regressoes.append(f"{nome}: p50 {p50_antes:.3f}ms -> {p50_agora:.3f}ms (+{variacao:.1f}%)")
+    return regressoes
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Benchmarks offline do PromoHunter')
+    parser.add_argument('--only', nargs='*', choices=sorted(BENCHMARKS), help='Executa apenas os estágios informados')
+    parser.add_argument('--iterations', type=int, default=200, help='Iterações por estágio de CPU')
+    parser.add_argument('--search-iterations', type=int, default=40, help='Total de buscas completas')
+    parser.add_argument('--concurrency', type=int, default=4, help='Buscas simultâneas em search_products')
+    parser.add_argument('--latency-ms', type=float, default=50.0, help='Latência injetada pelo servidor simulado')
+    parser.add_argument('--jitter-ms', type=float, default=20.0, help='Variação aleatória da latência injetada')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fração de respostas com erro injetado')
+    parser.add_argument('--slow-rate', type=float, default=0.0, help='Fração de respostas com atraso extra (cauda)')
+    parser.add_argument('--slow-ms', type=float, default=0.0, help='Atraso extra das respostas lentas')
+    parser.add_argument('--store-rps', type=float, default=0.0,
+                        help='Limite de requisições/s por loja em search_products e store_hedging (0 desativa)')
+    parser.add_argument('--store-max-in-flight', type=int, default=64,
+                        help='Requisições simultâneas por loja em search_products e store_hedging')
+    parser.add_argument('--index-docs', type=int, default=1_000_000, help='Produtos no catálogo de catalog_index')
+    parser.add_argument('--seed', type=int, default=26, help='Semente da injeção de latência/erros')
+    parser.add_argument('--import-runs', type=int, default=5, help='Execuções de `-X importtime` por módulo')
+    parser.add_argument('--import-budget-ms', type=float, default=150.0,
+                        help='Orçamento de tempo de import do ponto de entrada (main)')
+    parser.add_argument('--output', help='Arquivo JSON de saída (padrão: stdout)')
+    parser.add_argument('--baseline', help='Resultado anterior para detectar regressões')
+    parser.add_argument('--regression-threshold', type=float, default=10.0, help='Regressão tolerada no p50 (%%)')
+    parser.add_argument('--fail-on-regression', action='store_true', help='Sai com código 1 se houver regressão')
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+
+    # Logs e prints dos serviços poluiriam a saída e somariam I/O às medições
+    logging.disable(logging.INFO)
+    # Cada estágio mede a ida às lojas; o cache HTTP em disco só entra em `http_revalidation`
+    # e o catálogo local só em `catalog_index`
+    get_config().HTTP_CACHE_DIR = ''
+    get_config().INDEX_PATH = ''
+    # Os produtos das lojas simuladas não podem ir para a exportação real (EXPORT_DIR);
+    # `export_observations` usa um exportador próprio em uma pasta temporária
+    get_config().EXPORT_DIR = ''
+
+    relatorio: Dict[str, Any] = {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'git_commit': _git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'args': {k: v for k, v in vars(args).items() if k not in ('output', 'baseline')},
+        },
+        'results': {},
+    }
+
+    for nome in args.only or BENCHMARKS:
+        print(f"▶ {nome}...", file=sys.stderr)
+        with contextlib.redirect_stdout(io.StringIO()):
+            relatorio['results'][nome] = BENCHMARKS[nome](args)
+
+    saida = json.dumps(relatorio, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as arquivo:
+            arquivo.write(saida + '\n')
+        print(f"Resultados gravados em {args.output}", file=sys.stderr)
+    else:
+        print(saida)
+
+    startup = relatorio['results'].get('startup_import')
+    if startup and not startup['within_budget']:
+        print(f"⚠️  Import do ponto de entrada acima do orçamento: "
+              f"{startup['latency_ms']['p50']:.1f}ms > {startup['budget_ms']:.1f}ms", file=sys.stderr)
+        if args.fail_on_regression:
+            return 1
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as arquivo:
+            regressoes = compare(relatorio, json.load(arquivo), args.regression_threshold)
+        for regressao in regressoes:
+            print(f"⚠️  Regressão: {regressao}", file=sys.stderr)
+        if regressoes and args.fail_on_regression:
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
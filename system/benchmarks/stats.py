@@ -0,0 +1,66 @@
+"""
+Funções auxiliares de medição e estatística dos benchmarks.
+"""
+
+import time
+from typing import Any, Callable, Dict, List, Sequence
+
+
+def percentile(amostras: Sequence[float], pct: float) -> float:
+    """Percentil por interpolação linear (mesma definição do numpy)."""
+    if not amostras:
+        return 0.0
+    ordenadas = sorted(amostras)
+    posicao = (len(ordenadas) - 1) * pct / 100
+    inferior = int(posicao)
+    superior = min(inferior + 1, len(ordenadas) - 1)
+    fracao = posicao - inferior
+    return ordenadas[inferior] + (ordenadas[superior] - ordenadas[inferior]) * fracao
+
+
+def summarize(latencias_s: List[float], duracao_total_s: float, **extras: Any) -> Dict[str, Any]:
+    """Resume uma série de latências (em segundos) no formato exportado pelo runner.
+
+    Args:
+        latencias_s: Latência de cada operação, em segundos
+        duracao_total_s: Tempo de parede de toda a série (para calcular a vazão)
+        **extras: Campos adicionais incluídos no resultado
+
+    Returns:
+        Dict com contagem, vazão (ops/s) e percentis de latência em milissegundos
+    """
+    ms = [latencia * 1000 for latencia in latencias_s]
+    resultado = {
+        'iterations': len(ms),
+        'ops_per_sec': round(len(ms) / duracao_total_s, 2) if duracao_total_s > 0 else 0.0,
+        'latency_ms': {
+            'mean': round(sum(ms) / len(ms), 4) if ms else 0.0,
+            'min': round(min(ms), 4) if ms else 0.0,
+            'p50': round(percentile(ms, 50), 4),
+            'p95': round(percentile(ms, 95), 4),
+            'p99': round(percentile(ms, 99), 4),
+            'max': round(max(ms), 4) if ms else 0.0,
+        },
+    }
+    resultado.update(extras)
+    return resultado
+
+
+def time_calls(funcao: Callable[[], Any], iteracoes: int, aquecimento: int = 5) -> Dict[str, Any]:
+    """Executa `funcao` repetidamente e mede a latência de cada chamada.
+
+    Args:
+        funcao: Função sem argumentos a ser medida
+        iteracoes: Número de execuções medidas
+        aquecimento: Execuções descartadas antes da medição
+    """
+    for _ in range(aquecimento):
+        funcao()
+
+    latencias = []
+    inicio_total = time.perf_counter()
+    for _ in range(iteracoes):
+        inicio = time.perf_counter()
+        funcao()
+        latencias.append(time.perf_counter() - inicio)
+    return summarize(latencias, time.perf_counter() - inicio_total)
@@ -1,32 +1,115 @@
+import atexit
+import json
 import logging
+import logging.handlers
+import os
+import queue
 import sys
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Optional, TextIO, Tuple
+
+# Atributos padrão de um LogRecord; o resto veio de `extra=` e vai para o JSON
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    """Formata cada registro como uma linha JSON (campos de `extra=` incluídos)."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        dados = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        for chave, valor in record.__dict__.items():
+            if chave not in _RECORD_ATTRS and not chave.startswith('_'):
+                dados[chave] = valor
+        if record.exc_info:
+            dados['exc'] = self.formatException(record.exc_info)
+        return json.dumps(dados, ensure_ascii=False, default=str)
+
+
+class RateLimitFilter(logging.Filter):
+    """Amostra erros repetitivos: cada mensagem (por logger e template) passa no máximo
+    `burst` vezes por janela; as suprimidas são contadas no próximo registro emitido."""
+
+    def __init__(self, burst: int = 5, window_s: float = 60.0, min_level: int = logging.WARNING):
+        super().__init__()
+        self.burst = burst
+        self.window_s = window_s
+        self.min_level = min_level
+        self._janelas: Dict[Tuple[str, int, str], list] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < self.min_level:
+            return True
+
+        chave = (record.name, record.levelno, str(record.msg))
+        agora = time.monotonic()
+        with self._lock:
+            janela = self._janelas.get(chave)
+            if janela is None or agora - janela[0] >= self.window_s:
+                suprimidas = janela[2] if janela else 0
+                self._janelas[chave] = [agora, 1, 0]
+                if suprimidas:
+                    record.suppressed = suprimidas
+                return True
+            if janela[1] < self.burst:
+                janela[1] += 1
+                return True
+            janela[2] += 1
+            return False
+
+
+class _LazyQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler que não formata a mensagem na thread de origem.
+
+    O `QueueHandler` padrão chama `format()` antes de enfileirar; aqui a interpolação
+    dos argumentos e a serialização acontecem na thread do `QueueListener`.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
 
 class BotLogger:
     """
     Uma classe para configurar e fornecer um logger centralizado.
+
+    Todos os loggers compartilham uma fila: o código da aplicação apenas enfileira os
+    registros, e a escrita em stdout/arquivo acontece em uma thread dedicada
+    (`QueueListener`), fora do event loop.
     """
-    def __init__(self, nome_logger: str, nivel_log=logging.INFO):
+
+    _queue: Optional[queue.SimpleQueue] = None
+    _listener: Optional[logging.handlers.QueueListener] = None
+    _queue_handler: Optional[logging.Handler] = None
+    _default_level = logging.INFO
+    _levels: Dict[str, int] = {}
+    _console: Optional[TextIO] = None
+    _lock = threading.Lock()
+
+    def __init__(self, nome_logger: str, nivel_log=None):
         """
         Inicializa e configura o logger.
 
         Args:
             nome_logger (str): O nome do logger (geralmente __name__ do módulo que o utiliza).
             nivel_log: O nível de log a ser capturado (ex: logging.INFO, logging.DEBUG).
+                Se omitido, usa o nível configurado em LOG_LEVEL para este logger.
         """
-        self.logger = logging.getLogger(nome_logger)
-        self.logger.setLevel(nivel_log)
-
-        if not self.logger.handlers:
-            handler_console = logging.StreamHandler(sys.stdout)
+        BotLogger._ensure_listener()
 
-            formato_log = logging.Formatter(
-                '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-                datefmt='%Y-%m-%d %H:%M:%S'
-            )
-
-            handler_console.setFormatter(formato_log)
+        self.logger = logging.getLogger(nome_logger)
+        self.logger.setLevel(nivel_log if nivel_log is not None else BotLogger._level_for(nome_logger))
 
-            self.logger.addHandler(handler_console)
+        if BotLogger._queue_handler not in self.logger.handlers:
+            self.logger.addHandler(BotLogger._queue_handler)
+            self.logger.propagate = False
 
     def get_logger(self) -> logging.Logger:
         """
@@ -36,3 +119,129 @@ class BotLogger:
             logging.Logger: O objeto logger.
         """
         return self.logger
+
+    @staticmethod
+    def parse_levels(spec: str) -> Tuple[int, Dict[str, int]]:
+        """
+        Interpreta a especificação de níveis de LOG_LEVEL.
+
+        Aceita um nível global seguido de níveis por logger, por exemplo:
+        ``INFO,services.lojas=DEBUG,services.telegram=WARNING``.
+
+        Returns:
+            Tuple com o nível padrão e o dicionário {nome_do_logger: nível}
+        """
+        padrao = logging.INFO
+        por_logger: Dict[str, int] = {}
+        for parte in (spec or '').split(','):
+            parte = parte.strip()
+            if not parte:
+                continue
+            nome, sep, nivel = parte.partition('=')
+            if not sep:
+                nome, nivel = '', nome
+            valor = logging.getLevelName(nivel.strip().upper())
+            if not isinstance(valor, int):
+                continue
+            if nome:
+                por_logger[nome.strip()] = valor
+            else:
+                padrao = valor
+        return padrao, por_logger
+
+    @classmethod
+    def configure(cls, level_spec: Optional[str] = None, log_file: Optional[str] = None,
+                  log_format: Optional[str] = None):
+        """
+        Aplica a configuração de logging (normalmente a partir de `Config`).
+
+        Args:
+            level_spec: Valor de LOG_LEVEL (ex: "INFO,services.lojas=DEBUG")
+            log_file: Arquivo de log adicional (rotacionado); vazio desativa
+            log_format: "json" (padrão) ou "text"
+        """
+        with cls._lock:
+            cls._default_level, cls._levels = cls.parse_levels(level_spec or 'INFO')
+            cls._stop_listener()
+            cls._start_listener(log_file, log_format)
+
+        gerenciador = logging.Logger.manager
+        for nome, logger in list(gerenciador.loggerDict.items()):
+            if isinstance(logger, logging.Logger) and cls._queue_handler in logger.handlers:
+                logger.setLevel(cls._level_for(nome))
+
+    @classmethod
+    def use_console(cls, stream: TextIO):
+        """
+        Escreve os logs de console em `stream` em vez de stdout (mantido nas próximas `configure`).
+
+        Usado por modos cuja saída padrão é o próprio resultado (ex: `--scan-exports`).
+
+        Args:
+            stream: Destino dos registros (ex: `sys.stderr`)
+        """
+        with cls._lock:
+            cls._console = stream
+            if cls._listener is not None:
+                for handler in cls._listener.handlers:
+                    if type(handler) is logging.StreamHandler:
+                        handler.setStream(stream)
+
+    @classmethod
+    def _level_for(cls, nome_logger: str) -> int:
+        """Nível mais específico configurado para o logger (ou um de seus pais)."""
+        nome = nome_logger
+        while nome:
+            if nome in cls._levels:
+                return cls._levels[nome]
+            nome = nome.rpartition('.')[0]
+        return cls._default_level
+
+    @classmethod
+    def _ensure_listener(cls):
+        if cls._listener is None:
+            with cls._lock:
+                if cls._listener is None:
+                    cls._default_level, cls._levels = cls.parse_levels(os.getenv('LOG_LEVEL', 'INFO'))
+                    cls._start_listener(None, os.getenv('LOG_FORMAT'))
+                    atexit.register(cls.shutdown)
+
+    @classmethod
+    def _start_listener(cls, log_file: Optional[str], log_format: Optional[str]):
+        if (log_format or 'json').lower() == 'text':
+            formato = logging.Formatter(
+                '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+                datefmt='%Y-%m-%d %H:%M:%S'
+            )
+        else:
+            formato = JsonFormatter()
+
+        handlers = [logging.StreamHandler(cls._console or sys.stdout)]
+        if log_file:
+            handlers.append(logging.handlers.RotatingFileHandler(
+                log_file, maxBytes=10 * 1024 * 1024, backupCount=5, encoding='utf-8', delay=True
+            ))
+        for handler in handlers:
+            handler.setFormatter(formato)
+
+        if cls._queue is None:
+            cls._queue = queue.SimpleQueue()
+            cls._queue_handler = _LazyQueueHandler(cls._queue)
+            cls._queue_handler.addFilter(RateLimitFilter())
+
+        cls._listener = logging.handlers.QueueListener(cls._queue, *handlers, respect_handler_level=True)
+        cls._listener.start()
+
+    @classmethod
+    def _stop_listener(cls):
+        if cls._listener is not None:
+            cls._listener.stop()
+            for handler in cls._listener.handlers:
+                handler.close()
+            cls._listener = None
+
+    @classmethod
+    def shutdown(cls):
+        """Esvazia a fila e encerra a thread de escrita dos logs."""
+        with cls._lock:
+            cls._stop_listener()
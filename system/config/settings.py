@@ -30,13 +30,137 @@ class Config:
         self.DEBUG_MODE = os.getenv('DEBUG_MODE', 'False').lower() == 'true'
         
         # Configurações de logging
-        self.LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+        # Nível global e, opcionalmente, por logger: "INFO,services.lojas=DEBUG"
+        self.LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
         self.LOG_FILE = os.getenv('LOG_FILE', 'promohunter.log')
+        self.LOG_FORMAT = os.getenv('LOG_FORMAT', 'json').lower()
+        BotLogger.configure(self.LOG_LEVEL, self.LOG_FILE, self.LOG_FORMAT)
         
         # Configurações de API (para futuras integrações)
         self.API_TIMEOUT = int(os.getenv('API_TIMEOUT', '30'))
         self.MAX_RETRIES = int(os.getenv('MAX_RETRIES', '3'))
         
+        # Requisições às lojas: timeout derivado do p99 recente (limitado a [MIN, MAX]),
+        # cópia da requisição após o p95 em até STORE_HEDGE_MAX_RATE das requisições e
+        # retentativas (até MAX_RETRIES cada) em até STORE_RETRY_BUDGET das requisições
+        self.STORE_TIMEOUT_MIN_S = float(os.getenv('STORE_TIMEOUT_MIN_S', '1.0'))
+        self.STORE_TIMEOUT_MAX_S = float(os.getenv('STORE_TIMEOUT_MAX_S', '10.0'))
+        self.STORE_HEDGE_MAX_RATE = float(os.getenv('STORE_HEDGE_MAX_RATE', '0.1'))
+        self.STORE_RETRY_BUDGET = float(os.getenv('STORE_RETRY_BUDGET', '0.2'))
+        
+        # Limite de requisições de saída por loja, compartilhado por todos os chats
+        self.STORE_RATE_LIMIT_RPS = float(os.getenv('STORE_RATE_LIMIT_RPS', '10'))
+        self.STORE_RATE_LIMIT_BURST = int(os.getenv('STORE_RATE_LIMIT_BURST', '20'))
+        self.STORE_MAX_IN_FLIGHT = int(os.getenv('STORE_MAX_IN_FLIGHT', '8'))
+        
+        # Circuit breaker por loja: abre com STORE_BREAKER_ERROR_RATE de erros (ou
+        # STORE_BREAKER_SLOW_RATE de buscas acima de STORE_BREAKER_SLOW_S) nas buscas
+        # recentes e, após STORE_BREAKER_OPEN_S, libera uma única busca de teste
+        self.STORE_BREAKER_ERROR_RATE = float(os.getenv('STORE_BREAKER_ERROR_RATE', '0.5'))
+        self.STORE_BREAKER_SLOW_S = float(os.getenv('STORE_BREAKER_SLOW_S', '8.0'))
+        self.STORE_BREAKER_SLOW_RATE = float(os.getenv('STORE_BREAKER_SLOW_RATE', '0.5'))
+        self.STORE_BREAKER_MIN_CALLS = int(os.getenv('STORE_BREAKER_MIN_CALLS', '5'))
+        self.STORE_BREAKER_OPEN_S = float(os.getenv('STORE_BREAKER_OPEN_S', '30'))
+        # Resultados por loja guardados por mais tempo, exibidos enquanto ela está indisponível
+        self.STORE_STALE_TTL = int(os.getenv('STORE_STALE_TTL', '3600'))
+        
+        # Cache HTTP das respostas das lojas em disco (vazio desativa)
+        self.HTTP_CACHE_DIR = os.getenv('HTTP_CACHE_DIR', '.cache/http')
+        self.HTTP_CACHE_MAX_MB = int(os.getenv('HTTP_CACHE_MAX_MB', '100'))
+        
+        # Cache de resultados de busca
+        self.SEARCH_CACHE_TTL = int(os.getenv('SEARCH_CACHE_TTL', '300'))
+        self.SEARCH_CACHE_SIZE = int(os.getenv('SEARCH_CACHE_SIZE', '500'))
+        
+        # Catálogo local (SQLite FTS5) dos produtos já buscados; vazio desativa. Com ao menos
+        # INDEX_MIN_RESULTS produtos atualizados há até INDEX_MAX_AGE_S, a busca é respondida
+        # pelo catálogo e as lojas são consultadas em segundo plano
+        self.INDEX_PATH = os.getenv('INDEX_PATH', '.cache/catalogo.sqlite3')
+        self.INDEX_MIN_RESULTS = int(os.getenv('INDEX_MIN_RESULTS', '20'))
+        self.INDEX_MAX_AGE_S = int(os.getenv('INDEX_MAX_AGE_S', '21600'))
+        self.INDEX_MAX_RESULTS = int(os.getenv('INDEX_MAX_RESULTS', '200'))
+        
+        # Busca paginada: a página 1 vem primeiro e as seguintes em paralelo, até
+        # SEARCH_MIN_IN_STOCK produtos disponíveis ou o fim do orçamento de tempo
+        self.SEARCH_MAX_PAGES = int(os.getenv('SEARCH_MAX_PAGES', '3'))
+        self.SEARCH_MIN_IN_STOCK = int(os.getenv('SEARCH_MIN_IN_STOCK', '80'))
+        self.SEARCH_PAGES_BUDGET_S = float(os.getenv('SEARCH_PAGES_BUDGET_S', '3.0'))
+        
+        # Buscas em lote (search_many): termos simultâneos e prazo de cada termo
+        self.SEARCH_BATCH_CONCURRENCY = int(os.getenv('SEARCH_BATCH_CONCURRENCY', '8'))
+        self.SEARCH_BATCH_TERM_TIMEOUT_S = float(os.getenv('SEARCH_BATCH_TERM_TIMEOUT_S', '30'))
+        
+        # Formatação das mensagens de busca ('MarkdownV2' ou 'HTML') e fragmentos em cache
+        self.MESSAGE_PARSE_MODE = os.getenv('MESSAGE_PARSE_MODE', 'MarkdownV2')
+        self.RENDER_CACHE_SIZE = int(os.getenv('RENDER_CACHE_SIZE', '4096'))
+        
+        # Top da busca como texto ('text') ou álbum de fotos ('album'); no álbum, o file_id
+        # de cada imagem já enviada fica em MEDIA_FILE_IDS_PATH (vazio: apenas em memória)
+        self.SEARCH_RESULTS_MODE = os.getenv('SEARCH_RESULTS_MODE', 'text')
+        self.MEDIA_FILE_IDS_PATH = os.getenv('MEDIA_FILE_IDS_PATH', '.cache/telegram_file_ids.sqlite3')
+        self.MEDIA_FILE_IDS_MAX = int(os.getenv('MEDIA_FILE_IDS_MAX', '10000'))
+        self.MEDIA_DEAD_URL_TTL = int(os.getenv('MEDIA_DEAD_URL_TTL', '3600'))
+        
+        # Estado compartilhado entre workers (cache de resultados, buscas em andamento,
+        # limite de requisições às lojas e sessões dos chats): vazio mantém tudo em memória;
+        # `redis://host:6379/0` usa um servidor Redis (ou compatível)
+        self.SHARED_STATE_URL = os.getenv('SHARED_STATE_URL', '')
+        self.SHARED_STATE_PREFIX = os.getenv('SHARED_STATE_PREFIX', 'promohunter:')
+        # Validade da trava de uma busca em andamento (quem espera desiste e busca por conta própria)
+        self.SHARED_LOCK_TTL_S = float(os.getenv('SHARED_LOCK_TTL_S', '30'))
+        self.SESSION_TTL_S = int(os.getenv('SESSION_TTL_S', '86400'))
+        
+        # Pool de processos para os estágios de CPU (0 desativa): páginas a partir de
+        # CPU_POOL_MIN_BYTES e respostas com CPU_POOL_MIN_PRODUCTS produtos saem do processo principal
+        self.CPU_POOL_WORKERS = int(os.getenv('CPU_POOL_WORKERS', '0'))
+        self.CPU_POOL_MIN_BYTES = int(os.getenv('CPU_POOL_MIN_BYTES', '65536'))
+        self.CPU_POOL_MIN_PRODUCTS = int(os.getenv('CPU_POOL_MIN_PRODUCTS', '2000'))
+
+        # Exportação das observações de produtos para análise offline: pasta (vazio desativa),
+        # formato ('parquet' ou 'csv'; vazio escolhe Parquet se o pyarrow estiver instalado),
+        # linhas por lote e rotação dos arquivos por tamanho (MB) e idade (s)
+        self.EXPORT_DIR = os.getenv('EXPORT_DIR', '.cache/observacoes')
+        self.EXPORT_FORMAT = os.getenv('EXPORT_FORMAT', '')
+        self.EXPORT_BATCH_ROWS = int(os.getenv('EXPORT_BATCH_ROWS', '5000'))
+        self.EXPORT_FILE_MAX_MB = int(os.getenv('EXPORT_FILE_MAX_MB', '64'))
+        self.EXPORT_FILE_MAX_S = float(os.getenv('EXPORT_FILE_MAX_S', '3600'))
+
+        # Vitrine do /ofertas: categorias (termos de busca separados por vírgula; vazio desativa),
+        # intervalo entre reconstruções e janela de preços usada no desconto histórico
+        self.OFFERS_CATEGORIES = [
+            termo.strip()
+            for termo in os.getenv('OFFERS_CATEGORIES', 'smartphone,notebook,smart tv,fone bluetooth,air fryer').split(',')
+            if termo.strip()
+        ]
+        self.OFFERS_REFRESH_S = float(os.getenv('OFFERS_REFRESH_S', '1800'))
+        self.OFFERS_HISTORY_WINDOW_S = float(os.getenv('OFFERS_HISTORY_WINDOW_S', str(7 * 86400)))
+
+        # Administração: chats que podem usar /perf e /metricas (ids separados por vírgula) e limites
+        # do perfilador por amostragem
+        self.ADMIN_CHAT_IDS = {
+            int(chat_id) for chat_id in os.getenv('ADMIN_CHAT_IDS', '').split(',') if chat_id.strip()
+        }
+        self.PERF_MAX_SECONDS = float(os.getenv('PERF_MAX_SECONDS', '60'))
+        self.PERF_SAMPLE_INTERVAL_MS = float(os.getenv('PERF_SAMPLE_INTERVAL_MS', '5'))
+        self.PERF_TOP_N = int(os.getenv('PERF_TOP_N', '15'))
+
+        # Orçamento de memória dos caches, sessões e buffers (MB; 0 apenas contabiliza), intervalo
+        # entre verificações, tracemalloc para validar as estimativas e mensagens recebidas guardadas
+        self.MEMORY_BUDGET_MB = int(os.getenv('MEMORY_BUDGET_MB', '512'))
+        self.MEMORY_CHECK_INTERVAL_S = float(os.getenv('MEMORY_CHECK_INTERVAL_S', '10'))
+        self.MEMORY_DEBUG_TRACEMALLOC = os.getenv('MEMORY_DEBUG_TRACEMALLOC', 'False').lower() == 'true'
+        self.RECEIVED_MESSAGES_MAX = int(os.getenv('RECEIVED_MESSAGES_MAX', '1000'))
+
+        # Magalu: validade do build id do Next.js descoberto na vitrine
+        self.MAGALU_BUILD_ID_TTL = int(os.getenv('MAGALU_BUILD_ID_TTL', '3600'))
+        
+        # Aquecimento (--warmup): buscas populares pré-carregadas no cache
+        self.WARMUP_QUERIES = [
+            termo.strip()
+            for termo in os.getenv('WARMUP_QUERIES', 'notebook,smartphone,monitor,headset,mouse gamer').split(',')
+            if termo.strip()
+        ]
+        
         # Validar configurações obrigatórias
         self._validate_config()
     
@@ -81,5 +205,24 @@ class Config:
             f"telegram_configured={bool(self.TELEGRAM_TOKEN)})"
         )
 
-# Instância global de configuração
-config = Config()
\ No newline at end of file
+_config: Optional[Config] = None
+
+
+def get_config() -> Config:
+    """Retorna a instância global de configuração, criando-a no primeiro uso.
+
+    Returns:
+        Config: Configuração da aplicação
+    """
+    global _config
+    if _config is None:
+        _config = Config()
+    return _config
+
+
+def __getattr__(nome: str):
+    # Mantém `from config.settings import config` funcionando sem criar a
+    # configuração (nem logar) no momento do import do módulo
+    if nome == 'config':
+        return get_config()
+    raise AttributeError(f"module {__name__!r} has no attribute {nome!r}")
\ No newline at end of file
@@ -7,3 +7,10 @@ class InteracaoLojasInterface(ABC):
     def buscar_produtos(self, termo_busca: str):
         """ Método responsável por buscar produtos em determinada loja online via API. """
         pass
+
+    def aquecer(self) -> bool:
+        """ Método opcional para abrir conexões com a loja e validar as rotas usadas antes do primeiro uso.
+
+        Retorna True se a loja respondeu como esperado.
+        """
+        return True
@@ -5,16 +5,81 @@ import os
 
 sys.path.append(os.path.join(os.path.dirname(__file__), 'system'))
 
-from services.telegram import TelegramBot
-from config.environments import Environments
+# Os módulos pesados (python-telegram-bot, pydantic, requests) são importados dentro
+# das funções: `--test` e `--help` não pagam por eles, e o import deste módulo é barato.
 
-async def main():
+async def warmup(product_search, termos):
+    """Aquece conexões com as lojas e pré-carrega o cache antes de iniciar o polling."""
+    print(f"🔥 Aquecendo: conexões com as lojas e {len(termos)} buscas populares...")
+    relatorio = await product_search.aquecer(termos)
+    
+    for loja in ('magalu', 'kabuum'):
+        status = "✅" if relatorio[loja] else "⚠️ "
+        print(f"  {status} {loja.capitalize()}")
+    print(f"  ✅ {relatorio['cached_queries']}/{relatorio['requested_queries']} buscas em cache "
+          f"({relatorio['duration_s']:.1f}s)")
+    return relatorio
+
+def worker_process(indice, token, termos):
+    """Ponto de entrada de um processo worker (fila `indice` do estado compartilhado)."""
+    from services.workers import executar_worker
+    try:
+        asyncio.run(executar_worker(indice, token, termos_aquecimento=termos))
+    except KeyboardInterrupt:
+        pass
+
+async def scale_out(token, args, termos):
+    """Distribui os updates por chat entre `--workers` processos (ou roda só um worker, com `--worker`)."""
+    from multiprocessing import get_context
+    from services.estado import get_estado
+    from services.workers import DistribuidorUpdates, executar_worker
+    
+    estado = get_estado()
+    if not estado.compartilhado:
+        print("❌ Vários workers exigem estado compartilhado!")
+        print("\nConfigure um servidor Redis no .env:")
+        print('SHARED_STATE_URL="redis://localhost:6379/0"')
+        return
+    
+    if args.worker is not None:
+        print(f"👷 Worker {args.worker}: consumindo a fila de updates (Ctrl+C para parar)")
+        await executar_worker(args.worker, token, termos_aquecimento=termos)
+        return
+    
+    distribuidor = DistribuidorUpdates(token, estado, args.workers)
+    processos = []
+    if not args.dispatcher_only:
+        contexto = get_context('spawn')
+        processos = [
+            contexto.Process(target=worker_process, args=(indice, token, termos), name=f'worker-{indice}')
+            for indice in range(args.workers)
+        ]
+        for processo in processos:
+            processo.start()
+    print(f"🚀 Distribuindo updates entre {args.workers} workers "
+          f"({len(processos)} neste processo). Pressione Ctrl+C para parar")
+    try:
+        await distribuidor.executar()
+    finally:
+        distribuidor.parar()
+        for processo in processos:
+            processo.terminate()
+        for processo in processos:
+            processo.join(10)
+        print(f"✅ Updates distribuídos por worker: {distribuidor.distribuidos}")
+
+async def main(args=None):
     """Exemplo principal do PromoHunter com busca integrada."""
+    from services.telegram import TelegramBot
+    from services.product_search import ProductSearchService
+    from config.environments import Environments
+    from config.settings import get_config
     
     print("🤖 PromoHunter - Bot Telegram com Busca Integrada")
     print("=" * 55)
     
     try:
+        config = get_config()
         env = Environments()
         token = env.TELEGRAM_TOKEN.get_secret_value()
         
@@ -24,7 +89,16 @@ async def main():
             print('TELEGRAM_TOKEN="seu_token_aqui"')
             return
         
-        bot = TelegramBot(token)
+        if args is not None and (args.workers > 1 or args.worker is not None):
+            termos = (args.warmup_queries or config.WARMUP_QUERIES) if args.warmup else None
+            await scale_out(token, args, termos)
+            return
+        
+        product_search = ProductSearchService()
+        if args is not None and args.warmup:
+            await warmup(product_search, args.warmup_queries or config.WARMUP_QUERIES)
+        
+        bot = TelegramBot(token, product_search=product_search)
         
         bot_info = await bot.get_bot_info()
         print(f"🤖 Bot: {bot_info.get('first_name', 'PromoHunter')} (@{bot_info.get('username', 'seu_bot')})")
@@ -39,6 +113,7 @@ async def main():
         print("  • /start - Inicializar bot")
         print("  • /help - Ver ajuda completa")
         print("  • /buscar <produto> - Buscar produto específico")
+        print("  • /ofertas [categoria] - Melhores ofertas do dia")
         print("  • Ou digite diretamente: 'procuro smartphone'")
         
         print(f"\n🔥 Exemplos de uso:")
@@ -74,6 +149,47 @@ async def main():
         print(f"❌ Erro ao executar PromoHunter: {e}")
         traceback.print_exc()
 
+def parse_instante(texto, fim_do_dia=False):
+    """Converte uma data (2026-10-01) ou data e hora (2026-10-01T14:30) em timestamp.
+    
+    Com `fim_do_dia`, uma data sem hora vale até o fim daquele dia.
+    """
+    from datetime import datetime, timedelta
+    
+    instante = datetime.fromisoformat(texto)
+    if fim_do_dia and len(texto) <= 10:
+        instante += timedelta(days=1, microseconds=-1)
+    return instante.timestamp()
+
+def scan_exports(args):
+    """Lê as observações exportadas (EXPORT_DIR) e escreve as linhas em CSV, sem carregar os arquivos inteiros."""
+    import csv
+    from config.logger import BotLogger
+    
+    # A saída padrão pode ser o próprio CSV: os logs (inclusive os da carga da configuração) vão para stderr
+    BotLogger.use_console(sys.stderr)
+    from config.settings import get_config
+    from services.exportacao import NOMES_COLUNAS, ler_observacoes
+    
+    diretorio = args.export_dir or get_config().EXPORT_DIR
+    colunas = args.columns.split(',') if args.columns else list(NOMES_COLUNAS)
+    inicio = parse_instante(args.since) if args.since else None
+    fim = parse_instante(args.until, fim_do_dia=True) if args.until else None
+    observacoes = ler_observacoes(diretorio, colunas, inicio, fim)
+    
+    saida = open(args.output, 'w', newline='', encoding='utf-8') if args.output else sys.stdout
+    try:
+        escritor = csv.writer(saida)
+        escritor.writerow(colunas)
+        linhas = 0
+        for observacao in observacoes:
+            escritor.writerow([observacao[coluna] for coluna in colunas])
+            linhas += 1
+    finally:
+        if args.output:
+            saida.close()
+    print(f"✅ {linhas} observações lidas de {diretorio}", file=sys.stderr)
+
 def quick_test():
     """Teste rápido das funcionalidades."""
     print("🧪 Teste Rápido das Funcionalidades")
@@ -113,10 +229,45 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='PromoHunter - Bot Telegram Completo')
     parser.add_argument('--test', '-t', action='store_true', 
                        help='Executar apenas teste rápido')
+    parser.add_argument('--warmup', '-w', action='store_true',
+                       help='Aquecer conexões e pré-carregar o cache antes de iniciar o polling')
+    parser.add_argument('--warmup-queries', nargs='+', metavar='TERMO',
+                       help='Termos pré-carregados no aquecimento (padrão: WARMUP_QUERIES)')
+    
+    parser.add_argument('--workers', type=int, default=1, metavar='N',
+                       help='Distribuir os updates por chat entre N processos (exige SHARED_STATE_URL)')
+    parser.add_argument('--dispatcher-only', action='store_true',
+                       help='Com --workers: apenas distribuir (os workers rodam em outras máquinas)')
+    parser.add_argument('--worker', type=int, metavar='K',
+                       help='Rodar apenas o worker K (fila K, de 0 a N-1, com o mesmo --workers N do distribuidor)')
+    
+    parser.add_argument('--scan-exports', action='store_true',
+                       help='Ler as observações exportadas (EXPORT_DIR) e escrever em CSV')
+    parser.add_argument('--export-dir', metavar='PASTA',
+                       help='Com --scan-exports: pasta da exportação (padrão: EXPORT_DIR)')
+    parser.add_argument('--columns', metavar='COLUNAS',
+                       help='Com --scan-exports: colunas separadas por vírgula (ex: observed_at,store,price)')
+    parser.add_argument('--since', metavar='DATA',
+                       help='Com --scan-exports: observações a partir de DATA (ex: 2026-10-01 ou 2026-10-01T14:30)')
+    parser.add_argument('--until', metavar='DATA',
+                       help='Com --scan-exports: observações até DATA (uma data sem hora inclui o dia todo)')
+    parser.add_argument('--output', '-o', metavar='ARQUIVO',
+                       help='Com --scan-exports: arquivo CSV de saída (padrão: saída padrão)')
     
     args = parser.parse_args()
+    if args.workers < 1:
+        parser.error('--workers deve ser pelo menos 1')
+    if args.worker is not None and not 0 <= args.worker < args.workers:
+        # O distribuidor só alimenta as filas 0..N-1: fora disso o worker esperaria para sempre
+        parser.error(f'--worker deve estar entre 0 e {args.workers - 1} (--workers {args.workers})')
     
     if args.test:
         quick_test()
+    elif args.scan_exports:
+        try:
+            scan_exports(args)
+        except (ValueError, RuntimeError) as e:
+            print(f"❌ {e}", file=sys.stderr)
+            sys.exit(2)
     else:
-        asyncio.run(main())
+        asyncio.run(main(args))
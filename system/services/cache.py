@@ -0,0 +1,103 @@
+import math
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional
+
+from services.memoria import estimar_bytes
+
+
+class TTLCache:
+    """Cache LRU em memória com expiração por tempo, seguro para uso entre threads.
+
+    Usado para guardar resultados de busca: um termo repetido dentro do TTL é
+    respondido sem consultar as lojas.
+    """
+
+    def __init__(self, max_entries: int = 500, ttl: float = 300.0):
+        """
+        Args:
+            max_entries: Número máximo de entradas (as menos usadas são descartadas)
+            ttl: Tempo de vida de cada entrada, em segundos
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._dados: 'OrderedDict[Hashable, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, chave: Hashable) -> Optional[Any]:
+        """Retorna o valor armazenado ou None se ausente/expirado."""
+        with self._lock:
+            entrada = self._dados.get(chave)
+            if entrada is None or entrada[0] < time.monotonic():
+                if entrada is not None:
+                    del self._dados[chave]
+                self.misses += 1
+                return None
+            self._dados.move_to_end(chave)
+            self.hits += 1
+            return entrada[1]
+
+    def set(self, chave: Hashable, valor: Any, ttl: Optional[float] = None):
+        """Armazena um valor, descartando a entrada menos usada se o cache estiver cheio."""
+        expira_em = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._dados[chave] = (expira_em, valor)
+            self._dados.move_to_end(chave)
+            while len(self._dados) > self.max_entries:
+                self._dados.popitem(last=False)
+
+    def __contains__(self, chave: Hashable) -> bool:
+        with self._lock:
+            entrada = self._dados.get(chave)
+            return entrada is not None and entrada[0] >= time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._dados)
+
+    def bytes_aproximados(self) -> int:
+        """Tamanho estimado das entradas em bytes (amostra extrapolada; ver `services.memoria`)."""
+        with self._lock:
+            itens = list(self._dados.items())
+            tamanho = sys.getsizeof(self._dados)
+        return tamanho + estimar_bytes(itens)
+
+    def descartar(self, fracao: float) -> int:
+        """Descarta a fração `fracao` das entradas: primeiro as expiradas, depois as menos usadas.
+
+        Returns:
+            Entradas descartadas
+        """
+        with self._lock:
+            quantidade = math.ceil(len(self._dados) * fracao)
+            agora = time.monotonic()
+            expiradas = [chave for chave, (expira_em, _) in self._dados.items() if expira_em < agora][:quantidade]
+            for chave in expiradas:
+                del self._dados[chave]
+            menos_usadas = min(quantidade - len(expiradas), len(self._dados))
+            for _ in range(menos_usadas):
+                self._dados.popitem(last=False)
+            return len(expiradas) + menos_usadas
+
+    def conteudo(self) -> List[tuple]:
+        """Cópia rasa das entradas (chave, (expira_em, valor)), das menos às mais usadas."""
+        with self._lock:
+            return list(self._dados.items())
+
+    def clear(self):
+        """Remove todas as entradas."""
+        with self._lock:
+            self._dados.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de uso do cache."""
+        total = self.hits + self.misses
+        return {
+            'entries': len(self._dados),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0,
+        }
@@ -0,0 +1,197 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+from typing import Any, Callable, Dict, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+
+from config.logger import BotLogger
+from services.cache import TTLCache
+from services.memoria import NIVEL_DERIVADOS, get_governador
+from services.metricas import get_metricas
+
+
+def url_canonica(url: str) -> str:
+    """URL normalizada para uso como chave: esquema/host em minúsculas e parâmetros ordenados."""
+    preparada = requests.PreparedRequest()
+    preparada.prepare_url(url, None)
+    partes = urlsplit(preparada.url)
+    query = urlencode(sorted(parse_qsl(partes.query, keep_blank_values=True)))
+    return urlunsplit((partes.scheme.lower(), partes.netloc.lower(), partes.path, query, ''))
+
+
+class CacheHttp:
+    """Cache HTTP em disco com revalidação condicional (ETag/Last-Modified).
+
+    Guarda, por URL canônica, os validadores e o corpo comprimido de cada resposta.
+    Na próxima requisição à mesma URL são enviados `If-None-Match`/`If-Modified-Since`;
+    se a loja responder 304, o resultado já decodificado (mantido em memória) é
+    reaproveitado sem baixar nem decodificar o corpo de novo.
+    """
+
+    def __init__(self, diretorio: str, nome: str = 'http', max_bytes: int = 100 * 1024 * 1024,
+                 max_decodificados: int = 256):
+        """
+        Args:
+            diretorio: Pasta dos arquivos do cache (criada se não existir)
+            nome: Nome da loja (rótulo das métricas e subpasta)
+            max_bytes: Tamanho máximo em disco; os arquivos mais antigos são removidos ao exceder
+            max_decodificados: Resultados decodificados mantidos em memória
+        """
+        self.diretorio = os.path.join(diretorio, nome.lower())
+        self.nome = nome
+        self.max_bytes = max_bytes
+        self.logger = BotLogger(__name__).get_logger()
+        self.metricas = get_metricas()
+        os.makedirs(self.diretorio, exist_ok=True)
+
+        self._decodificados = TTLCache(max_decodificados, float('inf'))
+        get_governador().registrar(f'http_decoded_{nome.lower()}', self._decodificados, NIVEL_DERIVADOS)
+        self._lock = threading.Lock()
+        self._bytes_em_disco = sum(
+            entrada.stat().st_size for entrada in os.scandir(self.diretorio) if entrada.name.endswith('.cache')
+        )
+        self.contadores: Dict[str, int] = {
+            'revalidations': 0,
+            'hits': 0,
+            'misses': 0,
+            'bytes_saved': 0,
+        }
+        for contador, descricao in (
+            ('revalidations', 'Requisições condicionais enviadas'),
+            ('hits', 'Respostas 304 atendidas pelo cache'),
+            ('misses', 'Respostas 200 guardadas no cache'),
+            ('bytes_saved', 'Bytes de corpo não baixados graças a respostas 304'),
+        ):
+            self.metricas.descrever(f'http_cache_{contador}_total', descricao)
+
+    def _contar(self, nome: str, valor: int = 1):
+        with self._lock:
+            self.contadores[nome] += valor
+        self.metricas.incrementar(f'http_cache_{nome}_total', valor, store=self.nome)
+
+    def _arquivo(self, chave: str) -> str:
+        return os.path.join(self.diretorio, hashlib.sha256(chave.encode()).hexdigest() + '.cache')
+
+    def _ler(self, chave: str, com_corpo: bool = False) -> Tuple[Optional[Dict[str, Any]], Optional[bytes]]:
+        """Lê o cabeçalho (e, se pedido, o corpo descomprimido) de uma entrada."""
+        try:
+            with open(self._arquivo(chave), 'rb') as arquivo:
+                meta = json.loads(arquivo.readline())
+                corpo = zlib.decompress(arquivo.read()) if com_corpo else None
+        except (OSError, ValueError, zlib.error):
+            return None, None
+        if meta.get('url') != chave:
+            return None, None
+        return meta, corpo
+
+    def validadores(self, url: str) -> Dict[str, str]:
+        """Cabeçalhos condicionais para a URL (vazio se não houver entrada guardada)."""
+        chave = url_canonica(url)
+        em_memoria = self._decodificados.get(chave)
+        if em_memoria is not None:
+            etag, last_modified = em_memoria[0]
+        else:
+            # Entrada gravada antes de um reinício: só o cabeçalho do arquivo é lido
+            meta, _ = self._ler(chave)
+            if not meta:
+                return {}
+            etag, last_modified = meta.get('etag'), meta.get('last_modified')
+        cabecalhos = {}
+        if etag:
+            cabecalhos['If-None-Match'] = etag
+        if last_modified:
+            cabecalhos['If-Modified-Since'] = last_modified
+        if cabecalhos:
+            self._contar('revalidations')
+        return cabecalhos
+
+    def guardar(self, response: requests.Response, decodificado: Any):
+        """Guarda uma resposta 200 com validadores e o resultado da sua decodificação."""
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if not (etag or last_modified) or 'no-store' in response.headers.get('Cache-Control', ''):
+            return
+        chave = url_canonica(response.url)
+        corpo = zlib.compress(response.content, 6)
+        meta = {
+            'url': chave,
+            'etag': etag,
+            'last_modified': last_modified,
+            'size': len(response.content),
+            'stored_at': time.time(),
+        }
+        conteudo = json.dumps(meta).encode() + b'\n' + corpo
+
+        destino = self._arquivo(chave)
+        temporario = f"{destino}.{threading.get_ident()}.tmp"
+        try:
+            tamanho_anterior = os.path.getsize(destino) if os.path.exists(destino) else 0
+            with open(temporario, 'wb') as arquivo:
+                arquivo.write(conteudo)
+            os.replace(temporario, destino)
+        except OSError as e:
+            self.logger.warning("Falha ao gravar o cache HTTP de %s: %s", self.nome, e)
+            return
+
+        self._decodificados.set(chave, ((etag, last_modified), decodificado))
+        self._contar('misses')
+        with self._lock:
+            self._bytes_em_disco += len(conteudo) - tamanho_anterior
+            excedeu = self._bytes_em_disco > self.max_bytes
+        if excedeu:
+            self._podar()
+
+    def reaproveitar(self, response: requests.Response, decodificar: Callable[[bytes], Any]) -> Optional[Any]:
+        """Resultado guardado para uma resposta 304 (None se a entrada não existir mais).
+
+        Args:
+            response: A resposta 304
+            decodificar: Usado apenas se o resultado não estiver em memória (ex: após reiniciar)
+        """
+        chave = url_canonica(response.url)
+        em_memoria = self._decodificados.get(chave)
+        meta, corpo = self._ler(chave, com_corpo=em_memoria is None)
+        if meta is None:
+            return None
+
+        if em_memoria is not None and em_memoria[0] == (meta.get('etag'), meta.get('last_modified')):
+            decodificado = em_memoria[1]
+        else:
+            if corpo is None:
+                _, corpo = self._ler(chave, com_corpo=True)
+                if corpo is None:
+                    return None
+            decodificado = decodificar(corpo)
+            self._decodificados.set(chave, ((meta.get('etag'), meta.get('last_modified')), decodificado))
+
+        self._contar('hits')
+        self._contar('bytes_saved', meta.get('size', 0))
+        return decodificado
+
+    def _podar(self):
+        """Remove as entradas mais antigas até ocupar 90% de `max_bytes`."""
+        with self._lock:
+            entradas = sorted(
+                (entrada.stat().st_mtime, entrada.stat().st_size, entrada.path)
+                for entrada in os.scandir(self.diretorio) if entrada.name.endswith('.cache')
+            )
+            total = sum(tamanho for _, tamanho, _ in entradas)
+            for _, tamanho, caminho in entradas:
+                if total <= self.max_bytes * 0.9:
+                    break
+                try:
+                    os.remove(caminho)
+                    total -= tamanho
+                except OSError:
+                    pass
+            self._bytes_em_disco = total
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de revalidação/acerto e ocupação em disco."""
+        with self._lock:
+            return dict(self.contadores, disk_bytes=self._bytes_em_disco)
@@ -0,0 +1,581 @@
+"""
+Estado compartilhado entre processos (workers) do bot.
+
+Com um único processo, o cache de resultados, as buscas em andamento e o limitador
+de cada loja vivem em memória. Com vários workers, cada um teria os seus: o tráfego
+às lojas dobraria e uma busca feita por um worker não serviria aos outros. Este módulo
+define a interface de um backend de estado (chave/valor com expiração, trava
+"set if absent", contador por janela e filas) e duas implementações:
+
+- `EstadoLocal`: em memória, para um processo só (padrão);
+- `EstadoRedis`: qualquer servidor que fale o protocolo do Redis (RESP), com um
+  cliente mínimo sobre sockets da biblioteca padrão, sem dependências extras.
+
+`criar_estado` escolhe a implementação pela URL (`SHARED_STATE_URL`).
+"""
+
+import math
+import socket
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+from urllib.parse import unquote, urlsplit
+
+from config.logger import BotLogger
+from config.settings import get_config
+from services import json_projetado
+from services.memoria import estimar_bytes
+from services.metricas import get_metricas
+
+
+class EstadoIndisponivelError(Exception):
+    """O backend de estado compartilhado não respondeu (conexão recusada, timeout, erro do servidor)."""
+
+
+# Apaga a chave apenas se ela ainda guarda o valor esperado (trava liberada só pelo dono)
+SCRIPT_LIBERAR = "if redis.call('GET', KEYS[1]) == ARGV[1] then return redis.call('DEL', KEYS[1]) else return 0 end"
+
+
+class EstadoCompartilhado(ABC):
+    """Interface dos backends de estado. Chaves são `str`; valores, `bytes`."""
+
+    # True se o estado é visto por outros processos (e as chamadas podem ir à rede)
+    compartilhado = False
+
+    @abstractmethod
+    def get(self, chave: str) -> Optional[bytes]:
+        """Valor da chave, ou None se ausente/expirada."""
+
+    @abstractmethod
+    def set(self, chave: str, valor: bytes, ttl_s: Optional[float] = None):
+        """Grava o valor, com expiração opcional (segundos)."""
+
+    @abstractmethod
+    def set_se_ausente(self, chave: str, valor: bytes, ttl_s: float) -> bool:
+        """Grava o valor apenas se a chave não existir (trava). Retorna True se gravou."""
+
+    @abstractmethod
+    def delete(self, chave: str):
+        """Remove a chave (se existir)."""
+
+    @abstractmethod
+    def incrementar(self, chave: str, ttl_s: float) -> int:
+        """Soma 1 ao contador da chave (criado com 0 e expiração `ttl_s`) e retorna o novo valor."""
+
+    @abstractmethod
+    def empurrar(self, fila: str, valor: bytes):
+        """Acrescenta um item ao fim da fila."""
+
+    @abstractmethod
+    def retirar(self, fila: str, timeout_s: float) -> Optional[bytes]:
+        """Retira o primeiro item da fila, esperando até `timeout_s` (None se continuar vazia)."""
+
+    @abstractmethod
+    def liberar(self, chave: str, valor: bytes):
+        """Remove uma trava somente se ela ainda guarda `valor` (não apaga a trava de outro dono), atomicamente."""
+
+    def fechar(self):
+        """Libera conexões e recursos do backend."""
+
+    def stats(self) -> Dict[str, Any]:
+        """Tipo do backend e contadores de uso."""
+        return {'backend': type(self).__name__}
+
+
+class EstadoLocal(EstadoCompartilhado):
+    """Estado em memória do processo, com expiração por chave."""
+
+    # A cada tantas escritas, as chaves expiradas (ex: contadores de janelas passadas) são removidas
+    _VARRER_A_CADA = 1000
+
+    def __init__(self):
+        self._dados: Dict[str, Tuple[Optional[float], Any]] = {}
+        self._filas: Dict[str, Deque[bytes]] = {}
+        self._cond = threading.Condition()
+        self._escritas = 0
+
+    def _vivo(self, chave: str, agora: float) -> Optional[Any]:
+        entrada = self._dados.get(chave)
+        if entrada is None:
+            return None
+        expira_em, valor = entrada
+        if expira_em is not None and expira_em <= agora:
+            del self._dados[chave]
+            return None
+        return valor
+
+    def _gravar(self, chave: str, valor: Any, ttl_s: Optional[float], agora: float):
+        self._dados[chave] = (agora + ttl_s if ttl_s is not None else None, valor)
+        self._escritas += 1
+        if self._escritas % self._VARRER_A_CADA == 0:
+            for expirada in [c for c, (expira_em, _) in self._dados.items()
+                             if expira_em is not None and expira_em <= agora]:
+                del self._dados[expirada]
+
+    def get(self, chave: str) -> Optional[bytes]:
+        with self._cond:
+            return self._vivo(chave, time.monotonic())
+
+    def set(self, chave: str, valor: bytes, ttl_s: Optional[float] = None):
+        with self._cond:
+            self._gravar(chave, valor, ttl_s, time.monotonic())
+
+    def set_se_ausente(self, chave: str, valor: bytes, ttl_s: float) -> bool:
+        with self._cond:
+            agora = time.monotonic()
+            if self._vivo(chave, agora) is not None:
+                return False
+            self._gravar(chave, valor, ttl_s, agora)
+            return True
+
+    def delete(self, chave: str):
+        with self._cond:
+            self._dados.pop(chave, None)
+
+    def liberar(self, chave: str, valor: bytes):
+        with self._cond:
+            if self._vivo(chave, time.monotonic()) == valor:
+                del self._dados[chave]
+
+    def incrementar(self, chave: str, ttl_s: float) -> int:
+        with self._cond:
+            agora = time.monotonic()
+            atual = self._vivo(chave, agora)
+            if atual is None:
+                self._gravar(chave, 1, ttl_s, agora)
+                return 1
+            expira_em = self._dados[chave][0]
+            self._dados[chave] = (expira_em, atual + 1)
+            return atual + 1
+
+    def empurrar(self, fila: str, valor: bytes):
+        with self._cond:
+            self._filas.setdefault(fila, deque()).append(valor)
+            self._cond.notify_all()
+
+    def retirar(self, fila: str, timeout_s: float) -> Optional[bytes]:
+        prazo = time.monotonic() + timeout_s
+        with self._cond:
+            while True:
+                itens = self._filas.get(fila)
+                if itens:
+                    return itens.popleft()
+                restante = prazo - time.monotonic()
+                if restante <= 0:
+                    return None
+                self._cond.wait(restante)
+
+    def itens_com_prefixo(self, prefixo: str) -> List[Tuple[str, Tuple[Optional[float], Any]]]:
+        """Cópia rasa das entradas cujas chaves começam com `prefixo` (chave, (expira_em, valor))."""
+        with self._cond:
+            return [(chave, entrada) for chave, entrada in self._dados.items() if chave.startswith(prefixo)]
+
+    def descartar_com_prefixo(self, prefixo: str, fracao: float) -> int:
+        """
+        Remove a fração `fracao` das chaves com o prefixo, as que expiram primeiro antes.
+
+        Returns:
+            Chaves removidas
+        """
+        with self._cond:
+            chaves = sorted(
+                (entrada[0] if entrada[0] is not None else float('inf'), chave)
+                for chave, entrada in self._dados.items() if chave.startswith(prefixo)
+            )
+            removidas = chaves[:math.ceil(len(chaves) * fracao)]
+            for _, chave in removidas:
+                del self._dados[chave]
+            return len(removidas)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {'backend': 'memory', 'keys': len(self._dados),
+                    'queued': sum(len(itens) for itens in self._filas.values())}
+
+
+class _ConexaoFechada(ConnectionError):
+    """A conexão caiu no envio ou antes da primeira resposta (ex: conexão ociosa encerrada pelo servidor)."""
+
+
+class _ConexaoRedis:
+    """Uma conexão RESP: envia comandos (em pipeline) e lê as respostas."""
+
+    def __init__(self, host: str, porta: int, timeout_s: float):
+        self.socket = socket.create_connection((host, porta), timeout=timeout_s)
+        self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.arquivo = self.socket.makefile('rb')
+        self.timeout_s = timeout_s
+
+    @staticmethod
+    def _codificar(partes: Tuple[Any, ...]) -> bytes:
+        saida = [b'*%d\r\n' % len(partes)]
+        for parte in partes:
+            if not isinstance(parte, bytes):
+                parte = str(parte).encode()
+            saida.append(b'$%d\r\n%s\r\n' % (len(parte), parte))
+        return b''.join(saida)
+
+    def _ler(self) -> Any:
+        linha = self.arquivo.readline()
+        if not linha:
+            raise ConnectionResetError('conexão fechada pelo servidor')
+        tipo, conteudo = linha[:1], linha[1:-2]
+        if tipo == b'+':
+            return conteudo.decode()
+        if tipo == b':':
+            return int(conteudo)
+        if tipo == b'$':
+            tamanho = int(conteudo)
+            if tamanho < 0:
+                return None
+            dados = self.arquivo.read(tamanho + 2)
+            return dados[:-2]
+        if tipo == b'*':
+            tamanho = int(conteudo)
+            return None if tamanho < 0 else [self._ler() for _ in range(tamanho)]
+        if tipo == b'-':
+            return EstadoIndisponivelError(conteudo.decode(errors='replace'))
+        raise ConnectionError(f'resposta RESP inválida: {linha[:40]!r}')
+
+    def executar(self, comandos: List[Tuple[Any, ...]], timeout_s: Optional[float] = None) -> List[Any]:
+        """
+        Raises:
+            _ConexaoFechada: A conexão caiu antes de qualquer resposta (pode ser refeita em outra)
+            OSError: Demais falhas, inclusive timeout: os comandos podem já ter sido executados
+        """
+        self.socket.settimeout(timeout_s or self.timeout_s)
+        respostas: List[Any] = []
+        try:
+            self.socket.sendall(b''.join(self._codificar(c) for c in comandos))
+            for _ in comandos:
+                respostas.append(self._ler())
+            return respostas
+        except (BrokenPipeError, ConnectionResetError, ConnectionAbortedError) as e:
+            if respostas:
+                raise
+            raise _ConexaoFechada(str(e)) from e
+        finally:
+            self.socket.settimeout(self.timeout_s)
+
+    def fechar(self):
+        try:
+            self.arquivo.close()
+            self.socket.close()
+        except OSError:
+            pass
+
+
+class EstadoRedis(EstadoCompartilhado):
+    """Estado em um servidor Redis (ou compatível com o protocolo RESP).
+
+    Cada thread pega uma conexão do pool, executa os comandos e a devolve. Comandos
+    de uma mesma operação são enviados juntos (pipeline), em uma ida e volta.
+    """
+
+    compartilhado = True
+
+    def __init__(self, url: str, prefixo: str = '', timeout_s: float = 2.0, max_conexoes: int = 32):
+        """
+        Args:
+            url: `redis://[:senha@]host[:porta][/db]`
+            prefixo: Prefixo de todas as chaves (separa instalações no mesmo servidor)
+            timeout_s: Timeout de conexão e de cada comando
+            max_conexoes: Conexões ociosas mantidas no pool
+        """
+        partes = urlsplit(url)
+        if partes.scheme != 'redis':
+            raise ValueError(f"URL de estado não suportada: {url!r}")
+        self.host = partes.hostname or '127.0.0.1'
+        self.porta = partes.port or 6379
+        self.senha = unquote(partes.password) if partes.password else None
+        self.db = int(partes.path.lstrip('/') or 0)
+        self.prefixo = prefixo
+        self.timeout_s = timeout_s
+        self.max_conexoes = max_conexoes
+        self.logger = BotLogger(__name__).get_logger()
+        self.metricas = get_metricas()
+        self._ociosas: List[_ConexaoRedis] = []
+        self._lock = threading.Lock()
+        self.contadores: Dict[str, int] = {'commands': 0, 'round_trips': 0, 'errors': 0, 'connections': 0}
+        self.metricas.descrever('shared_state_round_trips_total', 'Idas e voltas ao backend de estado compartilhado')
+        self.metricas.descrever('shared_state_errors_total', 'Falhas de comunicação com o backend de estado compartilhado')
+
+    def _conectar(self) -> _ConexaoRedis:
+        conexao = _ConexaoRedis(self.host, self.porta, self.timeout_s)
+        iniciais: List[Tuple[Any, ...]] = []
+        if self.senha:
+            iniciais.append(('AUTH', self.senha))
+        if self.db:
+            iniciais.append(('SELECT', self.db))
+        for resposta in conexao.executar(iniciais) if iniciais else []:
+            if isinstance(resposta, Exception):
+                conexao.fechar()
+                raise resposta
+        with self._lock:
+            self.contadores['connections'] += 1
+        return conexao
+
+    def _executar(self, *comandos: Tuple[Any, ...], timeout_s: Optional[float] = None) -> List[Any]:
+        """Envia os comandos em pipeline e retorna as respostas, na ordem.
+
+        Raises:
+            EstadoIndisponivelError: Falha de rede ou erro devolvido pelo servidor
+        """
+        with self._lock:
+            conexao = self._ociosas.pop() if self._ociosas else None
+            self.contadores['commands'] += len(comandos)
+            self.contadores['round_trips'] += 1
+        # Uma conexão ociosa pode ter sido fechada pelo servidor: ela é trocada por uma nova uma vez,
+        # só se caiu antes de qualquer resposta. Depois de um timeout os comandos podem já ter sido
+        # executados, e reenviar um RPUSH ou INCR o repetiria
+        for tentativa in range(2):
+            reaproveitada = conexao is not None
+            try:
+                if conexao is None:
+                    conexao = self._conectar()
+                respostas = conexao.executar(list(comandos), timeout_s)
+                break
+            except (OSError, ConnectionError, EstadoIndisponivelError) as e:
+                if conexao is not None:
+                    conexao.fechar()
+                    conexao = None
+                if reaproveitada and tentativa == 0 and isinstance(e, _ConexaoFechada):
+                    continue
+                with self._lock:
+                    self.contadores['errors'] += 1
+                self.metricas.incrementar('shared_state_errors_total')
+                raise EstadoIndisponivelError(f"{self.host}:{self.porta}: {e}") from e
+
+        with self._lock:
+            if len(self._ociosas) < self.max_conexoes:
+                self._ociosas.append(conexao)
+                conexao = None
+        if conexao is not None:
+            conexao.fechar()
+        self.metricas.incrementar('shared_state_round_trips_total')
+
+        for resposta in respostas:
+            if isinstance(resposta, Exception):
+                with self._lock:
+                    self.contadores['errors'] += 1
+                self.metricas.incrementar('shared_state_errors_total')
+                raise resposta
+        return respostas
+
+    def _k(self, chave: str) -> str:
+        return self.prefixo + chave
+
+    @staticmethod
+    def _ms(ttl_s: float) -> int:
+        return max(1, int(ttl_s * 1000))
+
+    def get(self, chave: str) -> Optional[bytes]:
+        return self._executar(('GET', self._k(chave)))[0]
+
+    def set(self, chave: str, valor: bytes, ttl_s: Optional[float] = None):
+        if ttl_s is None:
+            self._executar(('SET', self._k(chave), valor))
+        else:
+            self._executar(('SET', self._k(chave), valor, 'PX', self._ms(ttl_s)))
+
+    def set_se_ausente(self, chave: str, valor: bytes, ttl_s: float) -> bool:
+        return self._executar(('SET', self._k(chave), valor, 'PX', self._ms(ttl_s), 'NX'))[0] is not None
+
+    def delete(self, chave: str):
+        self._executar(('DEL', self._k(chave)))
+
+    def liberar(self, chave: str, valor: bytes):
+        # Comparar e apagar no servidor: entre um GET e um DEL a trava poderia expirar e passar a outro worker
+        self._executar(('EVAL', SCRIPT_LIBERAR, 1, self._k(chave), valor))
+
+    def incrementar(self, chave: str, ttl_s: float) -> int:
+        # Cria o contador com expiração (sem efeito se já existir) e incrementa, numa ida e volta
+        chave = self._k(chave)
+        _, valor = self._executar(('SET', chave, 0, 'PX', self._ms(ttl_s), 'NX'), ('INCR', chave))
+        return valor
+
+    def empurrar(self, fila: str, valor: bytes):
+        self._executar(('RPUSH', self._k(fila), valor))
+
+    def retirar(self, fila: str, timeout_s: float) -> Optional[bytes]:
+        # BLPOP aceita segundos fracionários; o socket espera um pouco mais que o servidor
+        resposta = self._executar(('BLPOP', self._k(fila), f'{timeout_s:.3f}'),
+                                  timeout_s=timeout_s + self.timeout_s)[0]
+        return resposta[1] if resposta else None
+
+    def fechar(self):
+        with self._lock:
+            ociosas, self._ociosas = self._ociosas, []
+        for conexao in ociosas:
+            conexao.fechar()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.contadores, backend='redis', server=f'{self.host}:{self.porta}',
+                        idle_connections=len(self._ociosas))
+
+
+def criar_estado(url: str = '', prefixo: str = '') -> EstadoCompartilhado:
+    """
+    Cria o backend de estado indicado pela URL.
+
+    Args:
+        url: Vazio ou `memory://` para o estado em memória; `redis://...` para um servidor RESP
+        prefixo: Prefixo das chaves no servidor
+
+    Raises:
+        ValueError: Se o esquema da URL não for suportado
+    """
+    if not url or url.startswith('memory://'):
+        return EstadoLocal()
+    return EstadoRedis(url, prefixo=prefixo)
+
+
+_estado: Optional[EstadoCompartilhado] = None
+_estado_lock = threading.Lock()
+
+
+def get_estado() -> EstadoCompartilhado:
+    """Retorna o backend de estado do processo (SHARED_STATE_URL), criando-o no primeiro uso."""
+    global _estado
+    if _estado is None:
+        with _estado_lock:
+            if _estado is None:
+                config = get_config()
+                _estado = criar_estado(config.SHARED_STATE_URL, config.SHARED_STATE_PREFIX)
+    return _estado
+
+
+class CacheCompartilhado:
+    """Cache de resultados de busca no backend de estado, visto por todos os workers.
+
+    Mesma interface usada de `TTLCache` (`get`, `set`, `ttl`, `stats`); os valores
+    são guardados em JSON. Falhas do backend contam como ausência no cache.
+    """
+
+    def __init__(self, estado: EstadoCompartilhado, ttl: float = 300.0, prefixo: str = 'busca:'):
+        """
+        Args:
+            estado: Backend de estado compartilhado
+            ttl: Tempo de vida de cada entrada, em segundos
+            prefixo: Prefixo das chaves deste cache no backend
+        """
+        self.estado = estado
+        self.ttl = ttl
+        self.prefixo = prefixo
+        self.logger = BotLogger(__name__).get_logger()
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def get(self, chave: str) -> Optional[Any]:
+        """Retorna o valor armazenado ou None se ausente/expirado (ou se o backend falhar)."""
+        try:
+            dados = self.estado.get(self.prefixo + chave)
+        except EstadoIndisponivelError as e:
+            self.logger.warning("Cache compartilhado indisponível: %s", e)
+            self.errors += 1
+            dados = None
+        if dados is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json_projetado.carregar(dados)
+
+    def set(self, chave: str, valor: Any, ttl: Optional[float] = None):
+        """Armazena um valor por `ttl` segundos (padrão: o TTL do cache)."""
+        try:
+            self.estado.set(self.prefixo + chave, json_projetado.serializar(valor), self.ttl if ttl is None else ttl)
+        except EstadoIndisponivelError as e:
+            self.logger.warning("Cache compartilhado indisponível: %s", e)
+            self.errors += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de uso do cache."""
+        total = self.hits + self.misses
+        return {
+            'backend': self.estado.stats().get('backend'),
+            'hits': self.hits,
+            'misses': self.misses,
+            'errors': self.errors,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+class SessoesChat:
+    """Sessão de cada chat (últimas buscas e preferências), guardada no estado compartilhado.
+
+    Qualquer worker que receba o próximo update do chat encontra a mesma sessão.
+    """
+
+    def __init__(self, estado: EstadoCompartilhado, ttl_s: float = 86400.0):
+        """
+        Args:
+            estado: Backend de estado
+            ttl_s: Validade da sessão desde a última alteração
+        """
+        self.estado = estado
+        self.ttl_s = ttl_s
+        self.logger = BotLogger(__name__).get_logger()
+
+    def get(self, chat_id: int) -> Dict[str, Any]:
+        """Sessão do chat (vazia se não houver ou se o backend falhar)."""
+        try:
+            dados = self.estado.get(f'sessao:{chat_id}')
+        except EstadoIndisponivelError as e:
+            self.logger.warning("Sessões indisponíveis: %s", e)
+            return {}
+        return json_projetado.carregar(dados) if dados else {}
+
+    def atualizar(self, chat_id: int, **campos) -> Dict[str, Any]:
+        """Grava os campos na sessão do chat e renova a validade.
+
+        Returns:
+            A sessão atualizada
+        """
+        sessao = self.get(chat_id)
+        sessao.update(campos)
+        try:
+            self.estado.set(f'sessao:{chat_id}', json_projetado.serializar(sessao), self.ttl_s)
+        except EstadoIndisponivelError as e:
+            self.logger.warning("Sessões indisponíveis: %s", e)
+        return sessao
+
+    def incrementar(self, chat_id: int, campo: str) -> Optional[int]:
+        """
+        Soma 1 a um contador do chat, atomicamente no backend (sem perder incrementos de workers simultâneos).
+
+        O contador fica em uma chave própria (`sessao:<chat>:<campo>`), com a validade da sessão
+        contada a partir do primeiro incremento.
+
+        Returns:
+            O novo valor, ou None se o backend falhar
+        """
+        try:
+            return self.estado.incrementar(f'sessao:{chat_id}:{campo}', self.ttl_s)
+        except EstadoIndisponivelError as e:
+            self.logger.warning("Sessões indisponíveis: %s", e)
+            return None
+
+    @property
+    def em_memoria(self) -> bool:
+        """Indica se as sessões ficam na memória deste processo (estado local), e contam no orçamento."""
+        return isinstance(self.estado, EstadoLocal)
+
+    def bytes_aproximados(self) -> int:
+        """Tamanho estimado das sessões guardadas no estado local, em bytes."""
+        return estimar_bytes(self.conteudo())
+
+    def descartar(self, fracao: float) -> int:
+        """Apaga a fração `fracao` das sessões do estado local, as alteradas há mais tempo primeiro.
+
+        Returns:
+            Sessões apagadas
+        """
+        return self.estado.descartar_com_prefixo('sessao:', fracao)
+
+    def conteudo(self) -> List[Tuple[str, Any]]:
+        """Cópia rasa das sessões do estado local."""
+        return self.estado.itens_com_prefixo('sessao:')
@@ -0,0 +1,427 @@
+"""
+Exportação das observações de produtos (preço, desconto, avaliação) para análise offline.
+
+Cada produto normalizado que chega das lojas vira uma linha com o instante e o
+termo da busca. `registrar` só enfileira (O(1), sem I/O): uma thread própria
+converte as observações em lotes de colunas de até `lote_max` linhas e grava cada
+lote no arquivo aberto, que é trocado por outro ao passar de `arquivo_max_bytes`
+ou de `arquivo_max_s`. Se a fila encher (disco lento ou parado), as observações
+novas são descartadas e contadas, em vez de segurar as buscas.
+
+Formato: Parquet (um row group por lote, via `pyarrow`, opcional) ou, sem ele, CSV
+comprimido com gzip (um membro gzip por lote). O arquivo em escrita tem o sufixo
+`.part`; ao ser fechado, é renomeado com o intervalo de tempo que contém
+(`observacoes-<inicio>-<fim>-<pid>-<sequência>.parquet`), e só então aparece para `ler_observacoes`.
+
+`ler_observacoes` percorre os arquivos sem carregá-los inteiros: descarta pelo nome
+os arquivos fora do intervalo pedido, lê só as colunas pedidas (no Parquet, também
+pula os row groups fora do intervalo pelas estatísticas) e devolve uma linha por vez.
+"""
+
+import atexit
+import csv
+import glob
+import gzip
+import importlib.util
+import io
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from config.logger import BotLogger
+from config.settings import get_config
+from services.filtros import preco_numerico
+from services.metricas import get_metricas
+
+# O pyarrow (opcional) é pesado: só é importado ao escrever ou ler um arquivo Parquet
+FORMATOS = ('parquet', 'csv') if importlib.util.find_spec('pyarrow') is not None else ('csv',)
+
+# Colunas de cada observação e seus tipos ('float', 'int', 'bool' ou 'str')
+COLUNAS: Tuple[Tuple[str, str], ...] = (
+    ('observed_at', 'float'),
+    ('search_term', 'str'),
+    ('store', 'str'),
+    ('id', 'str'),
+    ('name', 'str'),
+    ('brand', 'str'),
+    ('price', 'float'),
+    ('full_price', 'float'),
+    ('discount', 'float'),
+    ('availability', 'bool'),
+    ('rating_average', 'float'),
+    ('rating_count', 'int'),
+    ('url', 'str'),
+)
+NOMES_COLUNAS = tuple(nome for nome, _ in COLUNAS)
+_TIPOS = dict(COLUNAS)
+_EXTENSOES = {'parquet': '.parquet', 'csv': '.csv.gz'}
+_PREFIXO = 'observacoes-'
+_FORMATO_DATA = '%Y%m%dT%H%M%S'
+
+
+def _observacao(produto: Dict[str, Any], termo: str, agora: float) -> Tuple[Any, ...]:
+    """Linha (na ordem de `COLUNAS`) de um produto normalizado."""
+    rating = produto.get('rating') or {}
+    return (
+        agora,
+        termo,
+        str(produto.get('store', '')),
+        str(produto.get('id', '')),
+        str(produto.get('name', '')),
+        str(produto.get('brand', '')),
+        preco_numerico(produto.get('price', 0)),
+        preco_numerico(produto.get('full_price', 0)),
+        preco_numerico(produto.get('discount', 0)),
+        bool(produto.get('availability', False)),
+        preco_numerico(rating.get('average', 0)),
+        int(rating.get('count', 0) or 0),
+        str(produto.get('url', '')),
+    )
+
+
+def _converter(valor: str, tipo: str) -> Any:
+    """Valor lido do CSV no tipo da coluna."""
+    if tipo == 'float':
+        return float(valor) if valor else 0.0
+    if tipo == 'int':
+        return int(valor) if valor else 0
+    if tipo == 'bool':
+        return valor == '1'
+    return valor
+
+
+class _EscritorCsv:
+    """Arquivo `.csv.gz`: cabeçalho no início e um membro gzip por lote."""
+
+    def __init__(self, caminho: str):
+        self.caminho = caminho
+        self._arquivo = open(caminho, 'wb')
+        self._gravar([NOMES_COLUNAS])
+
+    def _gravar(self, linhas: Iterable[Sequence[Any]]):
+        texto = io.StringIO()
+        csv.writer(texto, lineterminator='\n').writerows(linhas)
+        self._arquivo.write(gzip.compress(texto.getvalue().encode('utf-8'), compresslevel=6))
+        self._arquivo.flush()
+
+    def escrever(self, linhas: List[Tuple[Any, ...]]):
+        self._gravar(
+            [int(v) if isinstance(v, bool) else v for v in linha] for linha in linhas
+        )
+
+    def tamanho(self) -> int:
+        return self._arquivo.tell()
+
+    def fechar(self):
+        self._arquivo.close()
+
+
+class _EscritorParquet:
+    """Arquivo `.parquet`: um row group por lote."""
+
+    _TIPOS_ARROW = {'float': 'float64', 'int': 'int64', 'bool': 'bool_', 'str': 'string'}
+
+    def __init__(self, caminho: str):
+        import pyarrow
+        import pyarrow.parquet as parquet
+
+        self.pyarrow = pyarrow
+        self.caminho = caminho
+        self.esquema = pyarrow.schema([(nome, getattr(pyarrow, self._TIPOS_ARROW[tipo])()) for nome, tipo in COLUNAS])
+        self._escritor = parquet.ParquetWriter(caminho, self.esquema, compression='zstd')
+
+    def escrever(self, linhas: List[Tuple[Any, ...]]):
+        colunas = list(zip(*linhas))
+        self._escritor.write_table(self.pyarrow.Table.from_arrays(
+            [self.pyarrow.array(valores, type=self.esquema.field(i).type) for i, valores in enumerate(colunas)],
+            schema=self.esquema,
+        ))
+
+    def tamanho(self) -> int:
+        return os.path.getsize(self.caminho)
+
+    def fechar(self):
+        self._escritor.close()
+
+
+class ExportadorObservacoes:
+    """Grava as observações de produtos em arquivos colunares rotativos, em uma thread própria."""
+
+    def __init__(self, diretorio: str, formato: Optional[str] = None, lote_max: int = 5000,
+                 arquivo_max_bytes: int = 64 * 1024 * 1024, arquivo_max_s: float = 3600,
+                 intervalo_gravacao_s: float = 5.0, fila_max: int = 1000):
+        """
+        Args:
+            diretorio: Pasta dos arquivos (criada se não existir)
+            formato: 'parquet' ou 'csv' (padrão: Parquet se o `pyarrow` estiver instalado)
+            lote_max: Linhas por lote gravado (row group no Parquet, membro gzip no CSV)
+            arquivo_max_bytes: Tamanho a partir do qual o arquivo é fechado e outro é aberto
+            arquivo_max_s: Idade a partir da qual o arquivo é fechado e outro é aberto
+            intervalo_gravacao_s: Espera máxima para gravar um lote incompleto
+            fila_max: Buscas aguardando gravação; acima disso as observações são descartadas
+
+        Raises:
+            ValueError: Se o formato não estiver disponível
+        """
+        formato = formato or FORMATOS[0]
+        if formato not in FORMATOS:
+            raise ValueError(f"Formato de exportação indisponível: {formato} (disponíveis: {', '.join(FORMATOS)})")
+        os.makedirs(diretorio, exist_ok=True)
+        self.diretorio = diretorio
+        self.formato = formato
+        self.lote_max = lote_max
+        self.arquivo_max_bytes = arquivo_max_bytes
+        self.arquivo_max_s = arquivo_max_s
+        self.intervalo_gravacao_s = intervalo_gravacao_s
+        self.logger = BotLogger(__name__).get_logger()
+        self.metricas = get_metricas()
+        self.metricas.descrever('export_rows_total', 'Observações de produtos gravadas nos arquivos de exportação')
+        self.metricas.descrever('export_dropped_total', 'Observações descartadas com a fila de exportação cheia')
+        self.metricas.descrever('export_files_total', 'Arquivos de exportação concluídos')
+        self._fila: 'queue.Queue[Optional[Tuple[float, str, List[Dict[str, Any]]]]]' = queue.Queue(fila_max)
+        self._escritor = None
+        self._inicio_arquivo: Optional[float] = None
+        self._fim_arquivo: Optional[float] = None
+        self._aberto_em = 0.0
+        self._sequencia = 0
+        self._lock = threading.Lock()
+        self.contadores: Dict[str, int] = {'rows': 0, 'batches': 0, 'files': 0, 'dropped': 0, 'errors': 0}
+        self._thread = threading.Thread(target=self._laco, name='exportador', daemon=True)
+        self._thread.start()
+
+    def registrar(self, produtos: List[Dict[str, Any]], termo: str, agora: Optional[float] = None):
+        """
+        Enfileira as observações de uma busca (sem I/O; descarta se a fila estiver cheia).
+
+        Args:
+            produtos: Produtos normalizados recém-chegados das lojas
+            termo: Termo da busca
+            agora: Instante da observação (padrão: agora)
+        """
+        if not produtos:
+            return
+        try:
+            self._fila.put_nowait((time.time() if agora is None else agora, termo, produtos))
+        except queue.Full:
+            with self._lock:
+                self.contadores['dropped'] += len(produtos)
+            self.metricas.incrementar('export_dropped_total', len(produtos))
+
+    def _laco(self):
+        pendentes: List[Tuple[Any, ...]] = []
+        prazo = time.monotonic() + self.intervalo_gravacao_s
+        while True:
+            try:
+                item = self._fila.get(timeout=max(0.0, prazo - time.monotonic()))
+            except queue.Empty:
+                item = ()
+            if item is None:
+                break
+            if item:
+                agora, termo, produtos = item
+                pendentes.extend(_observacao(produto, termo, agora) for produto in produtos)
+            while len(pendentes) >= self.lote_max:
+                self._gravar(pendentes[:self.lote_max])
+                del pendentes[:self.lote_max]
+            if time.monotonic() >= prazo:
+                if pendentes:
+                    self._gravar(pendentes)
+                    pendentes = []
+                self._rotacionar_se_preciso()
+                prazo = time.monotonic() + self.intervalo_gravacao_s
+        if pendentes:
+            self._gravar(pendentes)
+        self._fechar_arquivo()
+
+    def _gravar(self, linhas: List[Tuple[Any, ...]]):
+        try:
+            if self._escritor is None:
+                self._abrir_arquivo(linhas[0][0])
+            self._escritor.escrever(linhas)
+        except Exception as e:
+            self.logger.error("Erro ao gravar %d observações: %s", len(linhas), e)
+            with self._lock:
+                self.contadores['errors'] += 1
+            return
+        self._fim_arquivo = max(self._fim_arquivo or 0.0, max(linha[0] for linha in linhas))
+        with self._lock:
+            self.contadores['rows'] += len(linhas)
+            self.contadores['batches'] += 1
+        self.metricas.incrementar('export_rows_total', len(linhas))
+        self._rotacionar_se_preciso()
+
+    def _abrir_arquivo(self, inicio: float):
+        self._inicio_arquivo = inicio
+        self._fim_arquivo = inicio
+        self._aberto_em = time.monotonic()
+        self._sequencia += 1
+        nome = f"{_PREFIXO}{datetime.fromtimestamp(inicio).strftime(_FORMATO_DATA)}-{os.getpid()}-{self._sequencia}"
+        caminho = os.path.join(self.diretorio, nome + _EXTENSOES[self.formato] + '.part')
+        self._escritor = _EscritorParquet(caminho) if self.formato == 'parquet' else _EscritorCsv(caminho)
+
+    def _rotacionar_se_preciso(self):
+        if self._escritor is None:
+            return
+        if (self._escritor.tamanho() >= self.arquivo_max_bytes
+                or time.monotonic() - self._aberto_em >= self.arquivo_max_s):
+            self._fechar_arquivo()
+
+    def _fechar_arquivo(self):
+        """Fecha o arquivo atual e o renomeia com o intervalo de tempo das observações."""
+        if self._escritor is None:
+            return
+        escritor, self._escritor = self._escritor, None
+        try:
+            escritor.fechar()
+            inicio = datetime.fromtimestamp(self._inicio_arquivo).strftime(_FORMATO_DATA)
+            # O fim é arredondado para cima: o nome sempre cobre a última observação
+            fim = datetime.fromtimestamp(int(self._fim_arquivo) + 1).strftime(_FORMATO_DATA)
+            final = os.path.join(self.diretorio,
+                                 f"{_PREFIXO}{inicio}-{fim}-{os.getpid()}-{self._sequencia}{_EXTENSOES[self.formato]}")
+            os.replace(escritor.caminho, final)
+        except Exception as e:
+            self.logger.error("Erro ao concluir o arquivo de exportação %s: %s", escritor.caminho, e)
+            with self._lock:
+                self.contadores['errors'] += 1
+            return
+        with self._lock:
+            self.contadores['files'] += 1
+        self.metricas.incrementar('export_files_total')
+
+    def fechar(self, timeout: Optional[float] = 10.0):
+        """Grava o que estiver na fila, conclui o arquivo aberto e encerra a thread."""
+        if not self._thread.is_alive():
+            return
+        self._fila.put(None)
+        self._thread.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        """Formato, linhas e arquivos gravados, descartes e o tamanho da fila."""
+        with self._lock:
+            return dict(self.contadores, format=self.formato, queued=self._fila.qsize())
+
+
+def _intervalo_do_nome(caminho: str) -> Optional[Tuple[float, float]]:
+    """Instantes de início e fim gravados no nome de um arquivo concluído."""
+    partes = os.path.basename(caminho)[len(_PREFIXO):].split('-')
+    try:
+        return (datetime.strptime(partes[0], _FORMATO_DATA).timestamp(),
+                datetime.strptime(partes[1], _FORMATO_DATA).timestamp())
+    except (IndexError, ValueError):
+        return None
+
+
+def arquivos_exportados(diretorio: str, inicio: Optional[float] = None,
+                        fim: Optional[float] = None) -> List[str]:
+    """Arquivos concluídos da exportação que podem ter observações em [inicio, fim], em ordem de tempo."""
+    caminhos = []
+    for extensao in _EXTENSOES.values():
+        for caminho in glob.glob(os.path.join(diretorio, _PREFIXO + '*' + extensao)):
+            intervalo = _intervalo_do_nome(caminho)
+            if intervalo is None:
+                continue
+            if (inicio is not None and intervalo[1] < inicio) or (fim is not None and intervalo[0] > fim):
+                continue
+            caminhos.append((intervalo[0], caminho))
+    return [caminho for _, caminho in sorted(caminhos)]
+
+
+def _ler_csv(caminho: str, colunas: Sequence[str], inicio: Optional[float],
+             fim: Optional[float]) -> Iterator[Dict[str, Any]]:
+    with gzip.open(caminho, 'rt', encoding='utf-8', newline='') as arquivo:
+        leitor = csv.reader(arquivo)
+        cabecalho = next(leitor, None)
+        if cabecalho is None:
+            return
+        indices = [(nome, cabecalho.index(nome), _TIPOS[nome]) for nome in colunas]
+        tempo = cabecalho.index('observed_at')
+        filtrar = inicio is not None or fim is not None
+        for linha in leitor:
+            if filtrar:
+                instante = float(linha[tempo])
+                if (inicio is not None and instante < inicio) or (fim is not None and instante > fim):
+                    continue
+            yield {nome: _converter(linha[indice], tipo) for nome, indice, tipo in indices}
+
+
+def _ler_parquet(caminho: str, colunas: Sequence[str], inicio: Optional[float],
+                 fim: Optional[float], lote: int) -> Iterator[Dict[str, Any]]:
+    try:
+        import pyarrow.parquet as parquet
+    except ImportError:
+        raise RuntimeError(f"{caminho}: ler Parquet exige o pyarrow (pip install pyarrow)")
+    arquivo = parquet.ParquetFile(caminho)
+    tempo = arquivo.schema_arrow.get_field_index('observed_at')
+    grupos = []
+    for grupo in range(arquivo.metadata.num_row_groups):
+        estatisticas = arquivo.metadata.row_group(grupo).column(tempo).statistics
+        if estatisticas is not None and estatisticas.has_min_max:
+            if (inicio is not None and estatisticas.max < inicio) or (fim is not None and estatisticas.min > fim):
+                continue
+        grupos.append(grupo)
+    if not grupos:
+        return
+    lidas = list(colunas) if 'observed_at' in colunas else list(colunas) + ['observed_at']
+    for lote_arrow in arquivo.iter_batches(batch_size=lote, row_groups=grupos, columns=lidas):
+        dados = lote_arrow.to_pydict()
+        for i, instante in enumerate(dados['observed_at']):
+            if (inicio is not None and instante < inicio) or (fim is not None and instante > fim):
+                continue
+            yield {nome: dados[nome][i] for nome in colunas}
+
+
+def ler_observacoes(diretorio: str, colunas: Optional[Sequence[str]] = None,
+                    inicio: Optional[float] = None, fim: Optional[float] = None,
+                    lote: int = 8192) -> Iterator[Dict[str, Any]]:
+    """
+    Percorre as observações exportadas, uma linha por vez, sem carregar os arquivos inteiros.
+
+    Args:
+        diretorio: Pasta da exportação
+        colunas: Colunas devolvidas (padrão: todas); no Parquet só elas são lidas do disco
+        inicio: Descarta observações anteriores a este instante (timestamp)
+        fim: Descarta observações posteriores a este instante (timestamp)
+        lote: Linhas decodificadas por vez nos arquivos Parquet
+
+    Returns:
+        Iterador de dicts {coluna: valor}
+
+    Raises:
+        ValueError: Se uma coluna não existir
+    """
+    colunas = list(colunas or NOMES_COLUNAS)
+    desconhecidas = [nome for nome in colunas if nome not in _TIPOS]
+    if desconhecidas:
+        raise ValueError(f"Colunas desconhecidas: {', '.join(desconhecidas)} (disponíveis: {', '.join(NOMES_COLUNAS)})")
+    return _percorrer(arquivos_exportados(diretorio, inicio, fim), colunas, inicio, fim, lote)
+
+
+def _percorrer(caminhos: List[str], colunas: List[str], inicio: Optional[float], fim: Optional[float],
+               lote: int) -> Iterator[Dict[str, Any]]:
+    for caminho in caminhos:
+        if caminho.endswith(_EXTENSOES['parquet']):
+            yield from _ler_parquet(caminho, colunas, inicio, fim, lote)
+        else:
+            yield from _ler_csv(caminho, colunas, inicio, fim)
+
+
+_exportador: Optional[ExportadorObservacoes] = None
+_exportador_lock = threading.Lock()
+
+
+def get_exportador() -> Optional[ExportadorObservacoes]:
+    """Exportador do processo atual (None com `EXPORT_DIR` vazio); concluído na saída do processo."""
+    global _exportador
+    config = get_config()
+    if _exportador is None and config.EXPORT_DIR:
+        with _exportador_lock:
+            if _exportador is None:
+                _exportador = ExportadorObservacoes(
+                    config.EXPORT_DIR, config.EXPORT_FORMAT or None, config.EXPORT_BATCH_ROWS,
+                    config.EXPORT_FILE_MAX_MB * 1024 * 1024, config.EXPORT_FILE_MAX_S,
+                )
+                atexit.register(_exportador.fechar)
+    return _exportador
@@ -0,0 +1,230 @@
+"""
+Filtros estruturados das buscas: faixa de preço, lojas, marcas, estoque e ordenação.
+
+Um `FiltroBusca` é aplicado o mais cedo possível: lojas excluídas nem são consultadas,
+a ordenação por preço vai na query string das lojas e os demais critérios são
+avaliados no laço de decodificação de cada página, antes da normalização, de modo
+que produtos recusados nunca são normalizados, guardados no cache ou no catálogo.
+
+`extrair_filtro` separa o termo de busca dos filtros escritos pelo usuário, ex:
+"notebook até 3000 só Kabum" -> ("notebook", preço <= 3000 apenas na Kabum).
+"""
+
+import re
+import unicodedata
+from typing import Any, Dict, FrozenSet, Iterable, Optional, Tuple
+
+# Chaves das lojas em `search_products` (as mesmas de `resultados['magalu']`/`['kabuum']`)
+LOJAS = ('magalu', 'kabuum')
+
+_NOMES_LOJAS = {'kabum': 'kabuum', 'kabuum': 'kabuum', 'magalu': 'magalu', 'magazine luiza': 'magalu'}
+_LOJA = r'(kabum|kabuum|magalu|magazine\s+luiza)'
+# Unidades que, depois de um número, indicam que ele não é um preço ("menos de 2 kg", "até 3 metros")
+_UNIDADES = (r'(?:k?g|mg|m|cm|mm|km|metros?|pol(?:egadas?)?|"|[kmgt]b|w|v|hz|mah|l|ml|litros?|'
+             r'anos?|meses|dias|horas?|p[eé]s|pe[cç]as?|unidades?|lugares|portas|bocas|x)(?!\w)')
+# O número termina ali (nem "2kg" nem "2.5") e não é seguido de uma unidade
+_NUMERO = (r'(?:r\$\s*)?(\d{1,3}(?:\.\d{3})+|\d+)(?:,(\d{1,2}))?(?:\s*(k|mil)\b)?(?:\s*reais\b)?'
+           rf'(?!\w|[.,]\d)(?!\s*{_UNIDADES})')
+
+_FAIXA = re.compile(rf'\bentre\s+{_NUMERO}\s+(?:e|a|at[eé])\s+{_NUMERO}', re.IGNORECASE)
+# "de X a Y" também descreve medidas ("cabo de 2 a 3 metros"): só vale com R$ antes ou "reais" no fim
+_FAIXA_DE_MOEDA = re.compile(rf'\bde\s+(?=r\$){_NUMERO}\s+(?:a|at[eé])\s+{_NUMERO}', re.IGNORECASE)
+_FAIXA_DE_REAIS = re.compile(rf'\bde\s+{_NUMERO}\s+(?:a|at[eé])\s+{_NUMERO}(?<=reais)', re.IGNORECASE)
+_MAXIMO = re.compile(rf'\b(?:por\s+at[eé]|at[eé]|abaixo\s+de|menos\s+de|no\s+m[aá]ximo|'
+                     rf'mais\s+barat[oa]s?\s+(?:do\s+)?que)\s+{_NUMERO}', re.IGNORECASE)
+_MINIMO = re.compile(rf'\b(?:acima\s+de|a\s+partir\s+de|mais\s+de|no\s+m[ií]nimo)\s+{_NUMERO}', re.IGNORECASE)
+_SO_LOJA = re.compile(rf'\b(?:s[oó]|somente|apenas)\s+(?:(?:na|no|da|do)\s+)?{_LOJA}\b', re.IGNORECASE)
+_SEM_LOJA = re.compile(rf'\bsem\s+(?:(?:a|o)\s+)?{_LOJA}\b', re.IGNORECASE)
+_MARCA = re.compile(r'\bmarca\s+([\w\-]+)', re.IGNORECASE)
+_ESTOQUE = re.compile(r'\b(?:em\s+estoque|dispon[ií]ve(?:l|is))\b', re.IGNORECASE)
+# "mais barato que X" é preço máximo, não ordenação (o "que" não pode sobrar no termo)
+_ORDEM_PRECO = re.compile(r'\b(?:mais\s+baratos?(?!\s+(?:do\s+)?que\b)|menor\s+pre[cç]o)\b', re.IGNORECASE)
+
+
+def sem_acento(texto: str) -> str:
+    """Texto em minúsculas e sem acentos, para comparações tolerantes."""
+    decomposto = unicodedata.normalize('NFKD', str(texto).lower())
+    return ''.join(c for c in decomposto if not unicodedata.combining(c))
+
+
+def preco_numerico(preco: Any) -> float:
+    """Converte o preço de uma loja (número ou texto como "R$ 1.299,90") para float (0.0 se inválido)."""
+    if isinstance(preco, (int, float)):
+        return float(preco)
+    if isinstance(preco, str):
+        limpo = re.sub(r'[^\d.,]', '', preco)
+        # Formato brasileiro: ponto separa os milhares e vírgula os centavos ("1.299,90", "1.299")
+        if ',' in limpo or re.fullmatch(r'\d{1,3}(?:\.\d{3})+', limpo):
+            limpo = limpo.replace('.', '').replace(',', '.')
+        try:
+            return float(limpo)
+        except ValueError:
+            return 0.0
+    return 0.0
+
+
+def _valor(inteiro: str, centavos: Optional[str], multiplicador: Optional[str]) -> float:
+    valor = float(inteiro.replace('.', '') + ('.' + centavos if centavos else ''))
+    return valor * 1000 if multiplicador else valor
+
+
+class FiltroBusca:
+    """Critérios de uma busca, avaliados sobre produtos projetados (antes da normalização) ou normalizados."""
+
+    ORDENACOES = ('preco',)
+
+    def __init__(self, preco_min: Optional[float] = None, preco_max: Optional[float] = None,
+                 lojas: Optional[Iterable[str]] = None, marcas: Optional[Iterable[str]] = None,
+                 apenas_disponiveis: bool = False, ordenacao: Optional[str] = None):
+        """
+        Args:
+            preco_min: Preço mínimo (inclusive)
+            preco_max: Preço máximo (inclusive)
+            lojas: Lojas consultadas, por chave (`LOJAS`); None consulta todas
+            marcas: Marcas aceitas (comparadas sem caixa nem acento; basta conter o texto)
+            apenas_disponiveis: Recusa produtos fora de estoque
+            ordenacao: 'preco' pede às lojas os mais baratos primeiro
+
+        Raises:
+            ValueError: Se uma loja ou ordenação for desconhecida
+        """
+        if lojas is not None:
+            lojas = frozenset(lojas)
+            desconhecidas = lojas - set(LOJAS)
+            if desconhecidas:
+                raise ValueError(f"lojas desconhecidas: {sorted(desconhecidas)}")
+        if ordenacao is not None and ordenacao not in self.ORDENACOES:
+            raise ValueError(f"ordenação desconhecida: {ordenacao}")
+        self.preco_min = preco_min
+        self.preco_max = preco_max
+        self.lojas: Optional[FrozenSet[str]] = lojas
+        self.marcas: FrozenSet[str] = frozenset(sem_acento(marca) for marca in marcas or ())
+        self.apenas_disponiveis = apenas_disponiveis
+        self.ordenacao = ordenacao
+
+    @property
+    def vazio(self) -> bool:
+        """Indica se o filtro não restringe nada (equivale a não filtrar)."""
+        return self.lojas is None and not self.restringe_produtos and self.ordenacao is None
+
+    @property
+    def restringe_produtos(self) -> bool:
+        """Indica se há critérios avaliados produto a produto (preço, marca ou estoque)."""
+        return (self.preco_min is not None or self.preco_max is not None
+                or bool(self.marcas) or self.apenas_disponiveis)
+
+    def inclui_loja(self, loja: str) -> bool:
+        """Indica se a loja (chave em `LOJAS`) deve ser consultada."""
+        return self.lojas is None or loja in self.lojas
+
+    def aceita(self, produto: Dict[str, Any]) -> bool:
+        """Avalia os critérios por produto (em produtos normalizados, também a loja)."""
+        if self.apenas_disponiveis and not produto.get('availability'):
+            return False
+        if self.preco_min is not None or self.preco_max is not None:
+            preco = preco_numerico(produto.get('price'))
+            if preco <= 0:
+                return False
+            if self.preco_min is not None and preco < self.preco_min:
+                return False
+            if self.preco_max is not None and preco > self.preco_max:
+                return False
+        if self.marcas:
+            marca = sem_acento(produto.get('brand') or '')
+            if not any(aceita in marca for aceita in self.marcas):
+                return False
+        if self.lojas is not None and 'store' in produto:
+            return str(produto['store']).lower() in self.lojas
+        return True
+
+    def chave(self) -> str:
+        """Sufixo das chaves de cache e de buscas em andamento (vazio para o filtro vazio)."""
+        partes = []
+        if self.preco_min is not None:
+            partes.append(f'min={self.preco_min:g}')
+        if self.preco_max is not None:
+            partes.append(f'max={self.preco_max:g}')
+        if self.lojas is not None:
+            partes.append('lojas=' + ','.join(sorted(self.lojas)))
+        if self.marcas:
+            partes.append('marcas=' + ','.join(sorted(self.marcas)))
+        if self.apenas_disponiveis:
+            partes.append('estoque')
+        if self.ordenacao:
+            partes.append(f'ordem={self.ordenacao}')
+        return ('|' + '|'.join(partes)) if partes else ''
+
+    def descricao(self) -> str:
+        """Critérios em texto, para o resumo da busca (ex: "até R$ 3000.00, só Kabuum")."""
+        partes = []
+        if self.preco_min is not None and self.preco_max is not None:
+            partes.append(f'R$ {self.preco_min:.2f} a R$ {self.preco_max:.2f}')
+        elif self.preco_max is not None:
+            partes.append(f'até R$ {self.preco_max:.2f}')
+        elif self.preco_min is not None:
+            partes.append(f'a partir de R$ {self.preco_min:.2f}')
+        if self.lojas is not None:
+            partes.append('só ' + ' e '.join(loja.capitalize() for loja in LOJAS if loja in self.lojas))
+        if self.marcas:
+            partes.append('marca ' + ' ou '.join(sorted(self.marcas)))
+        if self.apenas_disponiveis:
+            partes.append('em estoque')
+        if self.ordenacao == 'preco':
+            partes.append('mais baratos primeiro')
+        return ', '.join(partes)
+
+    def __repr__(self) -> str:
+        return f"FiltroBusca({self.chave().lstrip('|') or 'vazio'})"
+
+
+def extrair_filtro(texto: str) -> Tuple[str, FiltroBusca]:
+    """
+    Separa o termo de busca dos filtros escritos em linguagem natural.
+
+    Reconhece: faixa de preço ("até 3000", "mais barato que 1500", "acima de 500",
+    "entre 1.000 e 2.500", "de R$ 1000 a 2000", "de 1000 a 2000 reais", "até 3k"; um
+    número seguido de unidade, como "menos de 2 kg", não é preço), lojas ("só Kabum",
+    "apenas na Magalu", "sem Magalu"; excluir todas equivale a não filtrar loja), marcas
+    ("marca Dell"), estoque ("em estoque", "disponível") e ordenação ("mais barato",
+    "menor preço"; "mais barato que X" é preço máximo).
+
+    Args:
+        texto: Texto digitado pelo usuário
+
+    Returns:
+        Tuple com o termo de busca (o texto sem os filtros) e o filtro; se não sobrar
+        termo, o texto original com um filtro vazio
+    """
+    restante = texto
+    preco_min = preco_max = None
+    lojas = None
+    marcas = []
+
+    def remover(padrao: 're.Pattern') -> list:
+        nonlocal restante
+        encontrados = list(padrao.finditer(restante))
+        restante = padrao.sub(' ', restante)
+        return encontrados
+
+    for faixa in remover(_FAIXA) + remover(_FAIXA_DE_MOEDA) + remover(_FAIXA_DE_REAIS):
+        valores = sorted((_valor(*faixa.group(1, 2, 3)), _valor(*faixa.group(4, 5, 6))))
+        preco_min, preco_max = valores
+    for maximo in remover(_MAXIMO):
+        preco_max = _valor(*maximo.group(1, 2, 3))
+    for minimo in remover(_MINIMO):
+        preco_min = _valor(*minimo.group(1, 2, 3))
+    for so_loja in remover(_SO_LOJA):
+        lojas = (lojas or set()) | {_NOMES_LOJAS[' '.join(so_loja.group(1).lower().split())]}
+    for sem_loja in remover(_SEM_LOJA):
+        lojas = (lojas if lojas is not None else set(LOJAS)) - {_NOMES_LOJAS[' '.join(sem_loja.group(1).lower().split())]}
+    if lojas is not None and not lojas:
+        # Todas as lojas excluídas ("sem Magalu sem Kabum"): o filtro de loja é ignorado (busca-se nas duas)
+        lojas = None
+    marcas.extend(marca.group(1) for marca in remover(_MARCA))
+    apenas_disponiveis = bool(remover(_ESTOQUE))
+    ordenacao = 'preco' if remover(_ORDEM_PRECO) else None
+
+    termo = ' '.join(restante.split())
+    if not termo:
+        return ' '.join(texto.split()), FiltroBusca()
+    return termo, FiltroBusca(preco_min, preco_max, lojas, marcas, apenas_disponiveis, ordenacao)
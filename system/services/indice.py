@@ -0,0 +1,183 @@
+"""
+Índice local (SQLite FTS5) dos produtos já buscados nas lojas.
+
+Cada produto normalizado por `search_products` é gravado (upsert por loja + id)
+com o instante da última atualização. Consultas casam por prefixo e sem acento
+("camera" encontra "Câmera", "note" encontra "Notebook"), ordenadas por BM25,
+e podem ser respondidas na hora enquanto a busca nas lojas atualiza o índice.
+"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional
+
+from services import json_projetado
+
+# Palavras que não ajudam a encontrar produtos e deixariam a consulta (AND) vazia
+STOPWORDS = frozenset({
+    'a', 'o', 'as', 'os', 'um', 'uma', 'uns', 'umas', 'de', 'da', 'do', 'das', 'dos',
+    'e', 'em', 'no', 'na', 'nos', 'nas', 'com', 'sem', 'para', 'pra', 'por', 'que',
+})
+
+_PALAVRAS = re.compile(r'\w+', re.UNICODE)
+
+_ESQUEMA = (
+    '''CREATE TABLE IF NOT EXISTS produtos (
+        chave TEXT PRIMARY KEY,
+        loja TEXT NOT NULL,
+        nome TEXT NOT NULL,
+        marca TEXT NOT NULL,
+        dados TEXT NOT NULL,
+        atualizado_em REAL NOT NULL
+    )''',
+    '''CREATE VIRTUAL TABLE IF NOT EXISTS produtos_fts USING fts5(
+        nome, marca,
+        content='produtos', content_rowid='rowid',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )''',
+    # Mantêm o índice FTS igual à tabela de conteúdo a cada upsert
+    '''CREATE TRIGGER IF NOT EXISTS produtos_ai AFTER INSERT ON produtos BEGIN
+        INSERT INTO produtos_fts(rowid, nome, marca) VALUES (new.rowid, new.nome, new.marca);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS produtos_ad AFTER DELETE ON produtos BEGIN
+        INSERT INTO produtos_fts(produtos_fts, rowid, nome, marca) VALUES ('delete', old.rowid, old.nome, old.marca);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS produtos_au AFTER UPDATE OF nome, marca ON produtos BEGIN
+        INSERT INTO produtos_fts(produtos_fts, rowid, nome, marca) VALUES ('delete', old.rowid, old.nome, old.marca);
+        INSERT INTO produtos_fts(rowid, nome, marca) VALUES (new.rowid, new.nome, new.marca);
+    END''',
+)
+
+
+def consulta_fts(termo: str) -> Optional[str]:
+    """Converte o termo digitado em uma consulta FTS5 (todas as palavras, por prefixo).
+
+    As palavras são citadas, o que impede que operadores do FTS5 no texto do
+    usuário (`OR`, `NEAR`, `*`, aspas) mudem a consulta. Retorna None se não
+    sobrar nenhuma palavra.
+    """
+    palavras = [p for p in _PALAVRAS.findall(termo.lower()) if p not in STOPWORDS]
+    if not palavras:
+        return None
+    return ' '.join(f'"{p}"*' for p in palavras)
+
+
+class IndiceProdutos:
+    """Catálogo local dos produtos normalizados, com busca textual."""
+
+    def __init__(self, caminho: str = ':memory:'):
+        """
+        Args:
+            caminho: Arquivo SQLite (criado se não existir) ou ':memory:'
+        """
+        if caminho != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(caminho)), exist_ok=True)
+        self._conexao = sqlite3.connect(caminho, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conexao.execute('PRAGMA journal_mode=WAL')
+            self._conexao.execute('PRAGMA synchronous=NORMAL')
+            for comando in _ESQUEMA:
+                self._conexao.execute(comando)
+
+    @staticmethod
+    def _chave(produto: Dict[str, Any]) -> str:
+        return f"{produto.get('store', '')}:{produto.get('id') or produto.get('url', '')}"
+
+    def upsert(self, produtos: Iterable[Dict[str, Any]], agora: Optional[float] = None) -> int:
+        """
+        Grava (ou atualiza) produtos normalizados em uma única transação.
+
+        Args:
+            produtos: Produtos no formato de `ProductSearchService._normalize_product`
+            agora: Instante da atualização (padrão: agora)
+
+        Returns:
+            Número de produtos gravados
+        """
+        agora = time.time() if agora is None else agora
+        linhas = [
+            (self._chave(p), p.get('store', ''), p.get('name', ''), p.get('brand', ''),
+             json.dumps(p, ensure_ascii=False), agora)
+            for p in produtos
+        ]
+        if not linhas:
+            return 0
+        with self._lock:
+            self._conexao.execute('BEGIN')
+            try:
+                self._conexao.executemany(
+                    '''INSERT INTO produtos (chave, loja, nome, marca, dados, atualizado_em)
+                       VALUES (?, ?, ?, ?, ?, ?)
+                       ON CONFLICT(chave) DO UPDATE SET
+                           loja = excluded.loja, nome = excluded.nome, marca = excluded.marca,
+                           dados = excluded.dados, atualizado_em = excluded.atualizado_em''',
+                    linhas,
+                )
+            except Exception:
+                self._conexao.execute('ROLLBACK')
+                raise
+            self._conexao.execute('COMMIT')
+        return len(linhas)
+
+    def buscar(self, termo: str, limite: int = 200, idade_max_s: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Produtos que casam com o termo, do mais relevante (BM25) ao menos.
+
+        Args:
+            termo: Termo de busca como digitado pelo usuário
+            limite: Máximo de produtos retornados
+            idade_max_s: Ignora produtos atualizados há mais tempo que isso
+
+        Returns:
+            Dict com 'products' e a atualização mais antiga/recente entre eles
+            ('oldest_update'/'newest_update', timestamps ou None)
+        """
+        consulta = consulta_fts(termo)
+        if consulta is None:
+            return {'products': [], 'oldest_update': None, 'newest_update': None}
+        limite_idade = time.time() - idade_max_s if idade_max_s is not None else 0.0
+
+        # O ranking (BM25, com o nome pesando mais que a marca) é feito só sobre o índice
+        # FTS; a junção com os dados e o filtro de idade valem apenas para os candidatos
+        with self._lock:
+            linhas = self._conexao.execute(
+                '''SELECT p.dados, p.atualizado_em
+                   FROM (SELECT rowid, bm25(produtos_fts, 10.0, 2.0) AS relevancia
+                         FROM produtos_fts WHERE produtos_fts MATCH ?
+                         ORDER BY relevancia LIMIT ?) candidatos
+                   JOIN produtos p ON p.rowid = candidatos.rowid
+                   WHERE p.atualizado_em >= ?
+                   ORDER BY candidatos.relevancia
+                   LIMIT ?''',
+                (consulta, limite * 2, limite_idade, limite),
+            ).fetchall()
+
+        atualizacoes = [atualizado_em for _, atualizado_em in linhas]
+        return {
+            'products': [json_projetado.carregar(dados) for dados, _ in linhas],
+            'oldest_update': min(atualizacoes) if atualizacoes else None,
+            'newest_update': max(atualizacoes) if atualizacoes else None,
+        }
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conexao.execute('SELECT COUNT(*) FROM produtos').fetchone()[0]
+
+    def otimizar(self):
+        """Funde os segmentos do índice FTS (útil após cargas grandes)."""
+        with self._lock:
+            self._conexao.execute("INSERT INTO produtos_fts(produtos_fts) VALUES ('optimize')")
+
+    def fechar(self):
+        """Fecha o arquivo SQLite."""
+        with self._lock:
+            self._conexao.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """Tamanho do índice."""
+        return {'documents': len(self)}
@@ -0,0 +1,183 @@
+"""
+Decodificação JSON das respostas das lojas, extraindo apenas os campos usados.
+
+Com `orjson` instalado (opcional), o payload é decodificado por ele, que é bem mais
+rápido que o módulo `json`. Sem ele, o payload é percorrido de forma incremental com o
+decodificador da biblioteca padrão: os campos fora dos caminhos pedidos são
+decodificados e descartados um a um, cada item da lista é projetado (reduzido aos
+campos usados) assim que é lido e a leitura termina quando todos os caminhos foram
+encontrados. A árvore completa do payload nunca fica inteira em memória.
+"""
+
+import json
+import re
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depende do ambiente
+    orjson = None
+
+BACKEND = 'orjson' if orjson is not None else 'json'
+BACKENDS = ('orjson', 'json') if orjson is not None else ('json',)
+
+_decodificador = json.JSONDecoder()
+_ESPACOS = re.compile(r'[ \t\n\r]*')
+
+Projecao = Callable[[Any], Optional[Any]]
+
+
+def carregar(dados: Union[bytes, str]) -> Any:
+    """Decodifica um documento JSON completo com o backend mais rápido disponível."""
+    if orjson is not None:
+        return orjson.loads(dados)
+    return json.loads(dados)
+
+
+def serializar(valor: Any) -> bytes:
+    """Codifica um valor em JSON (UTF-8) com o backend mais rápido disponível."""
+    if orjson is not None:
+        return orjson.dumps(valor, default=str)
+    return json.dumps(valor, ensure_ascii=False, default=str).encode()
+
+
+class _Concluido(Exception):
+    """Todos os caminhos pedidos foram lidos; o restante do documento é ignorado."""
+
+
+class _LeitorIncremental:
+    """Percorre um documento JSON decodificando apenas os caminhos pedidos."""
+
+    def __init__(self, texto: str, caminho_lista: Sequence[str], projetar: Projecao,
+                 valores: Dict[str, Sequence[str]]):
+        self.texto = texto
+        self.projetar = projetar
+        self.itens: List[Any] = []
+        self.valores: Dict[str, Any] = {nome: None for nome in valores}
+
+        # Árvore de chaves: folhas ('lista',) ou ('valor', nome)
+        self.arvore: Dict[str, Any] = {}
+        folhas = [(caminho_lista, ('lista',))] + [(caminho, ('valor', nome)) for nome, caminho in valores.items()]
+        for caminho, folha in folhas:
+            no = self.arvore
+            for chave in caminho[:-1]:
+                no = no.setdefault(chave, {})
+            no[caminho[-1]] = folha
+        self.pendentes = len(folhas)
+
+    def _pular(self, pos: int) -> int:
+        return _ESPACOS.match(self.texto, pos).end()
+
+    def _concluir(self):
+        self.pendentes -= 1
+        if not self.pendentes:
+            raise _Concluido
+
+    def ler(self):
+        pos = self._pular(0)
+        if self.texto[pos:pos + 1] != '{':
+            # Raiz que não é objeto: nenhum caminho existe, mas o JSON precisa ser válido
+            _decodificador.raw_decode(self.texto, pos)
+            return
+        try:
+            self._objeto(pos, self.arvore)
+        except _Concluido:
+            pass
+
+    def _objeto(self, pos: int, arvore: Dict[str, Any]) -> int:
+        texto = self.texto
+        pos = self._pular(pos + 1)
+        if texto[pos:pos + 1] == '}':
+            return pos + 1
+        while True:
+            chave, pos = _decodificador.raw_decode(texto, pos)
+            pos = self._pular(pos)
+            if texto[pos:pos + 1] != ':':
+                raise json.JSONDecodeError("Expecting ':' delimiter", texto, pos)
+            pos = self._pular(pos + 1)
+
+            alvo = arvore.get(chave)
+            inicio_valor = texto[pos:pos + 1]
+            if isinstance(alvo, dict) and inicio_valor == '{':
+                pos = self._objeto(pos, alvo)
+            elif isinstance(alvo, tuple) and alvo[0] == 'valor':
+                self.valores[alvo[1]], pos = _decodificador.raw_decode(texto, pos)
+                self._concluir()
+            elif isinstance(alvo, tuple) and inicio_valor == '[':
+                pos = self._lista(pos)
+                self._concluir()
+            else:
+                # Fora dos caminhos pedidos: decodificado e descartado em seguida
+                _, pos = _decodificador.raw_decode(texto, pos)
+
+            pos = self._pular(pos)
+            separador = texto[pos:pos + 1]
+            if separador == '}':
+                return pos + 1
+            if separador != ',':
+                raise json.JSONDecodeError("Expecting ',' delimiter", texto, pos)
+            pos = self._pular(pos + 1)
+
+    def _lista(self, pos: int) -> int:
+        texto = self.texto
+        pos = self._pular(pos + 1)
+        if texto[pos:pos + 1] == ']':
+            return pos + 1
+        while True:
+            item, pos = _decodificador.raw_decode(texto, pos)
+            projetado = self.projetar(item)
+            if projetado is not None:
+                self.itens.append(projetado)
+            pos = self._pular(pos)
+            separador = texto[pos:pos + 1]
+            if separador == ']':
+                return pos + 1
+            if separador != ',':
+                raise json.JSONDecodeError("Expecting ',' delimiter", texto, pos)
+            pos = self._pular(pos + 1)
+
+
+def _no(documento: Any, caminho: Sequence[str]) -> Any:
+    atual = documento
+    for chave in caminho:
+        if not isinstance(atual, dict):
+            return None
+        atual = atual.get(chave)
+    return atual
+
+
+def extrair(dados: Union[bytes, str], caminho_lista: Sequence[str], projetar: Projecao,
+            valores: Optional[Dict[str, Sequence[str]]] = None,
+            backend: Optional[str] = None) -> Tuple[List[Any], Dict[str, Any]]:
+    """Extrai e projeta os itens de uma lista, além de alguns valores avulsos.
+
+    Args:
+        dados: Corpo da resposta
+        caminho_lista: Chaves dos objetos até a lista (ex: ['pageProps', 'data', 'search', 'products'])
+        projetar: Reduz um item bruto aos campos usados (itens projetados como None são descartados)
+        valores: Outros valores a extrair, por nome (ex: {'paginas': ['meta', 'total_pages_count']})
+        backend: 'orjson' ou 'json' (padrão: o mais rápido disponível)
+
+    Returns:
+        Tuple com os itens projetados (lista vazia se o caminho não existir) e os valores
+        pedidos (None para os ausentes)
+
+    Raises:
+        ValueError: Se o documento não for JSON válido (`json.JSONDecodeError`)
+    """
+    valores = valores or {}
+    backend = backend or BACKEND
+
+    if backend == 'orjson':
+        if orjson is None:
+            raise ValueError("backend 'orjson' indisponível")
+        documento = orjson.loads(dados)
+        lista = _no(documento, caminho_lista)
+        itens = [projetado for projetado in map(projetar, lista if isinstance(lista, list) else [])
+                 if projetado is not None]
+        return itens, {nome: _no(documento, caminho) for nome, caminho in valores.items()}
+
+    texto = dados.decode('utf-8') if isinstance(dados, (bytes, bytearray)) else dados
+    leitor = _LeitorIncremental(texto, caminho_lista, projetar, valores)
+    leitor.ler()
+    return leitor.itens, leitor.valores
@@ -1,164 +1,572 @@
+import re
+import secrets
+import threading
+import time
 import requests
+from abc import abstractmethod
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Optional, List, Dict, Any, Tuple, Callable
 from interfaces.lojas import InteracaoLojasInterface
-import traceback
+from config.logger import BotLogger
+from config.settings import get_config
+from services.cache_http import CacheHttp
+from services.estado import EstadoCompartilhado, get_estado
+from services.filtros import FiltroBusca
+from services import json_projetado
+from services.json_projetado import extrair
+from services.processamento import PoolCpu, extrair_pagina, get_pool_cpu
+from services.resiliencia import (
+    PRIORIDADE_INTERATIVA, PRIORIDADE_SEGUNDO_PLANO, CircuitoAbertoError, ClienteHttpLoja, DisjuntorLoja, LimitadorLoja
+)
 
-class Magalu(InteracaoLojasInterface):
+
+class LojaPaginada(InteracaoLojasInterface):
+    """Base para lojas com busca paginada.
+
+    A página 1 é buscada primeiro (ela informa o total de páginas); as seguintes, até
+    `max_paginas`, são buscadas em paralelo dentro de `orcamento_paginas_s`. A coleta
+    termina antes se `min_disponiveis` produtos em estoque já tiverem sido reunidos.
+    """
+
+    NOME = 'Loja'
+
+    def __init__(self, max_paginas: Optional[int] = None, min_disponiveis: Optional[int] = None,
+                 orcamento_paginas_s: Optional[float] = None, estado: Optional[EstadoCompartilhado] = None,
+                 pool_cpu: Optional[PoolCpu] = None):
+        """
+        Args:
+            max_paginas: Máximo de páginas por busca (padrão: SEARCH_MAX_PAGES)
+            min_disponiveis: Produtos em estoque que encerram a coleta (padrão: SEARCH_MIN_IN_STOCK)
+            orcamento_paginas_s: Tempo máximo de espera pelas páginas 2..N (padrão: SEARCH_PAGES_BUDGET_S)
+            estado: Estado compartilhado entre workers (padrão: SHARED_STATE_URL)
+            pool_cpu: Pool de processos para decodificar as páginas grandes (padrão: CPU_POOL_WORKERS)
+        """
+        config = get_config()
+        self.max_paginas = max_paginas if max_paginas is not None else config.SEARCH_MAX_PAGES
+        self.min_disponiveis = min_disponiveis if min_disponiveis is not None else config.SEARCH_MIN_IN_STOCK
+        self.orcamento_paginas_s = (
+            orcamento_paginas_s if orcamento_paginas_s is not None else config.SEARCH_PAGES_BUDGET_S
+        )
+        self.logger = BotLogger(__name__).get_logger()
+        self.pool_cpu = pool_cpu if pool_cpu is not None else get_pool_cpu()
+        # Sessão própria para reaproveitar conexões (e o handshake TLS) entre buscas
+        self.session = requests.Session()
+        # Cache HTTP em disco (revalidação com ETag/Last-Modified); desativado com HTTP_CACHE_DIR vazio
+        self.cache_http = (
+            CacheHttp(config.HTTP_CACHE_DIR, self.NOME, max_bytes=config.HTTP_CACHE_MAX_MB * 1024 * 1024)
+            if config.HTTP_CACHE_DIR else None
+        )
+        # Compartilhado por todas as buscas (de todos os chats) feitas com este adaptador e,
+        # com estado compartilhado, limitado também na soma de todos os workers
+        estado = estado if estado is not None else get_estado()
+        self.limitador = LimitadorLoja(
+            self.NOME,
+            taxa_por_s=config.STORE_RATE_LIMIT_RPS,
+            rajada=config.STORE_RATE_LIMIT_BURST,
+            max_em_andamento=config.STORE_MAX_IN_FLIGHT,
+            estado=estado if estado.compartilhado else None,
+        )
+        self.http = ClienteHttpLoja(
+            self.session,
+            self.NOME,
+            max_retentativas=config.MAX_RETRIES,
+            timeout_min=config.STORE_TIMEOUT_MIN_S,
+            timeout_max=config.STORE_TIMEOUT_MAX_S,
+            taxa_hedge=config.STORE_HEDGE_MAX_RATE,
+            proporcao_retentativas=config.STORE_RETRY_BUDGET,
+            limitador=self.limitador,
+            cache=self.cache_http,
+        )
+        self.prazo_max_s = config.API_TIMEOUT
+        self.disjuntor = DisjuntorLoja(
+            self.NOME,
+            limiar_erros=config.STORE_BREAKER_ERROR_RATE,
+            limiar_lento_s=config.STORE_BREAKER_SLOW_S,
+            limiar_lentas=config.STORE_BREAKER_SLOW_RATE,
+            min_chamadas=config.STORE_BREAKER_MIN_CALLS,
+            tempo_aberto_s=config.STORE_BREAKER_OPEN_S,
+        )
+        # Compartilhado entre buscas simultâneas: dimensionado para várias buscas, não só uma
+        self._executor_paginas = ThreadPoolExecutor(
+            max_workers=16, thread_name_prefix=f'paginas-{self.NOME.lower()}'
+        )
+
+    def prazo_s(self) -> float:
+        """Tempo máximo esperado para uma busca completa, derivado do timeout atual da loja."""
+        prazo = self.http.timeout() * (self.http.max_retentativas + 1) + self.orcamento_paginas_s
+        return min(self.prazo_max_s, prazo)
+
+    # Caminhos, no payload de busca da loja, da lista de produtos e do total de páginas
+    CAMINHO_PRODUTOS: Tuple[str, ...] = ()
+    CAMINHO_PAGINAS: Tuple[str, ...] = ()
+
+    @staticmethod
+    @abstractmethod
+    def _projetar_produto(produto_raw: Dict[str, Any]) -> Dict[str, Any]:
+        """Reduz um produto bruto da loja aos campos usados."""
+
+    @classmethod
+    def _extrair_produtos(cls, conteudo: bytes, backend: Optional[str] = None,
+                          filtro: Optional[FiltroBusca] = None) -> Tuple[List[Dict[str, Any]], int]:
+        """Decodifica o corpo de uma página lendo apenas os produtos (projetados) e o total de páginas.
+
+        Com `filtro`, os produtos recusados são descartados já no laço de decodificação.
+        """
+        if filtro is not None and filtro.restringe_produtos:
+            def projetar(produto_raw: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+                produto = cls._projetar_produto(produto_raw)
+                return produto if filtro.aceita(produto) else None
+        else:
+            projetar = cls._projetar_produto
+        produtos, valores = extrair(
+            conteudo, cls.CAMINHO_PRODUTOS, projetar,
+            valores={'paginas': cls.CAMINHO_PAGINAS}, backend=backend,
+        )
+        total_paginas = valores['paginas'] if isinstance(valores['paginas'], int) else 1
+        return produtos, total_paginas or 1
+
+    def _decodificar(self, conteudo: bytes, filtro: Optional[FiltroBusca] = None) -> Tuple[List[Dict[str, Any]], int]:
+        """Decodifica uma página; as grandes vão ao pool de processos, se ele estiver ativo."""
+        if self.pool_cpu is not None and self.pool_cpu.usar_para_pagina(len(conteudo)):
+            produtos, total_paginas = json_projetado.carregar(
+                self.pool_cpu.executar('page_decode', extrair_pagina, self.NOME, conteudo, None, filtro)
+            )
+            return produtos, total_paginas
+        return self._extrair_produtos(conteudo, filtro=filtro)
+
+    def _processar_resposta(self, response: requests.Response, repetir: Callable[[], requests.Response],
+                            filtro: Optional[FiltroBusca] = None) -> Tuple[List[Dict[str, Any]], int]:
+        """Decodifica a resposta de uma página, reaproveitando o resultado guardado em um 304.
+
+        Args:
+            response: Resposta da loja
+            repetir: Refaz a requisição sem validadores, caso o 304 chegue para uma
+                entrada que já saiu do cache
+            filtro: Critérios aplicados aos produtos durante a decodificação
+        """
+        # O cache HTTP guarda a página inteira: filtrada, ela não serviria às outras buscas
+        filtrar = filtro is not None and filtro.restringe_produtos
+        if response.status_code == 304 and self.cache_http:
+            reaproveitado = self.cache_http.reaproveitar(response, self._decodificar)
+            if reaproveitado is not None:
+                produtos, total_paginas = reaproveitado
+                return ([p for p in produtos if filtro.aceita(p)] if filtrar else produtos), total_paginas
+            response = repetir()
+
+        response.raise_for_status()
+        resultado = self._decodificar(response.content, filtro)
+        if self.cache_http and not filtrar:
+            self.cache_http.guardar(response, resultado)
+        return resultado
+
+    @abstractmethod
+    def buscar_pagina(self, termo_busca: str, pagina: int, prioridade: int = PRIORIDADE_INTERATIVA,
+                      filtro: Optional[FiltroBusca] = None) -> Tuple[List[Dict[str, Any]], int]:
+        """Busca uma página de resultados.
+
+        Args:
+            termo_busca: Termo de busca
+            pagina: Número da página (a partir de 1)
+            prioridade: Classe de prioridade no limitador de requisições da loja
+            filtro: Critérios da busca (a ordenação vai na URL, se a loja aceitar; os
+                demais são aplicados na decodificação)
+
+        Returns:
+            Tuple com os produtos processados da página e o total de páginas da busca
+        """
+        pass
+
+    def buscar_produtos(self, termo_busca: str,
+                        ao_receber_pagina: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+                        prioridade: int = PRIORIDADE_INTERATIVA, filtro: Optional[FiltroBusca] = None):
+        """Busca produtos em até `max_paginas` páginas usando o termo informado.
+
+        Args:
+            termo_busca: Termo de busca
+            ao_receber_pagina: Chamada (na thread da busca) com os produtos novos de cada
+                página assim que ela chega, para que o chamador processe os resultados
+                incrementalmente
+            prioridade: Classe de prioridade no limitador (`PRIORIDADE_SEGUNDO_PLANO` para
+                aquecimento e atualizações em segundo plano)
+            filtro: Critérios da busca; só os produtos aceitos são coletados
+
+        Returns:
+            Lista de produtos sem repetições ou None em caso de erro na primeira página
+
+        Raises:
+            CircuitoAbertoError: Se a loja está com o circuito aberto (a busca não é enviada)
+        """
+        if not self.disjuntor.permitir():
+            raise CircuitoAbertoError(self.NOME)
+
+        coletados: List[Dict[str, Any]] = []
+        vistos = set()
+        disponiveis = 0
+
+        def incorporar(produtos: List[Dict[str, Any]]):
+            nonlocal disponiveis
+            novos = []
+            for produto in produtos:
+                chave = produto.get('id') or produto.get('url')
+                if chave in vistos:
+                    continue
+                vistos.add(chave)
+                novos.append(produto)
+                if produto.get('availability'):
+                    disponiveis += 1
+            coletados.extend(novos)
+            if ao_receber_pagina and novos:
+                ao_receber_pagina(novos)
+
+        # O circuito vê só o tempo da loja: a fila do limitador e a descoberta do build id não contam
+        with self.http.medir_tempo_loja() as tempo_na_loja:
+            try:
+                produtos, total_paginas = self.buscar_pagina(termo_busca, 1, prioridade, filtro)
+            except requests.exceptions.RequestException as e:
+                self.disjuntor.registrar(False, tempo_na_loja())
+                self.logger.error("Erro de requisição ao buscar produtos na %s: %s", self.NOME, e)
+                return None
+            except Exception:
+                self.disjuntor.registrar(False, tempo_na_loja())
+                self.logger.exception("Erro inesperado ao buscar produtos na %s", self.NOME)
+                return None
+            # Só a primeira página conta para o circuito: as demais são opcionais
+            self.disjuntor.registrar(True, tempo_na_loja())
+
+        incorporar(produtos)
+
+        ultima_pagina = min(self.max_paginas, total_paginas)
+        if ultima_pagina <= 1 or disponiveis >= self.min_disponiveis:
+            return coletados
+
+        futuros = {
+            self._executor_paginas.submit(self.buscar_pagina, termo_busca, pagina, prioridade, filtro): pagina
+            for pagina in range(2, ultima_pagina + 1)
+        }
+        prazo = time.monotonic() + self.orcamento_paginas_s
+        pendentes = set(futuros)
+
+        while pendentes and disponiveis < self.min_disponiveis:
+            restante = prazo - time.monotonic()
+            if restante <= 0:
+                break
+            concluidos, pendentes = wait(pendentes, timeout=restante, return_when=FIRST_COMPLETED)
+            for futuro in concluidos:
+                try:
+                    produtos_pagina, _ = futuro.result()
+                except Exception as e:
+                    self.logger.warning("Falha ao buscar a página %d na %s: %s", futuros[futuro], self.NOME, e)
+                    continue
+                incorporar(produtos_pagina)
+
+        # Páginas que ainda não começaram são canceladas; as em andamento são ignoradas
+        for futuro in pendentes:
+            futuro.cancel()
+
+        self.logger.debug(
+            "%s: %d produtos (%d disponíveis) em %d/%d páginas para '%s'",
+            self.NOME, len(coletados), disponiveis, ultima_pagina - len(pendentes), ultima_pagina, termo_busca
+        )
+        return coletados
+
+
+class Magalu(LojaPaginada):
     """ Classe concreta para cadastro de lojas online via API.
 
     :param InteracaoLojasInterface: Assinatura voltada para cadastro de lojas online via API.
     """
+
+    BASE_URL = "https://www.magazinevoce.com.br"
+    STORE_PATH = "magazinemagalushopbr"
+
+    # Build id conhecido, usado apenas se a descoberta na vitrine falhar
+    DEFAULT_BUILD_ID = "6cijUACDhFQyBEGYnV_Mr"
+    # Nova tentativa de descoberta após uma falha (evita consultar a vitrine a cada busca)
+    BUILD_ID_RETRY_S = 60
+
+    _BUILD_ID_PATTERNS = (
+        re.compile(r'"buildId"\s*:\s*"([^"]+)"'),
+        re.compile(r'/_next/static/([^/"]+)/_buildManifest\.js'),
+    )
+
+    NOME = 'Magalu'
+    # Caminhos no payload `_next/data`: só a lista de produtos e o total de páginas são lidos
+    CAMINHO_PRODUTOS = ('pageProps', 'data', 'search', 'products')
+    CAMINHO_PAGINAS = ('pageProps', 'data', 'search', 'pagination', 'pages')
+
+    def __init__(self, base_url: Optional[str] = None, build_id_ttl: Optional[float] = None, **kwargs):
+        """
+        Args:
+            base_url: Host da loja (permite apontar para um servidor local nos benchmarks)
+            build_id_ttl: Validade (s) do build id descoberto (padrão: MAGALU_BUILD_ID_TTL)
+            **kwargs: Parâmetros de paginação, estado compartilhado e pool de `LojaPaginada`
+        """
+        super().__init__(**kwargs)
+        self.base_url = (base_url or self.BASE_URL).rstrip('/')
+
+        self.build_id_ttl = build_id_ttl if build_id_ttl is not None else get_config().MAGALU_BUILD_ID_TTL
+        self._build_id: Optional[str] = None
+        self._build_id_expira_em = 0.0
+        # Incrementada a cada descoberta: permite saber se outra thread já atualizou o build id
+        self._build_id_geracao = 0
+        self._build_id_lock = threading.Lock()
     
-    def buscar_produtos(self, termo_busca: str):
-        """Busca produtos na loja Magalu usando o termo informado."""
+    def _url_busca(self, termo_busca: str, build_id: str, pagina: int = 1,
+                   filtro: Optional[FiltroBusca] = None) -> str:
+        """Monta a URL da rota de dados (`_next/data`) da página de busca."""
+        return (
+            f"{self.base_url}/_next/data/{build_id}/"
+            f"{self.STORE_PATH}/busca/{termo_busca}.json?"
+            f"path0={self.STORE_PATH}&path2={termo_busca}"
+            + (f"&page={pagina}" if pagina > 1 else "")
+            # Mesma ordenação do "Menor preço" da vitrine
+            + ("&sortType=price&sortOrientation=asc" if filtro is not None and filtro.ordenacao == 'preco' else "")
+        )
+
+    def _descobrir_build_id(self) -> Optional[str]:
+        """Lê o build id atual do Next.js no HTML da vitrine da loja."""
+        response = self.session.get(f"{self.base_url}/{self.STORE_PATH}/", timeout=10)
+        response.raise_for_status()
+        for padrao in self._BUILD_ID_PATTERNS:
+            encontrado = padrao.search(response.text)
+            if encontrado:
+                return encontrado.group(1)
+        return None
+
+    def _obter_build_id(self) -> Tuple[str, int]:
+        """Retorna o build id em cache (descobrindo-o se expirado) e sua geração."""
+        if self._build_id and time.monotonic() < self._build_id_expira_em:
+            return self._build_id, self._build_id_geracao
+        return self._atualizar_build_id(self._build_id_geracao)
+
+    def _atualizar_build_id(self, geracao_vista: int) -> Tuple[str, int]:
+        """
+        Redescobre o build id sob um lock. Se outra thread já o atualizou depois da
+        geração `geracao_vista`, reaproveita o resultado sem consultar a vitrine de novo.
+        """
+        with self._build_id_lock:
+            if self._build_id and self._build_id_geracao != geracao_vista:
+                return self._build_id, self._build_id_geracao
+
+            try:
+                novo = self._descobrir_build_id()
+            except requests.exceptions.RequestException as e:
+                self.logger.warning("Falha ao descobrir o build id da Magalu: %s", e)
+                novo = None
+
+            agora = time.monotonic()
+            if novo:
+                if novo != self._build_id:
+                    self.logger.info("Build id da Magalu atualizado: %s -> %s", self._build_id, novo)
+                self._build_id = novo
+                self._build_id_expira_em = agora + self.build_id_ttl
+            else:
+                if not self._build_id:
+                    self._build_id = self.DEFAULT_BUILD_ID
+                self._build_id_expira_em = agora + min(self.build_id_ttl, self.BUILD_ID_RETRY_S)
+
+            self._build_id_geracao += 1
+            return self._build_id, self._build_id_geracao
+
+    def _get_busca(self, termo_busca: str, pagina: int = 1, prioridade: int = PRIORIDADE_INTERATIVA,
+                   condicional: bool = True, filtro: Optional[FiltroBusca] = None) -> requests.Response:
+        """
+        Faz a requisição à rota de dados. Um 404 indica que a Magalu fez um novo
+        deploy: o build id é atualizado uma única vez e a requisição é repetida.
+        """
+        build_id, geracao = self._obter_build_id()
+        response = self.http.get(
+            self._url_busca(termo_busca, build_id, pagina, filtro), prioridade=prioridade, condicional=condicional
+        )
+
+        if response.status_code == 404:
+            novo_build_id, _ = self._atualizar_build_id(geracao)
+            if novo_build_id != build_id:
+                response = self.http.get(
+                    self._url_busca(termo_busca, novo_build_id, pagina, filtro), prioridade=prioridade,
+                    condicional=condicional
+                )
+
+        return response
+
+    def buscar_pagina(self, termo_busca: str, pagina: int, prioridade: int = PRIORIDADE_INTERATIVA,
+                      filtro: Optional[FiltroBusca] = None) -> Tuple[List[Dict[str, Any]], int]:
+        """Busca uma página de resultados na Magalu."""
+        response = self._get_busca(termo_busca, pagina, prioridade, filtro=filtro)
+        return self._processar_resposta(
+            response, lambda: self._get_busca(termo_busca, pagina, prioridade, condicional=False, filtro=filtro),
+            filtro,
+        )
+
+    def aquecer(self) -> bool:
+        """Abre a conexão com a Magalu e valida se a rota `_next/data` ainda responde."""
         try:
-            api = (
-                f"https://www.magazinevoce.com.br/_next/data/6cijUACDhFQyBEGYnV_Mr/"
-                f"magazinemagalushopbr/busca/{termo_busca}.json?"
-                f"path0=magazinemagalushopbr&path2={termo_busca}"
-            )
+            response = self._get_busca('notebook', prioridade=PRIORIDADE_SEGUNDO_PLANO, condicional=False)
+            if response.status_code != 200 or 'pageProps' not in response.json():
+                self.logger.warning("Rota de dados da Magalu inválida (HTTP %s)", response.status_code)
+                return False
+            return True
+        except (requests.exceptions.RequestException, ValueError) as e:
+            self.logger.warning("Falha ao aquecer conexão com a Magalu: %s", e)
+            return False
 
-            response = requests.get(api, timeout=10)
-
-            response.raise_for_status()
-
-            data = response.json()
-
-            produtos_raw = data.get("pageProps", {}).get("data", {}).get("search", {}).get("products", [])
-            
-            produtos_processados = []
-            
-            for produto_raw in produtos_raw:
-                produto = {
-                    'id': produto_raw.get('id', ''),
-                    'name': produto_raw.get('title', 'Nome não disponível'),
-                    'url': produto_raw.get('url', ''),
-                    'imageUrl': produto_raw.get('image', ''),
-                    'brand': produto_raw.get('brand', {}).get('name', 'Marca não informada') if isinstance(produto_raw.get('brand'), dict) else 'Marca não informada',
-                    'description': produto_raw.get('description', ''),
-                    'availability': produto_raw.get('available', False)
-                }
-                
-                price_info = produto_raw.get('price', {})
-                if isinstance(price_info, dict):
-                    produto['price'] = price_info.get('bestPrice', price_info.get('price', 'Preço não informado'))
-                    produto['full_price'] = price_info.get('fullPrice', price_info.get('price', ''))
-                    produto['discount'] = price_info.get('discount', '0')
-                    produto['payment_method'] = price_info.get('paymentMethodDescription', '')
-                else:
-                    produto['price'] = 'Preço não informado'
-                    produto['full_price'] = ''
-                    produto['discount'] = '0'
-                    produto['payment_method'] = ''
-                
-                rating_info = produto_raw.get('rating', {})
-                if isinstance(rating_info, dict):
-                    produto['rating'] = {
-                        'average': rating_info.get('average', 0),
-                        'count': rating_info.get('count', 0)
-                    }
-                else:
-                    produto['rating'] = {'average': 0, 'count': 0}
-                
-                produtos_processados.append(produto)
-            
-            return produtos_processados
-
-        except requests.exceptions.RequestException as e:
-            print(f"Erro de requisição ao buscar o produto na Magalu: {e}")
-        except Exception:
-            print(f"Erro inesperado: {traceback.format_exc()}")
-
-
-class Kabuum(InteracaoLojasInterface):
+    @staticmethod
+    def _projetar_produto(produto_raw: Dict[str, Any]) -> Dict[str, Any]:
+        """Reduz um produto da Magalu aos campos usados pela normalização e pelas mensagens."""
+        produto = {
+            'id': produto_raw.get('id', ''),
+            'name': produto_raw.get('title', 'Nome não disponível'),
+            'url': produto_raw.get('url', ''),
+            'imageUrl': produto_raw.get('image', ''),
+            'brand': produto_raw.get('brand', {}).get('name', 'Marca não informada') if isinstance(produto_raw.get('brand'), dict) else 'Marca não informada',
+            'availability': produto_raw.get('available', False)
+        }
+        
+        price_info = produto_raw.get('price', {})
+        if isinstance(price_info, dict):
+            produto['price'] = price_info.get('bestPrice', price_info.get('price', 'Preço não informado'))
+            produto['full_price'] = price_info.get('fullPrice', price_info.get('price', ''))
+            produto['discount'] = price_info.get('discount', '0')
+            produto['payment_method'] = price_info.get('paymentMethodDescription', '')
+        else:
+            produto['price'] = 'Preço não informado'
+            produto['full_price'] = ''
+            produto['discount'] = '0'
+            produto['payment_method'] = ''
+        
+        rating_info = produto_raw.get('rating', {})
+        if isinstance(rating_info, dict):
+            produto['rating'] = {
+                'average': rating_info.get('average', 0),
+                'count': rating_info.get('count', 0)
+            }
+        else:
+            produto['rating'] = {'average': 0, 'count': 0}
+        
+        return produto
+
+
+class Kabuum(LojaPaginada):
     """Classe concreta para buscar produtos na Kabum via API pública."""
 
-    def buscar_produtos(self, termo_busca: str):
-        """Busca produtos na loja Kabum usando o termo informado."""
+    BASE_URL = "https://servicespub.prod.api.aws.grupokabum.com.br"
+
+    HEADERS = {
+        'Accept': '*/*',
+        'Accept-Encoding': 'gzip, deflate, br, zstd',
+        'Accept-Language': 'pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7',
+        'Origin': 'https://www.kabum.com.br',
+        'Referer': 'https://www.kabum.com.br/',
+        'Sec-Fetch-Dest': 'empty',
+        'Sec-Fetch-Mode': 'cors',
+        'Sec-Fetch-Site': 'cross-site',
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36',
+        'Client-Id': 'kabum',
+    }
+
+    NOME = 'Kabum'
+    PAGE_SIZE = 20
+    CAMINHO_PRODUTOS = ('data',)
+    CAMINHO_PAGINAS = ('meta', 'total_pages_count')
+
+    def __init__(self, base_url: Optional[str] = None, **kwargs):
+        """
+        Args:
+            base_url: Host da API (permite apontar para um servidor local nos benchmarks)
+            **kwargs: Parâmetros de paginação, estado compartilhado e pool de `LojaPaginada`
+        """
+        super().__init__(**kwargs)
+        self.base_url = (base_url or self.BASE_URL).rstrip('/')
+        # Id de sessão próprio de cada instância, em vez de um valor fixo compartilhado
+        self.headers = {**self.HEADERS, 'Session': secrets.token_hex(16)}
+
+    def _url_busca(self, termo_busca: str, pagina: int = 1, filtro: Optional[FiltroBusca] = None) -> str:
+        """Monta a URL da busca no catálogo completo da Kabum (não apenas os patrocinados)."""
+        ordenacao = 'price' if filtro is not None and filtro.ordenacao == 'preco' else 'most_searched'
+        return (
+            f"{self.base_url}/catalog/v2/products?query={termo_busca}"
+            f"&page_number={pagina}&page_size={self.PAGE_SIZE}&sort={ordenacao}"
+        )
+
+    def buscar_pagina(self, termo_busca: str, pagina: int, prioridade: int = PRIORIDADE_INTERATIVA,
+                      filtro: Optional[FiltroBusca] = None) -> Tuple[List[Dict[str, Any]], int]:
+        """Busca uma página de resultados no catálogo da Kabum."""
+        url = self._url_busca(termo_busca, pagina, filtro)
+        response = self.http.get(url, prioridade=prioridade, headers=self.headers)
+        produtos, total_paginas = self._processar_resposta(
+            response, lambda: self.http.get(url, prioridade=prioridade, condicional=False, headers=self.headers),
+            filtro,
+        )
+
+        self.logger.debug(
+            "Kabum respondeu %s com %d produtos para '%s' (página %d)",
+            response.status_code, len(produtos), termo_busca, pagina
+        )
+        if not produtos and pagina == 1:
+            self.logger.debug(
+                "Kabum sem produtos para '%s' (%d bytes na resposta)",
+                termo_busca, len(response.content)
+            )
+
+        return produtos, total_paginas
+
+    def aquecer(self) -> bool:
+        """Abre a conexão com a API da Kabum e valida o formato da resposta."""
         try:
-            url = f"https://servicespub.prod.api.aws.grupokabum.com.br/catalog/v2/sponsored_products?query={termo_busca}&context=search"
-            
-            headers = {
-                'Accept': '*/*',
-                'Accept-Encoding': 'gzip, deflate, br, zstd',
-                'Accept-Language': 'pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7',
-                'Origin': 'https://www.kabum.com.br',
-                'Referer': 'https://www.kabum.com.br/',
-                'Sec-Fetch-Dest': 'empty',
-                'Sec-Fetch-Mode': 'cors',
-                'Sec-Fetch-Site': 'cross-site',
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36',
-                'Client-Id': 'kabum',
-                'Session': 'c191668c71a88c3b61ab232316e549a4'
+            response = self.http.get(
+                self._url_busca('notebook'), prioridade=PRIORIDADE_SEGUNDO_PLANO, condicional=False, headers=self.headers
+            )
+            if response.status_code != 200 or 'data' not in response.json():
+                self.logger.warning("API da Kabum respondeu de forma inesperada (HTTP %s)", response.status_code)
+                return False
+            return True
+        except (requests.exceptions.RequestException, ValueError) as e:
+            self.logger.warning("Falha ao aquecer conexão com a Kabum: %s", e)
+            return False
+
+    @staticmethod
+    def _projetar_produto(produto_raw: Dict[str, Any]) -> Dict[str, Any]:
+        """Reduz um produto da Kabum aos campos usados (a descrição, longa e nunca exibida, fica de fora)."""
+        attributes = produto_raw.get('attributes', {})
+        
+        produto = {
+            'id': produto_raw.get('id', ''),
+            'name': attributes.get('title', 'Nome não disponível'),
+            'url': f"https://www.kabum.com.br/produto/{produto_raw.get('id')}/{attributes.get('product_link', '')}",
+            'imageUrl': attributes.get('images', [''])[0] if attributes.get('images') else '',
+            'brand': attributes.get('manufacturer', {}).get('name', 'Marca não informada'),
+            'availability': attributes.get('available', False)
+        }
+
+        price = attributes.get('price', 0)
+        price_with_discount = attributes.get('price_with_discount', 0)
+        old_price = attributes.get('old_price', 0)
+        
+        produto['price'] = price_with_discount if price_with_discount > 0 else price
+        produto['full_price'] = old_price if old_price > 0 else price
+        
+        # Calcular desconto
+        if old_price > 0 and price_with_discount > 0:
+            desconto = ((old_price - price_with_discount) / old_price) * 100
+            produto['discount'] = round(desconto, 2)
+        elif price > 0 and price_with_discount > 0 and price > price_with_discount:
+            desconto = ((price - price_with_discount) / price) * 100
+            produto['discount'] = round(desconto, 2)
+        else:
+            produto['discount'] = 0
+
+        produto['rating'] = {
+            'average': attributes.get('score_of_ratings', 0),
+            'count': attributes.get('number_of_ratings', 0)
+        }
+        produto['installment'] = attributes.get('max_installment', '')
+        
+        offer = attributes.get('offer')
+        if offer:
+            produto['offer'] = {
+                'name': offer.get('name', ''),
+                'price': offer.get('price_with_discount', offer.get('price', 0)),
+                'discount_percentage': offer.get('discount_percentage', 0)
             }
-            
-            response = requests.get(url, headers=headers, timeout=10)
-            response.raise_for_status()
-
-            data = response.json()
-            
-            print("Status da resposta:", response.status_code)
-            print("Chaves na resposta:", list(data.keys()) if isinstance(data, dict) else "Não é dict")
-            
-            produtos_raw = data.get("data", [])
-            print(f"Número de produtos encontrados: {len(produtos_raw)}")
-            
-            if len(produtos_raw) == 0:
-                print("Array de produtos está vazio")
-                print("Conteúdo completo da resposta:")
-                import json
-                print(json.dumps(data, indent=2)[:500] + "..." if len(str(data)) > 500 else json.dumps(data, indent=2))
-
-            produtos_processados = []
-
-            for produto_raw in produtos_raw:
-                attributes = produto_raw.get('attributes', {})
-                
-                produto = {
-                    'id': produto_raw.get('id', ''),
-                    'name': attributes.get('title', 'Nome não disponível'),
-                    'url': f"https://www.kabum.com.br/produto/{produto_raw.get('id')}/{attributes.get('product_link', '')}",
-                    'imageUrl': attributes.get('images', [''])[0] if attributes.get('images') else '',
-                    'brand': attributes.get('manufacturer', {}).get('name', 'Marca não informada'),
-                    'description': attributes.get('description', ''),
-                    'availability': attributes.get('available', False)
-                }
-
-                price = attributes.get('price', 0)
-                price_with_discount = attributes.get('price_with_discount', 0)
-                old_price = attributes.get('old_price', 0)
-                
-                produto['price'] = price_with_discount if price_with_discount > 0 else price
-                produto['full_price'] = old_price if old_price > 0 else price
-                
-                # Calcular desconto
-                if old_price > 0 and price_with_discount > 0:
-                    desconto = ((old_price - price_with_discount) / old_price) * 100
-                    produto['discount'] = round(desconto, 2)
-                elif price > 0 and price_with_discount > 0 and price > price_with_discount:
-                    desconto = ((price - price_with_discount) / price) * 100
-                    produto['discount'] = round(desconto, 2)
-                else:
-                    produto['discount'] = 0
-
-                produto['rating'] = {
-                    'average': attributes.get('score_of_ratings', 0),
-                    'count': attributes.get('number_of_ratings', 0)
-                }
-                produto['installment'] = attributes.get('max_installment', '')
-                
-                offer = attributes.get('offer')
-                if offer:
-                    produto['offer'] = {
-                        'name': offer.get('name', ''),
-                        'price': offer.get('price_with_discount', offer.get('price', 0)),
-                        'discount_percentage': offer.get('discount_percentage', 0)
-                    }
-
-                produtos_processados.append(produto)
-
-            return produtos_processados
-
-        except requests.exceptions.RequestException as e:
-            print(f"Erro de requisição ao buscar produto na Kabum: {e}")
-        except Exception:
-            print(f"Erro inesperado: {traceback.format_exc()}")
+
+        return produto
@@ -0,0 +1,348 @@
+"""
+Orçamento de memória do processo: contabilidade dos caches, sessões e buffers e
+descarte adaptativo quando o total passa do orçamento.
+
+Cada estrutura limitada do bot (cache de buscas, sessões dos chats, cache de
+fragmentos das mensagens, mapa de `file_id`, mensagens recebidas...) se registra no
+governador com um nível de valor. A cada `intervalo_s` o governador estima os bytes
+de cada uma (tamanho profundo de uma amostra das entradas, extrapolado para todas) e
+publica os valores nas métricas. Se a soma passar de `orcamento_bytes`, entradas são
+descartadas a partir do nível mais baixo (o mais barato de refazer) até o total
+voltar a `ALVO` do orçamento; dentro de um nível, cada componente perde a mesma
+fração, calculada a partir do excesso medido naquela verificação.
+
+Um componente é qualquer objeto com três métodos:
+
+- `bytes_aproximados() -> int`: tamanho estimado (ex: com `estimar_bytes`);
+- `descartar(fracao: float) -> int`: descarta essa fração das entradas, começando
+  pelas menos úteis, e devolve quantas saíram;
+- `conteudo() -> Any`: cópia rasa das entradas (usada apenas no modo de depuração).
+
+As estimativas contam uma vez os objetos repetidos dentro da amostra, mas não entre
+componentes (o mesmo produto no cache de buscas e nos resultados de reserva conta nos
+dois), então tendem a ficar acima do real. No modo de depuração o tracemalloc é
+ligado e cada verificação reconstrói o conteúdo de cada componente (pickle), medindo
+o que a cópia aloca: o tamanho medido sai nas métricas ao lado do estimado.
+"""
+
+import math
+import pickle
+import sys
+import threading
+import tracemalloc
+import weakref
+from collections import deque
+from typing import Any, Dict, List, Optional, Sequence
+
+from config.logger import BotLogger
+from config.settings import get_config
+from services.metricas import get_metricas
+
+# Níveis de valor, do mais barato de perder ao mais caro (o descarte segue esta ordem)
+NIVEL_BUFFERS = 0     # histórico de entrada (ex: mensagens recebidas)
+NIVEL_DERIVADOS = 1   # refeito localmente sem I/O (fragmentos de mensagem, páginas decodificadas)
+NIVEL_RESERVA = 2     # resultados antigos guardados para quando uma loja cai
+NIVEL_MIDIA = 3       # `file_id` das fotos (perder obriga o Telegram a baixar a imagem de novo)
+NIVEL_BUSCAS = 4      # resultados de busca (perder obriga a consultar as lojas de novo)
+NIVEL_SESSOES = 5     # sessões dos chats (perder apaga o contexto do usuário)
+
+NOMES_NIVEIS = {
+    NIVEL_BUFFERS: 'buffers',
+    NIVEL_DERIVADOS: 'derived',
+    NIVEL_RESERVA: 'fallback',
+    NIVEL_MIDIA: 'media',
+    NIVEL_BUSCAS: 'search',
+    NIVEL_SESSOES: 'sessions',
+}
+
+# Fração do orçamento a que o total volta depois de um descarte (evita descartar a cada verificação)
+ALVO = 0.9
+
+# Diferença entre estimado e medido abaixo da qual o modo de depuração não registra aviso
+_TOLERANCIA_BYTES = 64 * 1024
+
+_ESCALARES = (str, bytes, bytearray, int, float, bool, type(None))
+
+
+def tamanho_profundo(objeto: Any, vistos: Optional[set] = None, max_profundidade: int = 8,
+                     amostra: int = 16) -> int:
+    """
+    Bytes ocupados pelo objeto e pelo que ele contém (dicts, listas, tuplas, conjuntos e deques).
+
+    Sequências com mais de `amostra` itens (ex: a lista de produtos de um resultado) são
+    medidas por uma amostra de itens espaçados igualmente, extrapolada para todos.
+
+    Args:
+        objeto: Objeto medido
+        vistos: Ids já contados (compartilhe entre chamadas para não contar um objeto duas vezes)
+        max_profundidade: Níveis de aninhamento percorridos
+        amostra: Itens medidos em cada sequência longa
+
+    Returns:
+        Soma estimada de `sys.getsizeof` dos objetos alcançados
+    """
+    if vistos is None:
+        vistos = set()
+    if id(objeto) in vistos:
+        return 0
+    vistos.add(id(objeto))
+    total = sys.getsizeof(objeto)
+    if isinstance(objeto, _ESCALARES) or max_profundidade <= 0:
+        return total
+    if isinstance(objeto, dict):
+        for chave, valor in objeto.items():
+            total += tamanho_profundo(chave, vistos, max_profundidade - 1, amostra)
+            total += tamanho_profundo(valor, vistos, max_profundidade - 1, amostra)
+    elif isinstance(objeto, (list, tuple, set, frozenset, deque)):
+        itens = objeto if isinstance(objeto, (list, tuple)) else list(objeto)
+        medidos = itens[::max(1, len(itens) // amostra)][:amostra]
+        if medidos:
+            soma = sum(tamanho_profundo(item, vistos, max_profundidade - 1, amostra) for item in medidos)
+            total += int(soma * len(itens) / len(medidos))
+    return total
+
+
+def estimar_bytes(itens: Sequence[Any], amostra: int = 32) -> int:
+    """
+    Bytes estimados de uma coleção de entradas: tamanho profundo de até `amostra`
+    entradas espaçadas igualmente, extrapolado para todas.
+
+    Args:
+        itens: Entradas (ex: pares chave/valor de um cache)
+        amostra: Entradas medidas
+
+    Returns:
+        Estimativa em bytes (exata se houver até `amostra` entradas)
+    """
+    total = len(itens)
+    if not total:
+        return 0
+    passo = max(1, total // amostra)
+    medidos = itens[::passo][:amostra]
+    vistos: set = set()
+    return int(sum(tamanho_profundo(item, vistos) for item in medidos) * total / len(medidos))
+
+
+class FilaLimitada(deque):
+    """`deque` com `maxlen` que se reporta ao governador (buffers de entrada, ex: mensagens recebidas)."""
+
+    def bytes_aproximados(self) -> int:
+        """Tamanho estimado das entradas em bytes."""
+        return sys.getsizeof(self) + estimar_bytes(list(self))
+
+    def descartar(self, fracao: float) -> int:
+        """Descarta a fração `fracao` das entradas, começando pelas mais antigas.
+
+        Returns:
+            Entradas descartadas
+        """
+        quantidade = math.ceil(len(self) * fracao)
+        descartadas = 0
+        while descartadas < quantidade and self:
+            self.popleft()
+            descartadas += 1
+        return descartadas
+
+    def conteudo(self) -> List[Any]:
+        """Cópia rasa das entradas."""
+        return list(self)
+
+
+class GovernadorMemoria:
+    """Contabilidade dos componentes registrados e descarte por nível para manter o orçamento."""
+
+    def __init__(self, orcamento_bytes: int = 0, intervalo_s: float = 10.0, depurar: bool = False):
+        """
+        Args:
+            orcamento_bytes: Orçamento do total estimado dos componentes (0 apenas contabiliza)
+            intervalo_s: Intervalo entre verificações da thread do governador (0 não cria a thread)
+            depurar: Liga o tracemalloc e mede o conteúdo de cada componente a cada verificação
+        """
+        self.orcamento_bytes = orcamento_bytes
+        self.intervalo_s = intervalo_s
+        self.depurar = depurar
+        self.logger = BotLogger(__name__).get_logger()
+        self.metricas = get_metricas()
+        self.metricas.descrever('memory_budget_bytes', 'Orçamento de memória dos caches, sessões e buffers')
+        self.metricas.descrever('memory_used_bytes', 'Total estimado dos componentes registrados')
+        self.metricas.descrever('memory_component_bytes', 'Bytes estimados por componente')
+        self.metricas.descrever('memory_evictions_total', 'Entradas descartadas para manter o orçamento, por componente')
+        self.metricas.descrever('memory_checks_total', 'Verificações do orçamento, por resultado')
+        self.metricas.definir('memory_budget_bytes', orcamento_bytes)
+        # Nome -> (referência fraca ao componente, nível): um componente descartado sai do registro sozinho
+        self._componentes: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+        self._verificacao = threading.Lock()
+        self._ultimo: Dict[str, Dict[str, Any]] = {}
+        self._descartes: Dict[str, int] = {}
+        self._parar = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        if depurar:
+            self.metricas.descrever('memory_component_measured_bytes',
+                                    'Bytes medidos com tracemalloc por componente (modo de depuração)')
+            self.metricas.descrever('memory_traced_bytes', 'Memória alocada pelo Python segundo o tracemalloc')
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+
+    def registrar(self, nome: str, componente: Any, nivel: int):
+        """
+        Passa a contabilizar o componente (um nome já registrado é substituído).
+
+        Args:
+            nome: Nome do componente (rótulo das métricas, ex: 'search_cache')
+            componente: Objeto com `bytes_aproximados`, `descartar` e `conteudo`
+            nivel: Nível de valor (`NIVEL_*`); os mais baixos são descartados primeiro
+
+        Raises:
+            ValueError: Se o nível for desconhecido
+        """
+        if nivel not in NOMES_NIVEIS:
+            raise ValueError(f"nível de memória desconhecido: {nivel}")
+        with self._lock:
+            self._componentes[nome] = (weakref.ref(componente), nivel)
+
+    def _vivos(self) -> List[tuple]:
+        with self._lock:
+            vivos = []
+            for nome, (referencia, nivel) in list(self._componentes.items()):
+                componente = referencia()
+                if componente is None:
+                    del self._componentes[nome]
+                else:
+                    vivos.append((nome, componente, nivel))
+        return vivos
+
+    def _estimar(self, nome: str, componente: Any) -> int:
+        try:
+            return int(componente.bytes_aproximados())
+        except Exception as e:
+            self.logger.warning("Não foi possível estimar a memória de %s: %s", nome, e)
+            return 0
+
+    @staticmethod
+    def _medir(componente: Any) -> Optional[int]:
+        """Bytes alocados ao reconstruir o conteúdo do componente (com o tracemalloc ligado)."""
+        try:
+            serializado = pickle.dumps(componente.conteudo(), pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            return None
+        antes = tracemalloc.get_traced_memory()[0]
+        copia = pickle.loads(serializado)
+        medido = tracemalloc.get_traced_memory()[0] - antes
+        del copia
+        return medido
+
+    def verificar(self) -> Dict[str, Any]:
+        """
+        Estima os componentes, publica as métricas e, acima do orçamento, descarta a partir do nível mais baixo.
+
+        Returns:
+            Dict com o total antes e depois ('used_bytes', 'after_bytes') e as entradas
+            descartadas por componente ('evicted')
+        """
+        with self._verificacao:
+            vivos = self._vivos()
+            usos = {nome: self._estimar(nome, componente) for nome, componente, _ in vivos}
+            total = sum(usos.values())
+            descartadas: Dict[str, int] = {}
+
+            if self.orcamento_bytes and total > self.orcamento_bytes:
+                excesso = total - int(self.orcamento_bytes * ALVO)
+                for nivel in sorted({nivel for _, _, nivel in vivos}):
+                    do_nivel = [(nome, componente) for nome, componente, n in vivos if n == nivel and usos[nome]]
+                    uso_nivel = sum(usos[nome] for nome, _ in do_nivel)
+                    if not uso_nivel:
+                        continue
+                    fracao = min(1.0, excesso / uso_nivel)
+                    for nome, componente in do_nivel:
+                        try:
+                            descartadas[nome] = componente.descartar(fracao)
+                        except Exception as e:
+                            self.logger.warning("Não foi possível descartar entradas de %s: %s", nome, e)
+                            continue
+                        # O que saiu é medido de novo, não presumido pela fração
+                        novo = self._estimar(nome, componente)
+                        excesso -= usos[nome] - novo
+                        usos[nome] = novo
+                    if excesso <= 0:
+                        break
+                depois = sum(usos.values())
+                self.logger.warning(
+                    "Orçamento de memória excedido (%d de %d bytes): %d bytes liberados, descartes %s",
+                    total, self.orcamento_bytes, total - depois, descartadas,
+                )
+                self.metricas.incrementar('memory_checks_total', outcome='evicted')
+            else:
+                self.metricas.incrementar('memory_checks_total', outcome='ok')
+
+            ultimo: Dict[str, Dict[str, Any]] = {}
+            for nome, componente, nivel in vivos:
+                rotulos = {'component': nome, 'tier': NOMES_NIVEIS[nivel]}
+                self.metricas.definir('memory_component_bytes', usos[nome], **rotulos)
+                ultimo[nome] = {'tier': NOMES_NIVEIS[nivel], 'bytes': usos[nome]}
+                if descartadas.get(nome):
+                    self._descartes[nome] = self._descartes.get(nome, 0) + descartadas[nome]
+                    self.metricas.incrementar('memory_evictions_total', descartadas[nome], component=nome)
+                if self.depurar:
+                    medido = self._medir(componente)
+                    if medido is not None:
+                        ultimo[nome]['measured_bytes'] = medido
+                        self.metricas.definir('memory_component_measured_bytes', medido, **rotulos)
+                        if abs(usos[nome] - medido) > max(medido / 2, _TOLERANCIA_BYTES):
+                            self.logger.info("Estimativa de memória de %s fora do medido: %d estimados, %d medidos",
+                                             nome, usos[nome], medido)
+            self.metricas.definir('memory_used_bytes', sum(usos.values()))
+            if self.depurar:
+                self.metricas.definir('memory_traced_bytes', tracemalloc.get_traced_memory()[0])
+            self._ultimo = ultimo
+            return {'used_bytes': total, 'after_bytes': sum(usos.values()), 'evicted': descartadas}
+
+    def _laco(self):
+        while not self._parar.wait(self.intervalo_s):
+            try:
+                self.verificar()
+            except Exception as e:
+                self.logger.error("Erro ao verificar o orçamento de memória: %s", e)
+
+    def iniciar(self):
+        """Começa as verificações periódicas em uma thread daemon."""
+        if self._thread is None and self.intervalo_s > 0:
+            self._parar.clear()
+            self._thread = threading.Thread(target=self._laco, name='memoria', daemon=True)
+            self._thread.start()
+
+    def parar(self):
+        """Encerra as verificações periódicas."""
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Orçamento, uso por componente na última verificação e entradas já descartadas."""
+        ultimo = self._ultimo
+        return {
+            'budget_bytes': self.orcamento_bytes,
+            'used_bytes': sum(item['bytes'] for item in ultimo.values()),
+            'components': ultimo,
+            'evictions': dict(self._descartes),
+            'tracemalloc': self.depurar,
+        }
+
+
+_governador: Optional[GovernadorMemoria] = None
+_governador_lock = threading.Lock()
+
+
+def get_governador() -> GovernadorMemoria:
+    """Governador do processo atual (`MEMORY_BUDGET_MB`), com as verificações já iniciadas."""
+    global _governador
+    if _governador is None:
+        with _governador_lock:
+            if _governador is None:
+                config = get_config()
+                _governador = GovernadorMemoria(config.MEMORY_BUDGET_MB * 1024 * 1024,
+                                                config.MEMORY_CHECK_INTERVAL_S, config.MEMORY_DEBUG_TRACEMALLOC)
+                _governador.iniciar()
+    return _governador
+
@@ -0,0 +1,92 @@
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+Rotulos = Tuple[Tuple[str, str], ...]
+
+
+class Metricas:
+    """Registro em memória de contadores e medidores (gauges) da aplicação.
+
+    Cada métrica pode ter rótulos (ex: `store="kabum"`). O conteúdo pode ser lido
+    como dicionário (`snapshot`) ou no formato texto do Prometheus (`exportar_prometheus`).
+    """
+
+    def __init__(self):
+        self._contadores: Dict[str, Dict[Rotulos, float]] = {}
+        self._medidores: Dict[str, Dict[Rotulos, float]] = {}
+        self._descricoes: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _rotulos(rotulos: Dict[str, Any]) -> Rotulos:
+        return tuple(sorted((chave, str(valor)) for chave, valor in rotulos.items()))
+
+    def descrever(self, nome: str, descricao: str):
+        """Registra a descrição de uma métrica (linha `# HELP` na exportação)."""
+        with self._lock:
+            self._descricoes[nome] = descricao
+
+    def incrementar(self, nome: str, valor: float = 1, **rotulos):
+        """Soma `valor` a um contador."""
+        chave = self._rotulos(rotulos)
+        with self._lock:
+            serie = self._contadores.setdefault(nome, {})
+            serie[chave] = serie.get(chave, 0) + valor
+
+    def definir(self, nome: str, valor: float, **rotulos):
+        """Define o valor atual de um medidor."""
+        chave = self._rotulos(rotulos)
+        with self._lock:
+            self._medidores.setdefault(nome, {})[chave] = valor
+
+    def valor(self, nome: str, **rotulos) -> Optional[float]:
+        """Valor atual de um contador ou medidor (None se ainda não registrado)."""
+        chave = self._rotulos(rotulos)
+        with self._lock:
+            for tipo in (self._contadores, self._medidores):
+                if nome in tipo and chave in tipo[nome]:
+                    return tipo[nome][chave]
+        return None
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """Cópia de todas as métricas: {nome: {'rotulo=valor,...': valor}}."""
+        with self._lock:
+            series = {**self._contadores, **self._medidores}
+            return {
+                nome: {','.join(f'{k}={v}' for k, v in chave): valor for chave, valor in serie.items()}
+                for nome, serie in series.items()
+            }
+
+    def exportar_prometheus(self) -> str:
+        """Métricas no formato texto de exposição do Prometheus."""
+        linhas = []
+        with self._lock:
+            for tipo, series in (('counter', self._contadores), ('gauge', self._medidores)):
+                for nome in sorted(series):
+                    if nome in self._descricoes:
+                        linhas.append(f'# HELP {nome} {self._descricoes[nome]}')
+                    linhas.append(f'# TYPE {nome} {tipo}')
+                    for chave, valor in sorted(series[nome].items()):
+                        rotulos = ','.join(f'{k}="{v}"' for k, v in chave)
+                        linhas.append(f'{nome}{{{rotulos}}} {valor}' if rotulos else f'{nome} {valor}')
+        return '\n'.join(linhas) + '\n'
+
+    def limpar(self):
+        """Remove todas as métricas (útil entre execuções de benchmark)."""
+        with self._lock:
+            self._contadores.clear()
+            self._medidores.clear()
+
+
+_metricas: Optional[Metricas] = None
+_metricas_lock = threading.Lock()
+
+
+def get_metricas() -> Metricas:
+    """Retorna o registro global de métricas, criando-o no primeiro uso."""
+    global _metricas
+    if _metricas is None:
+        with _metricas_lock:
+            if _metricas is None:
+                _metricas = Metricas()
+    return _metricas
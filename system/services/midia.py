@@ -0,0 +1,255 @@
+"""
+Envio das fotos dos produtos em álbuns (media group) com reaproveitamento de `file_id`.
+
+Na primeira vez que a imagem de um produto é enviada, o Telegram baixa a URL e
+devolve um `file_id`; ele é guardado em um mapa persistente (SQLite) e limitado,
+chaveado pela URL da imagem. Envios seguintes da mesma imagem usam o `file_id`,
+sem novo download. URLs que o Telegram não consegue baixar ficam marcadas como
+mortas por um tempo e o produto é enviado como texto.
+"""
+
+import math
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from telegram import Bot, InputMediaPhoto, Message
+from telegram.error import BadRequest
+
+from config.logger import BotLogger
+from services.cache import TTLCache
+from services.memoria import estimar_bytes
+from services.metricas import get_metricas
+
+# Limites da Bot API: um álbum tem de 2 a 10 itens e legendas de até 1024 caracteres
+MAX_ITENS_ALBUM = 10
+MAX_LEGENDA = 1024
+
+
+class MapaFileIds:
+    """Mapa URL da imagem -> `file_id` do Telegram, limitado e persistido em SQLite.
+
+    As consultas são atendidas pela cópia em memória (LRU); o arquivo só é escrito
+    quando um `file_id` novo é registrado ou removido. Com `caminho` vazio o mapa
+    fica apenas em memória.
+    """
+
+    def __init__(self, caminho: str = '', max_entradas: int = 10000):
+        """
+        Args:
+            caminho: Arquivo SQLite (criado se não existir; vazio mantém o mapa só em memória)
+            max_entradas: Máximo de imagens guardadas (as usadas há mais tempo são descartadas)
+        """
+        self.max_entradas = max_entradas
+        self._lock = threading.Lock()
+        self._dados: 'OrderedDict[str, str]' = OrderedDict()
+        self._conexao: Optional[sqlite3.Connection] = None
+
+        if caminho:
+            os.makedirs(os.path.dirname(os.path.abspath(caminho)), exist_ok=True)
+            self._conexao = sqlite3.connect(caminho, check_same_thread=False, isolation_level=None)
+            self._conexao.execute('PRAGMA journal_mode=WAL')
+            self._conexao.execute('PRAGMA synchronous=NORMAL')
+            self._conexao.execute(
+                'CREATE TABLE IF NOT EXISTS file_ids (url TEXT PRIMARY KEY, file_id TEXT NOT NULL, '
+                'gravado_em REAL NOT NULL)'
+            )
+            for url, file_id in self._conexao.execute(
+                'SELECT url, file_id FROM file_ids ORDER BY gravado_em DESC LIMIT ?', (max_entradas,)
+            ).fetchall()[::-1]:
+                self._dados[url] = file_id
+
+    def get(self, url: str) -> Optional[str]:
+        """`file_id` da imagem, ou None se ela ainda não foi enviada."""
+        with self._lock:
+            file_id = self._dados.get(url)
+            if file_id is not None:
+                self._dados.move_to_end(url)
+            return file_id
+
+    def set(self, url: str, file_id: str):
+        """Registra o `file_id` devolvido pelo Telegram para a URL."""
+        with self._lock:
+            if self._dados.get(url) == file_id:
+                return
+            self._dados[url] = file_id
+            self._dados.move_to_end(url)
+            descartadas = []
+            while len(self._dados) > self.max_entradas:
+                descartadas.append(self._dados.popitem(last=False)[0])
+            if self._conexao is not None:
+                self._conexao.execute(
+                    'INSERT OR REPLACE INTO file_ids (url, file_id, gravado_em) VALUES (?, ?, ?)',
+                    (url, file_id, time.time()),
+                )
+                if descartadas:
+                    self._conexao.executemany('DELETE FROM file_ids WHERE url = ?', [(u,) for u in descartadas])
+
+    def remover(self, url: str):
+        """Esquece o `file_id` da URL (ex: recusado pelo Telegram)."""
+        with self._lock:
+            self._dados.pop(url, None)
+            if self._conexao is not None:
+                self._conexao.execute('DELETE FROM file_ids WHERE url = ?', (url,))
+
+    def __len__(self) -> int:
+        return len(self._dados)
+
+    def bytes_aproximados(self) -> int:
+        """Tamanho estimado da cópia em memória, em bytes."""
+        with self._lock:
+            itens = list(self._dados.items())
+            tamanho = sys.getsizeof(self._dados)
+        return tamanho + estimar_bytes(itens)
+
+    def descartar(self, fracao: float) -> int:
+        """Tira da memória a fração `fracao` das imagens usadas há mais tempo.
+
+        O SQLite não é alterado: as imagens voltam a ser conhecidas ao reiniciar o processo.
+
+        Returns:
+            Entradas descartadas
+        """
+        with self._lock:
+            quantidade = min(math.ceil(len(self._dados) * fracao), len(self._dados))
+            for _ in range(quantidade):
+                self._dados.popitem(last=False)
+            return quantidade
+
+    def conteudo(self) -> List[Tuple[str, str]]:
+        """Cópia rasa da cópia em memória (URL, `file_id`)."""
+        with self._lock:
+            return list(self._dados.items())
+
+    def fechar(self):
+        """Fecha o arquivo SQLite."""
+        with self._lock:
+            if self._conexao is not None:
+                self._conexao.close()
+                self._conexao = None
+
+
+class EnviadorAlbuns:
+    """Envia o top da busca como álbum de fotos, reaproveitando os `file_id` já conhecidos."""
+
+    def __init__(self, bot: Bot, mapa: MapaFileIds, parse_mode: Optional[str] = None,
+                 ttl_url_morta: float = 3600.0):
+        """
+        Args:
+            bot: Bot usado nos envios
+            mapa: Mapa persistente URL -> `file_id`
+            parse_mode: Formatação das legendas
+            ttl_url_morta: Tempo (s) em que uma URL que falhou não é tentada de novo
+        """
+        self.bot = bot
+        self.mapa = mapa
+        self.parse_mode = parse_mode
+        self.logger = BotLogger(__name__).get_logger()
+        self.metricas = get_metricas()
+        self.urls_mortas = TTLCache(4096, ttl_url_morta)
+        self.contadores: Dict[str, int] = {'reused': 0, 'uploaded': 0, 'dead_urls': 0, 'text_fallbacks': 0}
+        for contador, descricao in (
+            ('reused', 'Fotos enviadas com file_id já conhecido (sem download)'),
+            ('uploaded', 'Fotos enviadas por URL (baixadas pelo Telegram)'),
+            ('dead_urls', 'URLs de imagem que o Telegram não conseguiu baixar'),
+            ('text_fallbacks', 'Produtos enviados como texto por falta de imagem válida'),
+        ):
+            self.metricas.descrever(f'telegram_media_{contador}_total', descricao)
+        self.metricas.descrever('telegram_media_reuse_rate', 'Fração das fotos enviadas com file_id já conhecido')
+
+    def _contar(self, nome: str, valor: int = 1):
+        if valor:
+            self.contadores[nome] += valor
+            self.metricas.incrementar(f'telegram_media_{nome}_total', valor)
+
+    def _midia(self, url: str, legenda: str) -> Tuple[InputMediaPhoto, bool]:
+        """Item do álbum para a URL e se ele usa um `file_id` conhecido."""
+        file_id = self.mapa.get(url)
+        return (
+            InputMediaPhoto(media=file_id or url, caption=legenda, parse_mode=self.parse_mode),
+            file_id is not None,
+        )
+
+    def _registrar(self, url: str, mensagem: Message, reaproveitado: bool):
+        if reaproveitado:
+            self._contar('reused')
+        elif mensagem.photo:
+            # A maior resolução vem por último
+            self.mapa.set(url, mensagem.photo[-1].file_id)
+            self._contar('uploaded')
+
+    async def _enviar_foto(self, chat_id: int, url: str, legenda: str) -> bool:
+        """Envia uma foto avulsa; um `file_id` recusado é esquecido e a URL é tentada."""
+        midia, reaproveitado = self._midia(url, legenda)
+        try:
+            mensagem = await self.bot.send_photo(chat_id=chat_id, photo=midia.media, caption=midia.caption,
+                                                 parse_mode=self.parse_mode)
+        except BadRequest as e:
+            if reaproveitado:
+                self.logger.warning("file_id recusado para %s: %s", url, e)
+                self.mapa.remover(url)
+                return await self._enviar_foto(chat_id, url, legenda)
+            self.logger.warning("Imagem indisponível (%s): %s", url, e)
+            self.urls_mortas.set(url, True)
+            self._contar('dead_urls')
+            return False
+        self._registrar(url, mensagem, reaproveitado)
+        return True
+
+    async def enviar(self, chat_id: int, itens: Sequence[Tuple[str, str]]) -> List[int]:
+        """
+        Envia os itens como álbum (ou foto avulsa, se houver um só com imagem).
+
+        Args:
+            chat_id: Chat de destino
+            itens: (URL da imagem, legenda) de cada produto, na ordem de exibição
+
+        Returns:
+            Índices dos itens que não puderam ser enviados como foto (sem imagem,
+            URL morta ou acima do limite do álbum); o chamador os envia como texto
+        """
+        # Legendas acima do limite não são cortadas (quebraria a formatação): vão como texto
+        com_foto = [
+            indice for indice, (url, legenda) in enumerate(itens)
+            if url and len(legenda) <= MAX_LEGENDA and url not in self.urls_mortas
+        ][:MAX_ITENS_ALBUM]
+        pendentes = [indice for indice in range(len(itens)) if indice not in com_foto]
+
+        enviados: List[int] = []
+        if len(com_foto) == 1:
+            url, legenda = itens[com_foto[0]]
+            if await self._enviar_foto(chat_id, url, legenda):
+                enviados = com_foto
+        elif com_foto:
+            midias = [self._midia(*itens[indice]) for indice in com_foto]
+            try:
+                mensagens = await self.bot.send_media_group(chat_id=chat_id, media=[m for m, _ in midias])
+            except BadRequest as e:
+                # O Telegram recusa o álbum inteiro sem dizer qual item falhou: as fotos
+                # são reenviadas uma a uma para isolar as URLs mortas e os file_ids inválidos
+                self.logger.warning("Álbum recusado (%s); enviando as fotos separadamente", e)
+                for indice in com_foto:
+                    if await self._enviar_foto(chat_id, *itens[indice]):
+                        enviados.append(indice)
+            else:
+                for indice, mensagem, (_, reaproveitado) in zip(com_foto, mensagens, midias):
+                    self._registrar(itens[indice][0], mensagem, reaproveitado)
+                enviados = com_foto
+
+        nao_enviados = sorted(pendentes + [indice for indice in com_foto if indice not in enviados])
+        self._contar('text_fallbacks', len(nao_enviados))
+        self.metricas.definir('telegram_media_reuse_rate', self.stats()['reuse_rate'])
+        return nao_enviados
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de envio e taxa de reaproveitamento de `file_id`."""
+        enviados = self.contadores['reused'] + self.contadores['uploaded']
+        return dict(
+            self.contadores,
+            known_file_ids=len(self.mapa),
+            reuse_rate=round(self.contadores['reused'] / enviados, 4) if enviados else 0.0,
+        )
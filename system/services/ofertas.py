@@ -0,0 +1,299 @@
+"""
+Vitrine das "ofertas do dia": ranking materializado por categoria, servido pelo `/ofertas`.
+
+Quem quer só as melhores ofertas do dia mandaria uma busca ampla ("smartphone",
+"notebook") que consulta as duas lojas e é ranqueada do zero a cada pedido. A
+vitrine faz isso em segundo plano, a cada `intervalo_s`, para uma lista fixa de
+categorias (termos de busca): busca todas com `search_many`, ranqueia cada uma com
+`find_best_products` ('melhor_custo_beneficio') e já deixa as mensagens montadas.
+
+A visão nova é montada à parte e trocada de uma vez (uma atribuição), então uma
+leitura é um acesso a dict: nunca espera as lojas nem vê uma visão pela metade.
+Categorias cuja busca falhou numa reconstrução continuam com o ranking anterior.
+
+Desconto histórico: a vitrine guarda, por produto, o maior preço visto nas
+reconstruções dentro de `janela_historico_s`. Se o preço atual está abaixo dele, a
+queda conta como desconto no ranking (quando maior que o desconto da loja) e
+aparece na mensagem, o que pega as promoções que as lojas não marcam como tal.
+As referências contam no orçamento de memória; sob pressão, as mais antigas saem primeiro.
+"""
+
+import asyncio
+import math
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from config.logger import BotLogger
+from services.filtros import preco_numerico, sem_acento
+from services.memoria import NIVEL_RESERVA, estimar_bytes, get_governador
+from services.metricas import get_metricas
+
+# Chave da visão com o ranking de todas as categorias juntas (`/ofertas` sem categoria)
+TODAS = ''
+
+
+def chave_categoria(categoria: str) -> str:
+    """Normaliza o nome da categoria (caixa, acentos e espaços) para consultar a vitrine."""
+    return ' '.join(sem_acento(categoria).split())
+
+
+def _chave_produto(produto: Dict[str, Any]) -> str:
+    return f"{produto.get('store', '')}:{produto.get('id') or produto.get('url', '')}"
+
+
+class ReferenciasPreco:
+    """Maior preço visto por produto (loja:id) e quando, da referência mais antiga para a mais recente.
+
+    Componente do governador de memória: `descartar` tira as referências vistas há mais tempo.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._dados: 'OrderedDict[str, Tuple[float, float]]' = OrderedDict()
+
+    def get(self, chave: str) -> Optional[Tuple[float, float]]:
+        """(preço, visto_em) da referência do produto, ou None."""
+        with self._lock:
+            return self._dados.get(chave)
+
+    def set(self, chave: str, preco: float, visto_em: float):
+        """Registra o preço como nova referência do produto (passa a ser a mais recente)."""
+        with self._lock:
+            self._dados[chave] = (preco, visto_em)
+            self._dados.move_to_end(chave)
+
+    def expirar(self, limite: float) -> int:
+        """Remove as referências vistas antes de `limite`.
+
+        Returns:
+            Referências removidas
+        """
+        removidas = 0
+        with self._lock:
+            while self._dados and next(iter(self._dados.values()))[1] < limite:
+                self._dados.popitem(last=False)
+                removidas += 1
+        return removidas
+
+    def __len__(self) -> int:
+        return len(self._dados)
+
+    def bytes_aproximados(self) -> int:
+        """Tamanho estimado das referências, em bytes."""
+        with self._lock:
+            itens = list(self._dados.items())
+            tamanho = sys.getsizeof(self._dados)
+        return tamanho + estimar_bytes(itens)
+
+    def descartar(self, fracao: float) -> int:
+        """Descarta a fração `fracao` das referências, começando pelas vistas há mais tempo.
+
+        Returns:
+            Referências descartadas
+        """
+        with self._lock:
+            quantidade = min(math.ceil(len(self._dados) * fracao), len(self._dados))
+            for _ in range(quantidade):
+                self._dados.popitem(last=False)
+            return quantidade
+
+    def conteudo(self) -> List[Tuple[str, Tuple[float, float]]]:
+        """Cópia rasa das referências (chave, (preço, visto_em))."""
+        with self._lock:
+            return list(self._dados.items())
+
+
+class VitrineOfertas:
+    """Ranking das ofertas do dia por categoria, reconstruído periodicamente e trocado atomicamente."""
+
+    def __init__(self, service, categorias: Iterable[str], intervalo_s: float = 1800,
+                 janela_historico_s: float = 7 * 86400):
+        """
+        Args:
+            service: `ProductSearchService` usado nas buscas, no ranking e na renderização
+            categorias: Termos de busca de cada categoria (ex: "smartphone", "smart tv")
+            intervalo_s: Intervalo entre reconstruções
+            janela_historico_s: Por quanto tempo um preço visto serve de referência para o desconto histórico
+        """
+        self.service = service
+        self.categorias: Dict[str, str] = {}
+        for categoria in categorias:
+            self.categorias.setdefault(chave_categoria(categoria), ' '.join(categoria.split()))
+        self.intervalo_s = intervalo_s
+        self.janela_historico_s = janela_historico_s
+        self.logger = BotLogger(__name__).get_logger()
+        self.metricas = get_metricas()
+        self.metricas.descrever('offers_rebuilds_total', 'Reconstruções da vitrine de ofertas, por resultado')
+        self.metricas.descrever('offers_rebuild_seconds', 'Duração da última reconstrução da vitrine de ofertas')
+        self.metricas.descrever('offers_reads_total', 'Consultas à vitrine de ofertas, por resultado')
+        # Visão atual (categoria normalizada -> ranking pronto); substituída inteira a cada reconstrução
+        self._visao: Dict[str, Dict[str, Any]] = {}
+        # Maior preço visto por produto (loja:id) e quando ele foi visto, no orçamento de memória
+        self._referencias = ReferenciasPreco()
+        get_governador().registrar('offer_price_references', self._referencias, NIVEL_RESERVA)
+        self.atualizada_em: Optional[float] = None
+        self._tarefa: Optional[asyncio.Task] = None
+
+    @property
+    def pronta(self) -> bool:
+        """Indica se já há uma visão montada."""
+        return bool(self._visao)
+
+    def consultar(self, categoria: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Ranking pronto de uma categoria (ou de todas, sem categoria), sem I/O.
+
+        Args:
+            categoria: Nome da categoria como digitado; aceita parte do nome se só uma categoria casar
+
+        Returns:
+            Dict com 'category', 'best', 'summary', 'messages' e 'built_at', ou None se a
+            categoria não existe (ou a vitrine ainda não foi montada)
+        """
+        visao = self._visao
+        chave = chave_categoria(categoria) if categoria else TODAS
+        entrada = visao.get(chave)
+        if entrada is None and chave:
+            parecidas = [c for c in visao if c and chave in c]
+            if len(parecidas) == 1:
+                entrada = visao[parecidas[0]]
+        self.metricas.incrementar('offers_reads_total', outcome='hit' if entrada is not None else 'miss')
+        return entrada
+
+    def nomes_categorias(self) -> List[str]:
+        """Categorias configuradas, como escritas na configuração."""
+        return list(self.categorias.values())
+
+    def _com_desconto_historico(self, produtos: List[Dict[str, Any]], agora: float) -> List[Dict[str, Any]]:
+        """
+        Cópias dos produtos para o ranking: 'discount' passa a ser o maior entre o da loja e o
+        histórico, 'historical_discount' traz a queda em relação à referência e 'store_discount'
+        guarda o desconto da loja (o exibido ao lado do preço cheio). Produtos repetidos
+        (o mesmo anúncio em duas páginas) entram uma vez.
+        """
+        limite = agora - self.janela_historico_s
+        ajustados = []
+        vistos = set()
+        for produto in produtos:
+            preco = produto.get('price', 0)
+            chave = _chave_produto(produto)
+            if chave in vistos:
+                continue
+            vistos.add(chave)
+            referencia = self._referencias.get(chave)
+            if referencia is not None and referencia[1] < limite:
+                referencia = None
+            historico = 0.0
+            if referencia is not None and preco > 0 and referencia[0] > preco:
+                historico = round((referencia[0] - preco) / referencia[0] * 100, 2)
+            if preco > 0 and (referencia is None or preco >= referencia[0]):
+                self._referencias.set(chave, preco, agora)
+            desconto = preco_numerico(produto.get('discount', 0))
+            ajustados.append(dict(produto, discount=max(desconto, historico), historical_discount=historico,
+                                  store_discount=desconto))
+        return ajustados
+
+    def _montar_entrada(self, categoria: str, produtos: List[Dict[str, Any]], agora: float) -> Dict[str, Any]:
+        melhores = self.service.find_best_products(produtos, criterio='melhor_custo_beneficio')
+        renderizador = self.service.renderizador
+        mensagens = []
+        for i, produto in enumerate(melhores, 1):
+            mensagem = renderizador.produto(dict(produto, discount=produto['store_discount']), i)
+            if produto.get('historical_discount', 0) > 0:
+                mensagem += renderizador.queda_de_preco(produto['historical_discount'])
+            mensagens.append(mensagem)
+        return {
+            'category': categoria,
+            'best': melhores,
+            'summary': renderizador.ofertas(categoria, len(produtos), len(melhores)),
+            'messages': mensagens,
+            'built_at': agora,
+        }
+
+    async def reconstruir(self) -> Dict[str, Any]:
+        """
+        Busca todas as categorias, monta a visão nova e a coloca no lugar da atual.
+
+        Returns:
+            Dict com as categorias atualizadas, as mantidas da visão anterior e a duração
+        """
+        inicio = time.perf_counter()
+        anterior = self._visao
+        nova: Dict[str, Dict[str, Any]] = {}
+        por_categoria: Dict[str, List[Dict[str, Any]]] = {}
+        agora = time.time()
+
+        lote = self.service.search_many(self.categorias.values())
+        async for termo, resultados in lote:
+            chave = chave_categoria(termo)
+            if resultados and resultados['all_products']:
+                por_categoria[chave] = self._com_desconto_historico(resultados['all_products'], agora)
+                nova[chave] = self._montar_entrada(self.categorias[chave], por_categoria[chave], agora)
+            elif chave in anterior:
+                nova[chave] = anterior[chave]
+                por_categoria[chave] = anterior[chave]['best']
+
+        # Todas as categorias juntas: o mesmo ranking sobre a união (um produto pode estar em várias)
+        unicos: Dict[str, Dict[str, Any]] = {}
+        for produtos in por_categoria.values():
+            for produto in produtos:
+                unicos.setdefault(_chave_produto(produto), produto)
+        if unicos:
+            nova[TODAS] = self._montar_entrada('', list(unicos.values()), agora)
+
+        # Referências que saíram da janela não voltam a ser usadas
+        limite = agora - self.janela_historico_s
+        self._referencias.expirar(limite)
+
+        atualizadas = sum(1 for chave, entrada in nova.items() if chave and entrada['built_at'] == agora)
+        mantidas = sum(1 for chave in nova if chave) - atualizadas
+        if nova:
+            self._visao = nova
+            self.atualizada_em = agora
+        duracao = time.perf_counter() - inicio
+        self.metricas.incrementar('offers_rebuilds_total', outcome='ok' if atualizadas else 'failed')
+        self.metricas.definir('offers_rebuild_seconds', duracao)
+        relatorio = {
+            'updated': atualizadas,
+            'kept': mantidas,
+            'missing': len(self.categorias) - atualizadas - mantidas,
+            'duration_s': round(duracao, 3),
+        }
+        self.logger.info("Vitrine de ofertas reconstruída", extra={'offers': relatorio})
+        return relatorio
+
+    async def _manter(self):
+        while True:
+            try:
+                await self.reconstruir()
+            except Exception as e:
+                self.metricas.incrementar('offers_rebuilds_total', outcome='failed')
+                self.logger.error("Erro ao reconstruir a vitrine de ofertas: %s", e)
+            await asyncio.sleep(self.intervalo_s)
+
+    def iniciar(self):
+        """Começa as reconstruções periódicas (a primeira imediatamente) em uma tarefa do event loop."""
+        if self._tarefa is None and self.categorias:
+            self._tarefa = asyncio.ensure_future(self._manter())
+
+    async def parar(self):
+        """Encerra as reconstruções periódicas."""
+        if self._tarefa is not None:
+            self._tarefa.cancel()
+            try:
+                await self._tarefa
+            except asyncio.CancelledError:
+                pass
+            self._tarefa = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Categorias na visão, idade da visão e referências de preço guardadas."""
+        return {
+            'categories': len([c for c in self._visao if c]),
+            'configured': len(self.categorias),
+            'age_s': round(time.time() - self.atualizada_em, 1) if self.atualizada_em else None,
+            'price_references': len(self._referencias),
+        }
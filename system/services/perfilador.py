@@ -0,0 +1,294 @@
+"""
+Perfilador por amostragem do processo em execução, acionado pelo comando `/perf`.
+
+Uma thread própria lê, a cada `intervalo_s`, a pilha Python de todas as outras
+threads (`sys._current_frames`): a do event loop, as das buscas nas lojas, as das
+páginas etc. Nada é instrumentado e o custo fica na thread de amostragem, então o
+perfilador pode ser ligado em produção por alguns segundos.
+
+O resultado sai em dois formatos: pilhas colapsadas (`thread;f1;f2;f3 N`, uma por
+linha), que o `flamegraph.pl` ou o speedscope transformam em flame graph, e um
+resumo com as funções mais quentes (amostras na própria função e em toda a pilha).
+
+Amostras de threads paradas (event loop esperando no `select`, threads do pool
+esperando trabalho, leituras bloqueadas em sockets) são contadas à parte, para não
+esconder o que consome CPU.
+"""
+
+import asyncio
+import contextlib
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Set
+
+from config.logger import BotLogger
+from services.metricas import get_metricas
+
+# Funções (arquivo, nome) em que uma thread está parada esperando, não trabalhando
+_OCIOSAS = {
+    ('selectors.py', 'select'),
+    ('threading.py', 'wait'),
+    ('threading.py', '_wait_for_tstate_lock'),
+    ('queue.py', 'get'),
+    ('thread.py', '_worker'),
+    ('handlers.py', 'dequeue'),
+    ('socket.py', 'readinto'),
+    ('socket.py', 'accept'),
+    ('ssl.py', 'read'),
+}
+# Sufixo numérico das threads de um mesmo pool (`lojas_3` -> `lojas`)
+_SUFIXO_THREAD = re.compile(r'_\d+$')
+
+
+class RelatorioPerfil:
+    """Amostras de uma sessão do perfilador, com as exportações em texto."""
+
+    def __init__(self, pilhas: Counter, ociosas: int, duracao_s: float, intervalo_s: float):
+        """
+        Args:
+            pilhas: Contagem de amostras por pilha (tupla de quadros, da raiz para a folha)
+            ociosas: Amostras descartadas de threads paradas
+            duracao_s: Duração da sessão
+            intervalo_s: Intervalo entre amostras
+        """
+        self.pilhas = pilhas
+        self.ociosas = ociosas
+        self.duracao_s = duracao_s
+        self.intervalo_s = intervalo_s
+
+    @property
+    def amostras(self) -> int:
+        """Amostras de threads trabalhando."""
+        return sum(self.pilhas.values())
+
+    def colapsado(self) -> str:
+        """Pilhas no formato colapsado (entrada do `flamegraph.pl`/speedscope), mais frequentes primeiro."""
+        return ''.join(f"{';'.join(pilha)} {total}\n" for pilha, total in self.pilhas.most_common())
+
+    def top(self, n: int = 15) -> List[Dict[str, Any]]:
+        """
+        Funções mais quentes.
+
+        Returns:
+            Lista com 'function', 'self' (amostras com a função no topo da pilha) e
+            'total' (amostras com a função em qualquer ponto da pilha), ordenada por 'self'
+        """
+        proprias: Counter = Counter()
+        totais: Counter = Counter()
+        for pilha, total in self.pilhas.items():
+            # O primeiro item é o nome da thread, não uma função
+            proprias[pilha[-1]] += total
+            for quadro in set(pilha[1:]):
+                totais[quadro] += total
+        return [
+            {'function': funcao, 'self': proprias[funcao], 'total': totais[funcao]}
+            for funcao, _ in proprias.most_common(n)
+        ]
+
+    def resumo(self, n: int = 15) -> str:
+        """Resumo em texto puro: totais da sessão e as `n` funções mais quentes (% das amostras)."""
+        amostras = self.amostras
+        linhas = [
+            f"Perfil de {self.duracao_s:.1f}s: {amostras} amostras de threads ativas "
+            f"({self.ociosas} ociosas descartadas, intervalo de {self.intervalo_s * 1000:.0f}ms)",
+        ]
+        if not amostras:
+            return linhas[0]
+        por_thread: Counter = Counter()
+        for pilha, total in self.pilhas.items():
+            por_thread[pilha[0]] += total
+        linhas.append('Threads: ' + ', '.join(
+            f"{thread} {total * 100 / amostras:.0f}%" for thread, total in por_thread.most_common()
+        ))
+        linhas.append('')
+        linhas.append('  self%  total%  função')
+        for item in self.top(n):
+            linhas.append(
+                f"{item['self'] * 100 / amostras:6.1f}  {item['total'] * 100 / amostras:6.1f}  {item['function']}"
+            )
+        return '\n'.join(linhas)
+
+
+class PerfiladorAmostragem:
+    """Amostrador das pilhas de todas as threads, em uma thread daemon."""
+
+    def __init__(self, intervalo_s: float = 0.005, max_profundidade: int = 64,
+                 incluir: Optional[Callable[[int], bool]] = None):
+        """
+        Args:
+            intervalo_s: Intervalo entre amostras
+            max_profundidade: Quadros guardados por pilha (os mais próximos da folha)
+            incluir: Decide, pelo id da thread, se a amostra entra (padrão: todas)
+        """
+        self.intervalo_s = intervalo_s
+        self.max_profundidade = max_profundidade
+        self.incluir = incluir
+        self._pilhas: Counter = Counter()
+        self._ociosas = 0
+        self._parar = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._inicio = time.perf_counter()
+
+    @property
+    def ativo(self) -> bool:
+        """Indica se a amostragem está em andamento."""
+        return self._thread is not None
+
+    def iniciar(self):
+        """Começa a amostrar."""
+        self._parar.clear()
+        self._inicio = time.perf_counter()
+        self._thread = threading.Thread(target=self._laco, name='perfilador', daemon=True)
+        self._thread.start()
+
+    def parar(self) -> RelatorioPerfil:
+        """Encerra a amostragem e devolve o relatório."""
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        return RelatorioPerfil(Counter(self._pilhas), self._ociosas, time.perf_counter() - self._inicio,
+                               self.intervalo_s)
+
+    def _laco(self):
+        propria = threading.get_ident()
+        while not self._parar.wait(self.intervalo_s):
+            nomes = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, quadro in sys._current_frames().items():
+                if ident == propria or (self.incluir is not None and not self.incluir(ident)):
+                    continue
+                self._amostrar(_SUFIXO_THREAD.sub('', nomes.get(ident, str(ident))), quadro)
+
+    def _amostrar(self, thread: str, quadro):
+        codigo = quadro.f_code
+        if (os.path.basename(codigo.co_filename), codigo.co_name) in _OCIOSAS:
+            self._ociosas += 1
+            return
+        pilha = []
+        while quadro is not None and len(pilha) < self.max_profundidade:
+            codigo = quadro.f_code
+            nome = getattr(codigo, 'co_qualname', codigo.co_name)
+            pilha.append(f"{nome} ({os.path.basename(codigo.co_filename)}:{codigo.co_firstlineno})")
+            quadro = quadro.f_back
+        pilha.append(thread)
+        self._pilhas[tuple(reversed(pilha))] += 1
+
+
+class ControlePerfil:
+    """Sessões do perfilador pedidas pelo `/perf`: uma por vez, por tempo ou pelas próximas buscas."""
+
+    def __init__(self, intervalo_s: float = 0.005, max_duracao_s: float = 60):
+        """
+        Args:
+            intervalo_s: Intervalo entre amostras
+            max_duracao_s: Duração máxima de uma sessão (por tempo ou aguardando as buscas)
+        """
+        self.intervalo_s = intervalo_s
+        self.max_duracao_s = max_duracao_s
+        self.logger = BotLogger(__name__).get_logger()
+        self.metricas = get_metricas()
+        self.metricas.descrever('profiler_sessions_total', 'Sessões do perfilador por amostragem, por modo')
+        self.metricas.descrever('profiler_samples_total', 'Amostras de threads ativas coletadas pelo perfilador')
+        self._ocupado = False
+        # Modo por buscas: buscas ainda a perfilar, tarefas em andamento e quem espera o relatório
+        self._restantes = 0
+        self._tarefas: Set[asyncio.Task] = set()
+        self._amostrador: Optional[PerfiladorAmostragem] = None
+        self._resultado: Optional[asyncio.Future] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread_loop: Optional[int] = None
+
+    @property
+    def ocupado(self) -> bool:
+        """Indica se já há uma sessão em andamento."""
+        return self._ocupado
+
+    def _concluir(self, amostrador: PerfiladorAmostragem, modo: str) -> RelatorioPerfil:
+        relatorio = amostrador.parar()
+        self._ocupado = False
+        self.metricas.incrementar('profiler_sessions_total', mode=modo)
+        self.metricas.incrementar('profiler_samples_total', relatorio.amostras)
+        self.logger.info("Perfil (%s) concluído: %d amostras em %.1fs", modo, relatorio.amostras, relatorio.duracao_s)
+        return relatorio
+
+    async def por_tempo(self, segundos: float) -> RelatorioPerfil:
+        """
+        Amostra o processo inteiro por `segundos` (limitado a `max_duracao_s`).
+
+        Raises:
+            RuntimeError: Se já houver uma sessão em andamento
+        """
+        if self._ocupado:
+            raise RuntimeError("já há uma sessão do perfilador em andamento")
+        self._ocupado = True
+        amostrador = PerfiladorAmostragem(self.intervalo_s)
+        amostrador.iniciar()
+        try:
+            await asyncio.sleep(min(segundos, self.max_duracao_s))
+        finally:
+            relatorio = self._concluir(amostrador, 'time')
+        return relatorio
+
+    async def proximas_buscas(self, quantidade: int) -> RelatorioPerfil:
+        """
+        Amostra apenas enquanto as próximas `quantidade` buscas (`rastrear`) estão em andamento.
+
+        Na thread do event loop só entram as amostras em que a tarefa em execução é uma
+        das buscas perfiladas; as threads das lojas e das páginas entram enquanto houver
+        alguma busca perfilada em andamento. A sessão termina com as buscas ou em
+        `max_duracao_s`, com o que tiver sido coletado.
+
+        Raises:
+            RuntimeError: Se já houver uma sessão em andamento
+        """
+        if self._ocupado:
+            raise RuntimeError("já há uma sessão do perfilador em andamento")
+        self._ocupado = True
+        self._loop = asyncio.get_running_loop()
+        self._thread_loop = threading.get_ident()
+        self._restantes = quantidade
+        self._tarefas = set()
+        self._amostrador = PerfiladorAmostragem(self.intervalo_s, incluir=self._incluir)
+        self._resultado = self._loop.create_future()
+        try:
+            await asyncio.wait_for(asyncio.shield(self._resultado), self.max_duracao_s)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self._restantes = 0
+        if self._resultado.done():
+            return self._resultado.result()
+        amostrador, self._amostrador = self._amostrador, None
+        return self._concluir(amostrador, 'calls')
+
+    def _incluir(self, ident: int) -> bool:
+        # Entre uma busca perfilada e a próxima, nada é amostrado
+        if not self._tarefas:
+            return False
+        if ident != self._thread_loop:
+            return True
+        return asyncio.current_task(self._loop) in self._tarefas
+
+    @contextlib.asynccontextmanager
+    async def rastrear(self) -> AsyncIterator[None]:
+        """Marca o trecho como uma busca; perfilado se houver uma sessão `proximas_buscas` esperando buscas."""
+        if self._restantes <= 0 or self._amostrador is None:
+            yield
+            return
+        self._restantes -= 1
+        tarefa = asyncio.current_task()
+        self._tarefas.add(tarefa)
+        if not self._amostrador.ativo:
+            self._amostrador.iniciar()
+        try:
+            yield
+        finally:
+            self._tarefas.discard(tarefa)
+            if self._restantes <= 0 and not self._tarefas and self._amostrador is not None:
+                amostrador, self._amostrador = self._amostrador, None
+                if not self._resultado.done():
+                    self._resultado.set_result(self._concluir(amostrador, 'calls'))
@@ -0,0 +1,205 @@
+"""
+Pool de processos para os estágios de CPU da busca: decodificação das páginas das
+lojas e ranking/renderização da resposta.
+
+As páginas são decodificadas nas threads das buscas e o ranking e as mensagens são
+montados no event loop: todos disputam o GIL, e em pico o loop fica sem vez. Com
+`CPU_POOL_WORKERS` > 0 esses estágios podem rodar em processos separados.
+
+Entre processos trafegam apenas bytes: o corpo da resposta da loja vai como foi
+recebido e volta um JSON compacto (só os campos projetados, ou só o top e as
+mensagens prontas); nenhum grafo de objetos passa pelo pickle. Cargas pequenas
+continuam inline, porque a ida e volta custa mais que o trabalho: páginas abaixo de
+`CPU_POOL_MIN_BYTES` e respostas com menos de `CPU_POOL_MIN_PRODUCTS` produtos (o
+estágio `cpu_offload` dos benchmarks mede o ponto de virada).
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+from typing import Any, Callable, Dict, Optional
+
+from config.logger import BotLogger
+from config.settings import get_config
+from services import json_projetado
+from services.filtros import FiltroBusca
+from services.metricas import get_metricas
+
+# Montador usado pelos processos do pool para ranquear e renderizar (criado no primeiro uso)
+_montador_cpu = None
+
+
+def extrair_pagina(loja: str, conteudo: bytes, backend: Optional[str] = None,
+                   filtro: Optional[FiltroBusca] = None) -> bytes:
+    """
+    Decodifica o corpo de uma página de busca (executada no processo do pool).
+
+    Args:
+        loja: `NOME` do adaptador (`Magalu` ou `Kabum`)
+        conteudo: Corpo da resposta, como recebido
+        backend: Backend JSON (padrão: o mais rápido disponível)
+        filtro: `FiltroBusca` aplicado na decodificação
+
+    Returns:
+        JSON de `[produtos projetados, total de páginas]`
+    """
+    from services.lojas import Kabuum, Magalu
+
+    classe = {Magalu.NOME: Magalu, Kabuum.NOME: Kabuum}[loja]
+    return json_projetado.serializar(classe._extrair_produtos(conteudo, backend, filtro))
+
+
+def ranquear_e_renderizar(dados: bytes, criterio: str, parse_mode: str, tamanho_cache: int) -> bytes:
+    """
+    Seleciona os melhores produtos e monta as mensagens da resposta (executada no processo do pool).
+
+    Args:
+        dados: JSON do resultado de `search_products`, sem as listas por loja
+        criterio: Critério de `find_best_products`
+        parse_mode: Formatação das mensagens
+        tamanho_cache: Fragmentos em cache no renderizador do processo
+
+    Returns:
+        JSON da resposta de `ProductSearchService.preparar_resposta`
+    """
+    global _montador_cpu
+    from services.ranking import MontadorResposta
+    from services.renderizacao import RenderizadorMensagens
+
+    if _montador_cpu is None or _montador_cpu.renderizador.modo != parse_mode:
+        _montador_cpu = MontadorResposta(RenderizadorMensagens(parse_mode, tamanho_cache))
+    resultados = json_projetado.carregar(dados)
+    # As listas por loja não viajam (são as mesmas de `all_products`); o resumo só usa o tamanho delas
+    for chave, loja in (('magalu', 'Magalu'), ('kabuum', 'Kabuum')):
+        resultados[chave] = [p for p in resultados['all_products'] if p.get('store') == loja]
+    return json_projetado.serializar(_montador_cpu.montar(resultados, criterio))
+
+
+def _preparar_processo() -> int:
+    """Importa os módulos usados pelos estágios (chamada uma vez por processo no aquecimento)."""
+    import services.lojas  # noqa: F401
+    import services.ranking  # noqa: F401
+    return 1
+
+
+class PoolCpu:
+    """Pool de processos dos estágios de CPU, com os limiares de uso e a volta inline em caso de falha."""
+
+    def __init__(self, processos: int, min_bytes: int = 65536, min_produtos: int = 2000):
+        """
+        Args:
+            processos: Número de processos do pool
+            min_bytes: Tamanho mínimo da página para decodificá-la no pool
+            min_produtos: Produtos mínimos na resposta para ranquear/renderizar no pool
+        """
+        self.processos = processos
+        self.min_bytes = min_bytes
+        self.min_produtos = min_produtos
+        self.logger = BotLogger(__name__).get_logger()
+        self.metricas = get_metricas()
+        self._pool = self._criar()
+        self._lock = threading.Lock()
+        self.contadores: Dict[str, int] = {'tasks': 0, 'bytes_sent': 0, 'bytes_received': 0, 'failures': 0}
+        self.metricas.descrever('cpu_pool_tasks_total', 'Estágios de CPU executados no pool de processos')
+        self.metricas.descrever('cpu_pool_seconds_total', 'Tempo de espera pelos estágios executados no pool')
+        self.metricas.descrever('cpu_pool_bytes_total', 'Bytes trocados com o pool de processos, por direção')
+
+    def _criar(self) -> ProcessPoolExecutor:
+        # spawn: o processo principal tem threads (lojas, páginas), que um fork copiaria em estado inconsistente
+        return ProcessPoolExecutor(max_workers=self.processos, mp_context=get_context('spawn'))
+
+    def usar_para_pagina(self, tamanho: int) -> bool:
+        """Indica se uma página com `tamanho` bytes compensa ir ao pool."""
+        return tamanho >= self.min_bytes
+
+    def usar_para_ranking(self, produtos: int) -> bool:
+        """Indica se uma resposta com `produtos` produtos compensa ir ao pool."""
+        return produtos >= self.min_produtos
+
+    def _contar(self, estagio: str, args: tuple, resultado: bytes, duracao: float):
+        enviados = sum(len(arg) for arg in args if isinstance(arg, bytes))
+        recebidos = len(resultado)
+        with self._lock:
+            self.contadores['tasks'] += 1
+            self.contadores['bytes_sent'] += enviados
+            self.contadores['bytes_received'] += recebidos
+        self.metricas.incrementar('cpu_pool_tasks_total', stage=estagio)
+        self.metricas.incrementar('cpu_pool_seconds_total', duracao, stage=estagio)
+        self.metricas.incrementar('cpu_pool_bytes_total', enviados, direction='sent')
+        self.metricas.incrementar('cpu_pool_bytes_total', recebidos, direction='received')
+
+    def _falhou(self, estagio: str, pool: ProcessPoolExecutor, erro: Exception):
+        """Recria o pool depois que um processo morreu; o estágio é refeito inline pelo chamador."""
+        self.logger.error("Pool de processos falhou em %s: %s; recriando", estagio, erro)
+        with self._lock:
+            self.contadores['failures'] += 1
+            # Outra thread pode já ter recriado o pool que quebrou
+            if self._pool is pool:
+                self._pool = self._criar()
+
+    def executar(self, estagio: str, funcao: Callable[..., bytes], *args) -> bytes:
+        """
+        Executa `funcao(*args)` no pool e espera o resultado (para chamadores em threads).
+
+        Args:
+            estagio: Nome do estágio (rótulo das métricas)
+            funcao: Função de nível de módulo que recebe e devolve bytes
+            *args: Argumentos (a carga vai como `bytes`)
+
+        Returns:
+            O retorno de `funcao`; se o pool quebrar (ex: processo morto), ela é executada inline
+        """
+        inicio = time.perf_counter()
+        pool = self._pool
+        try:
+            resultado = pool.submit(funcao, *args).result()
+        except BrokenProcessPool as e:
+            self._falhou(estagio, pool, e)
+            return funcao(*args)
+        self._contar(estagio, args, resultado, time.perf_counter() - inicio)
+        return resultado
+
+    async def executar_async(self, estagio: str, funcao: Callable[..., bytes], *args) -> bytes:
+        """Como `executar`, sem bloquear o event loop enquanto o processo trabalha."""
+        inicio = time.perf_counter()
+        pool = self._pool
+        try:
+            resultado = await asyncio.wrap_future(pool.submit(funcao, *args))
+        except BrokenProcessPool as e:
+            self._falhou(estagio, pool, e)
+            return funcao(*args)
+        self._contar(estagio, args, resultado, time.perf_counter() - inicio)
+        return resultado
+
+    def aquecer(self):
+        """Sobe os processos e importa neles os módulos dos estágios (evita pagar isso na primeira busca)."""
+        for futuro in [self._pool.submit(_preparar_processo) for _ in range(self.processos)]:
+            futuro.result()
+
+    def fechar(self):
+        """Encerra os processos do pool."""
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """Processos, limiares e contadores do pool."""
+        with self._lock:
+            return dict(self.contadores, processes=self.processos, min_bytes=self.min_bytes,
+                        min_products=self.min_produtos)
+
+
+_pool_cpu: Optional[PoolCpu] = None
+_pool_cpu_lock = threading.Lock()
+
+
+def get_pool_cpu() -> Optional[PoolCpu]:
+    """Pool de processos do processo atual (None com `CPU_POOL_WORKERS` = 0, o padrão)."""
+    global _pool_cpu
+    config = get_config()
+    if _pool_cpu is None and config.CPU_POOL_WORKERS > 0:
+        with _pool_cpu_lock:
+            if _pool_cpu is None:
+                _pool_cpu = PoolCpu(config.CPU_POOL_WORKERS, config.CPU_POOL_MIN_BYTES, config.CPU_POOL_MIN_PRODUCTS)
+    return _pool_cpu
@@ -1,31 +1,199 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, AsyncIterator, Iterable, Optional, Tuple
 from services.lojas import Magalu, Kabuum
+from services.cache import TTLCache
+from services.resiliencia import (
+    PRIORIDADE_INTERATIVA, PRIORIDADE_SEGUNDO_PLANO, CircuitoAbertoError, DisjuntorLoja
+)
+from services.estado import CacheCompartilhado, EstadoCompartilhado, EstadoIndisponivelError, get_estado
+from services.exportacao import ExportadorObservacoes, get_exportador
+from services.filtros import FiltroBusca, preco_numerico
+from services.indice import IndiceProdutos
+from services.memoria import NIVEL_BUSCAS, NIVEL_DERIVADOS, NIVEL_RESERVA, get_governador
+from services.metricas import get_metricas
+from services.processamento import PoolCpu, get_pool_cpu, ranquear_e_renderizar
+from services.ranking import MontadorResposta
+from services import json_projetado
+from services.renderizacao import RenderizadorMensagens
 from config.logger import BotLogger
+from config.settings import get_config
 from concurrent.futures import ThreadPoolExecutor
-import re
+import asyncio
+import secrets
+import time
+
+class BuscaEmLote:
+    """Execução de `ProductSearchService.search_many`.
+    
+    Iterável assíncrono: cada `async for` dispara as buscas (no máximo `concorrencia`
+    ao mesmo tempo) e devolve `(termo, resultados)` na ordem em que terminam. Termos
+    que estouram o prazo ou falham vêm com `resultados` None. Ao final, `stats()`
+    traz os totais e a vazão do lote.
+    """
+    
+    def __init__(self, service: 'ProductSearchService', termos: Iterable[str], concorrencia: int,
+                 prazo_s: float, prioridade: int):
+        """
+        Args:
+            service: Serviço que executa cada busca
+            termos: Termos a buscar; variações de caixa/espaços do mesmo termo são buscadas uma vez
+            concorrencia: Máximo de termos buscados ao mesmo tempo
+            prazo_s: Prazo de cada termo, contado a partir do início da sua busca
+            prioridade: Classe de prioridade das requisições às lojas
+        """
+        self.service = service
+        self.logger = service.logger
+        self.metricas = get_metricas()
+        self.concorrencia = max(1, concorrencia)
+        self.prazo_s = prazo_s
+        self.prioridade = prioridade
+        
+        unicos: Dict[str, str] = {}
+        solicitados = 0
+        for termo in termos:
+            solicitados += 1
+            unicos.setdefault(service._cache_key(termo), termo)
+        self.termos = list(unicos.values())
+        self.contadores: Dict[str, int] = {
+            'requested': solicitados,
+            'duplicates': solicitados - len(self.termos),
+            'completed': 0,
+            'empty': 0,
+            'timed_out': 0,
+            'failed': 0,
+            'products': 0,
+        }
+        self._inicio: Optional[float] = None
+        self._fim: Optional[float] = None
+        self.metricas.descrever('search_batch_terms_total', 'Termos buscados em lote, por resultado')
+    
+    async def _buscar(self, termo: str, semaforo: asyncio.Semaphore) -> Tuple[str, Optional[Dict[str, Any]]]:
+        async with semaforo:
+            try:
+                resultados = await asyncio.wait_for(
+                    self.service.search_products(termo, prioridade=self.prioridade), timeout=self.prazo_s
+                )
+            except asyncio.TimeoutError:
+                self.logger.warning("Busca em lote por '%s' excedeu o prazo de %.1fs", termo, self.prazo_s)
+                self._contar('timed_out')
+                return termo, None
+            except Exception as e:
+                self.logger.error("Erro na busca em lote por '%s': %s", termo, e)
+                self._contar('failed')
+                return termo, None
+        
+        self._contar('completed' if resultados['all_products'] else 'empty')
+        self.contadores['products'] += len(resultados['all_products'])
+        return termo, resultados
+    
+    def _contar(self, resultado: str):
+        self.contadores[resultado] += 1
+        self.metricas.incrementar('search_batch_terms_total', outcome=resultado)
+    
+    async def __aiter__(self) -> AsyncIterator[Tuple[str, Optional[Dict[str, Any]]]]:
+        self._inicio = time.perf_counter()
+        self._fim = None
+        semaforo = asyncio.Semaphore(self.concorrencia)
+        tarefas = [asyncio.ensure_future(self._buscar(termo, semaforo)) for termo in self.termos]
+        try:
+            for proxima in asyncio.as_completed(tarefas):
+                yield await proxima
+        finally:
+            # Consumidor desistiu no meio: os termos que ainda não começaram são descartados
+            for tarefa in tarefas:
+                tarefa.cancel()
+            self._fim = time.perf_counter()
+            self.logger.info("Busca em lote concluída", extra={'batch': self.stats()})
+    
+    def stats(self) -> Dict[str, Any]:
+        """Totais do lote e vazão agregada (termos e produtos por segundo)."""
+        if self._inicio is None:
+            duracao = 0.0
+        else:
+            duracao = (self._fim or time.perf_counter()) - self._inicio
+        buscados = sum(self.contadores[c] for c in ('completed', 'empty', 'timed_out', 'failed'))
+        return dict(
+            self.contadores,
+            unique=len(self.termos),
+            concurrency=self.concorrencia,
+            duration_s=round(duracao, 3),
+            terms_per_s=round(buscados / duracao, 2) if duracao else 0.0,
+            products_per_s=round(self.contadores['products'] / duracao, 2) if duracao else 0.0,
+        )
+
 
 class ProductSearchService:
     """Serviço para buscar e comparar produtos entre diferentes lojas."""
     
-    def __init__(self):
+    def __init__(self, magalu: Optional[Magalu] = None, kabuum: Optional[Kabuum] = None,
+                 cache: Optional[TTLCache] = None, indice: Optional[IndiceProdutos] = None,
+                 estado: Optional[EstadoCompartilhado] = None, pool_cpu: Optional[PoolCpu] = None,
+                 exportador: Optional[ExportadorObservacoes] = None):
+        """
+        Args:
+            magalu: Adaptador da Magalu (padrão: instância apontando para a loja real)
+            kabuum: Adaptador da Kabum (padrão: instância apontando para a loja real)
+            cache: Cache de resultados por termo (padrão: SEARCH_CACHE_SIZE/SEARCH_CACHE_TTL da configuração,
+                no estado compartilhado se houver um)
+            indice: Catálogo local de produtos (padrão: arquivo INDEX_PATH; desativado se vazio)
+            estado: Estado compartilhado entre workers (padrão: SHARED_STATE_URL)
+            pool_cpu: Pool de processos para decodificação, ranking e renderização (padrão: CPU_POOL_WORKERS)
+            exportador: Destino das observações de produtos para análise offline (padrão: EXPORT_DIR;
+                desativado se vazio)
+        """
         self.logger = BotLogger(__name__).get_logger()
-        self.magalu = Magalu()
-        self.kabuum = Kabuum()
+        self.metricas = get_metricas()
+        config = get_config()
+        self.estado = estado if estado is not None else get_estado()
+        self.pool_cpu = pool_cpu if pool_cpu is not None else get_pool_cpu()
+        self.magalu = magalu or Magalu(estado=self.estado, pool_cpu=self.pool_cpu)
+        self.kabuum = kabuum or Kabuum(estado=self.estado, pool_cpu=self.pool_cpu)
+        if cache is None:
+            cache = (CacheCompartilhado(self.estado, config.SEARCH_CACHE_TTL) if self.estado.compartilhado
+                     else TTLCache(config.SEARCH_CACHE_SIZE, config.SEARCH_CACHE_TTL))
+        self.cache = cache
+        # Validade da trava de uma busca em andamento em outro worker
+        self.prazo_trava_s = config.SHARED_LOCK_TTL_S
+        self.metricas.descrever('search_remote_coalesced_total',
+                                'Buscas atendidas pelo resultado de uma busca idêntica feita por outro worker')
+        # Últimos resultados de cada loja por termo, exibidos enquanto ela está indisponível
+        self.resultados_por_loja = TTLCache(config.SEARCH_CACHE_SIZE * 2, config.STORE_STALE_TTL)
+        # Pool persistente: evita criar threads a cada busca
+        self.executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix='lojas')
+        # Buscas em andamento por termo normalizado: pedidos iguais simultâneos esperam a mesma
+        self._buscas_em_andamento: Dict[str, asyncio.Future] = {}
+        # Catálogo local: responde buscas na hora enquanto as lojas são consultadas
+        if indice is None and config.INDEX_PATH:
+            indice = IndiceProdutos(config.INDEX_PATH)
+        self.indice = indice
+        self.indice_min_resultados = config.INDEX_MIN_RESULTS
+        self.indice_idade_max_s = config.INDEX_MAX_AGE_S
+        self.indice_max_resultados = config.INDEX_MAX_RESULTS
+        # Observações dos produtos vindos das lojas, gravadas em segundo plano para análise offline
+        self.exportador = exportador if exportador is not None else get_exportador()
+        # Mensagens com os textos das lojas escapados e fragmentos de produtos em cache
+        self.renderizador = RenderizadorMensagens(config.MESSAGE_PARSE_MODE, config.RENDER_CACHE_SIZE)
+        # Ranking e montagem da resposta (os processos do pool de CPU usam um montador próprio)
+        self.montador = MontadorResposta(self.renderizador)
+        # Estruturas em memória contabilizadas no orçamento do processo (MEMORY_BUDGET_MB)
+        governador = get_governador()
+        if isinstance(self.cache, TTLCache):
+            governador.registrar('search_cache', self.cache, NIVEL_BUSCAS)
+        governador.registrar('store_fallback', self.resultados_por_loja, NIVEL_RESERVA)
+        governador.registrar('render_fragments', self.renderizador.fragmentos, NIVEL_DERIVADOS)
+    
+    @property
+    def parse_mode(self) -> str:
+        """`parse_mode` do Telegram das mensagens geradas pelos métodos `format_*`."""
+        return self.renderizador.modo
+    
+    @staticmethod
+    def _cache_key(termo_busca: str) -> str:
+        """Normaliza o termo para que variações de caixa e espaços compartilhem o cache."""
+        return " ".join(termo_busca.lower().split())
         
     def _clean_price(self, price_str) -> float:
         """Converte string de preço para float."""
-        if isinstance(price_str, (int, float)):
-            return float(price_str)
-        
-        if isinstance(price_str, str):
-            clean_price = re.sub(r'[^\d.,]', '', str(price_str))
-            clean_price = clean_price.replace(',', '.')
-            try:
-                return float(clean_price)
-            except (ValueError, TypeError):
-                return 0.0
-        
-        return 0.0
+        return preco_numerico(price_str)
     
     def _normalize_product(self, produto: Dict[str, Any], loja: str) -> Dict[str, Any]:
         """Normaliza os dados do produto para comparação."""
@@ -44,133 +212,439 @@ class ProductSearchService:
             'imageUrl': produto.get('imageUrl', ''),
             'rating': produto.get('rating', {'average': 0, 'count': 0}),
             'store': loja,
-            'description': produto.get('description', ''),
             'installment': produto.get('installment', ''),
             'offer': produto.get('offer', {}),
             'payment_method': produto.get('payment_method', '')
         }
     
-    async def search_products(self, termo_busca: str) -> Dict[str, List[Dict[str, Any]]]:
+    async def search_products(self, termo_busca: str, prioridade: int = PRIORIDADE_INTERATIVA,
+                              filtro: Optional[FiltroBusca] = None) -> Dict[str, List[Dict[str, Any]]]:
         """
         Busca produtos em todas as lojas disponíveis.
         
         Args:
             termo_busca: Termo para buscar produtos
+            prioridade: Classe de prioridade das requisições às lojas (`PRIORIDADE_SEGUNDO_PLANO`
+                para aquecimento e atualizações, que cedem a vez às buscas dos usuários)
+            filtro: Critérios da busca: lojas excluídas não são consultadas e os produtos
+                recusados são descartados na decodificação das páginas, antes da normalização
             
         Returns:
-            Dict com resultados de cada loja
+            Dict com resultados de cada loja; respostas do catálogo local trazem
+            'index_updated_at' (atualização mais antiga entre os produtos) e buscas
+            filtradas, 'filters' (os critérios em texto)
+        """
+        if filtro is not None and filtro.vazio:
+            filtro = None
+        # Buscas filtradas têm cache e buscas em andamento próprios
+        chave = self._cache_key(termo_busca) + (filtro.chave() if filtro is not None else '')
+        em_cache = await self._ler_cache(chave)
+        if em_cache is not None:
+            self.logger.info("Busca por '%s' respondida pelo cache", termo_busca)
+            return dict(em_cache, search_term=termo_busca)
+        
+        # Buscas dos usuários são respondidas pelo catálogo local, se ele tiver produtos
+        # recentes suficientes; as lojas são consultadas em segundo plano para atualizá-lo
+        if self.indice is not None and prioridade == PRIORIDADE_INTERATIVA:
+            loop = asyncio.get_running_loop()
+            do_indice = await loop.run_in_executor(self.executor, self._buscar_no_indice, termo_busca, filtro)
+            if do_indice is not None:
+                self.logger.info("Busca por '%s' respondida pelo catálogo local", termo_busca)
+                self._atualizar_em_segundo_plano(termo_busca, chave, filtro)
+                return do_indice
+        
+        em_andamento = self._buscas_em_andamento.get(chave)
+        if em_andamento is not None:
+            self.logger.info("Busca por '%s' aguardando busca idêntica em andamento", termo_busca)
+            return dict(await asyncio.shield(em_andamento), search_term=termo_busca)
+        
+        tarefa = asyncio.ensure_future(self._buscar_coordenado(termo_busca, chave, prioridade, filtro))
+        self._buscas_em_andamento[chave] = tarefa
+        try:
+            return await asyncio.shield(tarefa)
+        finally:
+            if self._buscas_em_andamento.get(chave) is tarefa:
+                del self._buscas_em_andamento[chave]
+    
+    async def _ler_cache(self, chave: str) -> Optional[Dict[str, Any]]:
+        """Consulta o cache de resultados; o cache compartilhado (rede) é lido fora do event loop."""
+        if isinstance(self.cache, CacheCompartilhado):
+            return await asyncio.get_running_loop().run_in_executor(self.executor, self.cache.get, chave)
+        return self.cache.get(chave)
+    
+    async def _no_estado(self, funcao, *args):
+        """Executa uma operação do estado compartilhado no pool (pode ir à rede)."""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, funcao, *args)
+    
+    async def _buscar_coordenado(self, termo_busca: str, chave: str, prioridade: int,
+                                 filtro: Optional[FiltroBusca] = None) -> Dict[str, Any]:
         """
-        self.logger.info(f"Iniciando busca por: {termo_busca}")
+        Consulta as lojas uma única vez entre todos os workers que compartilham o estado.
+        
+        O worker que consegue a trava `voo:<termo>` busca; os demais esperam o resultado
+        aparecer no cache compartilhado. Se a trava sumir (ou expirar) sem resultado,
+        quem esperava busca por conta própria.
+        """
+        if not self.estado.compartilhado:
+            return await self._buscar_nas_lojas(termo_busca, chave, prioridade, filtro)
+        
+        trava = f'voo:{chave}'
+        dono = secrets.token_hex(8).encode()
+        try:
+            travou = await self._no_estado(self.estado.set_se_ausente, trava, dono, self.prazo_trava_s)
+        except EstadoIndisponivelError as e:
+            self.logger.warning("Estado compartilhado indisponível; buscando sem coordenação: %s", e)
+            return await self._buscar_nas_lojas(termo_busca, chave, prioridade, filtro)
+        
+        if not travou:
+            self.logger.info("Busca por '%s' aguardando busca idêntica em outro worker", termo_busca)
+            resultados = await self._aguardar_outro_worker(trava, chave)
+            if resultados is not None:
+                self.metricas.incrementar('search_remote_coalesced_total')
+                return dict(resultados, search_term=termo_busca)
+            return await self._buscar_nas_lojas(termo_busca, chave, prioridade, filtro)
+        
+        try:
+            return await self._buscar_nas_lojas(termo_busca, chave, prioridade, filtro)
+        finally:
+            try:
+                await self._no_estado(self.estado.liberar, trava, dono)
+            except EstadoIndisponivelError:
+                pass  # a trava expira sozinha em `prazo_trava_s`
+    
+    async def _aguardar_outro_worker(self, trava: str, chave: str) -> Optional[Dict[str, Any]]:
+        """Espera o resultado da busca de outro worker (None se ele terminar sem resultado em cache)."""
+        prazo = time.monotonic() + self.prazo_trava_s
+        intervalo = 0.02
+        while time.monotonic() < prazo:
+            await asyncio.sleep(intervalo)
+            intervalo = min(intervalo * 2, 0.25)
+            em_cache = await self._ler_cache(chave)
+            if em_cache is not None:
+                return em_cache
+            try:
+                if await self._no_estado(self.estado.get, trava) is None:
+                    # A busca terminou entre as duas leituras ou não gerou resultado
+                    return await self._ler_cache(chave)
+            except EstadoIndisponivelError:
+                return None
+        return None
+    
+    def _buscar_no_indice(self, termo_busca: str,
+                          filtro: Optional[FiltroBusca] = None) -> Optional[Dict[str, Any]]:
+        """Resultado no formato de `search_products` montado pelo catálogo local (None se insuficiente)."""
+        try:
+            encontrados = self.indice.buscar(termo_busca, self.indice_max_resultados, self.indice_idade_max_s)
+        except Exception as e:
+            self.logger.error("Erro ao consultar o catálogo local: %s", e)
+            return None
+        produtos = encontrados['products']
+        if filtro is not None:
+            produtos = [p for p in produtos if filtro.aceita(p)]
+        if len(produtos) < self.indice_min_resultados:
+            return None
+        return {
+            'magalu': [p for p in produtos if p.get('store') == 'Magalu'],
+            'kabuum': [p for p in produtos if p.get('store') == 'Kabuum'],
+            'all_products': produtos,
+            'search_term': termo_busca,
+            'unavailable_stores': [],
+            'stale_stores': [],
+            'throttled_stores': [],
+            'index_updated_at': encontrados['oldest_update'],
+            'filters': filtro.descricao() if filtro is not None else '',
+        }
+    
+    def _atualizar_em_segundo_plano(self, termo_busca: str, chave: str, filtro: Optional[FiltroBusca] = None):
+        """Consulta as lojas sem bloquear quem pediu (a menos que já haja uma busca igual em andamento)."""
+        if chave in self._buscas_em_andamento:
+            return
+        tarefa = asyncio.ensure_future(
+            self._buscar_coordenado(termo_busca, chave, PRIORIDADE_SEGUNDO_PLANO, filtro)
+        )
+        self._buscas_em_andamento[chave] = tarefa
+        
+        def concluir(concluida: asyncio.Future):
+            if self._buscas_em_andamento.get(chave) is concluida:
+                del self._buscas_em_andamento[chave]
+            if not concluida.cancelled() and concluida.exception() is not None:
+                self.logger.error("Erro na atualização de '%s': %s", termo_busca, concluida.exception())
+        
+        tarefa.add_done_callback(concluir)
+    
+    async def _buscar_nas_lojas(self, termo_busca: str, chave: str, prioridade: int,
+                                filtro: Optional[FiltroBusca] = None) -> Dict[str, Any]:
+        """Consulta as lojas e monta (e guarda no cache) o resultado de `search_products`."""
+        self.logger.info("Iniciando busca por: %s", termo_busca)
         
         resultados = {
             'magalu': [],
             'kabuum': [],
             'all_products': [],
-            'search_term': termo_busca
+            'search_term': termo_busca,
+            'unavailable_stores': [],
+            'stale_stores': [],
+            'throttled_stores': [],
+            'filters': filtro.descricao() if filtro is not None else '',
         }
         
-        with ThreadPoolExecutor(max_workers=2) as executor:
-            future_magalu = executor.submit(self._search_magalu, termo_busca)
-            future_kabuum = executor.submit(self._search_kabuum, termo_busca)
-            
-            try:
-                produtos_magalu = future_magalu.result(timeout=30)
-                resultados['magalu'] = [self._normalize_product(p, 'Magalu') for p in produtos_magalu]
-                self.logger.info(f"Magalu: {len(produtos_magalu)} produtos encontrados")
-            except Exception as e:
-                self.logger.error(f"Erro na busca Magalu: {e}")
-                
+        # As buscas rodam no pool de threads; o event loop fica livre para outros chats.
+        # Cada loja acumula seus produtos em `parciais`, aproveitados mesmo se o prazo estourar
+        loop = asyncio.get_running_loop()
+        lojas = {'magalu': (self.magalu, 'Magalu'), 'kabuum': (self.kabuum, 'Kabuum')}
+        if filtro is not None:
+            # Lojas excluídas pelo filtro não são consultadas
+            lojas = {chave_loja: loja for chave_loja, loja in lojas.items() if filtro.inclui_loja(chave_loja)}
+        parciais: Dict[str, List[Dict[str, Any]]] = {chave_loja: [] for chave_loja in lojas}
+        
+        futuros = {}
+        for chave_loja, (loja, nome_loja) in lojas.items():
+            # Com fila no limitador da loja, quem já tem resultado recente não entra na fila
+            salvos = self.resultados_por_loja.get((chave_loja, chave)) if loja.limitador.saturado() else None
+            if salvos:
+                parciais[chave_loja].extend(salvos)
+                resultados['throttled_stores'].append(loja.NOME)
+                continue
+            futuros[chave_loja] = loop.run_in_executor(
+                self.executor, self._buscar_loja, loja, nome_loja, termo_busca, parciais[chave_loja], prioridade,
+                filtro,
+            )
+        
+        # Produtos recém-chegados das lojas (não os salvos), gravados no catálogo local
+        novos: List[Dict[str, Any]] = []
+        inicio = loop.time()
+        for chave_loja, (loja, nome_loja) in lojas.items():
+            if chave_loja not in futuros:
+                resultados[chave_loja] = parciais[chave_loja]
+                self.logger.info("%s com fila de requisições: usando resultados recentes", nome_loja)
+                continue
+            # Prazo derivado das latências recentes da loja, em vez de um valor fixo
+            prazo = loja.prazo_s()
             try:
-                produtos_kabuum = future_kabuum.result(timeout=30)
-                resultados['kabuum'] = [self._normalize_product(p, 'Kabuum') for p in produtos_kabuum]
-                self.logger.info(f"Kabuum: {len(produtos_kabuum)} produtos encontrados")
+                restante = max(0.0, inicio + prazo - loop.time())
+                await asyncio.wait_for(futuros[chave_loja], timeout=restante)
+            except CircuitoAbertoError:
+                self.logger.info("%s com circuito aberto: busca não enviada", nome_loja)
+            except asyncio.TimeoutError:
+                self.logger.error(
+                    "Busca %s excedeu o prazo de %.1fs (%d produtos parciais)",
+                    nome_loja, prazo, len(parciais[chave_loja])
+                )
             except Exception as e:
-                self.logger.error(f"Erro na busca Kabuum: {e}")
+                self.logger.error("Erro na busca %s: %s", nome_loja, e)
+            
+            produtos = list(parciais[chave_loja])
+            novos.extend(produtos)
+            if loja.disjuntor.estado != DisjuntorLoja.FECHADO:
+                resultados['unavailable_stores'].append(loja.NOME)
+                salvos = None if produtos else self.resultados_por_loja.get((chave_loja, chave))
+                if salvos:
+                    produtos = salvos
+                    resultados['stale_stores'].append(loja.NOME)
+            elif produtos:
+                self.resultados_por_loja.set((chave_loja, chave), produtos)
+            
+            resultados[chave_loja] = produtos
+            self.logger.info("%s: %d produtos encontrados", nome_loja, len(produtos))
         
         resultados['all_products'] = resultados['magalu'] + resultados['kabuum']
         
-        self.logger.info(f"Total de produtos encontrados: {len(resultados['all_products'])}")
+        self.logger.info("Total de produtos encontrados: %d", len(resultados['all_products']))
+        
+        # Buscas sem resultado (ex: lojas fora do ar) não são guardadas; com alguma loja
+        # indisponível, o resultado parcial vale só até a próxima busca de teste
+        if resultados['all_products']:
+            ttl = None
+            if resultados['unavailable_stores']:
+                ttl = min(self.cache.ttl, self.magalu.disjuntor.tempo_aberto_s, self.kabuum.disjuntor.tempo_aberto_s)
+            if isinstance(self.cache, CacheCompartilhado):
+                await loop.run_in_executor(self.executor, self.cache.set, chave, resultados, ttl)
+            else:
+                self.cache.set(chave, resultados, ttl=ttl)
+        
+        if novos and self.exportador is not None:
+            self.exportador.registrar(novos, termo_busca)
+        
+        if novos and self.indice is not None:
+            try:
+                await loop.run_in_executor(self.executor, self.indice.upsert, novos)
+            except Exception as e:
+                self.logger.error("Erro ao gravar no catálogo local: %s", e)
         return resultados
     
-    def _search_magalu(self, termo_busca: str) -> List[Dict[str, Any]]:
-        """Busca produtos na Magalu."""
+    def search_many(self, termos: Iterable[str], concorrencia: Optional[int] = None,
+                    prazo_s: Optional[float] = None,
+                    prioridade: int = PRIORIDADE_SEGUNDO_PLANO) -> BuscaEmLote:
+        """
+        Busca vários termos (aquecimento, atualizações agendadas, relatórios).
+        
+        As buscas usam o cache, as buscas em andamento e as conexões de cada loja
+        compartilhadas com `search_products`; o limitador de cada loja continua valendo
+        para o processo todo.
+        
+        Args:
+            termos: Termos a buscar (repetidos são buscados uma vez)
+            concorrencia: Termos buscados ao mesmo tempo (padrão: SEARCH_BATCH_CONCURRENCY)
+            prazo_s: Prazo de cada termo (padrão: SEARCH_BATCH_TERM_TIMEOUT_S)
+            prioridade: Classe de prioridade das requisições às lojas
+            
+        Returns:
+            BuscaEmLote: iterar com `async for termo, resultados in ...`; `stats()` traz a vazão
+        """
+        config = get_config()
+        return BuscaEmLote(
+            self,
+            termos,
+            concorrencia or config.SEARCH_BATCH_CONCURRENCY,
+            prazo_s or config.SEARCH_BATCH_TERM_TIMEOUT_S,
+            prioridade,
+        )
+    
+    async def aquecer(self, termos: List[str]) -> Dict[str, Any]:
+        """
+        Prepara o serviço antes de atender usuários: abre as conexões com as lojas,
+        valida as rotas usadas e pré-carrega o cache com buscas populares.
+        
+        Args:
+            termos: Termos de busca a serem pré-carregados
+            
+        Returns:
+            Dict com o estado de cada loja e o número de termos pré-carregados
+        """
+        inicio = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        if self.pool_cpu is not None:
+            await loop.run_in_executor(self.executor, self.pool_cpu.aquecer)
+        
+        magalu_ok, kabuum_ok = await asyncio.gather(
+            loop.run_in_executor(self.executor, self.magalu.aquecer),
+            loop.run_in_executor(self.executor, self.kabuum.aquecer),
+        )
+        
+        lote = self.search_many(termos)
+        carregados = 0
+        async for _, resultados in lote:
+            if resultados and resultados['all_products']:
+                carregados += 1
+        
+        relatorio = {
+            'magalu': magalu_ok,
+            'kabuum': kabuum_ok,
+            'cached_queries': carregados,
+            'requested_queries': len(termos),
+            'queries_per_s': lote.stats()['terms_per_s'],
+            'duration_s': round(time.perf_counter() - inicio, 3),
+        }
+        self.logger.info("Aquecimento concluído", extra={'warmup': relatorio})
+        return relatorio
+    
+    def _buscar_loja(self, loja, nome_loja: str, termo_busca: str,
+                     destino: Optional[List[Dict[str, Any]]] = None,
+                     prioridade: int = PRIORIDADE_INTERATIVA,
+                     filtro: Optional[FiltroBusca] = None) -> List[Dict[str, Any]]:
+        """Busca produtos em uma loja, normalizando cada página assim que ela chega.
+        
+        Args:
+            loja: Adaptador da loja
+            nome_loja: Nome gravado em `store` nos produtos normalizados
+            termo_busca: Termo de busca
+            destino: Lista que recebe os produtos à medida que chegam (permite ao chamador
+                usar o resultado parcial se desistir de esperar)
+            prioridade: Classe de prioridade das requisições à loja
+            filtro: Critérios aplicados na decodificação (só os produtos aceitos são normalizados)
+        
+        Raises:
+            CircuitoAbertoError: Se a loja está com o circuito aberto
+        """
+        normalizados = destino if destino is not None else []
+        
+        def ao_receber_pagina(produtos: List[Dict[str, Any]]):
+            normalizados.extend(self._normalize_product(p, nome_loja) for p in produtos)
+        
         try:
-            return self.magalu.buscar_produtos(termo_busca) or []
+            loja.buscar_produtos(termo_busca, ao_receber_pagina=ao_receber_pagina, prioridade=prioridade,
+                                filtro=filtro)
+        except CircuitoAbertoError:
+            raise
         except Exception as e:
-            self.logger.error(f"Erro ao buscar na Magalu: {e}")
-            return []
+            self.logger.error("Erro ao buscar na %s: %s", nome_loja, e)
+        return normalizados
+    
+    def _search_magalu(self, termo_busca: str) -> List[Dict[str, Any]]:
+        """Busca produtos na Magalu (já normalizados)."""
+        return self._buscar_loja(self.magalu, 'Magalu', termo_busca)
     
     def _search_kabuum(self, termo_busca: str) -> List[Dict[str, Any]]:
-        """Busca produtos na Kabuum."""
-        try:
-            return self.kabuum.buscar_produtos(termo_busca) or []
-        except Exception as e:
-            self.logger.error(f"Erro ao buscar na Kabuum: {e}")
-            return []
+        """Busca produtos na Kabuum (já normalizados)."""
+        return self._buscar_loja(self.kabuum, 'Kabuum', termo_busca)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Estado do cache, do estado compartilhado e, por loja, do circuito, das requisições HTTP e do cache HTTP."""
+        return {
+            'cache': self.cache.stats(),
+            'shared_state': self.estado.stats(),
+            'render_cache': self.renderizador.stats(),
+            'index': self.indice.stats() if self.indice is not None else None,
+            'cpu_pool': self.pool_cpu.stats() if self.pool_cpu is not None else None,
+            'memory': get_governador().stats(),
+            'export': self.exportador.stats() if self.exportador is not None else None,
+            'stores': {
+                loja.NOME: {
+                    'circuit': loja.disjuntor.stats(),
+                    'http': loja.http.stats(),
+                    'rate_limit': loja.limitador.stats(),
+                    'http_cache': loja.cache_http.stats() if loja.cache_http else None,
+                }
+                for loja in (self.magalu, self.kabuum)
+            },
+        }
     
-    def find_best_products(self, produtos: List[Dict[str, Any]], criterio: str = 'melhor_preco') -> List[Dict[str, Any]]:
+    def find_best_products(self, produtos: List[Dict[str, Any]], criterio: str = 'melhor_preco',
+                           filtro: Optional[FiltroBusca] = None) -> List[Dict[str, Any]]:
         """
         Seleciona os melhores produtos baseado no critério escolhido.
         
         Args:
             produtos: Lista de produtos normalizados
             criterio: Critério de seleção ('melhor_preco', 'melhor_custo_beneficio', 'melhor_avaliacao')
+            filtro: Critérios aplicados antes do ranking (resultados de `search_products` com
+                o mesmo filtro já chegam filtrados)
             
         Returns:
             Lista dos melhores produtos (máximo 5)
         """
-        if not produtos:
-            return []
-        
-        produtos_validos = [
-            p for p in produtos 
-            if p.get('availability', False) and p.get('price', 0) > 0
-        ]
-        
-        if not produtos_validos:
-            return produtos[:3]
-        
-        if criterio == 'melhor_preco':
-            return self._sort_by_best_price(produtos_validos)
-        elif criterio == 'melhor_custo_beneficio':
-            return self._sort_by_best_value(produtos_validos)
-        elif criterio == 'melhor_avaliacao':
-            return self._sort_by_best_rating(produtos_validos)
-        else:
-            return produtos_validos[:5]
+        return self.montador.find_best_products(produtos, criterio, filtro)
     
-    def _sort_by_best_price(self, produtos: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """Ordena produtos por melhor preço."""
-        return sorted(produtos, key=lambda x: x.get('price', float('inf')))[:5]
-    
-    def _sort_by_best_value(self, produtos: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """Ordena produtos por melhor custo-benefício (preço + avaliação + desconto)."""
-        def calculate_value_score(produto):
-            price = produto.get('price', float('inf'))
-            rating = produto.get('rating', {}).get('average', 0)
-            rating_count = produto.get('rating', {}).get('count', 0)
-            discount = produto.get('discount', 0)
-            
-            price_score = 1 / (price / 1000 + 1)  # Evita divisão por zero
-            
-            rating_score = (rating / 5.0) * min(rating_count / 10, 1.0)
-            
-            discount_score = min(discount / 50, 1.0)
-            
-            total_score = (price_score * 0.5) + (rating_score * 0.3) + (discount_score * 0.2)
-            
-            return total_score
+    def montar_resposta(self, resultados: Dict[str, Any], criterio: str = 'melhor_custo_beneficio') -> Dict[str, Any]:
+        """
+        Seleciona os melhores produtos e monta todas as mensagens da resposta de uma busca.
         
-        return sorted(produtos, key=calculate_value_score, reverse=True)[:5]
+        Args:
+            resultados: Resultado de `search_products`
+            criterio: Critério de `find_best_products`
+            
+        Returns:
+            Dict com 'best' (melhores produtos), 'summary', 'comparison' (vazia com menos
+            de dois produtos) e 'messages' (uma por produto, já numeradas)
+        """
+        return self.montador.montar(resultados, criterio)
     
-    def _sort_by_best_rating(self, produtos: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """Ordena produtos por melhor avaliação."""
-        def rating_score(produto):
-            rating = produto.get('rating', {}).get('average', 0)
-            count = produto.get('rating', {}).get('count', 0)
-            return rating * min(count / 10, 1.0)
-        
-        return sorted(produtos, key=rating_score, reverse=True)[:5]
+    async def preparar_resposta(self, resultados: Dict[str, Any],
+                                criterio: str = 'melhor_custo_beneficio') -> Dict[str, Any]:
+        """
+        `montar_resposta` fora do event loop quando compensa: respostas com muitos produtos
+        vão ao pool de processos (como bytes, sem as listas por loja); as demais são montadas inline.
+        
+        Returns:
+            O mesmo dict de `montar_resposta`
+        """
+        if self.pool_cpu is None or not self.pool_cpu.usar_para_ranking(len(resultados['all_products'])):
+            return self.montar_resposta(resultados, criterio)
+        dados = json_projetado.serializar({k: v for k, v in resultados.items() if k not in ('magalu', 'kabuum')})
+        resposta = await self.pool_cpu.executar_async(
+            'rank_render', ranquear_e_renderizar, dados, criterio, self.parse_mode, get_config().RENDER_CACHE_SIZE
+        )
+        return json_projetado.carregar(resposta)
     
     def format_product_message(self, produto: Dict[str, Any], posicao: int = 1) -> str:
         """
@@ -181,51 +655,9 @@ class ProductSearchService:
             posicao: Posição na lista (para numeração)
             
         Returns:
-            String formatada para o Telegram
+            String formatada para o Telegram (enviar com `parse_mode=self.parse_mode`)
         """
-        store_emoji = {
-            'Magalu': '🔵',
-            'Kabuum': '🟠',
-            'default': '🛍️'
-        }
-        
-        emoji = store_emoji.get(produto.get('store', ''), store_emoji['default'])
-        
-        price = produto.get('price', 0)
-        full_price = produto.get('full_price', 0)
-        discount = produto.get('discount', 0)
-        
-        price_text = f"💰 **R$ {price:.2f}**"
-        if full_price > price and discount > 0:
-            price_text += f" ~~R$ {full_price:.2f}~~ ({discount:.0f}% OFF)"
-        
-        rating = produto.get('rating', {})
-        rating_text = ""
-        if rating.get('average', 0) > 0:
-            stars = "⭐" * int(rating.get('average', 0))
-            rating_text = f"\n⭐ {rating.get('average', 0)}/5 ({rating.get('count', 0)} avaliações)"
-        
-        # Parcelamento
-        installment = produto.get('installment', '')
-        installment_text = f"\n💳 {installment}" if installment else ""
-        
-        offer = produto.get('offer', {})
-        offer_text = ""
-        if offer and offer.get('name'):
-            offer_text = f"\n🎉 **{offer.get('name')}** - R$ {offer.get('price', 0):.2f}"
-        
-        message = (
-            f"{emoji} **{posicao}. {produto.get('name', 'Produto')[:80]}**\n"
-            f"🏪 {produto.get('store', 'Loja')}\n"
-            f"🏷️ {produto.get('brand', 'Marca não informada')}\n"
-            f"{price_text}"
-            f"{rating_text}"
-            f"{installment_text}"
-            f"{offer_text}\n"
-            f"🔗 [Ver produto]({produto.get('url', '#')})\n"
-        )
-        
-        return message
+        return self.renderizador.produto(produto, posicao)
     
     def format_summary_message(self, resultados: Dict[str, Any], melhores_produtos: List[Dict[str, Any]]) -> str:
         """
@@ -236,34 +668,9 @@ class ProductSearchService:
             melhores_produtos: Lista dos melhores produtos selecionados
             
         Returns:
-            String formatada com resumo
+            String formatada com resumo (enviar com `parse_mode=self.parse_mode`)
         """
-        termo = resultados.get('search_term', 'produto')
-        total_magalu = len(resultados.get('magalu', []))
-        total_kabuum = len(resultados.get('kabuum', []))
-        total_geral = len(resultados.get('all_products', []))
-        
-        if total_geral == 0:
-            return (
-                f"🔍 **Busca por: {termo}**\n\n"
-                "❌ Nenhum produto encontrado nas lojas consultadas.\n\n"
-                "💡 **Dicas:**\n"
-                "• Tente termos mais simples (ex: 'notebook' em vez de 'notebook gamer asus')\n"
-                "• Use palavras-chave específicas\n"
-                "• Verifique a ortografia\n\n"
-                "Digite outro termo para buscar! 😊"
-            )
-        
-        summary = (
-            f"🔍 **Busca por: {termo}**\n\n"
-            f"📊 **Resultados encontrados:**\n"
-            f"🔵 Magalu: {total_magalu} produtos\n"
-            f"🟠 Kabuum: {total_kabuum} produtos\n"
-            f"📦 Total: {total_geral} produtos\n\n"
-            f"🏆 **Top {len(melhores_produtos)} melhores ofertas:**\n\n"
-        )
-        
-        return summary
+        return self.renderizador.resumo(resultados, melhores_produtos)
     
     def create_comparison_message(self, produtos: List[Dict[str, Any]]) -> str:
         """
@@ -275,19 +682,4 @@ class ProductSearchService:
         Returns:
             String com comparação formatada
         """
-        if len(produtos) < 2:
-            return ""
-        
-        mais_barato = min(produtos, key=lambda x: x.get('price', float('inf')))
-        mais_caro = max(produtos, key=lambda x: x.get('price', 0))
-        
-        economia = mais_caro.get('price', 0) - mais_barato.get('price', 0)
-        
-        message = (
-            "💡 **Comparação Rápida:**\n"
-            f"💰 Mais barato: **R$ {mais_barato.get('price', 0):.2f}** ({mais_barato.get('store', 'Loja')})\n"
-            f"💸 Mais caro: **R$ {mais_caro.get('price', 0):.2f}** ({mais_caro.get('store', 'Loja')})\n"
-            f"💵 Economia: **R$ {economia:.2f}**\n\n"
-        )
-        
-        return message
\ No newline at end of file
+        return self.montador.comparacao(produtos)
\ No newline at end of file
@@ -0,0 +1,131 @@
+"""
+Ranking dos produtos de uma busca e montagem das mensagens da resposta.
+
+Não depende das lojas, do cache nem dos pools da busca: o `ProductSearchService`
+usa uma instância com o seu renderizador, e os processos do pool de CPU
+(`processamento.ranquear_e_renderizar`) criam a sua a partir do `parse_mode`.
+"""
+
+from typing import Any, Dict, List, Optional
+
+from services.filtros import FiltroBusca
+from services.renderizacao import RenderizadorMensagens
+
+
+class MontadorResposta:
+    """Seleciona os melhores produtos e monta o resumo, a comparação e as mensagens de cada um."""
+
+    def __init__(self, renderizador: RenderizadorMensagens):
+        """
+        Args:
+            renderizador: Renderizador das mensagens (define o `parse_mode` da resposta)
+        """
+        self.renderizador = renderizador
+
+    def find_best_products(self, produtos: List[Dict[str, Any]], criterio: str = 'melhor_preco',
+                           filtro: Optional[FiltroBusca] = None) -> List[Dict[str, Any]]:
+        """
+        Seleciona os melhores produtos baseado no critério escolhido.
+
+        Args:
+            produtos: Lista de produtos normalizados
+            criterio: Critério de seleção ('melhor_preco', 'melhor_custo_beneficio', 'melhor_avaliacao')
+            filtro: Critérios aplicados antes do ranking (resultados de `search_products` com
+                o mesmo filtro já chegam filtrados)
+
+        Returns:
+            Lista dos melhores produtos (máximo 5)
+        """
+        if filtro is not None:
+            produtos = [p for p in produtos if filtro.aceita(p)]
+
+        if not produtos:
+            return []
+
+        produtos_validos = [
+            p for p in produtos
+            if p.get('availability', False) and p.get('price', 0) > 0
+        ]
+
+        if not produtos_validos:
+            return produtos[:3]
+
+        if criterio == 'melhor_preco':
+            return self._sort_by_best_price(produtos_validos)
+        elif criterio == 'melhor_custo_beneficio':
+            return self._sort_by_best_value(produtos_validos)
+        elif criterio == 'melhor_avaliacao':
+            return self._sort_by_best_rating(produtos_validos)
+        else:
+            return produtos_validos[:5]
+
+    def _sort_by_best_price(self, produtos: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Ordena produtos por melhor preço."""
+        return sorted(produtos, key=lambda x: x.get('price', float('inf')))[:5]
+
+    def _sort_by_best_value(self, produtos: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Ordena produtos por melhor custo-benefício (preço + avaliação + desconto)."""
+        def calculate_value_score(produto):
+            price = produto.get('price', float('inf'))
+            rating = produto.get('rating', {}).get('average', 0)
+            rating_count = produto.get('rating', {}).get('count', 0)
+            discount = produto.get('discount', 0)
+
+            price_score = 1 / (price / 1000 + 1)  # Evita divisão por zero
+
+            rating_score = (rating / 5.0) * min(rating_count / 10, 1.0)
+
+            discount_score = min(discount / 50, 1.0)
+
+            total_score = (price_score * 0.5) + (rating_score * 0.3) + (discount_score * 0.2)
+
+            return total_score
+
+        return sorted(produtos, key=calculate_value_score, reverse=True)[:5]
+
+    def _sort_by_best_rating(self, produtos: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Ordena produtos por melhor avaliação."""
+        def rating_score(produto):
+            rating = produto.get('rating', {}).get('average', 0)
+            count = produto.get('rating', {}).get('count', 0)
+            return rating * min(count / 10, 1.0)
+
+        return sorted(produtos, key=rating_score, reverse=True)[:5]
+
+    def comparacao(self, produtos: List[Dict[str, Any]]) -> str:
+        """
+        Cria mensagem comparativa entre produtos.
+
+        Args:
+            produtos: Lista de produtos para comparar
+
+        Returns:
+            String com comparação formatada (vazia com menos de dois produtos)
+        """
+        if len(produtos) < 2:
+            return ""
+
+        mais_barato = min(produtos, key=lambda x: x.get('price', float('inf')))
+        mais_caro = max(produtos, key=lambda x: x.get('price', 0))
+
+        return self.renderizador.comparacao(mais_barato, mais_caro)
+
+    def montar(self, resultados: Dict[str, Any], criterio: str = 'melhor_custo_beneficio') -> Dict[str, Any]:
+        """
+        Seleciona os melhores produtos e monta todas as mensagens da resposta de uma busca.
+
+        Args:
+            resultados: Resultado de `search_products`
+            criterio: Critério de `find_best_products`
+
+        Returns:
+            Dict com 'best' (melhores produtos), 'summary', 'comparison' (vazia com menos
+            de dois produtos) e 'messages' (uma por produto, já numeradas)
+        """
+        melhores = self.find_best_products(resultados['all_products'], criterio=criterio)
+        return {
+            'best': melhores,
+            'summary': self.renderizador.resumo(resultados, melhores),
+            'comparison': self.comparacao(melhores),
+            'messages': [self.renderizador.produto(produto, i) for i, produto in enumerate(melhores, 1)],
+        }
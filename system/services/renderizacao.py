@@ -0,0 +1,279 @@
+"""
+Renderização das mensagens de produtos para o Telegram (MarkdownV2 ou HTML).
+
+Os modelos de cada modo são montados uma vez; os textos vindos das lojas e do
+usuário (nomes, marcas, ofertas, termos de busca) são sempre escapados, para que
+um `*`, `_` ou `[` num título não faça o Telegram recusar a mensagem.
+
+A mensagem de um produto é montada a partir de fragmentos guardados em cache:
+a parte fixa do produto (nome, loja, marca, link), chaveada pelo id e pelos
+próprios campos, e o corpo completo sem a numeração, chaveado também pela
+"versão" do preço (preço, desconto, avaliação, parcelamento, oferta). Só a
+numeração depende da posição; numa busca repetida ou ao paginar, apenas o que
+mudou é renderizado.
+"""
+
+import html
+import re
+import time
+from typing import Any, Dict, List, Tuple
+
+from services.cache import TTLCache
+
+MODOS = ('MarkdownV2', 'HTML')
+
+# Caracteres reservados do MarkdownV2 (https://core.telegram.org/bots/api#markdownv2-style)
+_RESERVADOS_MARKDOWN_V2 = re.compile(r'([_*\[\]()~`>#+\-=|{}.!\\])')
+_RESERVADOS_URL_MARKDOWN_V2 = re.compile(r'([)\\])')
+
+EMOJI_LOJA = {
+    'Magalu': '🔵',
+    'Kabuum': '🟠',
+}
+EMOJI_PADRAO = '🛍️'
+
+
+def escapar_markdown_v2(texto: Any) -> str:
+    """Escapa um texto para uso fora de entidades no MarkdownV2."""
+    return _RESERVADOS_MARKDOWN_V2.sub(r'\\\1', str(texto))
+
+
+def escapar_url_markdown_v2(url: Any) -> str:
+    """Escapa a URL de um link `[texto](url)` no MarkdownV2."""
+    return _RESERVADOS_URL_MARKDOWN_V2.sub(r'\\\1', str(url))
+
+
+def escapar_html(texto: Any) -> str:
+    """Escapa um texto para o modo HTML do Telegram."""
+    return html.escape(str(texto), quote=False)
+
+
+def escapar_url_html(url: Any) -> str:
+    """Escapa a URL do atributo `href` no modo HTML."""
+    return html.escape(str(url), quote=True)
+
+
+# Modelos por modo. Nos de MarkdownV2, o texto fixo já está escapado; os campos
+# ({nome}) recebem valores escapados na renderização.
+_MODELOS: Dict[str, Dict[str, str]] = {
+    'MarkdownV2': {
+        'numeracao': '{emoji} *{posicao}\\. ',
+        'identidade': '{nome}*\n🏪 {loja}\n🏷️ {marca}\n',
+        'link': '\n🔗 [Ver produto]({url})\n',
+        'preco': '💰 *R$ {preco}*',
+        'preco_de': ' ~R$ {preco_cheio}~ \\({desconto}% OFF\\)',
+        'avaliacao': '\n⭐ {media}/5 \\({avaliacoes} avaliações\\)',
+        'parcelamento': '\n💳 {parcelamento}',
+        'oferta': '\n🎉 *{oferta}* \\- R$ {preco_oferta}',
+        'resumo_titulo': '🔍 *Busca por: {termo}*\n\n',
+        'aviso_indisponivel': '⚠️ {loja} indisponível\n',
+        'aviso_anteriores': '⚠️ {loja} indisponível \\(exibindo resultados anteriores\\)\n',
+        'aviso_demanda': 'ℹ️ {loja} com alta demanda \\(exibindo resultados recentes\\)\n',
+        'aviso_catalogo': '🕒 Resultados do catálogo local, de até {minutos} min atrás \\(atualizando\\)\n',
+        'aviso_filtros': '🎯 Filtros: {filtros}\n',
+        'resumo_vazio': (
+            '❌ Nenhum produto encontrado nas lojas consultadas\\.\n\n'
+            '💡 *Dicas:*\n'
+            '• Tente termos mais simples \\(ex: \'notebook\' em vez de \'notebook gamer asus\'\\)\n'
+            '• Use palavras\\-chave específicas\n'
+            '• Verifique a ortografia\n\n'
+            'Digite outro termo para buscar\\! 😊'
+        ),
+        'resumo_totais': (
+            '📊 *Resultados encontrados:*\n'
+            '🔵 Magalu: {magalu} produtos\n'
+            '🟠 Kabuum: {kabuum} produtos\n'
+            '📦 Total: {total} produtos\n\n'
+        ),
+        'resumo_top': '🏆 *Top {quantidade} melhores ofertas:*\n\n',
+        'ofertas_titulo': '🔥 *Ofertas do dia*\n',
+        'ofertas_titulo_categoria': '🔥 *Ofertas do dia: {categoria}*\n',
+        'ofertas_totais': '📦 {total} produtos comparados\n\n🏆 *Top {quantidade} em custo\\-benefício:*\n\n',
+        'queda_preco': '📉 {desconto}% abaixo do maior preço dos últimos dias\n',
+        'comparacao': (
+            '💡 *Comparação Rápida:*\n'
+            '💰 Mais barato: *R$ {preco_barato}* \\({loja_barato}\\)\n'
+            '💸 Mais caro: *R$ {preco_caro}* \\({loja_caro}\\)\n'
+            '💵 Economia: *R$ {economia}*\n\n'
+        ),
+    },
+    'HTML': {
+        'numeracao': '{emoji} <b>{posicao}. ',
+        'identidade': '{nome}</b>\n🏪 {loja}\n🏷️ {marca}\n',
+        'link': '\n🔗 <a href="{url}">Ver produto</a>\n',
+        'preco': '💰 <b>R$ {preco}</b>',
+        'preco_de': ' <s>R$ {preco_cheio}</s> ({desconto}% OFF)',
+        'avaliacao': '\n⭐ {media}/5 ({avaliacoes} avaliações)',
+        'parcelamento': '\n💳 {parcelamento}',
+        'oferta': '\n🎉 <b>{oferta}</b> - R$ {preco_oferta}',
+        'resumo_titulo': '🔍 <b>Busca por: {termo}</b>\n\n',
+        'aviso_indisponivel': '⚠️ {loja} indisponível\n',
+        'aviso_anteriores': '⚠️ {loja} indisponível (exibindo resultados anteriores)\n',
+        'aviso_demanda': 'ℹ️ {loja} com alta demanda (exibindo resultados recentes)\n',
+        'aviso_catalogo': '🕒 Resultados do catálogo local, de até {minutos} min atrás (atualizando)\n',
+        'aviso_filtros': '🎯 Filtros: {filtros}\n',
+        'resumo_vazio': (
+            '❌ Nenhum produto encontrado nas lojas consultadas.\n\n'
+            '💡 <b>Dicas:</b>\n'
+            '• Tente termos mais simples (ex: \'notebook\' em vez de \'notebook gamer asus\')\n'
+            '• Use palavras-chave específicas\n'
+            '• Verifique a ortografia\n\n'
+            'Digite outro termo para buscar! 😊'
+        ),
+        'resumo_totais': (
+            '📊 <b>Resultados encontrados:</b>\n'
+            '🔵 Magalu: {magalu} produtos\n'
+            '🟠 Kabuum: {kabuum} produtos\n'
+            '📦 Total: {total} produtos\n\n'
+        ),
+        'resumo_top': '🏆 <b>Top {quantidade} melhores ofertas:</b>\n\n',
+        'ofertas_titulo': '🔥 <b>Ofertas do dia</b>\n',
+        'ofertas_titulo_categoria': '🔥 <b>Ofertas do dia: {categoria}</b>\n',
+        'ofertas_totais': '📦 {total} produtos comparados\n\n🏆 <b>Top {quantidade} em custo-benefício:</b>\n\n',
+        'queda_preco': '📉 {desconto}% abaixo do maior preço dos últimos dias\n',
+        'comparacao': (
+            '💡 <b>Comparação Rápida:</b>\n'
+            '💰 Mais barato: <b>R$ {preco_barato}</b> ({loja_barato})\n'
+            '💸 Mais caro: <b>R$ {preco_caro}</b> ({loja_caro})\n'
+            '💵 Economia: <b>R$ {economia}</b>\n\n'
+        ),
+    },
+}
+
+
+class RenderizadorMensagens:
+    """Monta as mensagens de busca no modo de formatação escolhido, com cache de fragmentos."""
+
+    def __init__(self, modo: str = 'MarkdownV2', max_fragmentos: int = 4096):
+        """
+        Args:
+            modo: 'MarkdownV2' ou 'HTML' (o `parse_mode` a usar no envio)
+            max_fragmentos: Fragmentos de produtos guardados em cache (0 desativa)
+
+        Raises:
+            ValueError: Se o modo não for suportado
+        """
+        if modo not in MODOS:
+            raise ValueError(f"Modo de formatação não suportado: {modo} (use {' ou '.join(MODOS)})")
+        self.modo = modo
+        self.modelos = _MODELOS[modo]
+        if modo == 'MarkdownV2':
+            self.escapar, self.escapar_url = escapar_markdown_v2, escapar_url_markdown_v2
+        else:
+            self.escapar, self.escapar_url = escapar_html, escapar_url_html
+        self.fragmentos = TTLCache(max_fragmentos, float('inf'))
+        # Numerações já montadas por (loja, posição): poucas combinações possíveis
+        self._numeracoes: Dict[Tuple[str, int], str] = {}
+
+    def _preencher(self, modelo: str, **campos: Any) -> str:
+        return self.modelos[modelo].format(**{nome: self.escapar(valor) for nome, valor in campos.items()})
+
+    def _identidade(self, loja: str, nome: str, marca: str, url: str) -> Tuple[str, str]:
+        """Nome, loja, marca e link: não mudam entre buscas."""
+        return (
+            self._preencher('identidade', nome=nome, loja=loja, marca=marca),
+            self.modelos['link'].format(url=self.escapar_url(url)),
+        )
+
+    def _precos(self, price: float, full_price: float, discount: float, media: float, avaliacoes: int,
+                installment: str, oferta: Any, preco_oferta: float) -> str:
+        """Preço, desconto, avaliação, parcelamento e oferta: a "versão do preço"."""
+        partes = [self._preencher('preco', preco=f'{price:.2f}')]
+        if full_price > price and discount > 0:
+            partes.append(self._preencher('preco_de', preco_cheio=f'{full_price:.2f}', desconto=f'{discount:.0f}'))
+        if media > 0:
+            partes.append(self._preencher('avaliacao', media=media, avaliacoes=avaliacoes))
+        if installment:
+            partes.append(self._preencher('parcelamento', parcelamento=installment))
+        if oferta:
+            partes.append(self._preencher('oferta', oferta=oferta, preco_oferta=f'{preco_oferta:.2f}'))
+        return ''.join(partes)
+
+    def produto(self, produto: Dict[str, Any], posicao: int = 1) -> str:
+        """Mensagem de um produto (numerada por `posicao`)."""
+        get = produto.get
+        loja = get('store', 'Loja')
+        identidade = (get('id', ''), loja, get('name', 'Produto')[:80], get('brand', 'Marca não informada'),
+                      get('url', '#'))
+        rating = get('rating') or {}
+        offer = get('offer') or {}
+        versao = (get('price', 0), get('full_price', 0), get('discount', 0), rating.get('average', 0),
+                  rating.get('count', 0), get('installment', ''), offer.get('name'), offer.get('price', 0))
+
+        # Uma consulta por produto: a parte que não depende da posição, chaveada pelo
+        # produto e pela versão do preço. Numa falta, a identidade (que muda menos)
+        # ainda pode vir do cache e só o preço é renderizado de novo
+        corpo = self.fragmentos.get((identidade, versao))
+        if corpo is None:
+            fixos = self.fragmentos.get(identidade)
+            if fixos is None:
+                fixos = self._identidade(*identidade[1:])
+                self.fragmentos.set(identidade, fixos)
+            corpo = fixos[0] + self._precos(*versao) + fixos[1]
+            self.fragmentos.set((identidade, versao), corpo)
+
+        numeracao = self._numeracoes.get((loja, posicao))
+        if numeracao is None:
+            numeracao = self.modelos['numeracao'].format(emoji=EMOJI_LOJA.get(loja, EMOJI_PADRAO), posicao=posicao)
+            if len(self._numeracoes) < 256:
+                self._numeracoes[(loja, posicao)] = numeracao
+        return numeracao + corpo
+
+    def resumo(self, resultados: Dict[str, Any], melhores_produtos: List[Dict[str, Any]]) -> str:
+        """Resumo da busca: totais por loja, avisos de lojas indisponíveis e cabeçalho do top."""
+        total_geral = len(resultados.get('all_products', []))
+
+        # Lojas com o circuito aberto: resultados antigos (se houver) ou nenhum
+        avisos = ''
+        salvas = resultados.get('stale_stores', [])
+        for loja in resultados.get('unavailable_stores', []):
+            avisos += self._preencher('aviso_anteriores' if loja in salvas else 'aviso_indisponivel', loja=loja)
+        for loja in resultados.get('throttled_stores', []):
+            avisos += self._preencher('aviso_demanda', loja=loja)
+        if resultados.get('index_updated_at') is not None:
+            minutos = max(1, round((time.time() - resultados['index_updated_at']) / 60))
+            avisos += self._preencher('aviso_catalogo', minutos=minutos)
+        if resultados.get('filters'):
+            avisos += self._preencher('aviso_filtros', filtros=resultados['filters'])
+        if avisos:
+            avisos += '\n'
+
+        titulo = self._preencher('resumo_titulo', termo=resultados.get('search_term', 'produto'))
+        if total_geral == 0:
+            return titulo + avisos + self.modelos['resumo_vazio']
+
+        return (
+            titulo
+            + self._preencher('resumo_totais', magalu=len(resultados.get('magalu', [])),
+                              kabuum=len(resultados.get('kabuum', [])), total=total_geral)
+            + avisos
+            + self._preencher('resumo_top', quantidade=len(melhores_produtos))
+        )
+
+    def ofertas(self, categoria: str, total: int, quantidade: int) -> str:
+        """Cabeçalho do `/ofertas`: categoria (vazia para todas), produtos comparados e tamanho do top."""
+        if categoria:
+            titulo = self._preencher('ofertas_titulo_categoria', categoria=categoria)
+        else:
+            titulo = self.modelos['ofertas_titulo']
+        return titulo + self._preencher('ofertas_totais', total=total, quantidade=quantidade)
+
+    def queda_de_preco(self, desconto: float) -> str:
+        """Linha com a queda em relação ao maior preço recente (anexada à mensagem do produto)."""
+        return self._preencher('queda_preco', desconto=f'{desconto:.0f}')
+
+    def comparacao(self, mais_barato: Dict[str, Any], mais_caro: Dict[str, Any]) -> str:
+        """Comparação entre o produto mais barato e o mais caro da seleção."""
+        economia = mais_caro.get('price', 0) - mais_barato.get('price', 0)
+        return self._preencher(
+            'comparacao',
+            preco_barato=f"{mais_barato.get('price', 0):.2f}",
+            loja_barato=mais_barato.get('store', 'Loja'),
+            preco_caro=f"{mais_caro.get('price', 0):.2f}",
+            loja_caro=mais_caro.get('store', 'Loja'),
+            economia=f'{economia:.2f}',
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """Uso do cache de fragmentos."""
+        return dict(self.fragmentos.stats(), mode=self.modo)
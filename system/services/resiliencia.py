@@ -0,0 +1,610 @@
+import contextlib
+import heapq
+import itertools
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError as FuturesTimeout, wait
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config.logger import BotLogger
+from services.metricas import get_metricas
+
+from services.estado import EstadoIndisponivelError
+
+if TYPE_CHECKING:
+    from services.cache_http import CacheHttp
+    from services.estado import EstadoCompartilhado
+
+# Respostas que indicam falha transitória da loja e podem ser repetidas
+STATUS_RETENTAVEIS = frozenset({429, 500, 502, 503, 504})
+
+# Classes de prioridade do limitador de requisições (menor valor é atendido primeiro)
+PRIORIDADE_INTERATIVA = 0
+PRIORIDADE_SEGUNDO_PLANO = 1
+_NOMES_PRIORIDADE = {PRIORIDADE_INTERATIVA: 'interactive', PRIORIDADE_SEGUNDO_PLANO: 'background'}
+
+
+class CircuitoAbertoError(Exception):
+    """Busca recusada sem consultar a loja porque o circuito dela está aberto."""
+
+    def __init__(self, loja: str):
+        super().__init__(f"{loja} indisponível (circuito aberto)")
+        self.loja = loja
+
+
+class JanelaLatencias:
+    """Distribuição das latências mais recentes de uma loja (janela deslizante)."""
+
+    def __init__(self, tamanho: int = 200):
+        """
+        Args:
+            tamanho: Número de amostras mantidas
+        """
+        self._amostras: deque = deque(maxlen=tamanho)
+        self._lock = threading.Lock()
+
+    def registrar(self, segundos: float):
+        """Adiciona uma amostra de latência."""
+        with self._lock:
+            self._amostras.append(segundos)
+
+    def percentil(self, p: float) -> Optional[float]:
+        """Percentil `p` (0-100) das amostras ou None se a janela estiver vazia."""
+        with self._lock:
+            ordenadas = sorted(self._amostras)
+        if not ordenadas:
+            return None
+        indice = min(len(ordenadas) - 1, int(round(p / 100 * (len(ordenadas) - 1))))
+        return ordenadas[indice]
+
+    def __len__(self) -> int:
+        return len(self._amostras)
+
+
+class Orcamento:
+    """Orçamento proporcional ao tráfego: cada requisição deposita `proporcao` fichas.
+
+    Limita retentativas e requisições duplicadas (hedge) a uma fração das
+    requisições normais, para que uma loja lenta não receba o dobro da carga.
+    """
+
+    def __init__(self, proporcao: float, maximo: float = 10.0, inicial: Optional[float] = None):
+        """
+        Args:
+            proporcao: Fichas depositadas por requisição (ex: 0.1 = até 10% a mais)
+            maximo: Saldo máximo acumulado
+            inicial: Saldo inicial (padrão: `maximo`)
+        """
+        self.proporcao = proporcao
+        self.maximo = maximo
+        self._saldo = maximo if inicial is None else inicial
+        self._lock = threading.Lock()
+
+    def depositar(self):
+        with self._lock:
+            self._saldo = min(self.maximo, self._saldo + self.proporcao)
+
+    def consumir(self) -> bool:
+        """Gasta uma ficha, se houver saldo."""
+        with self._lock:
+            if self._saldo >= 1:
+                self._saldo -= 1
+                return True
+            return False
+
+    @property
+    def saldo(self) -> float:
+        return self._saldo
+
+
+class LimitadorLoja:
+    """Limite de requisições de saída de uma loja, compartilhado por todos os chats do processo.
+
+    Combina um token bucket (`taxa_por_s` requisições/s, com rajadas de até `rajada`) e
+    um máximo de requisições em andamento. Quem espera é atendido por prioridade
+    (`PRIORIDADE_INTERATIVA` antes de `PRIORIDADE_SEGUNDO_PLANO`) e, na mesma
+    prioridade, por ordem de chegada.
+
+    Com um `estado` compartilhado, `taxa_por_s` vale também para a soma de todos os
+    processos que usam o mesmo backend: cada requisição liberada localmente ainda
+    conta em um contador global por segundo e espera o próximo segundo se ele esgotou.
+    """
+
+    def __init__(self, nome: str, taxa_por_s: float = 10.0, rajada: int = 20, max_em_andamento: int = 8,
+                 estado: Optional['EstadoCompartilhado'] = None):
+        """
+        Args:
+            nome: Nome da loja (rótulo das métricas)
+            taxa_por_s: Requisições por segundo sustentadas (0 desativa o token bucket)
+            rajada: Requisições que podem sair de uma vez após um período ocioso (pelo menos 1)
+            max_em_andamento: Requisições simultâneas à loja
+            estado: Backend compartilhado entre workers (None: limite apenas do processo)
+
+        Raises:
+            ValueError: Se `rajada` for menor que 1 (o bucket nunca teria ficha e toda requisição esperaria)
+        """
+        if rajada < 1:
+            raise ValueError(f"rajada do limitador de {nome} deve ser pelo menos 1: {rajada}")
+        self.nome = nome
+        self.estado = estado
+        self.taxa_por_s = taxa_por_s
+        self.rajada = rajada
+        self.max_em_andamento = max_em_andamento
+        self.metricas = get_metricas()
+
+        self._fichas = float(rajada)
+        self._ultima_reposicao = time.monotonic()
+        self._em_andamento = 0
+        self._fila: list = []
+        self._sequencia = itertools.count()
+        self._cond = threading.Condition()
+        self.esperas = JanelaLatencias()
+
+        self.metricas.descrever('store_rate_limit_wait_seconds_total', 'Tempo total de espera no limitador da loja')
+        self.metricas.descrever('store_rate_limit_acquired_total', 'Requisições liberadas pelo limitador da loja')
+        self.metricas.descrever('store_in_flight', 'Requisições em andamento à loja')
+        self.metricas.descrever('store_queue_length', 'Requisições aguardando o limitador da loja')
+        self.metricas.descrever('store_rate_limit_shared_unavailable_total',
+                                'Requisições liberadas sem o limite global (backend de estado indisponível)')
+
+    def _repor(self):
+        if not self.taxa_por_s:
+            self._fichas = float(self.rajada)
+            return
+        agora = time.monotonic()
+        self._fichas = min(float(self.rajada), self._fichas + (agora - self._ultima_reposicao) * self.taxa_por_s)
+        self._ultima_reposicao = agora
+
+    def _publicar(self):
+        self.metricas.definir('store_in_flight', self._em_andamento, store=self.nome)
+        self.metricas.definir('store_queue_length', len(self._fila), store=self.nome)
+
+    def adquirir(self, prioridade: int = PRIORIDADE_INTERATIVA) -> float:
+        """Espera a vez de enviar uma requisição.
+
+        Returns:
+            Tempo de espera, em segundos
+        """
+        inicio = time.monotonic()
+        entrada = (prioridade, next(self._sequencia))
+        with self._cond:
+            heapq.heappush(self._fila, entrada)
+            self._publicar()
+            while True:
+                self._repor()
+                primeiro = self._fila[0] == entrada
+                if primeiro and self._em_andamento < self.max_em_andamento and self._fichas >= 1:
+                    heapq.heappop(self._fila)
+                    self._fichas -= 1
+                    self._em_andamento += 1
+                    self._publicar()
+                    # O próximo da fila pode já ter ficha disponível
+                    self._cond.notify_all()
+                    break
+                espera = None
+                # Sem token bucket (taxa 0) só a vaga entre as em andamento libera, e ela avisa pelo `notify`
+                if primeiro and self._em_andamento < self.max_em_andamento and self.taxa_por_s:
+                    espera = (1 - self._fichas) / self.taxa_por_s
+                self._cond.wait(espera)
+
+        if self.estado is not None and self.taxa_por_s:
+            self._aguardar_janela_global()
+
+        espera = time.monotonic() - inicio
+        self.esperas.registrar(espera)
+        nome_prioridade = _NOMES_PRIORIDADE.get(prioridade, str(prioridade))
+        self.metricas.incrementar('store_rate_limit_wait_seconds_total', espera, store=self.nome,
+                                  priority=nome_prioridade)
+        self.metricas.incrementar('store_rate_limit_acquired_total', store=self.nome, priority=nome_prioridade)
+        return espera
+
+    def _aguardar_janela_global(self):
+        """Espera até o contador global do segundo atual ter vaga (janela fixa de 1s)."""
+        while True:
+            agora = time.time()
+            segundo = int(agora)
+            try:
+                usadas = self.estado.incrementar(f'taxa:{self.nome}:{segundo}', 2.0)
+            except EstadoIndisponivelError:
+                # Sem o backend, vale apenas o limite local (a loja não fica sem requisições)
+                self.metricas.incrementar('store_rate_limit_shared_unavailable_total', store=self.nome)
+                return
+            if usadas <= self.taxa_por_s:
+                return
+            time.sleep(segundo + 1 - agora)
+
+    def liberar(self):
+        """Devolve a vaga de uma requisição concluída."""
+        with self._cond:
+            self._em_andamento -= 1
+            self._publicar()
+            self._cond.notify_all()
+
+    def saturado(self) -> bool:
+        """Indica se há requisições esperando na fila."""
+        return bool(self._fila)
+
+    def tem_vaga(self) -> bool:
+        """Indica se uma requisição a mais sairia agora: há vaga entre as em andamento e ficha no bucket."""
+        with self._cond:
+            self._repor()
+            return self._em_andamento < self.max_em_andamento and self._fichas >= 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Ocupação atual e percentis do tempo de espera."""
+        return {
+            'in_flight': self._em_andamento,
+            'queued': len(self._fila),
+            'tokens': round(self._fichas, 2),
+            **{
+                f'wait_p{p}_ms': round(valor * 1000, 2) if valor is not None else None
+                for p in (50, 95, 99)
+                for valor in [self.esperas.percentil(p)]
+            },
+        }
+
+
+class ClienteHttpLoja:
+    """Cliente HTTP de uma loja com timeout adaptativo, hedge e orçamento de retentativas.
+
+    - O timeout de cada requisição é derivado do p99 das latências recentes da loja,
+      limitado a [timeout_min, timeout_max].
+    - Passado o p95 sem resposta, uma cópia da requisição é disparada e vence a que
+      responder primeiro, dentro do limite `taxa_hedge`.
+    - Erros de rede e respostas 429/5xx são repetidos até `max_retentativas` vezes por
+      requisição, desde que o orçamento global (`proporcao_retentativas`) permita.
+    """
+
+    # Amostras necessárias antes de confiar nos percentis
+    MIN_AMOSTRAS = 20
+
+    def __init__(self, session: requests.Session, nome: str, max_retentativas: int = 3,
+                 timeout_min: float = 1.0, timeout_max: float = 10.0, fator_timeout: float = 3.0,
+                 taxa_hedge: float = 0.1, proporcao_retentativas: float = 0.2, max_workers: int = 16,
+                 limitador: Optional[LimitadorLoja] = None, cache: Optional['CacheHttp'] = None):
+        """
+        Args:
+            session: Sessão HTTP da loja (conexões reaproveitadas)
+            nome: Nome da loja, usado nos logs e nas threads
+            max_retentativas: Retentativas por requisição (Config.MAX_RETRIES)
+            timeout_min: Menor timeout (s) derivado das latências
+            timeout_max: Maior timeout (s); usado enquanto não há amostras suficientes
+            fator_timeout: Multiplicador aplicado ao p99 para obter o timeout
+            taxa_hedge: Fração máxima de requisições que podem ganhar uma cópia
+            proporcao_retentativas: Fração máxima de requisições que podem ser repetidas
+            max_workers: Requisições simultâneas (incluindo cópias) da loja
+            limitador: Limite de requisições de saída (padrão: sem limite)
+            cache: Cache HTTP cujos validadores são enviados nas requisições (padrão: sem cache)
+        """
+        self.session = session
+        self.nome = nome
+        self.max_retentativas = max_retentativas
+        self.timeout_min = timeout_min
+        self.timeout_max = timeout_max
+        self.fator_timeout = fator_timeout
+        self.logger = BotLogger(__name__).get_logger()
+
+        self.limitador = limitador
+        self.cache = cache
+        self.latencias = JanelaLatencias()
+        self.orcamento_hedge = Orcamento(taxa_hedge)
+        self.orcamento_retentativas = Orcamento(proporcao_retentativas)
+
+        # Pool de conexões do tamanho do executor, para que as cópias não esperem conexão
+        adaptador = HTTPAdapter(pool_connections=4, pool_maxsize=max_workers)
+        self.session.mount('http://', adaptador)
+        self.session.mount('https://', adaptador)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f'http-{nome.lower()}')
+
+        # Tempo nas requisições à loja acumulado por thread, dentro de `medir_tempo_loja`
+        self._local = threading.local()
+
+        self._contadores_lock = threading.Lock()
+        self.contadores: Dict[str, int] = {
+            'requests': 0,
+            'hedges': 0,
+            'hedge_wins': 0,
+            'retries': 0,
+            'retries_denied': 0,
+            'timeouts': 0,
+        }
+
+    def _contar(self, nome: str):
+        with self._contadores_lock:
+            self.contadores[nome] += 1
+
+    def timeout(self) -> float:
+        """Timeout atual da loja, derivado do p99 das latências recentes."""
+        if len(self.latencias) < self.MIN_AMOSTRAS:
+            return self.timeout_max
+        p99 = self.latencias.percentil(99)
+        return max(self.timeout_min, min(self.timeout_max, p99 * self.fator_timeout))
+
+    def atraso_hedge(self) -> Optional[float]:
+        """Tempo após o qual uma cópia é disparada (p95) ou None sem amostras suficientes."""
+        if len(self.latencias) < self.MIN_AMOSTRAS:
+            return None
+        return self.latencias.percentil(95)
+
+    def _requisitar(self, url: str, timeout: float, prioridade: int, kwargs: Dict[str, Any]) -> requests.Response:
+        if self.limitador:
+            self.limitador.adquirir(prioridade)
+        # A espera no limitador não entra nas latências da loja
+        inicio = time.monotonic()
+        try:
+            response = self.session.get(url, timeout=timeout, **kwargs)
+        except requests.exceptions.RequestException as e:
+            e.duracao_loja_s = time.monotonic() - inicio
+            if isinstance(e, requests.exceptions.Timeout):
+                # Conta como amostra lenta para que o timeout não encolha com a loja degradada
+                self.latencias.registrar(timeout)
+                self._contar('timeouts')
+            raise
+        finally:
+            if self.limitador:
+                self.limitador.liberar()
+        response.duracao_loja_s = time.monotonic() - inicio
+        self.latencias.registrar(response.duracao_loja_s)
+        return response
+
+    @contextlib.contextmanager
+    def medir_tempo_loja(self) -> Iterator[Callable[[], float]]:
+        """
+        Mede o tempo gasto pela loja nas chamadas a `get` feitas pela thread atual dentro do bloco.
+
+        Conta só a duração da requisição que decidiu cada tentativa (o `session.get`): a
+        espera no limitador e o backoff entre tentativas ficam de fora.
+
+        Yields:
+            Função que devolve o tempo acumulado até o momento, em segundos
+        """
+        anterior = getattr(self._local, 'tempo_loja_s', None)
+        self._local.tempo_loja_s = 0.0
+        try:
+            yield lambda: self._local.tempo_loja_s
+        finally:
+            medido = self._local.tempo_loja_s
+            self._local.tempo_loja_s = None if anterior is None else anterior + medido
+
+    def _acumular_tempo_loja(self, resultado: Any):
+        if getattr(self._local, 'tempo_loja_s', None) is not None:
+            self._local.tempo_loja_s += getattr(resultado, 'duracao_loja_s', 0.0)
+
+    def _get_com_hedge(self, url: str, prioridade: int, kwargs: Dict[str, Any]) -> requests.Response:
+        timeout = self.timeout()
+        primeira = self._executor.submit(self._requisitar, url, timeout, prioridade, kwargs)
+
+        atraso = self.atraso_hedge()
+        if atraso is None:
+            return primeira.result()
+        try:
+            return primeira.result(timeout=atraso)
+        except FuturesTimeout:
+            pass
+
+        # Sem vaga ou ficha no limitador, a cópia esperaria na fila e só aumentaria a espera de todos
+        if (self.limitador and not self.limitador.tem_vaga()) or not self.orcamento_hedge.consumir():
+            return primeira.result()
+
+        self._contar('hedges')
+        copia = self._executor.submit(self._requisitar, url, timeout, prioridade, kwargs)
+        pendentes = {primeira, copia}
+        erro: Optional[BaseException] = None
+        falha: Optional[requests.Response] = None
+        while pendentes:
+            concluidas, pendentes = wait(pendentes, return_when=FIRST_COMPLETED)
+            for futuro in concluidas:
+                try:
+                    response = futuro.result()
+                except requests.exceptions.RequestException as e:
+                    erro = e
+                    continue
+                if response.status_code in STATUS_RETENTAVEIS and pendentes:
+                    # A outra requisição ainda pode responder com sucesso
+                    falha = response
+                    continue
+                if futuro is copia:
+                    self._contar('hedge_wins')
+                # A requisição perdedora termina em segundo plano e é descartada
+                return response
+        if falha is not None:
+            return falha
+        raise erro
+
+    def get(self, url: str, prioridade: int = PRIORIDADE_INTERATIVA, condicional: bool = True,
+            **kwargs) -> requests.Response:
+        """GET com timeout adaptativo, hedge e retentativas.
+
+        Args:
+            url: URL da requisição
+            prioridade: Classe de prioridade no limitador da loja
+            condicional: Envia os validadores do cache HTTP (a resposta pode ser 304)
+            **kwargs: Repassados a `requests.Session.get`
+
+        Returns:
+            Resposta da loja (a última, se todas as tentativas falharam com 429/5xx)
+
+        Raises:
+            requests.exceptions.RequestException: Se todas as tentativas falharam por erro de rede
+        """
+        if self.cache and condicional:
+            validadores = self.cache.validadores(url)
+            if validadores:
+                kwargs['headers'] = {**(kwargs.get('headers') or {}), **validadores}
+
+        self._contar('requests')
+        self.orcamento_hedge.depositar()
+        self.orcamento_retentativas.depositar()
+
+        tentativa = 0
+        while True:
+            erro: Optional[requests.exceptions.RequestException] = None
+            response: Optional[requests.Response] = None
+            try:
+                response = self._get_com_hedge(url, prioridade, kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                erro = e
+            except requests.exceptions.RequestException as e:
+                self._acumular_tempo_loja(e)
+                raise
+            self._acumular_tempo_loja(response if erro is None else erro)
+
+            if erro is None and response.status_code not in STATUS_RETENTAVEIS:
+                return response
+
+            if tentativa >= self.max_retentativas:
+                break
+            if not self.orcamento_retentativas.consumir():
+                self._contar('retries_denied')
+                break
+
+            tentativa += 1
+            self._contar('retries')
+            self.logger.debug(
+                "%s: repetindo requisição (tentativa %d/%d): %s",
+                self.nome, tentativa, self.max_retentativas,
+                erro or f"HTTP {response.status_code}"
+            )
+            # Backoff exponencial com jitter completo
+            time.sleep(random.uniform(0, min(1.0, 0.05 * 2 ** tentativa)))
+
+        if erro is not None:
+            raise erro
+        return response
+
+    def stats(self) -> Dict[str, Any]:
+        """Latências recentes, timeout atual e contadores de hedge/retentativas."""
+        with self._contadores_lock:
+            contadores = dict(self.contadores)
+        percentis = {
+            f'p{p}_ms': round(valor * 1000, 2) if valor is not None else None
+            for p in (50, 95, 99)
+            for valor in [self.latencias.percentil(p)]
+        }
+        return {
+            **contadores,
+            **percentis,
+            'timeout_s': round(self.timeout(), 3),
+            'samples': len(self.latencias),
+        }
+
+
+class DisjuntorLoja:
+    """Circuit breaker de uma loja.
+
+    - Fechado: as buscas passam e seus resultados (erro e duração) entram em uma janela.
+    - Aberto: com `min_chamadas` na janela e taxa de erros ≥ `limiar_erros` (ou de buscas
+      mais lentas que `limiar_lento_s` ≥ `limiar_lentas`), as buscas são recusadas por
+      `tempo_aberto_s`, sem esperar o timeout da loja.
+    - Semiaberto: passado esse tempo, uma única busca de teste é liberada; se der certo o
+      circuito fecha, se falhar volta a abrir.
+    """
+
+    FECHADO = 'closed'
+    ABERTO = 'open'
+    SEMIABERTO = 'half_open'
+
+    # Valor do medidor `store_circuit_state` para cada estado
+    _CODIGOS = {FECHADO: 0, SEMIABERTO: 1, ABERTO: 2}
+
+    def __init__(self, nome: str, limiar_erros: float = 0.5, limiar_lento_s: float = 8.0,
+                 limiar_lentas: float = 0.5, min_chamadas: int = 5, janela: int = 20,
+                 tempo_aberto_s: float = 30.0):
+        """
+        Args:
+            nome: Nome da loja (rótulo das métricas e mensagens)
+            limiar_erros: Fração de buscas com erro que abre o circuito
+            limiar_lento_s: Duração a partir da qual uma busca conta como lenta
+            limiar_lentas: Fração de buscas lentas que abre o circuito
+            min_chamadas: Buscas na janela antes de avaliar os limiares
+            janela: Número de buscas recentes consideradas
+            tempo_aberto_s: Tempo que o circuito fica aberto antes da busca de teste
+        """
+        self.nome = nome
+        self.limiar_erros = limiar_erros
+        self.limiar_lento_s = limiar_lento_s
+        self.limiar_lentas = limiar_lentas
+        self.min_chamadas = min_chamadas
+        self.tempo_aberto_s = tempo_aberto_s
+        self.logger = BotLogger(__name__).get_logger()
+        self.metricas = get_metricas()
+
+        self._resultados: deque = deque(maxlen=janela)
+        self._estado = self.FECHADO
+        self._aberto_desde = 0.0
+        self._teste_em_andamento = False
+        self._lock = threading.Lock()
+        self.metricas.descrever('store_circuit_state', 'Estado do circuito da loja (0=fechado, 1=semiaberto, 2=aberto)')
+        self.metricas.descrever('store_circuit_rejected_total', 'Buscas recusadas com o circuito aberto')
+        self.metricas.descrever('store_circuit_transitions_total', 'Mudanças de estado do circuito')
+        self.metricas.definir('store_circuit_state', 0, store=nome)
+
+    @property
+    def estado(self) -> str:
+        """Estado atual; um circuito aberto há mais de `tempo_aberto_s` é reportado como semiaberto."""
+        with self._lock:
+            if self._estado == self.ABERTO and time.monotonic() - self._aberto_desde >= self.tempo_aberto_s:
+                return self.SEMIABERTO
+            return self._estado
+
+    def _mudar_estado(self, novo: str):
+        anterior, self._estado = self._estado, novo
+        if novo == self.ABERTO:
+            self._aberto_desde = time.monotonic()
+        if novo == self.FECHADO:
+            self._resultados.clear()
+        self.metricas.definir('store_circuit_state', self._CODIGOS[novo], store=self.nome)
+        self.metricas.incrementar('store_circuit_transitions_total', store=self.nome, to=novo)
+        nivel = self.logger.warning if novo == self.ABERTO else self.logger.info
+        nivel("Circuito da %s: %s -> %s", self.nome, anterior, novo)
+
+    def permitir(self) -> bool:
+        """Indica se uma busca pode ser enviada à loja (no semiaberto, só a de teste)."""
+        with self._lock:
+            if self._estado == self.ABERTO and time.monotonic() - self._aberto_desde >= self.tempo_aberto_s:
+                self._mudar_estado(self.SEMIABERTO)
+                self._teste_em_andamento = False
+            if self._estado == self.FECHADO:
+                return True
+            if self._estado == self.SEMIABERTO and not self._teste_em_andamento:
+                self._teste_em_andamento = True
+                return True
+        self.metricas.incrementar('store_circuit_rejected_total', store=self.nome)
+        return False
+
+    def registrar(self, sucesso: bool, duracao_s: float):
+        """Registra o resultado de uma busca liberada por `permitir`."""
+        lenta = duracao_s >= self.limiar_lento_s
+        with self._lock:
+            if self._estado == self.SEMIABERTO:
+                self._teste_em_andamento = False
+                self._mudar_estado(self.FECHADO if sucesso and not lenta else self.ABERTO)
+                return
+            if self._estado != self.FECHADO:
+                return
+
+            self._resultados.append((sucesso, lenta))
+            total = len(self._resultados)
+            if total < self.min_chamadas:
+                return
+            erros = sum(1 for ok, _ in self._resultados if not ok) / total
+            lentas = sum(1 for _, devagar in self._resultados if devagar) / total
+            if erros >= self.limiar_erros or lentas >= self.limiar_lentas:
+                self._mudar_estado(self.ABERTO)
+
+    def stats(self) -> Dict[str, Any]:
+        """Estado do circuito e taxas da janela atual."""
+        with self._lock:
+            resultados = list(self._resultados)
+        total = len(resultados)
+        return {
+            'state': self.estado,
+            'window_calls': total,
+            'error_rate': round(sum(1 for ok, _ in resultados if not ok) / total, 4) if total else 0.0,
+            'slow_rate': round(sum(1 for _, lenta in resultados if lenta) / total, 4) if total else 0.0,
+        }
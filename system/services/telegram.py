@@ -1,9 +1,19 @@
 import asyncio
+import json
+import time
 from typing import Optional, Dict, Any, List
 from telegram import Bot, Update
 from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes
 from interfaces.chatbot import ChatbotInterface
 from config.logger import BotLogger
+from config.settings import get_config
+from services.estado import SessoesChat
+from services.filtros import extrair_filtro
+from services.memoria import NIVEL_BUFFERS, NIVEL_MIDIA, NIVEL_SESSOES, FilaLimitada, get_governador
+from services.metricas import get_metricas
+from services.midia import EnviadorAlbuns, MapaFileIds
+from services.ofertas import VitrineOfertas
+from services.perfilador import ControlePerfil, RelatorioPerfil
 from services.product_search import ProductSearchService
 
 class TelegramBot(ChatbotInterface):
@@ -13,19 +23,62 @@ class TelegramBot(ChatbotInterface):
     permitindo envio e recebimento de mensagens através da API do Telegram.
     """
     
-    def __init__(self, token: str):
+    def __init__(self, token: str, base_url: Optional[str] = None,
+                 product_search: Optional[ProductSearchService] = None, modo_resultados: Optional[str] = None):
         """Construtor da classe que receberá o token de acesso para as requisições para o telegram.
         
         Args:
             token (str): Token de acesso do bot fornecido pelo BotFather do Telegram
+            base_url (str, optional): URL da Bot API (padrão: https://api.telegram.org/bot).
+                Permite usar um servidor local da Bot API ou o servidor simulado dos testes de carga.
+            product_search (ProductSearchService, optional): Serviço de busca a ser usado
+                (padrão: serviço apontando para as lojas reais)
+            modo_resultados (str, optional): 'text' (uma mensagem por produto) ou 'album'
+                (fotos em um media group; padrão: SEARCH_RESULTS_MODE da configuração)
         """
         super().__init__(token)
         self.logger = BotLogger(__name__).get_logger()
-        self.bot = Bot(token=self.token)
-        self.application = Application.builder().token(self.token).build()
+        builder = Application.builder().token(self.token)
+        if base_url:
+            self.bot = Bot(token=self.token, base_url=base_url)
+            builder = builder.base_url(base_url)
+        else:
+            self.bot = Bot(token=self.token)
+        self.application = builder.build()
         self.is_running = False
-        self.received_messages: List[Dict[str, Any]] = []
-        self.product_search = ProductSearchService()
+        self.product_search = product_search or ProductSearchService()
+        
+        config = get_config()
+        # Últimas mensagens recebidas (as mais antigas saem ao passar de RECEIVED_MESSAGES_MAX)
+        self.received_messages: FilaLimitada = FilaLimitada(maxlen=config.RECEIVED_MESSAGES_MAX)
+        # Sessão de cada chat no mesmo estado da busca: vista por qualquer worker que receba o chat
+        self.sessoes = SessoesChat(self.product_search.estado, config.SESSION_TTL_S)
+        self.modo_resultados = modo_resultados or config.SEARCH_RESULTS_MODE
+        self.albuns: Optional[EnviadorAlbuns] = None
+        if self.modo_resultados == 'album':
+            self.albuns = EnviadorAlbuns(
+                self.bot,
+                MapaFileIds(config.MEDIA_FILE_IDS_PATH, config.MEDIA_FILE_IDS_MAX),
+                parse_mode=self.product_search.parse_mode,
+                ttl_url_morta=config.MEDIA_DEAD_URL_TTL,
+            )
+        
+        # Buffers, sessões e mapa de file_id contam no orçamento de memória do processo
+        governador = get_governador()
+        governador.registrar('received_messages', self.received_messages, NIVEL_BUFFERS)
+        if self.sessoes.em_memoria:
+            governador.registrar('chat_sessions', self.sessoes, NIVEL_SESSOES)
+        if self.albuns is not None:
+            governador.registrar('media_file_ids', self.albuns.mapa, NIVEL_MIDIA)
+        
+        # Ofertas do dia (/ofertas): ranking por categoria reconstruído em segundo plano
+        self.vitrine = VitrineOfertas(self.product_search, config.OFFERS_CATEGORIES, config.OFFERS_REFRESH_S,
+                                      config.OFFERS_HISTORY_WINDOW_S)
+        
+        # Perfilador por amostragem do /perf e métricas do /metricas, restritos aos chats de administração
+        self.admin_chat_ids = config.ADMIN_CHAT_IDS
+        self.perfil = ControlePerfil(config.PERF_SAMPLE_INTERVAL_MS / 1000, config.PERF_MAX_SECONDS)
+        self.perf_top_n = config.PERF_TOP_N
         
         # Configurar handlers
         self._setup_handlers()
@@ -46,6 +99,18 @@ class TelegramBot(ChatbotInterface):
         search_handler = CommandHandler('buscar', self._search_command)
         self.application.add_handler(search_handler)
         
+        # Handler para o comando /ofertas
+        offers_handler = CommandHandler('ofertas', self._offers_command)
+        self.application.add_handler(offers_handler)
+        
+        # Handler para o comando /perf (apenas administradores)
+        perf_handler = CommandHandler('perf', self._perf_command)
+        self.application.add_handler(perf_handler)
+        
+        # Handler para o comando /metricas (apenas administradores)
+        metrics_handler = CommandHandler('metricas', self._metrics_command)
+        self.application.add_handler(metrics_handler)
+        
         # Handler para mensagens de texto
         message_handler = MessageHandler(filters.TEXT & ~filters.COMMAND, self._handle_message)
         self.application.add_handler(message_handler)
@@ -60,7 +125,7 @@ class TelegramBot(ChatbotInterface):
             "descrevendo o produto que você está procurando!"
         )
         await update.message.reply_text(welcome_message)
-        self.logger.info(f"Start command executed for user {update.effective_user.id}")
+        self.logger.info("Start command executed for user %s", update.effective_user.id)
     
     async def _help_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handler para o comando /help."""
@@ -68,17 +133,22 @@ class TelegramBot(ChatbotInterface):
             "🔍 **Comandos Disponíveis:**\n\n"
             "/start - Iniciar o bot\n"
             "/help - Mostrar esta mensagem de ajuda\n"
-            "/buscar <produto> - Buscar produto nas lojas\n\n"
+            "/buscar <produto> - Buscar produto nas lojas\n"
+            "/ofertas [categoria] - Melhores ofertas do dia\n\n"
             "**Exemplos de uso:**\n"
             "/buscar smartphone\n"
             "/buscar notebook gamer\n"
             "/buscar placa de video\n\n"
+            "**Filtros (opcionais):**\n"
+            "/buscar notebook até 3000 só Kabum\n"
+            "/buscar monitor entre 800 e 1500 marca LG em estoque\n"
+            "/buscar mouse gamer sem Magalu mais barato\n\n"
             "**Ou simplesmente digite:**\n"
             "Procuro um smartphone bom e barato\n\n"
             "🤖 Eu vou buscar nas melhores lojas e te mostrar as melhores ofertas!"
         )
         await update.message.reply_text(help_message, parse_mode='Markdown')
-        self.logger.info(f"Help command executed for user {update.effective_user.id}")
+        self.logger.info("Help command executed for user %s", update.effective_user.id)
     
     async def _search_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handler para o comando /buscar."""
@@ -94,6 +164,115 @@ class TelegramBot(ChatbotInterface):
         termo_busca = " ".join(context.args)
         await self._process_search(update, termo_busca)
     
+    async def _offers_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handler para o comando /ofertas: ranking pronto da vitrine, sem consultar as lojas."""
+        categoria = " ".join(context.args) if context.args else None
+        if not self.vitrine.pronta:
+            await update.message.reply_text(
+                "⏳ As ofertas do dia ainda estão sendo preparadas. Tente novamente em instantes!"
+            )
+            return
+        
+        ofertas = self.vitrine.consultar(categoria)
+        if ofertas is None or not ofertas['best']:
+            categorias = "\n".join(f"• /ofertas {nome}" for nome in self.vitrine.nomes_categorias())
+            await update.message.reply_text(
+                f"❌ Não encontrei ofertas para '{categoria or 'hoje'}'.\n\nCategorias disponíveis:\n{categorias}"
+            )
+            return
+        
+        await update.message.reply_text(ofertas['summary'], parse_mode=self.product_search.parse_mode)
+        await self._enviar_produtos(update, ofertas['best'], ofertas['messages'])
+    
+    async def _perf_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handler para o comando /perf: `/perf <segundos>` ou `/perf buscas <N>` (só em ADMIN_CHAT_IDS)."""
+        chat_id = update.effective_chat.id
+        if chat_id not in self.admin_chat_ids:
+            self.logger.warning("/perf negado para o chat %s", chat_id)
+            return
+        
+        args = context.args or []
+        try:
+            if len(args) == 2 and args[0].lower() == 'buscas':
+                quantidade = int(args[1])
+                segundos = None
+            elif len(args) == 1:
+                segundos = float(args[0].replace(',', '.'))
+                quantidade = None
+            else:
+                raise ValueError
+            if (quantidade is not None and quantidade <= 0) or (segundos is not None and segundos <= 0):
+                raise ValueError
+        except ValueError:
+            await update.message.reply_text(
+                "Uso:\n/perf <segundos> - perfila o processo pelo tempo informado\n"
+                "/perf buscas <N> - perfila apenas as próximas N buscas"
+            )
+            return
+        
+        if self.perfil.ocupado:
+            await update.message.reply_text("⏳ Já há uma sessão do perfilador em andamento.")
+            return
+        
+        if quantidade is not None:
+            sessao = self.perfil.proximas_buscas(quantidade)
+            aviso = f"🔬 Perfilando as próximas {quantidade} buscas (até {self.perfil.max_duracao_s:.0f}s)..."
+        else:
+            segundos = min(segundos, self.perfil.max_duracao_s)
+            sessao = self.perfil.por_tempo(segundos)
+            aviso = f"🔬 Perfilando o processo por {segundos:g}s..."
+        await update.message.reply_text(aviso)
+        # Em segundo plano: o handler não pode segurar os outros updates durante a sessão
+        self.application.create_task(self._enviar_perfil(update, sessao), update=update)
+    
+    async def _enviar_perfil(self, update: Update, sessao):
+        """Espera a sessão do perfilador e envia o resumo e o arquivo de pilhas colapsadas."""
+        try:
+            relatorio: RelatorioPerfil = await sessao
+            await update.message.reply_text(relatorio.resumo(self.perf_top_n))
+            if relatorio.amostras:
+                await update.message.reply_document(
+                    document=relatorio.colapsado().encode('utf-8'),
+                    filename=f"perf-{time.strftime('%Y%m%d-%H%M%S')}.folded",
+                    caption="Pilhas colapsadas (flamegraph.pl ou speedscope.app)",
+                )
+        except Exception as e:
+            self.logger.error("Erro no /perf: %s", e)
+            await update.message.reply_text("❌ Não foi possível concluir o perfil.")
+    
+    async def _metrics_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handler para o comando /metricas: registro de métricas e estado dos serviços (só em ADMIN_CHAT_IDS)."""
+        chat_id = update.effective_chat.id
+        if chat_id not in self.admin_chat_ids:
+            self.logger.warning("/metricas negado para o chat %s", chat_id)
+            return
+        
+        try:
+            # O estado compartilhado pode ir à rede: montado fora do event loop
+            estado = await asyncio.get_running_loop().run_in_executor(self.product_search.executor, self.stats)
+            instante = time.strftime('%Y%m%d-%H%M%S')
+            await update.message.reply_document(
+                document=get_metricas().exportar_prometheus().encode('utf-8'),
+                filename=f"metricas-{instante}.prom",
+                caption="Métricas no formato texto do Prometheus",
+            )
+            await update.message.reply_document(
+                document=json.dumps(estado, indent=2, ensure_ascii=False, default=str).encode('utf-8'),
+                filename=f"estado-{instante}.json",
+                caption="Estado dos caches, lojas, memória, fotos e vitrine",
+            )
+        except Exception as e:
+            self.logger.error("Erro no /metricas: %s", e)
+            await update.message.reply_text("❌ Não foi possível coletar as métricas.")
+    
+    def stats(self) -> Dict[str, Any]:
+        """Estado da busca (caches, lojas, memória), do envio de fotos e da vitrine de ofertas."""
+        return {
+            'search': self.product_search.stats(),
+            'media': self.albuns.stats() if self.albuns is not None else None,
+            'offers': self.vitrine.stats(),
+        }
+    
     async def _handle_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handler para mensagens de texto regulares."""
         message_data = {
@@ -109,15 +288,30 @@ class TelegramBot(ChatbotInterface):
         # Processar mensagem como busca de produto
         await self._process_search(update, update.message.text)
         
-        self.logger.info(f"Message received from user {update.effective_user.id}: {update.message.text}")
+        # O texto do usuário fica fora dos logs: apenas o tamanho, e só em DEBUG
+        self.logger.debug(
+            "Message received from user %s (%d chars)", update.effective_user.id, len(update.message.text or '')
+        )
     
     async def _process_search(self, update: Update, termo_busca: str):
-        """Processa a busca de produtos e envia os resultados."""
+        """Processa a busca de produtos e envia os resultados.
+        
+        O texto pode trazer filtros ("notebook até 3000 só Kabum"), separados do termo por `extrair_filtro`.
+        Cada busca é marcada para o `/perf buscas <N>`, que perfila apenas as próximas N.
+        """
+        async with self.perfil.rastrear():
+            await self._buscar_e_responder(update, termo_busca)
+    
+    async def _buscar_e_responder(self, update: Update, termo_busca: str):
+        """Corpo de `_process_search`: busca, ranqueia e envia as mensagens."""
         chat_id = update.effective_chat.id
+        termo_busca, filtro = extrair_filtro(termo_busca)
         
         # Enviar mensagem de "digitando..."
         await self.bot.send_chat_action(chat_id=chat_id, action="typing")
         
+        await self._registrar_busca(chat_id, termo_busca)
+        
         # Mensagem de início da busca
         await update.message.reply_text(
             f"🔍 Buscando '{termo_busca}' nas melhores lojas...\n"
@@ -126,38 +320,25 @@ class TelegramBot(ChatbotInterface):
         
         try:
             # Realizar busca
-            resultados = await self.product_search.search_products(termo_busca)
+            resultados = await self.product_search.search_products(termo_busca, filtro=filtro)
             
-            # Encontrar melhores produtos
-            melhores_produtos = self.product_search.find_best_products(
-                resultados['all_products'], 
-                criterio='melhor_custo_beneficio'
-            )
+            # Melhores produtos e mensagens (no pool de processos, se a resposta for grande)
+            criterio = 'melhor_preco' if filtro.ordenacao == 'preco' else 'melhor_custo_beneficio'
+            resposta = await self.product_search.preparar_resposta(resultados, criterio=criterio)
+            melhores_produtos = resposta['best']
             
             if not melhores_produtos:
-                await update.message.reply_text(
-                    self.product_search.format_summary_message(resultados, [])
-                )
+                await update.message.reply_text(resposta['summary'], parse_mode=self.product_search.parse_mode)
                 return
             
             # Enviar resumo
-            summary = self.product_search.format_summary_message(resultados, melhores_produtos)
-            await update.message.reply_text(summary, parse_mode='Markdown')
+            await update.message.reply_text(resposta['summary'], parse_mode=self.product_search.parse_mode)
             
             # Enviar comparação (se houver mais de um produto)
-            if len(melhores_produtos) > 1:
-                comparison = self.product_search.create_comparison_message(melhores_produtos)
-                if comparison:
-                    await update.message.reply_text(comparison, parse_mode='Markdown')
+            if resposta['comparison']:
+                await update.message.reply_text(resposta['comparison'], parse_mode=self.product_search.parse_mode)
             
-            # Enviar cada produto
-            for i, produto in enumerate(melhores_produtos, 1):
-                product_message = self.product_search.format_product_message(produto, i)
-                await update.message.reply_text(product_message, parse_mode='Markdown')
-                
-                # Pequena pausa entre mensagens para não sobrecarregar
-                if i < len(melhores_produtos):
-                    await asyncio.sleep(0.5)
+            await self._enviar_produtos(update, melhores_produtos, resposta['messages'])
             
             # Mensagem final
             final_message = (
@@ -171,13 +352,46 @@ class TelegramBot(ChatbotInterface):
             await update.message.reply_text(final_message, parse_mode='Markdown')
             
         except Exception as e:
-            self.logger.error(f"Erro durante busca: {e}")
+            self.logger.error("Erro durante busca: %s", e)
             await update.message.reply_text(
                 "❌ Ops! Ocorreu um erro durante a busca.\n"
                 "🔄 Tente novamente em alguns instantes ou com outro termo.\n\n"
                 "Se o problema persistir, digite /help para mais informações."
             )
     
+    async def _enviar_produtos(self, update: Update, produtos: List[Dict[str, Any]], mensagens: List[str]):
+        """Envia as mensagens dos produtos (no modo álbum, as fotos vão juntas e o resto segue como texto)."""
+        if self.albuns is not None:
+            # Fotos em um álbum; produtos sem imagem válida seguem como texto
+            itens = [(produto.get('imageUrl', ''), mensagem) for produto, mensagem in zip(produtos, mensagens)]
+            mensagens = [mensagens[i] for i in await self.albuns.enviar(update.effective_chat.id, itens)]
+        
+        # Enviar cada produto
+        for i, product_message in enumerate(mensagens, 1):
+            await update.message.reply_text(product_message, parse_mode=self.product_search.parse_mode)
+            
+            # Pequena pausa entre mensagens para não sobrecarregar
+            if i < len(mensagens):
+                await asyncio.sleep(0.5)
+    
+    async def _registrar_busca(self, chat_id: int, termo_busca: str):
+        """Guarda a última busca (e o total de buscas) na sessão do chat; falhas não interrompem a busca."""
+        def registrar():
+            # O total é incrementado no backend: workers simultâneos não perdem buscas
+            buscas = self.sessoes.incrementar(chat_id, 'searches')
+            campos = {'last_search': termo_busca, 'last_search_at': time.time()}
+            if buscas is not None:
+                campos['searches'] = buscas
+            self.sessoes.atualizar(chat_id, **campos)
+        
+        try:
+            if self.sessoes.estado.compartilhado:
+                await asyncio.get_running_loop().run_in_executor(self.product_search.executor, registrar)
+            else:
+                registrar()
+        except Exception as e:
+            self.logger.warning("Não foi possível registrar a busca na sessão do chat %s: %s", chat_id, e)
+    
     async def send_message(self, chat_id: int, text: str, parse_mode: Optional[str] = None) -> bool:
         """Envia uma mensagem para o chat especificado.
         
@@ -195,10 +409,10 @@ class TelegramBot(ChatbotInterface):
                 text=text,
                 parse_mode=parse_mode
             )
-            self.logger.info(f"Message sent successfully to chat {chat_id}")
+            self.logger.info("Message sent successfully to chat %s", chat_id)
             return True
         except Exception as e:
-            self.logger.error(f"Error sending message to chat {chat_id}: {e}")
+            self.logger.error("Error sending message to chat %s: %s", chat_id, e)
             return False
     
     async def send_photo(self, chat_id: int, photo_url: str, caption: str = "") -> bool:
@@ -218,10 +432,10 @@ class TelegramBot(ChatbotInterface):
                 photo=photo_url,
                 caption=caption
             )
-            self.logger.info(f"Photo sent successfully to chat {chat_id}")
+            self.logger.info("Photo sent successfully to chat %s", chat_id)
             return True
         except Exception as e:
-            self.logger.error(f"Error sending photo to chat {chat_id}: {e}")
+            self.logger.error("Error sending photo to chat %s: %s", chat_id, e)
             return False
     
     def receive_message(self) -> List[Dict[str, Any]]:
@@ -230,8 +444,8 @@ class TelegramBot(ChatbotInterface):
         Returns:
             List[Dict[str, Any]]: Lista de mensagens recebidas
         """
-        messages = self.received_messages.copy()
-        self.received_messages.clear()  # Limpa a lista após retornar
+        messages = list(self.received_messages)
+        self.received_messages.clear()  # Limpa a fila após retornar
         return messages
     
     def get_latest_message(self) -> Optional[Dict[str, Any]]:
@@ -250,9 +464,10 @@ class TelegramBot(ChatbotInterface):
             await self.application.initialize()
             await self.application.start()
             await self.application.updater.start_polling()
+            self.vitrine.iniciar()
             self.logger.info("Telegram bot is now running and listening for messages")
         except Exception as e:
-            self.logger.error(f"Error starting bot polling: {e}")
+            self.logger.error("Error starting bot polling: %s", e)
             self.is_running = False
             raise
     
@@ -261,15 +476,42 @@ class TelegramBot(ChatbotInterface):
         try:
             self.logger.info("Stopping Telegram bot...")
             if self.is_running:
+                await self.vitrine.parar()
                 await self.application.updater.stop()
                 await self.application.stop()
                 await self.application.shutdown()
                 self.is_running = False
                 self.logger.info("Telegram bot stopped successfully")
         except Exception as e:
-            self.logger.error(f"Error stopping bot: {e}")
+            self.logger.error("Error stopping bot: %s", e)
             raise
     
+    async def start_worker(self):
+        """Inicia o bot sem polling: os updates chegam por `process_update_data` (ver `services.workers`)."""
+        self.logger.info("Starting Telegram bot worker...")
+        self.is_running = True
+        await self.application.initialize()
+        await self.application.start()
+        self.vitrine.iniciar()
+    
+    async def stop_worker(self):
+        """Para um bot iniciado com `start_worker`."""
+        if self.is_running:
+            await self.vitrine.parar()
+            await self.application.stop()
+            await self.application.shutdown()
+            self.is_running = False
+            self.logger.info("Telegram bot worker stopped")
+    
+    async def process_update_data(self, dados: Dict[str, Any]):
+        """Entrega um update (JSON da Bot API) aos handlers, como se viesse do polling.
+        
+        Args:
+            dados (Dict[str, Any]): Update no formato devolvido por `getUpdates`
+        """
+        update = Update.de_json(dados, self.application.bot)
+        await self.application.update_queue.put(update)
+    
     def run(self):
         """Método de conveniência para executar o bot (modo síncrono)."""
         try:
@@ -277,7 +519,7 @@ class TelegramBot(ChatbotInterface):
         except KeyboardInterrupt:
             self.logger.info("Bot stopped by user")
         except Exception as e:
-            self.logger.error(f"Error running bot: {e}")
+            self.logger.error("Error running bot: %s", e)
             raise
     
     @property
@@ -306,5 +548,5 @@ class TelegramBot(ChatbotInterface):
                 'supports_inline_queries': bot_info.supports_inline_queries
             }
         except Exception as e:
-            self.logger.error(f"Error getting bot info: {e}")
+            self.logger.error("Error getting bot info: %s", e)
             return {}
\ No newline at end of file
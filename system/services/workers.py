@@ -0,0 +1,147 @@
+"""
+Distribuição dos updates do Telegram entre vários processos (workers) do bot.
+
+Um único processo (o distribuidor) faz o long polling de `getUpdates` e coloca cada
+update na fila do worker responsável pelo chat (`chat_id % workers`), no estado
+compartilhado. Cada worker consome a sua fila e processa os updates com os handlers
+normais do `TelegramBot`. Como as filas, o cache de resultados, as buscas em andamento,
+o limite das lojas e as sessões ficam no mesmo backend (Redis), os workers podem rodar
+em núcleos diferentes da mesma máquina ou em máquinas diferentes.
+
+Os updates de um chat vão sempre para o mesmo worker, na ordem em que chegaram.
+"""
+
+import asyncio
+import signal
+from typing import Any, Dict, List, Optional
+
+from config.logger import BotLogger
+from services import json_projetado
+from services.estado import EstadoCompartilhado, EstadoIndisponivelError
+
+FILA_UPDATES = 'updates:{}'
+
+
+def worker_do_update(dados: Dict[str, Any], workers: int) -> int:
+    """Índice do worker que processa o update (pelo chat; updates sem chat vão pelo usuário)."""
+    for conteudo in dados.values():
+        if not isinstance(conteudo, dict):
+            continue
+        chat = conteudo.get('chat') or (conteudo.get('message') or {}).get('chat')
+        if chat:
+            return chat['id'] % workers
+        usuario = conteudo.get('from') or conteudo.get('user')
+        if usuario:
+            return usuario['id'] % workers
+    return 0
+
+
+class DistribuidorUpdates:
+    """Faz o long polling do bot e reparte os updates entre as filas dos workers."""
+
+    def __init__(self, token: str, estado: EstadoCompartilhado, workers: int,
+                 base_url: Optional[str] = None, timeout_polling: int = 25):
+        """
+        Args:
+            token: Token do bot
+            estado: Backend compartilhado com os workers (precisa ser visto por outros processos)
+            workers: Número de workers (filas)
+            base_url: URL da Bot API (padrão: https://api.telegram.org/bot)
+            timeout_polling: Timeout (s) do long polling de `getUpdates`
+
+        Raises:
+            ValueError: Se o estado não for compartilhado entre processos
+        """
+        if not estado.compartilhado:
+            raise ValueError("a distribuição entre workers exige SHARED_STATE_URL (ex: redis://localhost:6379/0)")
+        from telegram import Bot
+
+        self.estado = estado
+        self.workers = workers
+        self.timeout_polling = timeout_polling
+        self.bot = Bot(token=token, base_url=base_url) if base_url else Bot(token=token)
+        self.logger = BotLogger(__name__).get_logger()
+        self.distribuidos: List[int] = [0] * workers
+        self._executando = False
+
+    async def executar(self):
+        """Distribui os updates até `parar()` ser chamado."""
+        from telegram.error import NetworkError, TimedOut
+
+        loop = asyncio.get_running_loop()
+        self._executando = True
+        offset: Optional[int] = None
+        async with self.bot:
+            await self.bot.delete_webhook()
+            self.logger.info("Distribuindo updates entre %d workers", self.workers)
+            while self._executando:
+                try:
+                    updates = await self.bot.get_updates(offset=offset, timeout=self.timeout_polling)
+                except (TimedOut, NetworkError) as e:
+                    self.logger.warning("Falha no getUpdates: %s", e)
+                    await asyncio.sleep(1)
+                    continue
+                for update in updates:
+                    dados = update.to_dict()
+                    indice = worker_do_update(dados, self.workers)
+                    try:
+                        await loop.run_in_executor(None, self.estado.empurrar, FILA_UPDATES.format(indice),
+                                                   json_projetado.serializar(dados))
+                    except EstadoIndisponivelError as e:
+                        # O offset não avança: o update é pedido de novo no próximo getUpdates
+                        self.logger.error("Estado compartilhado indisponível: %s", e)
+                        await asyncio.sleep(1)
+                        break
+                    self.distribuidos[indice] += 1
+                    offset = update.update_id + 1
+
+    def parar(self):
+        """Encerra o laço de `executar` após o getUpdates em andamento."""
+        self._executando = False
+
+
+async def executar_worker(indice: int, token: str, base_url: Optional[str] = None,
+                          termos_aquecimento: Optional[List[str]] = None):
+    """
+    Processa os updates da fila `indice` até o processo receber SIGINT/SIGTERM.
+
+    Args:
+        indice: Número do worker (0..workers-1)
+        token: Token do bot (usado para responder)
+        base_url: URL da Bot API
+        termos_aquecimento: Buscas pré-carregadas antes de consumir a fila
+    """
+    from services.product_search import ProductSearchService
+    from services.telegram import TelegramBot
+
+    logger = BotLogger(__name__).get_logger()
+    product_search = ProductSearchService()
+    if not product_search.estado.compartilhado:
+        raise ValueError("workers exigem SHARED_STATE_URL (ex: redis://localhost:6379/0)")
+    if termos_aquecimento:
+        await product_search.aquecer(termos_aquecimento)
+    bot = TelegramBot(token, base_url=base_url, product_search=product_search)
+
+    parar = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sinal in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sinal, parar.set)
+        except (NotImplementedError, RuntimeError, ValueError):  # pragma: no cover - Windows, outra thread
+            pass
+
+    fila = FILA_UPDATES.format(indice)
+    await bot.start_worker()
+    logger.info("Worker %d consumindo %s", indice, fila)
+    try:
+        while not parar.is_set():
+            try:
+                dados = await loop.run_in_executor(product_search.executor, product_search.estado.retirar, fila, 1.0)
+            except EstadoIndisponivelError as e:
+                logger.error("Estado compartilhado indisponível: %s", e)
+                await asyncio.sleep(1)
+                continue
+            if dados is not None:
+                await bot.process_update_data(json_projetado.carregar(dados))
+    finally:
+        await bot.stop_worker()